@@ -72,6 +72,17 @@ def _cleanup_on_exit() -> None:
     except Exception:
         pass
 
+    # 5) 共享 HTTP 连接池（LLM/embedding 客户端）
+    try:
+        import sys as _sys
+
+        if "src.utils.http_transport" in _sys.modules:
+            from src.utils.http_transport import close_transport_registry
+
+            close_transport_registry()
+    except Exception:
+        pass
+
 
 def _start_tts_init_async() -> None:
     """后台初始化 TTS（避免阻塞 GUI 启动与首帧渲染）。"""
@@ -0,0 +1,161 @@
+"""
+本地 embedding 后端基准：PyTorch（SentenceTransformer）vs ONNX Runtime（int8 量化）
+
+报告每个后端的：
+- 模型加载耗时（含首次导入依赖）
+- 单条查询延迟（p50 / p95，顺序调用）
+- 吞吐：并发线程调用 embed_query（--micro-batch-ms > 0 时经 EmbeddingDispatcher 合并为批量前向）
+- 与 torch 后端向量的平均余弦相似度（量化误差）
+
+用法：
+    ./.venv/bin/python scripts/bench_local_embeddings.py
+    ./.venv/bin/python scripts/bench_local_embeddings.py --backend onnx --threads 8 --queries 400
+    ./.venv/bin/python scripts/bench_local_embeddings.py --model BAAI/bge-large-zh-v1.5 --micro-batch-ms 0
+
+说明：
+- 每个后端在独立子进程中运行，保证加载耗时包含依赖导入（onnx 后端不导入 torch）
+- embedding 缓存在基准中关闭，测得的是真实前向耗时
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+_SAMPLES = [
+    "主人今天想吃什么呀？",
+    "还记得我们上周一起看的那部电影吗",
+    "明天上海会下雨吗，需要带伞吗",
+    "帮我总结一下刚才聊的内容",
+    "我最喜欢的颜色是薄荷绿",
+    "What did we talk about yesterday evening?",
+    "周末要不要一起去公园散步喵",
+    "提醒我晚上九点给妈妈打电话",
+]
+
+
+def _queries(n: int) -> List[str]:
+    # 追加序号避免命中任何缓存/去重
+    return [f"{_SAMPLES[i % len(_SAMPLES)]} #{i}" for i in range(n)]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def run_backend(args: argparse.Namespace) -> Dict[str, Any]:
+    started = time.perf_counter()
+    from src.utils.embedding_dispatcher import BatchedEmbeddings
+    from src.utils.local_embeddings import LocalEmbeddings
+
+    embeddings: Any = LocalEmbeddings(
+        model_name=args.model,
+        device="cpu",
+        enable_cache=False,
+        backend=args.backend,
+        quantized=not args.fp32,
+    )
+    if args.micro_batch_ms > 0:
+        embeddings = BatchedEmbeddings(
+            embeddings, max_wait_ms=args.micro_batch_ms, max_batch=args.micro_batch_max
+        )
+    load_ms = (time.perf_counter() - started) * 1000.0
+
+    embeddings.embed_query("warmup")
+    latencies: List[float] = []
+    for text in _queries(args.latency_queries):
+        t0 = time.perf_counter()
+        embeddings.embed_query(text)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    queries = _queries(args.queries)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        vectors = list(pool.map(embeddings.embed_query, queries))
+    elapsed = time.perf_counter() - t0
+
+    stats = embeddings.get_stats()
+    return {
+        "backend": args.backend,
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "qps": round(len(queries) / elapsed, 1),
+        "micro_batch": stats.get("dispatch"),
+        "probe": vectors[: len(_SAMPLES)],
+    }
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = sum(x * x for x in a) ** 0.5
+    nb = sum(y * y for y in b) ** 0.5
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local embedding backend benchmark")
+    parser.add_argument("--model", default=_DEFAULT_MODEL)
+    parser.add_argument("--backend", choices=("torch", "onnx", "all"), default="all")
+    parser.add_argument("--fp32", action="store_true", help="onnx 后端使用 fp32 权重")
+    parser.add_argument("--queries", type=int, default=256, help="吞吐测试的查询条数")
+    parser.add_argument("--latency-queries", type=int, default=64, help="延迟测试的顺序查询条数")
+    parser.add_argument("--threads", type=int, default=8, help="吞吐测试的并发线程数")
+    parser.add_argument("--micro-batch-ms", type=float, default=2.0)
+    parser.add_argument("--micro-batch-max", type=int, default=32)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args)))
+        return
+
+    backends = ["torch", "onnx"] if args.backend == "all" else [args.backend]
+    results: Dict[str, Dict[str, Any]] = {}
+    for backend in backends:
+        cmd = [sys.executable, __file__, "--child", "--backend", backend]
+        for name in ("model", "queries", "latency_queries", "threads", "micro_batch_ms"):
+            cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        cmd += ["--micro-batch-max", str(args.micro_batch_max)]
+        if args.fp32:
+            cmd.append("--fp32")
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"[{backend}] 失败:\n{proc.stderr.strip()[-2000:]}")
+            continue
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(
+        f"{'backend':<8} {'load_ms':>9} {'p50_ms':>8} {'p95_ms':>8} {'qps':>8} "
+        f"{'avg_batch':>9} {'cos_vs_torch':>12}"
+    )
+    reference = results.get("torch", {}).get("probe")
+    for backend, res in results.items():
+        cos = ""
+        if reference and backend != "torch":
+            sims = [_cosine(a, b) for a, b in zip(reference, res["probe"])]
+            cos = f"{statistics.mean(sims):.4f}"
+        batch = (res.get("micro_batch") or {}).get("avg_batch", "-")
+        print(
+            f"{backend:<8} {res['load_ms']:>9} {res['p50_ms']:>8} {res['p95_ms']:>8} "
+            f"{res['qps']:>8} {batch:>9} {cos:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
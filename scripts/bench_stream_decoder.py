@@ -0,0 +1,168 @@
+"""
+流式解码微基准：SSE 字节直解 vs SDK chunk 对象解码
+
+用法：
+    ./.venv/bin/python scripts/bench_stream_decoder.py
+    ./.venv/bin/python scripts/bench_stream_decoder.py --sse-file captured.sse --repeat 200
+
+说明：
+- 默认回放脚本内置的两段录制流（纯文本回复 / 工具调用回复），并按真实网络读尺寸切片
+- `--sse-file` 可回放从真实网关抓取的原始 SSE 响应体（例如 `curl -N ... > captured.sse`）
+- 基线路径模拟 SDK：逐行拆分 → json.loads → ChatCompletionChunk 校验 → 逐 chunk 生成事件
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.llm_native.sse_decoder import StreamDeltaDecoder  # noqa: E402
+
+
+def _sse(obj: object) -> bytes:
+    return b"data: " + json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+def _chunk(delta: dict, finish_reason: str | None = None) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "bench-model",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def recorded_text_stream(tokens: int = 800) -> bytes:
+    """录制形态的纯文本回复：role 首包 + 逐 token 内容 + 周期性 keep-alive 注释。"""
+    words = ["主人", "今天", "天气", "很好", "喵~", "我们", "一起", "出去", "玩吧", "，", "。"]
+    rng = random.Random(7)
+    parts = [_sse(_chunk({"role": "assistant", "content": ""}))]
+    for i in range(tokens):
+        parts.append(_sse(_chunk({"content": rng.choice(words)})))
+        if i % 100 == 99:
+            parts.append(b": keep-alive\n\n")
+    parts.append(_sse(_chunk({}, "stop")))
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def recorded_tool_stream(args_pieces: int = 120) -> bytes:
+    """录制形态的工具调用回复：tool_call 首包 + 逐片 arguments。"""
+    parts = [
+        _sse(_chunk({"role": "assistant", "content": None})),
+        _sse(
+            _chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": 0,
+                            "id": "call_bench",
+                            "type": "function",
+                            "function": {"name": "amap_weather", "arguments": ""},
+                        }
+                    ]
+                }
+            )
+        ),
+    ]
+    for i in range(args_pieces):
+        piece = '{"city": "' if i == 0 else ("上海" if i % 2 else '", "x": "')
+        parts.append(_sse(_chunk({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]})))
+    parts.append(_sse(_chunk({}, "tool_calls")))
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def split_reads(
+    body: bytes, *, seed: int = 1, min_read: int = 64, max_read: int = 1400
+) -> List[bytes]:
+    """按随机网络读尺寸切片（会切断行/事件，覆盖跨读缓冲逻辑）。"""
+    rng = random.Random(seed)
+    reads: List[bytes] = []
+    pos = 0
+    while pos < len(body):
+        size = rng.randint(min_read, max_read)
+        reads.append(body[pos : pos + size])
+        pos += size
+    return reads
+
+
+def run_bytes_decoder(reads: Iterable[bytes]) -> int:
+    decoder = StreamDeltaDecoder()
+    count = 0
+    for data in reads:
+        count += len(decoder.feed(data))
+    count += len(decoder.close())
+    return count
+
+
+def run_sdk_baseline(reads: Iterable[bytes]) -> int:
+    from openai.types.chat import ChatCompletionChunk
+
+    decoder = StreamDeltaDecoder()
+    count = 0
+    buf = b""
+    for data in reads:
+        buf += data
+        while b"\n\n" in buf:
+            raw, buf = buf.split(b"\n\n", 1)
+            line = raw.strip()
+            if not line.startswith(b"data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == b"[DONE]":
+                continue
+            chunk = ChatCompletionChunk.model_validate(json.loads(payload))
+            count += len(decoder.feed_chunk(chunk))
+    return count
+
+
+def bench(name: str, fn, reads: List[bytes], repeat: int, input_bytes: int) -> float:
+    fn(reads)  # warmup
+    events = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        events += fn(reads)
+    elapsed = time.perf_counter() - started
+    eps = events / elapsed if elapsed > 0 else 0.0
+    mbps = input_bytes * repeat / elapsed / 1e6 if elapsed > 0 else 0.0
+    per_stream_ms = elapsed / repeat * 1000.0
+    print(
+        f"  {name:<14} events/s={eps:>12,.0f}  MB/s={mbps:>7.1f}  "
+        f"per-stream={per_stream_ms:>7.3f}ms  events/stream={events // repeat}"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE stream decoder micro-benchmark")
+    parser.add_argument("--sse-file", action="append", default=[], help="录制的原始 SSE 响应体")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    streams = {
+        "text_reply": recorded_text_stream(),
+        "tool_call": recorded_tool_stream(),
+    }
+    for path in args.sse_file:
+        streams[Path(path).name] = Path(path).read_bytes()
+
+    for name, body in streams.items():
+        reads = split_reads(body)
+        print(f"[{name}] bytes={len(body)} reads={len(reads)}")
+        sdk_s = bench("sdk_chunks", run_sdk_baseline, reads, args.repeat, len(body))
+        raw_s = bench("sse_bytes", run_bytes_decoder, reads, args.repeat, len(body))
+        print(f"  speedup: {sdk_s / raw_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+流式输出过滤器基准：回放录制的增量流，报告 ns/char 与暂存区峰值
+
+用法：
+    ./.venv/bin/python scripts/bench_stream_filter.py
+    ./.venv/bin/python scripts/bench_stream_filter.py --stream-file reply.txt --chunk-chars 3
+
+说明：
+- 默认回放脚本内置的几段典型流（长篇闲聊、工具痕迹泄漏、TOOL_RESULT 回显、结构化前缀）
+- `--stream-file` 可回放真实回复文本（按 `--chunk-chars` 随机切片模拟网关增量）；
+  也可以是 JSON 数组（每个元素为一个增量），按原始切片回放
+- 对每段流按 1x / 10x / 50x 长度回放，ns/char 保持平稳即说明扫描为线性
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.agent.stream_filter import StreamTextFilter  # noqa: E402
+
+_CHAT = "主人你好呀～今天想做什么呢？我们可以一起去公园散步，或者在家看电影喵！\n"
+_TRACE_LEAK = (
+    '好的主人喵！\n["local_search","map_guide"]}\n'
+    '{"tool_calls":[{"id":"call_1","type":"function","function":'
+    '{"name":"amap_weather","arguments":"{\\"city\\":\\"上海\\"}"}}]}\n'
+    "上海今天多云，气温 18 度喵~\n"
+)
+_TOOL_RESULT = (
+    "TOOL_RESULT: get_current_time\nlocal_time: 2025-12-26 22:44:00\n"
+    "timezone: Asia/Shanghai\n现在是晚上十点四十四分喵，主人早点休息哦！\n"
+)
+_PREFIX = '["general_chat"]}["emotion_analysis","affection_expression"]}'
+
+
+def builtin_streams() -> Dict[str, str]:
+    return {
+        "chat": _CHAT * 20,
+        "trace_leak": _TRACE_LEAK * 8,
+        "tool_result": _TOOL_RESULT * 8,
+        "prefix": _PREFIX + _CHAT * 20,
+    }
+
+
+def split_deltas(text: str, *, max_chars: int, seed: int = 1) -> List[str]:
+    """按 1..max_chars 随机长度切片，模拟网关的 token 级增量。"""
+    rng = random.Random(seed)
+    deltas: List[str] = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, max(1, max_chars))
+        deltas.append(text[pos : pos + size])
+        pos += size
+    return deltas
+
+
+def replay(deltas: List[str], *, min_chars: int, repeat: int) -> tuple[float, int, int]:
+    """回放增量流，返回 (ns/char, 输出字符数, 暂存峰值)。"""
+    total_chars = sum(len(d) for d in deltas)
+    out_chars = 0
+    peak = 0
+    started = time.perf_counter_ns()
+    for _ in range(repeat):
+        stream_filter = StreamTextFilter(min_chars=min_chars)
+        out_chars = 0
+        for delta in deltas:
+            out_chars += len(stream_filter.push(delta))
+        out_chars += len(stream_filter.flush())
+        peak = stream_filter.peak_buffered
+    elapsed_ns = time.perf_counter_ns() - started
+    return elapsed_ns / max(1, total_chars * repeat), out_chars, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream text filter benchmark")
+    parser.add_argument("--stream-file", action="append", default=[], help="录制的回复文本/增量")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="随机切片的最大增量长度")
+    parser.add_argument("--min-chars", type=int, default=8, help="合并输出的最小字符数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    recorded: Dict[str, List[str]] = {}
+    for name, text in builtin_streams().items():
+        recorded[name] = split_deltas(text, max_chars=args.chunk_chars)
+    for path in args.stream_file:
+        raw = Path(path).read_text(encoding="utf-8")
+        try:
+            deltas = json.loads(raw)
+        except ValueError:
+            deltas = None
+        if isinstance(deltas, list) and all(isinstance(d, str) for d in deltas):
+            recorded[Path(path).name] = deltas
+        else:
+            recorded[Path(path).name] = split_deltas(raw, max_chars=args.chunk_chars)
+
+    print(f"{'stream':<16}{'scale':>6}{'chars':>10}{'ns/char':>10}{'out':>10}{'peak_buf':>10}")
+    for name, deltas in recorded.items():
+        for scale in (1, 10, 50):
+            stream = deltas * scale
+            ns_per_char, out_chars, peak = replay(
+                stream, min_chars=args.min_chars, repeat=args.repeat
+            )
+            chars = sum(len(d) for d in stream)
+            print(f"{name:<16}{scale:>5}x{chars:>10}{ns_per_char:>10.0f}{out_chars:>10}{peak:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+重建长期记忆时间侧车索引
+
+旧库首次启用时间索引、或索引与向量库条数不一致时，时间范围查询（"今天/昨天/刚才"）会回退扫描路径；
+执行本脚本从向量库全量重建后即可使用二分查询。
+
+用法：
+    ./.venv/bin/python scripts/rebuild_memory_time_index.py                # 全局长期记忆
+    ./.venv/bin/python scripts/rebuild_memory_time_index.py --user-id 1    # 指定用户
+    ./.venv/bin/python scripts/rebuild_memory_time_index.py --persist-dir data/vectordb/long_term_memory
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.agent.memory import LongTermMemory  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the long-term memory time index")
+    parser.add_argument("--user-id", type=int, default=None, help="用户 ID（默认全局长期记忆）")
+    parser.add_argument("--persist-dir", type=Path, default=None, help="长期记忆向量库目录")
+    parser.add_argument("--collection", default="long_term_memory", help="集合名称")
+    parser.add_argument("--batch-size", type=int, default=500, help="每页读取条数")
+    args = parser.parse_args()
+
+    memory = LongTermMemory(
+        persist_directory=args.persist_dir,
+        collection_name=args.collection,
+        user_id=args.user_id,
+    )
+    stats = memory.time_index_stats()
+    if stats is None:
+        print("时间索引未启用（long_term_time_index_enabled=false 或向量库不可用）")
+        return 1
+
+    count = memory.rebuild_time_index(batch_size=args.batch_size)
+    stats = memory.time_index_stats() or {}
+    print(
+        f"时间索引已重建: {count} 条，耗时 {stats.get('last_rebuild_ms')}ms -> {stats.get('path')}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
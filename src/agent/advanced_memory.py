@@ -9,7 +9,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from src.config.settings import settings
 from src.utils.chroma_helper import create_chroma_vectorstore, get_collection_count
@@ -175,6 +175,45 @@ class CoreMemory:
             logger.error(f"获取核心记忆失败: {e}")
             return []
 
+    def iter_export_items(self, *, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        按页逐条产出核心记忆导出记录（{"id", "content", "metadata"}），内存占用与总量无关
+
+        Args:
+            batch_size: 每页读取条数
+        """
+        if self.vectorstore is None:
+            return
+        collection = getattr(self.vectorstore, "_collection", None)
+        step = max(1, int(batch_size))
+
+        def chunks() -> Iterator[Dict[str, Any]]:
+            if collection is None or not hasattr(collection, "count"):
+                yield self.vectorstore.get()
+                return
+            total = int(collection.count())
+            for offset in range(0, total, step):
+                try:
+                    yield collection.get(
+                        include=["documents", "metadatas"], limit=step, offset=offset
+                    )
+                except TypeError:
+                    if offset:
+                        raise
+                    # 兼容不支持 offset/limit 的旧版 chromadb
+                    yield collection.get(include=["documents", "metadatas"])
+                    return
+
+        for chunk in chunks():
+            ids = chunk.get("ids") or []
+            docs = chunk.get("documents") or []
+            metas = chunk.get("metadatas") or []
+            if not ids:
+                return
+            for doc_id, content, meta in zip(ids, docs, metas):
+                if content:
+                    yield {"id": str(doc_id), "content": content, "metadata": dict(meta or {})}
+
     def clear_all(self) -> bool:
         """清空核心记忆（删除 collection 并重建）。"""
         if self.vectorstore is None:
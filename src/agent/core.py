@@ -15,10 +15,16 @@ import json
 import logging
 import re
 import time
+import weakref
 from difflib import SequenceMatcher
 from pathlib import Path
 from collections import OrderedDict, deque
-from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    TimeoutError as FuturesTimeoutError,
+)
 from dataclasses import dataclass
 from queue import Empty, Full, Queue
 from threading import Event, Lock
@@ -33,6 +39,7 @@ from typing import (
     TYPE_CHECKING,
     Callable,
     Coroutine,
+    Sequence,
     Tuple,
 )
 
@@ -42,6 +49,7 @@ from src.config.settings import settings  # noqa: E402
 from src.utils.logger import get_logger  # noqa: E402
 from src.utils.async_loop_thread import AsyncLoopThread  # noqa: E402
 from src.utils.performance import monitor_performance, performance_monitor  # noqa: E402
+from src.utils.stream_processor import StreamRetraction, apply_stream_retraction  # noqa: E402
 from src.utils.tool_context import (  # noqa: E402
     ToolTraceRecorder,
     tool_timeout_s_var,
@@ -53,14 +61,29 @@ from .character_state import CharacterState  # noqa: E402
 from .context_compressor import ContextCompressor  # noqa: E402
 from .emotion import EmotionEngine  # noqa: E402
 from .memory import MemoryManager  # noqa: E402
+from .memory_prefetch import MemoryPrefetcher  # noqa: E402
 from .memory_retriever import ConcurrentMemoryRetriever  # noqa: E402
 from .memory_scorer import MemoryScorer  # noqa: E402
 from .mood_system import MoodSystem  # noqa: E402
+from .stream_filter import (  # noqa: E402
+    _IDENT_TOKEN_RE,
+    _looks_like_route_tag_list,
+    _looks_like_tool_call_payload,
+    RetractableStreamFilter,
+    StreamTextFilter,
+)
+
+# 兼容旧引用（from src.agent.core import StreamToolTraceScrubber 等）
+from .stream_filter import StreamStructuredPrefixStripper  # noqa: E402,F401
+from .stream_filter import StreamToolTraceScrubber  # noqa: E402,F401
 from .style_learner import StyleLearner  # noqa: E402
 from .tools import ToolRegistry, tool_registry  # noqa: E402
 
 if TYPE_CHECKING:
     from src.multimodal.tts_manager import AgentSpeechProfile
+    from src.multimodal.tts_pipeline import StreamingTTSPipeline
+    from src.multimodal.tts_warmer import TTSWarmer
+    from src.agent.runtime import AgentRuntime, AgentSession, SessionLoop
 
 logger = get_logger(__name__)
 
@@ -70,7 +93,6 @@ _CODE_FENCE_RE = re.compile(
     flags=re.IGNORECASE,
 )
 _MULTI_NEWLINE_RE = re.compile(r"\n{3,}")
-_IDENT_TOKEN_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]{0,63}$")
 _MEANINGFUL_CHAR_RE = re.compile(r"[0-9A-Za-z\u4e00-\u9fff]")
 _DEFAULT_EMPTY_REPLY = "抱歉主人，我好像没有理解您的意思喵~"
 
@@ -170,67 +192,6 @@ def _extract_any_json_fragment(text: str) -> Optional[str]:
     return None
 
 
-def _looks_like_tool_call_payload(data: Any) -> bool:
-    """
-    Heuristically detect common "tool call" / structured-tool routing payloads that should not be
-    shown to UI/TTS.
-
-    This targets OpenAI-style tool call JSON such as:
-      [{"id": "...", "type": "function", "function": {"name": "...", "arguments": "..."}}, ...]
-    as well as common wrapper variants ("tools"/"tool_calls", {"tool": ..., "args": ...}).
-    """
-
-    def _lower_keys(mapping: Dict[Any, Any]) -> set[str]:
-        try:
-            return {str(k).lower() for k in mapping.keys()}
-        except Exception:
-            return set()
-
-    if isinstance(data, dict):
-        keys = _lower_keys(data)
-        dtype = str(data.get("type") or "").lower()
-
-        if "tool_calls" in keys or "tools" in keys or dtype in {"tool_calls", "tool_call"}:
-            return True
-
-        if dtype == "function":
-            func = data.get("function")
-            if isinstance(func, dict):
-                fkeys = _lower_keys(func)
-                if "name" in fkeys and ("arguments" in fkeys or "args" in fkeys):
-                    return True
-            if "name" in keys and ("arguments" in keys or "args" in keys):
-                return True
-
-        # OpenAI tool call dict without explicit "type":"function" (defensive)
-        func = data.get("function")
-        if "function" in keys and isinstance(func, dict):
-            fkeys = _lower_keys(func)
-            if "name" in fkeys and ("arguments" in fkeys or "args" in fkeys):
-                return True
-
-        # Common wrapper-style forms
-        if "tool" in keys and (
-            "args" in keys or "arguments" in keys or "tool_input" in keys or "toolinput" in keys
-        ):
-            return True
-
-        # Some gateways emit {"id": "...", "name": "...", "arguments": "..."}.
-        if (
-            "name" in keys
-            and ("arguments" in keys or "args" in keys)
-            and ("id" in keys or "tool" in keys)
-        ):
-            return True
-
-        return False
-
-    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
-        return any(_looks_like_tool_call_payload(item) for item in data)
-
-    return False
-
-
 def _strip_tool_json_blocks(text: str, *, max_blocks: int = 3) -> str:
     """
     Remove embedded JSON blocks that look like tool-call payloads.
@@ -282,28 +243,6 @@ def _strip_tool_json_blocks(text: str, *, max_blocks: int = 3) -> str:
     return cleaned
 
 
-def _looks_like_route_tag_list(data: Any) -> bool:
-    """
-    Detect routing/tag lists leaked into the assistant text, e.g.:
-      ["local_search", "map_guide"]
-      ["emotion_analysis", "affection_expression", ...]
-
-    We keep it conservative: only list[str] of identifier-like snake_case tokens.
-    """
-    if not (isinstance(data, list) and data and all(isinstance(item, str) for item in data)):
-        return False
-    if len(data) > 24:
-        return False
-    normalized = [item.strip() for item in data if isinstance(item, str)]
-    if not normalized:
-        return False
-    if not all(_IDENT_TOKEN_RE.fullmatch(item) for item in normalized):
-        return False
-    if not any("_" in item for item in normalized):
-        return False
-    return True
-
-
 def _strip_route_tag_lists(text: str, *, max_blocks: int = 5) -> str:
     """
     Remove embedded route/tag list fragments (list[str]) leaked into natural language.
@@ -485,595 +424,6 @@ class LLMStreamWatchdog:
         return self._first_latency_ms
 
 
-class StreamDeltaAccumulator:
-    """仅返回累计流中的增量片段，避免重复渲染和TTS处理。"""
-
-    def __init__(self) -> None:
-        self._last: str = ""
-
-    def consume(self, text: str) -> str:
-        if not text:
-            return ""
-
-        if text.startswith(self._last):
-            delta = text[len(self._last) :]
-        else:
-            prefix_len = 0
-            for a, b in zip(text, self._last):
-                if a != b:
-                    break
-                prefix_len += 1
-            delta = text[prefix_len:]
-
-        self._last = text
-        return delta
-
-    def reset(self) -> None:
-        self._last = ""
-
-
-class StreamEmitBuffer:
-    """合并细碎增量，降低UI/TTS刷新频率。"""
-
-    def __init__(self, min_chars: int = 8) -> None:
-        self.min_chars = max(1, min_chars)
-        self._chunks: list[str] = []
-
-    def push(self, delta: str) -> str:
-        if not delta:
-            return ""
-        self._chunks.append(delta)
-        buffered = "".join(self._chunks)
-        if "\n" in delta or len(buffered) >= self.min_chars:
-            self._chunks.clear()
-            return buffered
-        return ""
-
-    def flush(self) -> str:
-        if not self._chunks:
-            return ""
-        buffered = "".join(self._chunks)
-        self._chunks.clear()
-        return buffered
-
-
-class StreamStructuredPrefixStripper:
-    """
-    针对流式输出开头的 structured output / 工具信息残留做“前缀剥离”。
-
-    一些 OpenAI 兼容网关 + 旧的流式链路组合会把工具选择/结构化片段（JSON）
-    当作普通消息流事件吐出，从而被 UI 直接拼接到回复开头（例如：["general_chat"]}...）。
-
-    该类会在流式开头阶段缓冲增量，直到：
-    - 识别到可丢弃的 JSON 前缀片段并剥离；或
-    - 确认输出并非上述前缀（例如用户真的需要返回 JSON），再开始透传。
-    """
-
-    def __init__(self, *, max_fragments: int = 3, max_buffer_chars: int = 4096) -> None:
-        self._max_fragments = max(0, int(max_fragments))
-        self._max_buffer_chars = max(0, int(max_buffer_chars))
-        self._buffer: str = ""
-        self._done = False
-
-    def process(self, delta: str) -> str:
-        if not delta:
-            return ""
-        if self._done:
-            return delta
-        self._buffer += delta
-        return self._try_release(force=False)
-
-    def flush(self) -> str:
-        if self._done:
-            return ""
-        return self._try_release(force=True)
-
-    def _try_release(self, *, force: bool) -> str:
-        full_text = self._buffer
-        if not full_text:
-            return ""
-
-        # Drop non-JSON tool routing traces that some gateways inject before the real assistant
-        # text.
-        # We do this before JSON stripping and keep it conservative (only at the very start).
-        for _ in range(2):
-            candidate = full_text.lstrip()
-            if not candidate:
-                if force:
-                    self._done = True
-                    self._buffer = ""
-                    return ""
-                self._buffer = full_text
-                return ""
-            candidate_lower = candidate.lower()
-            marker = "toolselectionresponse"
-            if marker.startswith(candidate_lower) and candidate_lower != marker:
-                # The marker might be arriving in fragments. Keep buffering until we can decide.
-                if force:
-                    self._done = True
-                    self._buffer = ""
-                    # If we only received a very short prefix (e.g. "tool"/"tools"), it might be
-                    # legit text.
-                    # Drop only when we have enough chars to be confident it's the marker.
-                    return "" if len(candidate_lower) >= 8 else full_text
-                self._buffer = full_text
-                return ""
-
-            if candidate_lower.startswith(marker):
-                nl = candidate.find("\n")
-                if nl < 0:
-                    if force or (
-                        self._max_buffer_chars and len(candidate) > self._max_buffer_chars
-                    ):
-                        self._done = True
-                        self._buffer = ""
-                        return ""
-                    self._buffer = full_text
-                    return ""
-                full_text = candidate[nl + 1 :].lstrip()
-                self._buffer = full_text
-                if not full_text:
-                    return ""
-                continue
-            break
-
-        # Some gateways prepend whitespace/newlines before the structured JSON prefix.
-        # If we see leading whitespace, inspect the first non-whitespace char before deciding
-        # whether we should enter the "structured prefix stripping" mode.
-        leading_ws_len = len(full_text) - len(full_text.lstrip())
-        if leading_ws_len:
-            candidate = full_text[leading_ws_len:]
-            if not candidate:
-                if force:
-                    self._done = True
-                    self._buffer = ""
-                    return full_text
-                self._buffer = full_text
-                return ""
-            if candidate[0] in "{[":
-                text = candidate
-                original_on_keep = full_text
-            else:
-                self._done = True
-                self._buffer = ""
-                return full_text
-        else:
-            text = full_text
-            original_on_keep = full_text
-            if text[0] not in "{[":
-                self._done = True
-                self._buffer = ""
-                return text
-
-        if text[0] not in "{[":
-            self._done = True
-            self._buffer = ""
-            return original_on_keep
-
-        cleaned = text
-        for _ in range(self._max_fragments):
-            if not cleaned or cleaned[0] not in "{[":
-                break
-
-            fragment = _extract_leading_json_fragment(cleaned)
-            if fragment is None:
-                if force or (self._max_buffer_chars and len(cleaned) > self._max_buffer_chars):
-                    self._done = True
-                    self._buffer = ""
-                    probe = cleaned.lstrip().lower()
-                    compact = probe.replace(" ", "")
-                    looks_like_tool_payload = (
-                        "toolselectionresponse" in compact
-                        or "tool_calls" in compact
-                        or '"tool_calls"' in compact
-                        or '"tools"' in compact
-                        or '"type":"function"' in compact
-                        or (
-                            '"function"' in compact
-                            and '"arguments"' in compact
-                            and '"name"' in compact
-                        )
-                    )
-                    if looks_like_tool_payload:
-                        return ""
-                    return original_on_keep
-                self._buffer = full_text
-                return ""
-
-            rest = cleaned[len(fragment) :]
-            rest_lstrip = rest.lstrip()
-            has_trailing_brace = rest_lstrip.startswith("}")
-            rest_after_braces = rest_lstrip.lstrip("}").lstrip()
-
-            if not self._should_drop_fragment(fragment, has_trailing_brace, rest_after_braces):
-                self._done = True
-                self._buffer = ""
-                return original_on_keep
-
-            cleaned = rest_after_braces
-
-        self._buffer = cleaned
-        if not cleaned:
-            return ""
-
-        if cleaned[0] in "{[":
-            fragment = _extract_leading_json_fragment(cleaned)
-            if (
-                fragment is None
-                and not force
-                and (not self._max_buffer_chars or len(cleaned) <= self._max_buffer_chars)
-            ):
-                return ""
-
-        self._done = True
-        self._buffer = ""
-        return cleaned
-
-    @staticmethod
-    def _should_drop_fragment(
-        fragment: str, has_trailing_brace: bool, rest_after_braces: str
-    ) -> bool:
-        lowered_fragment = fragment.lower()
-        parsed: Any = None
-        if len(fragment) <= 50_000:
-            try:
-                parsed = json.loads(fragment)
-            except Exception:
-                parsed = None
-
-        if parsed is not None and _looks_like_tool_call_payload(parsed):
-            return True
-        if parsed is None:
-            # Heuristic for very large fragments (or parse failures): keep it conservative.
-            # Only drop when it strongly resembles tool-call payloads.
-            if (
-                "tool_calls" in lowered_fragment
-                or '"tool_calls"' in lowered_fragment
-                or '"tools"' in lowered_fragment
-            ):
-                return True
-            if (
-                '"type":"function"' in lowered_fragment
-                and '"function"' in lowered_fragment
-                and '"arguments"' in lowered_fragment
-                and '"name"' in lowered_fragment
-            ):
-                return True
-
-        if isinstance(parsed, list) and parsed and all(isinstance(item, str) for item in parsed):
-            normalized = [item.strip() for item in parsed]
-            if not normalized:
-                return False
-            if not all(_IDENT_TOKEN_RE.fullmatch(item) for item in normalized):
-                return False
-            if not any("_" in item for item in normalized):
-                return False
-            if has_trailing_brace or rest_after_braces[:1] in "[{":
-                return True
-
-        return False
-
-
-_LINESTART_JSON_OPEN_RE = re.compile(r"(?:^|\n)[ \t]*(?P<open>[\\[{])")
-_LINESTART_TOOL_PREFIX_RE = re.compile(r"(?:^|\n)[ \t]*(?P<tool>(?i:tool_))")
-_TOOL_RESULT_HEADER_RE = re.compile(r"(?i)^tool_result\s*:\s*")
-_TOOL_RESULT_KV_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*\s*:\s*")
-_TOOL_RESULT_NUMBERED_RE = re.compile(r"^\d+\.\s*")
-
-
-class StreamToolTraceScrubber:
-    """
-    Stateful scrubber for streaming output.
-
-    Root cause (legacy stream runtime): when using `stream_mode="messages"`, some intermediate
-    routing steps (tool selection / structured output) can be streamed as assistant-like text
-    messages. On some OpenAI-compatible gateways, those structured payloads arrive as plain text
-    (sometimes split across chunks), so "end-only" filtering is not enough.
-
-    Strategy:
-    - Only react when we see suspicious markers (ToolSelectionResponse / JSON-like blocks at line
-      start).
-    - Buffer minimal tail if a JSON/tool fragment is incomplete, so partial garbage never reaches
-      UI.
-    - Remove:
-        - ToolSelectionResponse lines
-        - tool-call payload JSON blocks (dict/list)
-        - route/tag list fragments (list[str] of snake_case identifiers)
-    """
-
-    def __init__(self, *, max_buffer_chars: int = 16_384, max_scan_blocks: int = 8) -> None:
-        self._buffer = ""
-        self._max_buffer_chars = max(0, int(max_buffer_chars))
-        self._max_scan_blocks = max(1, int(max_scan_blocks))
-        self._in_tool_result = False
-
-    @staticmethod
-    def _is_suspicious(text: str) -> bool:
-        if not text:
-            return False
-        stripped = text.lstrip()
-        if stripped.startswith("{") or stripped.startswith("["):
-            return True
-        if "\n{" in text or "\n[" in text:
-            return True
-
-        stripped_lower = stripped.lower()
-        marker = "toolselectionresponse"
-        if (
-            stripped_lower
-            and stripped_lower != marker
-            and len(stripped_lower) >= 8
-            and marker.startswith(stripped_lower)
-        ):
-            return True
-
-        lower = text.lower()
-        if "tool_result" in lower or stripped.lower().startswith("tool_") or "\ntool_" in lower:
-            return True
-        if "toolselectionresponse" in lower:
-            return True
-        if "tool_calls" in lower or '"tool_calls"' in lower or '"tools"' in lower:
-            return True
-        if ("{" in text or "[" in text) and ('_"' in text or "_" in text):
-            # route tag list often contains underscores and quote brackets
-            if '["' in text:
-                return True
-        if '"function"' in lower and '"arguments"' in lower and '"name"' in lower:
-            return True
-        return False
-
-    def _tool_result_line_is_continuation(self, line: str) -> bool:
-        stripped = (line or "").strip()
-        if not stripped:
-            return True
-        lower = stripped.lower()
-        if lower == "results:":
-            return True
-        if stripped.startswith("[...工具输出已截断"):
-            return True
-        if _TOOL_RESULT_KV_RE.match(stripped):
-            return True
-        if _TOOL_RESULT_NUMBERED_RE.match(stripped):
-            return True
-        return False
-
-    def _consume_tool_result_frontier(self, s: str, *, force: bool) -> tuple[str, bool]:
-        """
-        Consume TOOL_RESULT blocks and their continuation lines at the frontier.
-
-        Returns:
-        - (new_s, needs_more): if needs_more is True, keep buffering `new_s` and stop draining.
-        """
-        while True:
-            if not s:
-                return "", False
-
-            # TOOL_RESULT blocks are line-oriented; drop leading whitespace while we're in this
-            # mode.
-            s_stripped = s.lstrip()
-            if s_stripped != s:
-                s = s_stripped
-                if not s:
-                    return "", False
-
-            nl = s.find("\n")
-            if nl < 0:
-                probe = s.strip()
-                if not probe:
-                    return "", False
-                if _TOOL_RESULT_HEADER_RE.match(probe) or (
-                    self._in_tool_result and self._tool_result_line_is_continuation(probe)
-                ):
-                    if not force:
-                        return s, True
-                    return "", False
-                # Looks like normal text: exit tool-result mode and keep it.
-                self._in_tool_result = False
-                return s, False
-
-            line = s[: nl + 1]
-            rest = s[nl + 1 :]
-            line_stripped = line.strip()
-
-            if not line_stripped:
-                s = rest
-                continue
-
-            if _TOOL_RESULT_HEADER_RE.match(line_stripped):
-                self._in_tool_result = True
-                s = rest
-                continue
-
-            if self._in_tool_result and self._tool_result_line_is_continuation(line_stripped):
-                s = rest
-                continue
-
-            # Not a tool-result continuation line: exit mode and keep the remaining text.
-            self._in_tool_result = False
-            return s, False
-
-    def process(self, delta: str) -> str:
-        if not delta:
-            return ""
-        if not self._buffer and not self._in_tool_result and not self._is_suspicious(delta):
-            return delta
-
-        self._buffer += delta
-        if self._max_buffer_chars and len(self._buffer) > self._max_buffer_chars:
-            # Keep the newest tail; tool traces are near the frontier.
-            self._buffer = self._buffer[-self._max_buffer_chars :]
-
-        return self._drain(force=False)
-
-    def flush(self) -> str:
-        return self._drain(force=True)
-
-    def _drain(self, *, force: bool) -> str:
-        s = self._buffer
-        if not s:
-            return ""
-
-        out_parts: list[str] = []
-        blocks_scanned = 0
-
-        while s and blocks_scanned < self._max_scan_blocks:
-            blocks_scanned += 1
-
-            # 1) Drop ToolSelectionResponse line(s) if present at the frontier.
-            candidate = s.lstrip()
-            if candidate:
-                lower = candidate.lower()
-                marker = "toolselectionresponse"
-                if marker.startswith(lower) and lower != marker:
-                    if not force:
-                        break
-                    # Force flush: drop incomplete marker fragments instead of leaking them to UI.
-                    s = ""
-                    continue
-                if lower.startswith(marker):
-                    nl = candidate.find("\n")
-                    if nl < 0:
-                        if not force:
-                            break
-                        s = ""
-                        continue
-                    s = candidate[nl + 1 :].lstrip()
-                    continue
-
-            # 2) Consume TOOL_RESULT blocks (tool outputs accidentally echoed by the model).
-            if self._in_tool_result:
-                s, needs_more = self._consume_tool_result_frontier(s, force=force)
-                if needs_more:
-                    break
-                if not s:
-                    break
-
-            # 3) Find next marker: JSON blocks or TOOL_RESULT/TOOL_ prefixes at line start.
-            json_match = _LINESTART_JSON_OPEN_RE.search(s)
-            tool_match = _LINESTART_TOOL_PREFIX_RE.search(s)
-            if not json_match and not tool_match:
-                out_parts.append(s)
-                s = ""
-                break
-
-            json_idx = json_match.start("open") if json_match else None
-            tool_idx = tool_match.start("tool") if tool_match else None
-            indices = [i for i in (json_idx, tool_idx) if isinstance(i, int)]
-            if not indices:
-                out_parts.append(s)
-                s = ""
-                break
-
-            next_idx = min(indices)
-            if next_idx > 0:
-                out_parts.append(s[:next_idx])
-                s = s[next_idx:]
-
-            if tool_idx is not None and tool_idx == next_idx:
-                lowered = s.lower()
-                if lowered.startswith("tool_result"):
-                    # Drop header line; the remaining continuation lines will be discarded in
-                    # subsequent iterations.
-                    nl = s.find("\n")
-                    if nl < 0:
-                        if not force:
-                            break
-                        s = ""
-                        self._in_tool_result = False
-                        continue
-                    self._in_tool_result = True
-                    s = s[nl + 1 :]
-                    continue
-
-                if lowered.startswith("tool_re"):
-                    # Likely a split TOOL_RESULT prefix; keep buffering unless we're force flushing.
-                    if not force:
-                        break
-                    s = ""
-                    self._in_tool_result = False
-                    continue
-
-                out_parts.append(s)
-                s = ""
-                break
-
-            # JSON marker path (existing behavior).
-            if json_match is None:
-                out_parts.append(s)
-                s = ""
-                break
-
-            fragment = _extract_leading_json_fragment(s)
-            if fragment is None:
-                # Incomplete JSON: keep buffered so partial tool traces won't show.
-                if force:
-                    probe = s.lstrip().lower()
-                    compact = probe.replace(" ", "")
-                    looks_like_tool_payload = (
-                        "toolselectionresponse" in compact
-                        or "tool_calls" in compact
-                        or '"tool_calls"' in compact
-                        or '"tools"' in compact
-                        or '"type":"function"' in compact
-                        or (
-                            '"function"' in compact
-                            and '"arguments"' in compact
-                            and '"name"' in compact
-                        )
-                    )
-                    if not looks_like_tool_payload:
-                        out_parts.append(s)
-                    s = ""
-                break
-
-            remove_fragment = False
-            parsed: Any = None
-            try:
-                parsed = json.loads(fragment)
-            except Exception:
-                parsed = None
-
-            if parsed is not None:
-                if _looks_like_tool_call_payload(parsed):
-                    remove_fragment = True
-                elif _looks_like_route_tag_list(parsed):
-                    # Be conservative: only remove tag lists when they behave like leaked internal
-                    # markers (e.g., followed by a stray brace or another JSON block). Otherwise the
-                    # user might legitimately be asking the model to output a JSON array.
-                    after = s[len(fragment) :]
-                    after_lstrip = after.lstrip()
-                    if after_lstrip.startswith("}") or after_lstrip[:1] in {"{", "["}:
-                        remove_fragment = True
-            else:
-                lowered_fragment = fragment.lower()
-                if (
-                    "tool_calls" in lowered_fragment
-                    or '"tool_calls"' in lowered_fragment
-                    or '"tools"' in lowered_fragment
-                    or (
-                        '"function"' in lowered_fragment
-                        and '"arguments"' in lowered_fragment
-                        and '"name"' in lowered_fragment
-                    )
-                ):
-                    remove_fragment = True
-
-            if not remove_fragment:
-                out_parts.append(fragment)
-                s = s[len(fragment) :]
-                continue
-
-            # Drop fragment and an optional stray trailing brace '}'.
-            rest = s[len(fragment) :]
-            rest_lstrip = rest.lstrip()
-            if rest_lstrip.startswith("}"):
-                rest = rest_lstrip[1:]
-            s = rest.lstrip()
-
-        self._buffer = s
-        return "".join(out_parts)
-
-
 _STREAM_INTERNAL_META_TOKENS: tuple[str, ...] = (
     # Tool selector middleware / structured outputs
     "toolselectionresponse",
@@ -1301,6 +651,7 @@ class MintChatAgent:
         temperature: Optional[float] = None,
         enable_streaming: Optional[bool] = None,
         user_id: Optional[int] = None,
+        runtime: Optional["AgentRuntime"] = None,
     ):
         """
         初始化 MintChat 智能体
@@ -1314,10 +665,21 @@ class MintChatAgent:
             temperature: 温度参数
             enable_streaming: 是否启用流式输出
             user_id: 用户ID，用于创建用户特定的记忆路径
+            runtime: 共享运行时；默认使用进程级 AgentRuntime（agent.shared_runtime_enabled=false 时各自创建）
         """
         # 用户ID
         self.user_id = user_id
 
+        # 共享运行时：线程池/事件循环/无状态组件全进程一份，Agent 只持有轻量会话句柄
+        if runtime is None and bool(getattr(settings.agent, "shared_runtime_enabled", True)):
+            from src.agent.runtime import get_agent_runtime
+
+            runtime = get_agent_runtime()
+        self._runtime_session: Optional["AgentSession"] = (
+            runtime.session(user_id) if runtime is not None else None
+        )
+        session = self._runtime_session
+
         # 角色配置
         self.character = character or default_character
         logger.info(f"初始化角色: {self.character.name} (用户ID: {user_id if user_id else '全局'})")
@@ -1341,6 +703,7 @@ class MintChatAgent:
             ),
             breaker_threshold=int(getattr(settings.agent, "memory_breaker_threshold", 3)),
             breaker_cooldown_s=float(getattr(settings.agent, "memory_breaker_cooldown", 3.0)),
+            executor=session.memory if session is not None else None,
         )
 
         # 工具注册表
@@ -1383,7 +746,7 @@ class MintChatAgent:
             max_important=context_compress_max_important,
         )
         self.style_learner = StyleLearner(user_id=user_id)
-        self.memory_scorer = MemoryScorer()
+        self.memory_scorer = runtime.memory_scorer if runtime is not None else MemoryScorer()
         self._tts_runtime: Optional[tuple[Any, Any]] = None  # 懒加载 TTS 依赖
         self._auto_compress_ratio = max(
             0.1,
@@ -1411,7 +774,24 @@ class MintChatAgent:
         self._interaction_lock = Lock()
         self._tts_prefetch_lock = Lock()
         self._pending_tts_prefetch: Optional[Future] = None
-        self._async_loop_thread = AsyncLoopThread(thread_name="mintchat-agent-async-loop")
+        self._async_loop_thread: "AsyncLoopThread | SessionLoop" = (
+            session.loop
+            if session is not None
+            else AsyncLoopThread(thread_name="mintchat-agent-async-loop")
+        )
+        # 输入时的记忆检索预取：在复用的后台事件循环上运行，发送时按草稿相似度复用
+        self._memory_prefetcher: Optional[MemoryPrefetcher] = None
+        if bool(getattr(settings.agent, "memory_prefetch_enabled", True)):
+            self._memory_prefetcher = MemoryPrefetcher(
+                self.memory_retriever,
+                submit=self._async_loop_thread.submit,
+                versions=self._memory_versions,
+                debounce_s=float(getattr(settings.agent, "memory_prefetch_debounce_ms", 350))
+                / 1000.0,
+                min_similarity=float(
+                    getattr(settings.agent, "memory_prefetch_min_similarity", 0.85)
+                ),
+            )
         self._state_persist_lock = Lock()
         self._pending_state_persist: Optional[Future] = None
         self._long_term_write_lock = Lock()
@@ -1432,9 +812,10 @@ class MintChatAgent:
         except Exception:
             drain_budget_s = 0.25
         self._long_term_write_drain_budget_s = max(0.0, drain_budget_s)
-        self._background_executor = ThreadPoolExecutor(
-            max_workers=2,
-            thread_name_prefix="mintchat-agent-bg",
+        self._background_executor: Executor = (
+            session.background
+            if session is not None
+            else ThreadPoolExecutor(max_workers=2, thread_name_prefix="mintchat-agent-bg")
         )
         self._background_futures: set[Future] = set()
         self._background_lock = Lock()
@@ -1462,18 +843,24 @@ class MintChatAgent:
                 float(getattr(settings.agent, "llm_total_timeout_s", 120.0)),
             ),
         )
-        self._llm_executor = ThreadPoolExecutor(
-            max_workers=max(1, int(getattr(settings.agent, "llm_executor_workers", 2))),
-            thread_name_prefix="mintchat-agent-llm",
-        )
-        self._stream_executor = ThreadPoolExecutor(
-            max_workers=max(1, int(getattr(settings.agent, "stream_executor_workers", 2))),
-            thread_name_prefix="mintchat-agent-stream",
-        )
-        self._blocking_executor = ThreadPoolExecutor(
-            max_workers=1,
-            thread_name_prefix="mintchat-agent-loop",
-        )
+        if session is not None:
+            # 单用户并发上限与原私有线程池大小一致，由共享池按用户轮转调度
+            self._llm_executor: Executor = session.llm
+            self._stream_executor: Executor = session.stream
+            self._blocking_executor: Executor = session.blocking
+        else:
+            self._llm_executor = ThreadPoolExecutor(
+                max_workers=max(1, int(getattr(settings.agent, "llm_executor_workers", 2))),
+                thread_name_prefix="mintchat-agent-llm",
+            )
+            self._stream_executor = ThreadPoolExecutor(
+                max_workers=max(1, int(getattr(settings.agent, "stream_executor_workers", 2))),
+                thread_name_prefix="mintchat-agent-stream",
+            )
+            self._blocking_executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="mintchat-agent-loop",
+            )
         # GUI/逐字渲染已具备节流与追赶机制，因此这里默认更偏向“低延迟首字节”。
         # 仍可通过 settings.agent.stream_min_chunk_chars 覆盖（例如性能调优或调试）。
         self._stream_min_chars = max(1, int(getattr(settings.agent, "stream_min_chunk_chars", 1)))
@@ -1512,6 +899,14 @@ class MintChatAgent:
         # OpenAI-compatible backend (lazy init)
         self._native_backend = None
         self._native_backend_lock = Lock()
+        self._native_tool_runner = None
+        # 每个事件循环一个异步 backend（AsyncOpenAI 客户端绑定创建它的循环）
+        self._native_async_backends: weakref.WeakKeyDictionary[Any, Any] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._native_async_backends_lock = Lock()
+        if bool(getattr(settings.agent, "llm_http_warmup", True)):
+            self._warmup_llm_transport()
 
         # 模型配置（OpenAI-compatible）
         self.model_name = model_name or settings.default_model_name
@@ -1933,6 +1328,102 @@ class MintChatAgent:
             )
         return [audio for audio in audios if audio]
 
+    def create_tts_pipeline(
+        self,
+        player: Any = None,
+        *,
+        use_mood_context: bool = True,
+        extra_profile: Optional["AgentSpeechProfile"] = None,
+        text_filter: Optional[Callable[[str], str]] = None,
+        min_sentence_length: int = 3,
+        max_buffer_size: int = 500,
+    ) -> Optional["StreamingTTSPipeline"]:
+        """
+        创建流式 TTS 流水线：配合 chat_stream / chat_stream_async 边生成边合成。
+
+        用法::
+
+            pipeline = agent.create_tts_pipeline()
+            for chunk in pipeline.tee(agent.chat_stream(message)):
+                ...
+
+        GUI 以 ``use_mood_context=False`` 创建并逐块 ``feed()``，与 ``start_tts_warmer`` 的语音参数一致。
+        ``min_sentence_length`` 默认 3，避免短句（如“好啊！”、“嗯。”）被过滤掉导致丢句。
+
+        Returns:
+            StreamingTTSPipeline；TTS 不可用时返回 None
+        """
+        tts_manager, profile_cls = self._resolve_tts_dependencies()
+        if tts_manager is None or profile_cls is None:
+            return None
+
+        profile = self._compose_speech_profile(
+            profile_cls=profile_cls,
+            use_mood_context=use_mood_context,
+            extra_profile=extra_profile,
+        )
+        if player is None:
+            from src.multimodal.audio_player import get_audio_player
+
+            player = get_audio_player(
+                default_volume=settings.tts.default_volume,
+                max_queue_size=settings.tts.max_queue_size,
+            )
+        if text_filter is None:
+            from src.multimodal.tts_text import strip_stage_directions
+
+            text_filter = strip_stage_directions
+
+        from src.multimodal.tts_pipeline import StreamingTTSPipeline
+
+        return StreamingTTSPipeline(
+            tts_manager,
+            player,
+            min_sentence_length=min_sentence_length,
+            max_buffer_size=max_buffer_size,
+            agent_profile=profile,
+            text_filter=text_filter,
+        )
+
+    def start_tts_warmer(
+        self,
+        *,
+        extra_phrases: Sequence[str] = (),
+        use_mood_context: bool = True,
+        text_filter: Optional[Callable[[str], str]] = None,
+    ) -> Optional["TTSWarmer"]:
+        """
+        空闲时预合成问候/告别语、``extra_phrases`` 与聊天记录中的高频句（常驻 TTS 缓存）。
+
+        语音参数与 ``create_tts_pipeline`` 相同，预热结果可直接被流水线命中。
+
+        Returns:
+            TTSWarmer；TTS 不可用或未启用预热时返回 None
+        """
+        tts_manager, profile_cls = self._resolve_tts_dependencies()
+        if tts_manager is None or profile_cls is None:
+            return None
+
+        profile = self._compose_speech_profile(
+            profile_cls=profile_cls,
+            use_mood_context=use_mood_context,
+            extra_profile=None,
+        )
+        if text_filter is None:
+            from src.multimodal.tts_text import strip_stage_directions
+
+            text_filter = strip_stage_directions
+        from src.multimodal.tts_warmer import start_tts_warmer
+
+        fixed = [self.get_greeting(), self.get_farewell(), *extra_phrases]
+        return start_tts_warmer(
+            tts_manager,
+            fixed=fixed,
+            agent_profile=profile,
+            text_filter=text_filter,
+            user_id=self.user_id,
+        )
+
     def _resolve_tts_dependencies(self):
         """
         获取 TTS 管理器与 AgentSpeechProfile 类型，缺失则返回 (None, None)。
@@ -2229,12 +1720,21 @@ class MintChatAgent:
             recent_messages=trimmed_messages,
             compression=compression,
         )
-        memories = await self.memory_retriever.retrieve_all_memories_async(
-            query=message,
-            long_term_k=retrieval_plan["long_term_k"],
-            core_k=retrieval_plan["core_k"],
-            use_cache=use_cache,
-        )
+        memories = None
+        prefetcher = getattr(self, "_memory_prefetcher", None)
+        if prefetcher is not None and use_cache:
+            memories = await prefetcher.take(
+                message,
+                long_term_k=retrieval_plan["long_term_k"],
+                core_k=retrieval_plan["core_k"],
+            )
+        if memories is None:
+            memories = await self.memory_retriever.retrieve_all_memories_async(
+                query=message,
+                long_term_k=retrieval_plan["long_term_k"],
+                core_k=retrieval_plan["core_k"],
+                use_cache=use_cache,
+            )
 
         include_state = compression != "off"
         additional_context = history_summary
@@ -2431,195 +1931,14 @@ class MintChatAgent:
 
                 def _native() -> str:
                     from src.llm_native.agent_runner import AgentRunnerConfig, NativeToolLoopRunner
-                    from src.llm_native.pipeline import Pipeline
-                    from src.llm_native.pipeline_stages import (
-                        ContextToolUsesTrimStage,
-                        PermissionScopedToolsStage,
-                        ToolCallLimitStage,
-                        ToolHeuristicPrefilterStage,
-                        ToolLlmSelectorStage,
-                        ToolTraceStage,
-                    )
-                    from src.llm_native.tool_runner import ToolRunner
 
                     backend = self._get_native_backend()
                     tools = self.tool_registry.get_tool_specs()
-                    pipeline = None
-                    if bool(getattr(settings.agent, "native_pipeline_enabled", False)):
-                        stages: list[Any] = []
-                        try:
-                            trim_tokens = int(
-                                getattr(settings.agent, "tool_context_trim_tokens", 1200) or 0
-                            )
-                            trim_tokens = max(0, trim_tokens)
-                        except Exception:
-                            trim_tokens = 1200
-                        if trim_tokens > 0:
-                            stages.append(
-                                ContextToolUsesTrimStage(max_tool_context_tokens=trim_tokens)
-                            )
-                        stages.append(
-                            PermissionScopedToolsStage(
-                                profile_map=getattr(settings.agent, "tool_permission_profiles", {}),
-                                default_profile=str(
-                                    getattr(settings.agent, "tool_permission_default", "default")
-                                    or "default"
-                                ),
-                            )
-                        )
-                        if bool(getattr(settings.agent, "tool_selector_enabled", True)):
-                            try:
-                                allow_in_fast_mode = bool(
-                                    getattr(settings.agent, "tool_selector_in_fast_mode", False)
-                                )
-                            except Exception:
-                                allow_in_fast_mode = False
-                            if (
-                                getattr(settings.agent, "memory_fast_mode", False)
-                                and not allow_in_fast_mode
-                            ):
-                                logger.info("fast_mode 跳过 tool selector stages (native pipeline)")
-                            else:
-                                try:
-                                    min_tools = int(
-                                        getattr(settings.agent, "tool_selector_min_tools", 16) or 0
-                                    )
-                                    min_tools = max(0, min_tools)
-                                except Exception:
-                                    min_tools = 16
-
-                                tools_count = len(tools) if tools else 0
-                                if tools_count and tools_count < min_tools:
-                                    logger.info(
-                                        "跳过 tool selector stages (native pipeline): "
-                                        "tools_count=%d < min_tools=%d",
-                                        tools_count,
-                                        min_tools,
-                                    )
-                                else:
-                                    try:
-                                        max_tools_raw = int(
-                                            getattr(settings.agent, "tool_selector_max_tools", 4)
-                                            or 0
-                                        )
-                                    except Exception:
-                                        max_tools_raw = 4
-                                    max_tools_for_llm = (
-                                        max(1, max_tools_raw) if max_tools_raw else 4
-                                    )
-
-                                    always_include = list(
-                                        getattr(
-                                            settings.agent,
-                                            "tool_selector_always_include",
-                                            [
-                                                "get_current_time",
-                                                "get_weather",
-                                                "web_search",
-                                                "map_search",
-                                            ],
-                                        )
-                                        or []
-                                    )
-                                    stages.append(
-                                        ToolHeuristicPrefilterStage(
-                                            always_include=always_include,
-                                            max_tools=max_tools_raw or None,
-                                            min_tools=min_tools,
-                                        )
-                                    )
-
-                                    try:
-                                        selector_timeout_s = float(
-                                            getattr(settings.agent, "tool_selector_timeout_s", 4.0)
-                                        )
-                                    except Exception:
-                                        selector_timeout_s = 4.0
-                                    try:
-                                        selector_disable_cooldown_s = float(
-                                            getattr(
-                                                settings.agent,
-                                                "tool_selector_disable_cooldown_s",
-                                                300.0,
-                                            )
-                                        )
-                                    except Exception:
-                                        selector_disable_cooldown_s = 300.0
-
-                                    selector_model_id = str(
-                                        getattr(settings.agent, "tool_selector_model", "auto")
-                                        or "auto"
-                                    )
-                                    backend_cfg = getattr(backend, "config", None)
-                                    selector_model = (
-                                        str(getattr(backend_cfg, "model", "") or "")
-                                        if not selector_model_id or selector_model_id == "auto"
-                                        else selector_model_id
-                                    )
-                                    selector_model = selector_model or str(
-                                        getattr(getattr(backend, "config", None), "model", "") or ""
-                                    )
-
-                                    selector_backend: Any = backend
-                                    try:
-                                        from src.llm_native.backend import BackendConfig
-                                        from src.llm_native.openai_backend import (
-                                            OpenAICompatibleBackend,
-                                        )
-
-                                        base_url = str(
-                                            getattr(backend_cfg, "base_url", "") or ""
-                                        ).strip()
-                                        api_key = str(
-                                            getattr(backend_cfg, "api_key", "") or ""
-                                        ).strip()
-                                        selector_backend = OpenAICompatibleBackend(
-                                            BackendConfig(
-                                                base_url=base_url or "https://api.openai.com/v1",
-                                                api_key=api_key,
-                                                model=selector_model,
-                                                timeout_s=max(1.0, float(selector_timeout_s)),
-                                                max_retries=0,
-                                            )
-                                        )
-                                    except Exception:
-                                        selector_backend = backend
-
-                                    stages.append(
-                                        ToolLlmSelectorStage(
-                                            backend=selector_backend,
-                                            max_tools=max_tools_for_llm,
-                                            min_tools=min_tools,
-                                            always_include=always_include,
-                                            disable_cooldown_s=selector_disable_cooldown_s,
-                                        )
-                                    )
-                        try:
-                            per_run_limit = int(
-                                getattr(settings.agent, "tool_call_limit_per_run", 0) or 0
-                            )
-                        except Exception:
-                            per_run_limit = 0
-                        if per_run_limit > 0:
-                            stages.append(ToolCallLimitStage(per_run_limit=per_run_limit))
-                        try:
-                            tool_output_max_chars = int(
-                                getattr(settings.agent, "tool_output_max_chars", 12000) or 0
-                            )
-                            tool_output_max_chars = max(0, tool_output_max_chars)
-                        except Exception:
-                            tool_output_max_chars = 12000
-                        stages.append(ToolTraceStage(max_output_chars=tool_output_max_chars))
-                        pipeline = Pipeline(stages=stages)
+                    pipeline = self._build_native_pipeline(backend, tools)
                     runner = NativeToolLoopRunner(
                         backend=backend,
                         tools=tools,
-                        tool_runner=ToolRunner(
-                            tool_executor=self.tool_registry,
-                            default_timeout_s=float(
-                                getattr(settings.agent, "tool_timeout_s", 30.0)
-                            ),
-                        ),
+                        tool_runner=self._get_native_tool_runner(),
                         config=AgentRunnerConfig(
                             tool_timeout_s=float(getattr(settings.agent, "tool_timeout_s", 30.0)),
                             temperature=float(
@@ -3163,6 +2482,45 @@ class MintChatAgent:
 
         return len(messages) >= self._auto_compress_min_messages
 
+    def _memory_versions(self) -> tuple:
+        """长期/核心记忆写入版本（记忆预取结果的失效键）。"""
+        long_term = getattr(self.memory, "long_term", None)
+        try:
+            core_version = int(getattr(self.core_memory, "write_version", 0) or 0)
+        except Exception:
+            core_version = 0
+        return (getattr(long_term, "write_version", 0), core_version)
+
+    def prefetch_context(self, draft_text: str) -> bool:
+        """
+        用户仍在输入时预取记忆检索结果（线程安全，可在 GUI 线程按输入变化频繁调用）
+
+        草稿经防抖后在后台完成长期/核心记忆检索；正式发送时若消息与草稿足够接近，
+        `_prepare_messages_async` 直接复用结果，省去检索耗时。
+
+        Args:
+            draft_text: 当前输入框草稿
+
+        Returns:
+            bool: 是否调度了新的预取（未启用/极速模式/草稿过短或未变化时为 False）
+        """
+        prefetcher = getattr(self, "_memory_prefetcher", None)
+        if prefetcher is None or getattr(settings.agent, "memory_fast_mode", False):
+            return False
+        draft = str(draft_text or "")
+        try:
+            plan = self._build_retrieval_plan(
+                message=draft,
+                recent_messages=self.memory.get_recent_messages(),
+                compression="auto",
+            )
+            return prefetcher.schedule(
+                draft, long_term_k=plan["long_term_k"], core_k=plan["core_k"]
+            )
+        except Exception as exc:
+            logger.debug("记忆预取调度失败（可忽略）: %s", exc)
+            return False
+
     def _build_retrieval_plan(
         self,
         *,
@@ -3440,10 +2798,7 @@ class MintChatAgent:
         worker = self._stream_executor.submit(producer)
 
         watchdog = LLMStreamWatchdog(self._llm_timeouts)
-        accumulator = StreamDeltaAccumulator()
-        prefix_stripper = StreamStructuredPrefixStripper(max_fragments=5, max_buffer_chars=100_000)
-        trace_scrubber = StreamToolTraceScrubber(max_buffer_chars=32_768)
-        coalescer = StreamEmitBuffer(min_chars=self._stream_min_chars)
+        stream_filter = StreamTextFilter(min_chars=self._stream_min_chars, max_buffer_chars=32_768)
 
         stream_start = time.perf_counter()
         chunk_count = 0
@@ -3455,16 +2810,7 @@ class MintChatAgent:
             normalized = MintChatAgent._normalize_output_text(text)
             if not normalized:
                 return ""
-            delta = accumulator.consume(normalized)
-            if not delta:
-                return ""
-            delta = prefix_stripper.process(delta)
-            if not delta:
-                return ""
-            delta = trace_scrubber.process(delta)
-            if not delta:
-                return ""
-            return coalescer.push(delta)
+            return stream_filter.push_snapshot(normalized)
 
         try:
             while True:
@@ -3513,24 +2859,7 @@ class MintChatAgent:
                 elif kind == "end":
                     break
         finally:
-            pending = prefix_stripper.flush()
-            if pending:
-                pending = trace_scrubber.process(pending)
-                buffered = coalescer.push(pending)
-                if buffered:
-                    chunk_count += 1
-                    total_chars += len(buffered)
-                    yield buffered
-
-            scrub_tail = trace_scrubber.flush()
-            if scrub_tail:
-                buffered = coalescer.push(scrub_tail)
-                if buffered:
-                    chunk_count += 1
-                    total_chars += len(buffered)
-                    yield buffered
-
-            tail = coalescer.flush()
+            tail = stream_filter.flush()
             if tail:
                 chunk_count += 1
                 total_chars += len(tail)
@@ -3548,46 +2877,309 @@ class MintChatAgent:
                 elapsed,
             )
 
+    @staticmethod
+    def _warmup_llm_transport() -> None:
+        """后台预热 LLM / 视觉 LLM API 的共享连接（失败可忽略）。"""
+        try:
+            from src.llm_native.openai_backend import _normalize_base_url
+            from src.utils.http_transport import get_transport_registry
+
+            registry = get_transport_registry()
+            base_urls = {str(getattr(settings.llm, "api", "") or "").strip()}
+            vision_cfg = getattr(settings, "vision_llm", None)
+            if vision_cfg is not None and bool(getattr(vision_cfg, "enabled", False)):
+                base_urls.add(str(getattr(vision_cfg.resolve(settings.llm), "api", "") or ""))
+            for base_url in base_urls:
+                normalized = _normalize_base_url(base_url)
+                if normalized:
+                    registry.warmup(normalized)
+        except Exception as exc:
+            logger.debug("LLM 连接预热失败（可忽略）: %s", exc)
+
     def _get_native_backend(self) -> Any:
         """Lazily create the OpenAI-compatible backend (native tool-loop path)."""
         backend = getattr(self, "_native_backend", None)
         if backend is not None:
             return backend
 
-        lock = getattr(self, "_native_backend_lock", None)
-        if lock is None:
-            lock = Lock()
-            self._native_backend_lock = lock
+        lock = getattr(self, "_native_backend_lock", None)
+        if lock is None:
+            lock = Lock()
+            self._native_backend_lock = lock
+
+        with lock:
+            backend = getattr(self, "_native_backend", None)
+            if backend is not None:
+                return backend
+
+            from src.llm_native.backend import BackendConfig
+            from src.llm_native.openai_backend import OpenAICompatibleBackend
+
+            base_url = str(getattr(settings.llm, "api", "") or "").strip()
+            api_key = str(getattr(settings.llm, "key", "") or "").strip()
+            model = str(getattr(self, "model_name", "") or "").strip() or str(
+                getattr(settings.llm, "model", "gpt-4o")
+            )
+
+            try:
+                timeout_s = float(getattr(getattr(self, "_llm_timeouts", None), "total", 120.0))
+            except Exception:
+                timeout_s = 120.0
+
+            cfg = BackendConfig(
+                base_url=base_url or "https://api.openai.com/v1",
+                api_key=api_key,
+                model=model,
+                timeout_s=max(5.0, float(timeout_s)),
+                max_retries=2,
+            )
+            backend = OpenAICompatibleBackend(cfg)
+            self._native_backend = backend
+            return backend
+
+    def _build_native_pipeline(self, backend: Any, tools: list[Any]) -> Any:
+        """Build the optional native Pipeline (stages from settings); `None` when disabled."""
+        from src.llm_native.pipeline import Pipeline
+        from src.llm_native.pipeline_stages import (
+            ContextToolUsesTrimStage,
+            PermissionScopedToolsStage,
+            ToolCallLimitStage,
+            ToolHeuristicPrefilterStage,
+            ToolLlmSelectorStage,
+            ToolTraceStage,
+        )
+
+        pipeline = None
+        if bool(getattr(settings.agent, "native_pipeline_enabled", False)):
+            stages: list[Any] = []
+            try:
+                trim_tokens = int(getattr(settings.agent, "tool_context_trim_tokens", 1200) or 0)
+                trim_tokens = max(0, trim_tokens)
+            except Exception:
+                trim_tokens = 1200
+            if trim_tokens > 0:
+                stages.append(ContextToolUsesTrimStage(max_tool_context_tokens=trim_tokens))
+            stages.append(
+                PermissionScopedToolsStage(
+                    profile_map=getattr(settings.agent, "tool_permission_profiles", {}),
+                    default_profile=str(
+                        getattr(settings.agent, "tool_permission_default", "default") or "default"
+                    ),
+                )
+            )
+            if bool(getattr(settings.agent, "tool_selector_enabled", True)):
+                try:
+                    allow_in_fast_mode = bool(
+                        getattr(settings.agent, "tool_selector_in_fast_mode", False)
+                    )
+                except Exception:
+                    allow_in_fast_mode = False
+                if getattr(settings.agent, "memory_fast_mode", False) and not allow_in_fast_mode:
+                    logger.info("fast_mode 跳过 tool selector stages (native pipeline)")
+                else:
+                    try:
+                        min_tools = int(getattr(settings.agent, "tool_selector_min_tools", 16) or 0)
+                        min_tools = max(0, min_tools)
+                    except Exception:
+                        min_tools = 16
+
+                    tools_count = len(tools) if tools else 0
+                    if tools_count and tools_count < min_tools:
+                        logger.info(
+                            "跳过 tool selector stages (native pipeline): "
+                            "tools_count=%d < min_tools=%d",
+                            tools_count,
+                            min_tools,
+                        )
+                    else:
+                        try:
+                            max_tools_raw = int(
+                                getattr(settings.agent, "tool_selector_max_tools", 4) or 0
+                            )
+                        except Exception:
+                            max_tools_raw = 4
+                        max_tools_for_llm = max(1, max_tools_raw) if max_tools_raw else 4
+
+                        always_include = list(
+                            getattr(
+                                settings.agent,
+                                "tool_selector_always_include",
+                                [
+                                    "get_current_time",
+                                    "get_weather",
+                                    "web_search",
+                                    "map_search",
+                                ],
+                            )
+                            or []
+                        )
+                        stages.append(
+                            ToolHeuristicPrefilterStage(
+                                always_include=always_include,
+                                max_tools=max_tools_raw or None,
+                                min_tools=min_tools,
+                            )
+                        )
+
+                        try:
+                            selector_timeout_s = float(
+                                getattr(settings.agent, "tool_selector_timeout_s", 4.0)
+                            )
+                        except Exception:
+                            selector_timeout_s = 4.0
+                        try:
+                            selector_disable_cooldown_s = float(
+                                getattr(
+                                    settings.agent,
+                                    "tool_selector_disable_cooldown_s",
+                                    300.0,
+                                )
+                            )
+                        except Exception:
+                            selector_disable_cooldown_s = 300.0
+
+                        selector_model_id = str(
+                            getattr(settings.agent, "tool_selector_model", "auto") or "auto"
+                        )
+                        backend_cfg = getattr(backend, "config", None)
+                        selector_model = (
+                            str(getattr(backend_cfg, "model", "") or "")
+                            if not selector_model_id or selector_model_id == "auto"
+                            else selector_model_id
+                        )
+                        selector_model = selector_model or str(
+                            getattr(getattr(backend, "config", None), "model", "") or ""
+                        )
+
+                        selector_backend: Any = backend
+                        try:
+                            from src.llm_native.backend import BackendConfig
+                            from src.llm_native.openai_backend import (
+                                OpenAICompatibleBackend,
+                            )
+
+                            base_url = str(getattr(backend_cfg, "base_url", "") or "").strip()
+                            api_key = str(getattr(backend_cfg, "api_key", "") or "").strip()
+                            selector_backend = OpenAICompatibleBackend(
+                                BackendConfig(
+                                    base_url=base_url or "https://api.openai.com/v1",
+                                    api_key=api_key,
+                                    model=selector_model,
+                                    timeout_s=max(1.0, float(selector_timeout_s)),
+                                    max_retries=0,
+                                )
+                            )
+                        except Exception:
+                            selector_backend = backend
+
+                        stages.append(
+                            ToolLlmSelectorStage(
+                                backend=selector_backend,
+                                max_tools=max_tools_for_llm,
+                                min_tools=min_tools,
+                                always_include=always_include,
+                                disable_cooldown_s=selector_disable_cooldown_s,
+                            )
+                        )
+            try:
+                per_run_limit = int(getattr(settings.agent, "tool_call_limit_per_run", 0) or 0)
+            except Exception:
+                per_run_limit = 0
+            if per_run_limit > 0:
+                stages.append(ToolCallLimitStage(per_run_limit=per_run_limit))
+            try:
+                tool_output_max_chars = int(
+                    getattr(settings.agent, "tool_output_max_chars", 12000) or 0
+                )
+                tool_output_max_chars = max(0, tool_output_max_chars)
+            except Exception:
+                tool_output_max_chars = 12000
+            stages.append(ToolTraceStage(max_output_chars=tool_output_max_chars))
+            pipeline = Pipeline(stages=stages)
+        return pipeline
+
+    @staticmethod
+    def _record_native_round_metrics(round_metrics: list[Any]) -> None:
+        """记录每轮首包指标（TTFT=首个文本到达调用方；first_token=后端首个文本 delta）。"""
+        for metrics in round_metrics:
+            if metrics.ttft_ms is not None:
+                performance_monitor.record_metric("native_round_ttft_ms", metrics.ttft_ms)
+            if metrics.first_token_ms is not None:
+                performance_monitor.record_metric(
+                    "native_round_first_token_ms", metrics.first_token_ms
+                )
+            if metrics.retracted_chars:
+                performance_monitor.record_metric(
+                    "native_round_retracted_chars", float(metrics.retracted_chars)
+                )
+
+    def _get_native_async_backend(self) -> Any:
+        """
+        Lazily create the AsyncOpenAI-based backend for the running event loop.
 
-        with lock:
-            backend = getattr(self, "_native_backend", None)
+        The SDK's async HTTP client is bound to the loop it first ran on, so one backend is kept per
+        loop. Backends of other loops stay untouched (they may still be streaming); entries of
+        closed loops are dropped, and live ones are closed in close().
+        """
+        loop = asyncio.get_running_loop()
+        with self._native_async_backends_lock:
+            backends = self._native_async_backends
+            backend = backends.get(loop)
             if backend is not None:
                 return backend
+            # 已关闭事件循环上的连接随之失效；共享连接池由传输注册表自行回收
+            for stale in [lp for lp in backends if lp.is_closed()]:
+                backends.pop(stale, None)
 
-            from src.llm_native.backend import BackendConfig
-            from src.llm_native.openai_backend import OpenAICompatibleBackend
+            from src.llm_native.openai_backend import AsyncOpenAICompatibleBackend
 
-            base_url = str(getattr(settings.llm, "api", "") or "").strip()
-            api_key = str(getattr(settings.llm, "key", "") or "").strip()
-            model = str(getattr(self, "model_name", "") or "").strip() or str(
-                getattr(settings.llm, "model", "gpt-4o")
-            )
+            sync_backend = self._get_native_backend()
+            backend = AsyncOpenAICompatibleBackend(sync_backend.config)
+            backends[loop] = backend
+            return backend
 
-            try:
-                timeout_s = float(getattr(getattr(self, "_llm_timeouts", None), "total", 120.0))
-            except Exception:
-                timeout_s = 120.0
+    @staticmethod
+    def _close_native_async_backend(loop: Any, backend: Any) -> None:
+        """在 backend 所属事件循环上调度 aclose()，归还其连接池。"""
+        if loop.is_closed() or not loop.is_running():
+            # 事件循环已结束：连接随之失效，无法再在其上 await
+            return
+        try:
+            if loop is asyncio.get_running_loop():
+                loop.create_task(backend.aclose())
+                return
+        except RuntimeError:
+            pass
+        try:
+            asyncio.run_coroutine_threadsafe(backend.aclose(), loop)
+        except Exception as exc:
+            logger.debug("关闭 native 异步 backend 失败(可忽略): %s", exc)
 
-            cfg = BackendConfig(
-                base_url=base_url or "https://api.openai.com/v1",
-                api_key=api_key,
-                model=model,
-                timeout_s=max(5.0, float(timeout_s)),
-                max_retries=2,
-            )
-            backend = OpenAICompatibleBackend(cfg)
-            self._native_backend = backend
-            return backend
+    def _get_native_tool_runner(self) -> Any:
+        """Lazily create the shared ToolRunner (keeps its worker pool across turns)."""
+        runner = getattr(self, "_native_tool_runner", None)
+        if runner is not None:
+            return runner
+
+        from src.llm_native.tool_runner import ToolRunner
+
+        try:
+            max_parallel = int(getattr(settings.agent, "native_tool_parallel_workers", 4))
+        except Exception:
+            max_parallel = 4
+        try:
+            round_timeout_s = float(getattr(settings.agent, "native_tool_round_timeout_s", 60.0))
+        except Exception:
+            round_timeout_s = 60.0
+
+        runner = ToolRunner(
+            tool_executor=self.tool_registry,
+            default_timeout_s=float(getattr(settings.agent, "tool_timeout_s", 30.0)),
+            max_parallel=max(1, max_parallel),
+            round_timeout_s=round_timeout_s if round_timeout_s > 0 else None,
+        )
+        self._native_tool_runner = runner
+        return runner
 
     def _to_native_messages(self, messages: list[dict[str, Any]]) -> list[Any]:
         """Convert project OpenAI-shaped dict messages to llm_native Message objects."""
@@ -3661,192 +3253,24 @@ class MintChatAgent:
             trace_token = tool_trace_recorder_var.set(tool_recorder)
             try:
                 from src.llm_native.agent_runner import AgentRunnerConfig, NativeToolLoopRunner
-                from src.llm_native.pipeline import Pipeline
-                from src.llm_native.pipeline_stages import (
-                    ContextToolUsesTrimStage,
-                    PermissionScopedToolsStage,
-                    ToolCallLimitStage,
-                    ToolHeuristicPrefilterStage,
-                    ToolLlmSelectorStage,
-                    ToolTraceStage,
-                )
-                from src.llm_native.tool_runner import ToolRunner
 
                 backend = self._get_native_backend()
                 tools = self.tool_registry.get_tool_specs()
-                pipeline = None
-                if bool(getattr(settings.agent, "native_pipeline_enabled", False)):
-                    stages: list[Any] = []
-                    try:
-                        trim_tokens = int(
-                            getattr(settings.agent, "tool_context_trim_tokens", 1200) or 0
-                        )
-                        trim_tokens = max(0, trim_tokens)
-                    except Exception:
-                        trim_tokens = 1200
-                    if trim_tokens > 0:
-                        stages.append(ContextToolUsesTrimStage(max_tool_context_tokens=trim_tokens))
-                    stages.append(
-                        PermissionScopedToolsStage(
-                            profile_map=getattr(settings.agent, "tool_permission_profiles", {}),
-                            default_profile=str(
-                                getattr(settings.agent, "tool_permission_default", "default")
-                                or "default"
-                            ),
-                        )
-                    )
-                    if bool(getattr(settings.agent, "tool_selector_enabled", True)):
-                        try:
-                            allow_in_fast_mode = bool(
-                                getattr(settings.agent, "tool_selector_in_fast_mode", False)
-                            )
-                        except Exception:
-                            allow_in_fast_mode = False
-                        if (
-                            getattr(settings.agent, "memory_fast_mode", False)
-                            and not allow_in_fast_mode
-                        ):
-                            logger.info("fast_mode 跳过 tool selector stages (native pipeline)")
-                        else:
-                            try:
-                                min_tools = int(
-                                    getattr(settings.agent, "tool_selector_min_tools", 16) or 0
-                                )
-                                min_tools = max(0, min_tools)
-                            except Exception:
-                                min_tools = 16
-
-                            tools_count = len(tools) if tools else 0
-                            if tools_count and tools_count < min_tools:
-                                logger.info(
-                                    "跳过 tool selector stages (native pipeline): "
-                                    "tools_count=%d < min_tools=%d",
-                                    tools_count,
-                                    min_tools,
-                                )
-                            else:
-                                try:
-                                    max_tools_raw = int(
-                                        getattr(settings.agent, "tool_selector_max_tools", 4) or 0
-                                    )
-                                except Exception:
-                                    max_tools_raw = 4
-                                max_tools_for_llm = max(1, max_tools_raw) if max_tools_raw else 4
-
-                                always_include = list(
-                                    getattr(
-                                        settings.agent,
-                                        "tool_selector_always_include",
-                                        [
-                                            "get_current_time",
-                                            "get_weather",
-                                            "web_search",
-                                            "map_search",
-                                        ],
-                                    )
-                                    or []
-                                )
-                                stages.append(
-                                    ToolHeuristicPrefilterStage(
-                                        always_include=always_include,
-                                        max_tools=max_tools_raw or None,
-                                        min_tools=min_tools,
-                                    )
-                                )
-
-                                try:
-                                    selector_timeout_s = float(
-                                        getattr(settings.agent, "tool_selector_timeout_s", 4.0)
-                                    )
-                                except Exception:
-                                    selector_timeout_s = 4.0
-                                try:
-                                    selector_disable_cooldown_s = float(
-                                        getattr(
-                                            settings.agent,
-                                            "tool_selector_disable_cooldown_s",
-                                            300.0,
-                                        )
-                                    )
-                                except Exception:
-                                    selector_disable_cooldown_s = 300.0
-
-                                selector_model_id = str(
-                                    getattr(settings.agent, "tool_selector_model", "auto") or "auto"
-                                )
-                                backend_cfg = getattr(backend, "config", None)
-                                selector_model = (
-                                    str(getattr(backend_cfg, "model", "") or "")
-                                    if not selector_model_id or selector_model_id == "auto"
-                                    else selector_model_id
-                                )
-                                selector_model = selector_model or str(
-                                    getattr(getattr(backend, "config", None), "model", "") or ""
-                                )
-
-                                selector_backend: Any = backend
-                                try:
-                                    from src.llm_native.backend import BackendConfig
-                                    from src.llm_native.openai_backend import (
-                                        OpenAICompatibleBackend,
-                                    )
-
-                                    base_url = str(
-                                        getattr(backend_cfg, "base_url", "") or ""
-                                    ).strip()
-                                    api_key = str(getattr(backend_cfg, "api_key", "") or "").strip()
-                                    selector_backend = OpenAICompatibleBackend(
-                                        BackendConfig(
-                                            base_url=base_url or "https://api.openai.com/v1",
-                                            api_key=api_key,
-                                            model=selector_model,
-                                            timeout_s=max(1.0, float(selector_timeout_s)),
-                                            max_retries=0,
-                                        )
-                                    )
-                                except Exception:
-                                    selector_backend = backend
-
-                                stages.append(
-                                    ToolLlmSelectorStage(
-                                        backend=selector_backend,
-                                        max_tools=max_tools_for_llm,
-                                        min_tools=min_tools,
-                                        always_include=always_include,
-                                        disable_cooldown_s=selector_disable_cooldown_s,
-                                    )
-                                )
-                    try:
-                        per_run_limit = int(
-                            getattr(settings.agent, "tool_call_limit_per_run", 0) or 0
-                        )
-                    except Exception:
-                        per_run_limit = 0
-                    if per_run_limit > 0:
-                        stages.append(ToolCallLimitStage(per_run_limit=per_run_limit))
-                    try:
-                        tool_output_max_chars = int(
-                            getattr(settings.agent, "tool_output_max_chars", 12000) or 0
-                        )
-                        tool_output_max_chars = max(0, tool_output_max_chars)
-                    except Exception:
-                        tool_output_max_chars = 12000
-                    stages.append(ToolTraceStage(max_output_chars=tool_output_max_chars))
-                    pipeline = Pipeline(stages=stages)
+                pipeline = self._build_native_pipeline(backend, tools)
 
                 runner = NativeToolLoopRunner(
                     backend=backend,
                     tools=tools,
-                    tool_runner=ToolRunner(
-                        tool_executor=self.tool_registry,
-                        default_timeout_s=float(getattr(settings.agent, "tool_timeout_s", 30.0)),
-                    ),
+                    tool_runner=self._get_native_tool_runner(),
                     config=AgentRunnerConfig(
                         tool_timeout_s=float(getattr(settings.agent, "tool_timeout_s", 30.0)),
                         temperature=float(
                             getattr(self, "temperature", None) or settings.model_temperature
                         ),
                         max_tokens=int(getattr(settings.llm, "max_tokens", 2000)),
+                        speculative_streaming=bool(
+                            getattr(settings.agent, "native_speculative_streaming", True)
+                        ),
                     ),
                     pipeline=pipeline,
                 )
@@ -3873,6 +3297,9 @@ class MintChatAgent:
                             _queue_put("heartbeat", None)
                     elif event_type in {"tool_call.delta", "tool.result"}:
                         _queue_put("heartbeat", None)
+                    elif event_type == "text.retract":
+                        # 推测流式：本轮已推送的文本作废，由消费端转换为 StreamRetraction
+                        _queue_put("retract", int(getattr(event, "chars", 0) or 0))
                     elif event_type == "error":
                         message = str(getattr(event, "message", "") or "")
                         exc_type = str(getattr(event, "exception_type", "") or "RuntimeError")
@@ -3884,6 +3311,8 @@ class MintChatAgent:
                         break
                     else:
                         _queue_put("heartbeat", None)
+
+                self._record_native_round_metrics(runner.round_metrics)
             except Exception as exc:
                 _queue_put("error", exc)
             finally:
@@ -3897,9 +3326,9 @@ class MintChatAgent:
         worker = self._stream_executor.submit(producer)
 
         watchdog = LLMStreamWatchdog(self._llm_timeouts)
-        coalescer = StreamEmitBuffer(min_chars=self._stream_min_chars)
-        prefix_stripper = StreamStructuredPrefixStripper(max_fragments=5, max_buffer_chars=100_000)
-        trace_scrubber = StreamToolTraceScrubber(max_buffer_chars=60_000)
+        stream_filter = RetractableStreamFilter(
+            min_chars=self._stream_min_chars, max_buffer_chars=60_000
+        )
 
         stream_start = time.perf_counter()
         chunk_count = 0
@@ -3941,16 +3370,21 @@ class MintChatAgent:
 
                 if kind == "data":
                     watchdog.mark_chunk()
-                    delta = str(payload or "")
-                    delta = prefix_stripper.process(delta)
-                    if not delta:
-                        continue
-                    delta = trace_scrubber.process(delta)
-                    buffered = coalescer.push(delta)
+                    buffered = stream_filter.push(str(payload or ""))
                     if buffered:
                         chunk_count += 1
                         total_chars += len(buffered)
                         yield buffered
+                elif kind == "retract":
+                    watchdog.mark_chunk()
+                    retracted, replacement = stream_filter.retract(int(payload or 0))
+                    if retracted:
+                        total_chars -= retracted
+                        yield StreamRetraction(retracted)
+                    if replacement:
+                        chunk_count += 1
+                        total_chars += len(replacement)
+                        yield replacement
                 elif kind == "heartbeat":
                     watchdog.mark_chunk()
                     continue
@@ -3966,22 +3400,7 @@ class MintChatAgent:
                 elif kind == "end":
                     break
         finally:
-            pending = prefix_stripper.flush()
-            if pending:
-                pending = trace_scrubber.process(pending)
-                buffered = coalescer.push(pending)
-                if buffered:
-                    chunk_count += 1
-                    total_chars += len(buffered)
-                    yield buffered
-            scrub_tail = trace_scrubber.flush()
-            if scrub_tail:
-                buffered = coalescer.push(scrub_tail)
-                if buffered:
-                    chunk_count += 1
-                    total_chars += len(buffered)
-                    yield buffered
-            tail = coalescer.flush()
+            tail = stream_filter.flush()
             if tail:
                 chunk_count += 1
                 total_chars += len(tail)
@@ -4008,213 +3427,190 @@ class MintChatAgent:
         cancel_event: Optional[Event] = None,
     ) -> AsyncIterator[str]:
         """
-        v3.3.4: 异步流式拉取 LLM 输出，复用统一的看门狗策略。
+        异步流式拉取 LLM 输出（native 工具循环直接运行在当前事件循环上）。
 
-        改进：
-        - 增强资源清理
-        - 改进错误处理
-        - 确保 stream 在所有情况下都被正确关闭
-        - 仅输出增量，减少UI/TTS重复处理
-        - 合并细碎片段，降低UI刷新频率
+        与同步版 `_stream_llm_response_native` 共享看门狗/前缀剥离/工具轨迹清洗/合并策略；
+        区别在于模型流由 AsyncOpenAICompatibleBackend 驱动，不再为每个流占用一个线程，
+        同一事件循环可同时承载多路会话。
         """
-        stream = None
-        timeout_token = tool_timeout_s_var.set(
-            float(getattr(settings.agent, "tool_timeout_s", 30.0))
-            if getattr(settings.agent, "tool_timeout_s", 30.0)
-            else None
-        )
-        trace_token = tool_trace_recorder_var.set(tool_recorder)
+        from src.llm_native.agent_runner import AgentRunnerConfig, AsyncNativeToolLoopRunner
 
-        async def _safe_aclose() -> None:
-            if stream and hasattr(stream, "aclose"):
-                try:
-                    await asyncio.wait_for(stream.aclose(), timeout=1.0)
-                except (asyncio.TimeoutError, Exception):
-                    pass
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=128)
 
-        try:
-            stream = self.agent.astream(
-                {"messages": messages},
-                stream_mode="messages",
-            )
-            iterator = stream.__aiter__()
-            watchdog = LLMStreamWatchdog(self._llm_timeouts)
-            first_latency_logged = False
-            accumulator = StreamDeltaAccumulator()
-            tool_first_received_at: Optional[float] = None
-            tool_direct_grace_s = max(
-                0.0,
-                float(getattr(settings.agent, "tool_direct_grace_s", 1.5)),
-            )
-            prefix_stripper = StreamStructuredPrefixStripper(
-                max_fragments=5, max_buffer_chars=100_000
+        async def producer() -> None:
+            timeout_token = tool_timeout_s_var.set(
+                float(getattr(settings.agent, "tool_timeout_s", 30.0))
+                if getattr(settings.agent, "tool_timeout_s", 30.0)
+                else None
             )
-            trace_scrubber = StreamToolTraceScrubber(max_buffer_chars=32_768)
-            coalescer = StreamEmitBuffer(min_chars=self._stream_min_chars)
-            stream_start = time.perf_counter()
-            chunk_count = 0
-            total_chars = 0
-
-            def _emit(text: str) -> Optional[str]:
-                if not text:
-                    return None
-                normalized = MintChatAgent._normalize_output_text(text)
-                if not normalized:
-                    return None
-                delta = accumulator.consume(normalized)
-                if not delta:
-                    return None
-                delta = prefix_stripper.process(delta)
-                if not delta:
-                    return None
-                delta = trace_scrubber.process(delta)
-                if not delta:
-                    return None
-                return coalescer.push(delta)
-
+            trace_token = tool_trace_recorder_var.set(tool_recorder)
+            events = None
             try:
-                while True:
-                    try:
-                        wait_timeout = watchdog.next_wait()
-                    except AgentTimeoutError:
-                        await _safe_aclose()
-                        raise
-                    if cancel_event is not None:
-                        wait_timeout = min(wait_timeout, 0.25)
+                tools = self.tool_registry.get_tool_specs()
+                runner = AsyncNativeToolLoopRunner(
+                    backend=self._get_native_async_backend(),
+                    tools=tools,
+                    tool_runner=self._get_native_tool_runner(),
+                    config=AgentRunnerConfig(
+                        tool_timeout_s=float(getattr(settings.agent, "tool_timeout_s", 30.0)),
+                        temperature=float(
+                            getattr(self, "temperature", None) or settings.model_temperature
+                        ),
+                        max_tokens=int(getattr(settings.llm, "max_tokens", 2000)),
+                        speculative_streaming=bool(
+                            getattr(settings.agent, "native_speculative_streaming", True)
+                        ),
+                    ),
+                    pipeline=self._build_native_pipeline(self._get_native_backend(), tools),
+                )
+
+                convo = self._to_native_messages(list(messages))
+                tool_profile = str(getattr(settings.agent, "tool_profile", "") or "").strip()
+                pipeline_runtime = {"tool_profile": tool_profile} if tool_profile else None
+
+                events = runner.stream(
+                    convo,
+                    cancel_event=cancel_event,
+                    pipeline_runtime=pipeline_runtime,
+                )
+                async for event in events:
                     if cancel_event and cancel_event.is_set():
-                        await _safe_aclose()
                         break
 
-                    try:
-                        item = await asyncio.wait_for(
-                            iterator.__anext__(),
-                            timeout=wait_timeout,
+                    event_type = str(getattr(event, "type", "") or "")
+                    if event_type == "text.delta":
+                        delta = str(getattr(event, "delta", "") or "")
+                        await chunk_queue.put(("data", delta) if delta else ("heartbeat", None))
+                    elif event_type == "text.retract":
+                        # 推测流式：本轮已推送的文本作废，由消费端转换为 StreamRetraction
+                        await chunk_queue.put(("retract", int(getattr(event, "chars", 0) or 0)))
+                    elif event_type == "error":
+                        message = str(getattr(event, "message", "") or "")
+                        exc_type = str(getattr(event, "exception_type", "") or "RuntimeError")
+                        await chunk_queue.put(
+                            (
+                                "error",
+                                RuntimeError(f"{exc_type}: {message}" if message else exc_type),
+                            )
                         )
-                    except StopAsyncIteration:
                         break
-                    except asyncio.TimeoutError as exc:
-                        # 未在当前窗口内获取数据，若总耗时未超限则继续等待
-                        if cancel_event and cancel_event.is_set():
-                            await _safe_aclose()
-                            break
+                    elif event_type == "done":
+                        break
+                    else:
+                        await chunk_queue.put(("heartbeat", None))
 
-                        tool_done_at: Optional[float] = None
-                        tools_in_flight = 0
-                        if tool_recorder is not None:
-                            try:
-                                in_flight, first_done_at, last_act = tool_recorder.state()
-                            except Exception:
-                                in_flight, first_done_at, last_act = 0, None, 0.0
-                            tools_in_flight = in_flight
-                            if in_flight > 0:
-                                # 工具执行期间可能不会产生任何 stream chunk；这里保持看门狗活跃，避免误判“无输出超时”。
-                                watchdog.mark_chunk()
-                            if in_flight <= 0 and first_done_at is not None:
-                                tool_done_at = last_act
-
-                        tool_stream_ready = (
-                            tool_first_received_at is not None
-                            and total_chars <= 0
-                            and (time.perf_counter() - tool_first_received_at)
-                            >= tool_direct_grace_s
-                        )
-                        if tool_recorder is not None and tools_in_flight > 0:
-                            tool_stream_ready = False
+                self._record_native_round_metrics(runner.round_metrics)
+            except Exception as exc:
+                await chunk_queue.put(("error", exc))
+            finally:
+                if events is not None:
+                    try:
+                        await events.aclose()
+                    except BaseException:
+                        pass
+                tool_trace_recorder_var.reset(trace_token)
+                tool_timeout_s_var.reset(timeout_token)
+                try:
+                    chunk_queue.put_nowait(("end", None))
+                except asyncio.QueueFull:
+                    pass
 
-                        if tool_stream_ready:
-                            await _safe_aclose()
-                            break
-                        if (
-                            tool_done_at is not None
-                            and total_chars <= 0
-                            and (time.perf_counter() - tool_done_at) >= tool_direct_grace_s
-                        ):
-                            await _safe_aclose()
-                            break
-                        if watchdog.remaining_total() > 0:
-                            continue
-                        await _safe_aclose()
-                        raise AgentTimeoutError("LLM 异步流式输出在规定时间内无响应") from exc
+        worker = asyncio.create_task(producer())
 
-                    chunk, metadata = _unwrap_stream_item(item)
-                    stream_mode = (
-                        metadata.get("stream_mode") if isinstance(metadata, dict) else None
-                    )
+        watchdog = LLMStreamWatchdog(self._llm_timeouts)
+        stream_filter = RetractableStreamFilter(
+            min_chars=self._stream_min_chars, max_buffer_chars=60_000
+        )
 
-                    first_latency = watchdog.mark_chunk()
-                    if first_latency and not first_latency_logged:
-                        first_latency_logged = True
+        stream_start = time.perf_counter()
+        chunk_count = 0
+        total_chars = 0
+        tool_done_at: Optional[float] = None
+        tool_direct_grace_s = max(
+            0.0,
+            float(getattr(settings.agent, "tool_direct_grace_s", 1.5)),
+        )
 
-                    tool_text = self._extract_tool_stream_text(chunk)
-                    if tool_text:
-                        normalized_tool = MintChatAgent._normalize_output_text(tool_text)
-                        if normalized_tool:
-                            if tool_first_received_at is None:
-                                tool_first_received_at = time.perf_counter()
+        try:
+            while True:
+                wait_timeout = watchdog.next_wait()
+                if cancel_event is not None:
+                    wait_timeout = min(wait_timeout, 0.25)
+                try:
+                    kind, payload = await asyncio.wait_for(chunk_queue.get(), timeout=wait_timeout)
+                except asyncio.TimeoutError:
+                    if cancel_event and cancel_event.is_set():
+                        break
 
-                    if bool(stream_mode and str(stream_mode).lower() != "messages") or (
-                        _metadata_looks_like_internal_routing(metadata)
-                    ):
-                        continue
+                    if tool_recorder is not None:
+                        in_flight, first_done_at, last_act = tool_recorder.state()
+                        if in_flight > 0:
+                            watchdog.mark_chunk()
+                        if in_flight <= 0 and first_done_at is not None:
+                            tool_done_at = last_act
 
-                    content = self._extract_stream_text(chunk)
-                    emitted = _emit(content)
-                    if emitted:
-                        chunk_count += 1
-                        total_chars += len(emitted)
-                        yield emitted
-            except Exception as e:
-                # v3.3.4: 改进错误信息处理
-                error_msg = str(e) or repr(e) or f"{type(e).__name__}: LLM 异步流式调用失败"
-                logger.error(f"异步流式输出异常: {error_msg}")
-                await _safe_aclose()
-                raise
-        except Exception:
-            # 发生异常时也要清理stream
-            await _safe_aclose()
-            raise
-        finally:
-            tool_trace_recorder_var.reset(trace_token)
-            tool_timeout_s_var.reset(timeout_token)
-            if "prefix_stripper" in locals():
-                pending = prefix_stripper.flush()
-                if pending and "trace_scrubber" in locals():
-                    pending = trace_scrubber.process(pending)
-                if pending and "coalescer" in locals():
-                    buffered = coalescer.push(pending)
+                    if total_chars <= 0 and tool_done_at is not None:
+                        if (time.perf_counter() - tool_done_at) >= tool_direct_grace_s:
+                            break
+
+                    if worker.done() and chunk_queue.empty():
+                        break
+                    continue
+
+                if kind == "data":
+                    watchdog.mark_chunk()
+                    buffered = stream_filter.push(str(payload or ""))
                     if buffered:
                         chunk_count += 1
                         total_chars += len(buffered)
                         yield buffered
-            if "trace_scrubber" in locals() and "coalescer" in locals():
-                scrub_tail = trace_scrubber.flush()
-                if scrub_tail:
-                    buffered = coalescer.push(scrub_tail)
-                    if buffered:
+                elif kind == "retract":
+                    watchdog.mark_chunk()
+                    retracted, replacement = stream_filter.retract(int(payload or 0))
+                    if retracted:
+                        total_chars -= retracted
+                        yield StreamRetraction(retracted)
+                    if replacement:
                         chunk_count += 1
-                        total_chars += len(buffered)
-                        yield buffered
-            if "coalescer" in locals():
-                tail = coalescer.flush()
-                if tail:
-                    chunk_count += 1
-                    total_chars += len(tail)
-                    yield tail
-
-            if total_chars <= 0:
-                # Intentionally do not emit raw tool output here; `chat_stream` will
-                # trigger a rewrite rescue based on the recorded tool traces.
-                pass
-            # v3.3.4: 确保stream被关闭（在所有情况下）
-            await _safe_aclose()
-            if "chunk_count" in locals():
-                elapsed = time.perf_counter() - stream_start
-                logger.info(
-                    "异步流式输出完成: chunks=%d, chars=%d, elapsed=%.2fs",
-                    chunk_count,
-                    total_chars,
-                    elapsed,
-                )
+                        total_chars += len(replacement)
+                        yield replacement
+                elif kind == "heartbeat":
+                    watchdog.mark_chunk()
+                    continue
+                elif kind == "error":
+                    exc = (
+                        payload
+                        if isinstance(payload, BaseException)
+                        else RuntimeError(str(payload))
+                    )
+                    error_msg = (
+                        str(exc) or repr(exc) or f"{type(exc).__name__}: LLM 异步流式调用失败"
+                    )
+                    logger.error("LLM 异步流式调用失败: %s", error_msg)
+                    raise exc
+                elif kind == "end":
+                    break
+        finally:
+            tail = stream_filter.flush()
+            if tail:
+                chunk_count += 1
+                total_chars += len(tail)
+                yield tail
+
+            if not worker.done():
+                worker.cancel()
+                try:
+                    await asyncio.wait_for(asyncio.shield(worker), timeout=1.0)
+                except BaseException:
+                    pass
+
+            elapsed = time.perf_counter() - stream_start
+            logger.info(
+                "异步流式输出完成: chunks=%d, chars=%d, elapsed=%.2fs",
+                chunk_count,
+                total_chars,
+                elapsed,
+            )
 
     def _extract_stream_text(self, chunk: Any) -> str:
         """直接提取文本，不做额外过滤。"""
@@ -5636,7 +5032,8 @@ class MintChatAgent:
             image_analysis: 图片分析结果（可选）
 
         Yields:
-            str: 回复的文本片段
+            str: 回复的文本片段；推测流式撤回时为 StreamRetraction（空串，需丢弃已输出文本末尾
+            ``chars`` 个字符）
         """
         stage_timer = (
             RequestStageTimer(enabled=True, label="chat_stream")
@@ -5736,7 +5133,11 @@ class MintChatAgent:
                     if cancel_event and cancel_event.is_set():
                         canceled = True
                         break
-                    reply_parts.append(chunk)
+                    if isinstance(chunk, StreamRetraction):
+                        # 推测流式撤回：历史只保存撤回后的文本，标记继续交给 UI/TTS
+                        apply_stream_retraction(reply_parts, chunk.chars)
+                    else:
+                        reply_parts.append(chunk)
                     yield chunk
                 if canceled:
                     # Drain the iterator to ensure internal cleanup (closing streams, stopping
@@ -5999,7 +5400,8 @@ class MintChatAgent:
             save_to_long_term: 是否保存到长期记忆
 
         Yields:
-            str: 回复的文本片段
+            str: 回复的文本片段；推测流式撤回时为 StreamRetraction（空串，需丢弃已输出文本末尾
+            ``chars`` 个字符）
         """
         stage_timer = (
             RequestStageTimer(enabled=True, label="chat_stream_async")
@@ -6098,7 +5500,11 @@ class MintChatAgent:
                     if cancel_event and cancel_event.is_set():
                         canceled = True
                         break
-                    reply_parts.append(chunk)
+                    if isinstance(chunk, StreamRetraction):
+                        # 推测流式撤回：历史只保存撤回后的文本，标记继续交给 UI/TTS
+                        apply_stream_retraction(reply_parts, chunk.chars)
+                    else:
+                        reply_parts.append(chunk)
                     yield chunk
                 if canceled:
                     # Drain the iterator to ensure internal cleanup (closing streams, avoiding
@@ -6313,19 +5719,7 @@ class MintChatAgent:
         # CoreMemory（Chroma collection）
         core_items = []
         if getattr(self, "core_memory", None) and getattr(self.core_memory, "vectorstore", None):
-            try:
-                core_data = self.core_memory.vectorstore.get(
-                    include=["documents", "metadatas", "ids"]
-                )
-            except TypeError:
-                core_data = self.core_memory.vectorstore.get()
-            ids = core_data.get("ids") or []
-            docs = core_data.get("documents") or []
-            metas = core_data.get("metadatas") or []
-        for doc_id, content, meta in zip(ids, docs, metas):
-            if not content:
-                continue
-            core_items.append({"id": str(doc_id), "content": content, "metadata": dict(meta or {})})
+            core_items = list(self.core_memory.iter_export_items())
         advanced["core_memory"] = {"count": len(core_items), "items": core_items}
 
         data["advanced_memory"] = advanced
@@ -6424,6 +5818,10 @@ class MintChatAgent:
         if optimizer_stats:
             stats["memory_optimizer"] = optimizer_stats
 
+        prefetcher = getattr(self, "_memory_prefetcher", None)
+        if prefetcher is not None:
+            stats["memory_prefetch"] = prefetcher.stats()
+
         return stats
 
     # ==================== 高级记忆管理方法 (v2.3 NEW!) ====================
@@ -6464,9 +5862,18 @@ class MintChatAgent:
         获取性能统计信息
 
         Returns:
-            Dict: 性能统计
+            Dict: 性能统计（含 `http_transport`：各 API 地址的连接池统计）
         """
-        return performance_monitor.get_all_stats()
+        stats = performance_monitor.get_all_stats()
+        try:
+            from src.utils.http_transport import get_transport_stats
+
+            transport_stats = get_transport_stats()
+        except Exception:
+            transport_stats = {}
+        if transport_stats:
+            stats["http_transport"] = transport_stats
+        return stats
 
     @staticmethod
     def print_performance_stats() -> None:
@@ -6729,6 +6136,9 @@ class MintChatAgent:
                         flush_batch = getattr(long_term, "flush_batch", None)
                         if callable(flush_batch):
                             flush_batch()
+                        close_long_term = getattr(long_term, "close", None)
+                        if callable(close_long_term):
+                            close_long_term()  # 持久化 FAISS 只读索引
                     except Exception:
                         pass
             except Exception:
@@ -6736,6 +6146,9 @@ class MintChatAgent:
 
         # 1.2 关闭复用的 AsyncLoopThread（用于同步路径跑异步逻辑）
         try:
+            prefetcher = getattr(self, "_memory_prefetcher", None)
+            if prefetcher is not None:
+                prefetcher.clear()
             loop_thread = getattr(self, "_async_loop_thread", None)
             if loop_thread is not None:
                 loop_thread.close(timeout=3.0)
@@ -6802,14 +6215,20 @@ class MintChatAgent:
                 logger.warning(f"关闭阻塞桥接执行器时出错: {e}")
             finally:
                 self._blocking_executor = None
-        # 7. 关闭工具执行线程池
-        try:
-            from src.agent.tools import tool_registry
+        session = getattr(self, "_runtime_session", None)
+        if session is not None:
+            # 只释放本会话；共享线程池与工具执行器由 shutdown_agent_runtime() 在进程退出时关闭
+            session.close()
+            self._runtime_session = None
+        else:
+            # 7. 关闭工具执行线程池
+            try:
+                from src.agent.tools import tool_registry
 
-            if hasattr(tool_registry, "close"):
-                tool_registry.close()
-        except Exception as e:
-            logger.debug("关闭工具执行器时出错（可忽略）: %s", e)
+                if hasattr(tool_registry, "close"):
+                    tool_registry.close()
+            except Exception as e:
+                logger.debug("关闭工具执行器时出错（可忽略）: %s", e)
 
         # 4. 关闭记忆检索器
         if hasattr(self, "memory_retriever") and self.memory_retriever:
@@ -6869,9 +6288,25 @@ class MintChatAgent:
                 if callable(close_fn):
                     close_fn()
             self._native_backend = None
+            # 异步 backend 绑定在各自的事件循环上：在该循环上调度 aclose()
+            backends = getattr(self, "_native_async_backends", None)
+            if backends is not None:
+                with self._native_async_backends_lock:
+                    pending = list(backends.items())
+                    backends.clear()
+                for loop, async_backend in pending:
+                    self._close_native_async_backend(loop, async_backend)
         except Exception as e:
             logger.debug("关闭 native backend 失败(可忽略): %s", e)
 
+        try:
+            native_tool_runner = getattr(self, "_native_tool_runner", None)
+            if native_tool_runner is not None:
+                native_tool_runner.close()
+            self._native_tool_runner = None
+        except Exception as e:
+            logger.debug("关闭 native 工具执行器失败(可忽略): %s", e)
+
         logger.info("Agent 资源清理完成")
 
     def get_memory_stats(self) -> Dict[str, Any]:
@@ -10,17 +10,37 @@ from collections import deque, OrderedDict
 import math
 import hashlib
 import json
+import os
 import re
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Lock
 import time
 from uuid import uuid4
-from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, TypedDict, Literal
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypedDict,
+    Literal,
+)
+
+import numpy as np
 
+from src.agent.memory_index import FAISS_AVAILABLE, FaissMemoryIndex
+from src.agent.memory_reranker import MIN_SIMILARITY, rerank, to_float_column
+from src.agent.memory_scan import RecordBatch, plan_prune
+from src.agent.memory_time_index import MemoryTimeIndex
 from src.config.settings import settings
 from src.utils.logger import get_logger
 from src.utils.chroma_helper import create_chroma_vectorstore, get_collection_count
+from src.utils.rw_lock import ReadWriteLock
+from src.utils.vector_cache import SemanticQueryCache
 
 logger = get_logger(__name__)
 
@@ -97,11 +117,12 @@ except ImportError:
     MEMORY_OPTIMIZER_AVAILABLE = False
 
 try:
-    from src.agent.memory_optimizer import CharacterConsistencyScorer
+    from src.agent.memory_optimizer import CharacterConsistencyScorer, get_character_scorer
 
     CHARACTER_SCORER_AVAILABLE = True
 except ImportError:
     CharacterConsistencyScorer = None  # type: ignore[assignment]
+    get_character_scorer = None  # type: ignore[assignment]
     CHARACTER_SCORER_AVAILABLE = False
 
 
@@ -337,8 +358,8 @@ class LongTermMemory:
         self._last_batch_flush_mono = time.monotonic()
         # 写入版本号：用于检索缓存失效（只在向量库实际写入成功后递增）
         self._write_version = 0
-        # 底层向量库（Chroma/SQLite）在并发读写下可能出现锁冲突或不稳定：用锁串行化访问更稳
-        self._vectorstore_lock = Lock()
+        # 底层向量库（Chroma/SQLite）并发写入可能出现锁冲突：检索/扫描共享读锁，写入独占写锁
+        self._vectorstore_lock = ReadWriteLock()
         # 角色一致性评分器：只在检索时使用（低开销但避免重复初始化）
         self._character_scorer = None
         # 角色一致性分数缓存：用于给历史数据（缺少字段时）做“按需回填”并避免反复计算
@@ -364,6 +385,243 @@ class LongTermMemory:
         else:
             logger.warning("长期记忆向量库初始化失败，长期记忆功能将不可用")
 
+        # 可选 FAISS 只读索引：首次检索时后台加载/构建，写入成功后增量镜像
+        self._read_index: Optional[FaissMemoryIndex] = self._create_read_index()
+        # 语义查询缓存：复用检索时已算出的查询向量，措辞不同的同义查询也能命中
+        self._query_cache: Optional[SemanticQueryCache] = self._create_query_cache()
+        # 时间侧车索引：(timestamp_unix, id) 有序表，时间范围查询二分定位后按 id 回表
+        self._time_index: Optional[MemoryTimeIndex] = self._create_time_index()
+
+    def _create_read_index(self) -> Optional[FaissMemoryIndex]:
+        agent_cfg = getattr(settings, "agent", object())
+        if not FAISS_AVAILABLE or not bool(getattr(agent_cfg, "long_term_faiss_enabled", True)):
+            return None
+        if self.vectorstore is None or not callable(getattr(self.vectorstore, "embed_query", None)):
+            return None
+        try:
+            return FaissMemoryIndex(
+                self.persist_directory.parent / f"{self.persist_directory.name}_faiss",
+                loader=self._load_read_index_batch,
+                counter=self.get_memory_count,
+                id_lister=self._list_read_index_ids,
+                min_count=int(getattr(agent_cfg, "long_term_faiss_min_count", 20000)),
+                ef_search=int(getattr(agent_cfg, "long_term_faiss_ef_search", 64)),
+            )
+        except Exception as e:
+            logger.debug("FAISS 记忆索引初始化失败，检索将使用 Chroma: %s", e)
+            return None
+
+    def _create_query_cache(self) -> Optional[SemanticQueryCache]:
+        agent_cfg = getattr(settings, "agent", object())
+        if not bool(getattr(agent_cfg, "long_term_query_cache_enabled", True)):
+            return None
+        if self.vectorstore is None or not callable(getattr(self.vectorstore, "embed_query", None)):
+            return None
+        return SemanticQueryCache(
+            max_size=int(getattr(agent_cfg, "long_term_query_cache_size", 256)),
+            similarity_threshold=float(
+                getattr(agent_cfg, "long_term_query_cache_similarity", 0.92)
+            ),
+            ttl_seconds=float(getattr(agent_cfg, "long_term_query_cache_ttl_s", 600.0)),
+        )
+
+    def _create_time_index(self) -> Optional[MemoryTimeIndex]:
+        agent_cfg = getattr(settings, "agent", object())
+        if self.vectorstore is None or not bool(
+            getattr(agent_cfg, "long_term_time_index_enabled", True)
+        ):
+            return None
+        try:
+            index = MemoryTimeIndex(
+                self.persist_directory.parent / f"{self.persist_directory.name}_time.sqlite3"
+            )
+            if not index.sync_with(get_collection_count(self.vectorstore)):
+                logger.info("长期记忆时间索引未就绪，时间范围查询将使用扫描路径（可执行重建）")
+            return index
+        except Exception as e:
+            logger.debug("长期记忆时间索引初始化失败，时间范围查询将使用扫描路径: %s", e)
+            return None
+
+    def _list_read_index_ids(self) -> List[str]:
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is None:
+            return []
+        with self._vectorstore_lock.read():
+            return [str(x) for x in collection.get(include=[]).get("ids") or []]
+
+    def _load_read_index_batch(self, offset: int, limit: int) -> Dict[str, Any]:
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is None:
+            return {}
+        with self._vectorstore_lock.read():
+            return dict(
+                collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=int(limit),
+                    offset=int(offset),
+                )
+            )
+
+    def _mirror_added_locked(self, ids: Any, metadatas: Sequence[Dict[str, Any]]) -> None:
+        """
+        将刚写入 Chroma 的记录镜像到时间索引与 FAISS 索引（调用方持有写锁）
+
+        时间索引未就绪时同样转发：重建期间由索引排队、提交前回放，否则会丢失重建窗口内的写入。
+        """
+        time_index = self._time_index
+        if time_index is not None:
+            if not ids or len(ids) != len(metadatas):
+                time_index.mark_stale()
+            else:
+                try:
+                    timestamps = to_float_column([m.get("timestamp_unix") for m in metadatas])
+                    timestamps[np.isnan(timestamps)] = time.time()
+                    time_index.upsert([str(x) for x in ids], timestamps.tolist())
+                except Exception as e:
+                    logger.debug("时间索引增量维护失败，将回退扫描路径: %s", e)
+                    time_index.mark_stale()
+
+        index = self._read_index
+        if index is None or not index.active:
+            return
+        if not ids:
+            # 向量库未返回 id：无法增量镜像，标记失效后台重建
+            index.invalidate(self._write_version)
+            return
+        try:
+            chunk = self.vectorstore.get(
+                ids=list(ids), include=["embeddings", "documents", "metadatas"]
+            )
+            index.add(
+                [str(x) for x in chunk.get("ids") or []],
+                chunk.get("embeddings"),
+                [str(x or "") for x in chunk.get("documents") or []],
+                [dict(x or {}) for x in chunk.get("metadatas") or []],
+                version=self._write_version,
+            )
+        except Exception as e:
+            logger.debug("FAISS 记忆索引增量镜像失败，将重建: %s", e)
+            index.invalidate(self._write_version)
+
+    def _unindex_times_locked(self, ids: Sequence[str]) -> None:
+        time_index = self._time_index
+        if time_index is None:
+            return
+        try:
+            time_index.remove(ids)
+        except Exception as e:
+            logger.debug("时间索引删除失败，将回退扫描路径: %s", e)
+            time_index.mark_stale()
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """计算查询向量（仅在语义缓存/FAISS 索引需要时；失败返回 None，由 Chroma 按文本检索）。"""
+        if self._query_cache is None and self._read_index is None:
+            return None
+        embed = getattr(self.vectorstore, "embed_query", None)
+        if not callable(embed):
+            return None
+        try:
+            embedding = embed(query)
+        except Exception as e:
+            logger.debug("查询向量计算失败: %s", e)
+            return None
+        return list(embedding) if embedding is not None and len(embedding) else None
+
+    def _similarity_search(
+        self,
+        query: str,
+        k: int,
+        filter_dict: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[tuple[Any, float]]:
+        """相似度检索：FAISS 快照与 Chroma 同版本时无锁读取，否则回退 Chroma。"""
+        search_by_vector = getattr(self.vectorstore, "similarity_search_by_vector_with_score", None)
+        index = self._read_index
+        if index is not None:
+            version = self._write_version
+            index.ensure_started(version)
+            stale = False
+            if index.ready and index.version != version:
+                # 写入在锁内完成镜像：持锁复核，排除“写入进行中”的瞬时不一致
+                with self._vectorstore_lock.read():
+                    version = self._write_version
+                    stale = index.version != version
+                if stale:
+                    # 存在未镜像的写入：后台重建，本次回退 Chroma
+                    index.invalidate(version)
+            if index.ready and not stale:
+                if query_embedding is None:
+                    query_embedding = self.vectorstore.embed_query(query)
+                if not query_embedding:
+                    return []
+                results = index.search(query_embedding, k, filter_dict)
+                if results is not None:
+                    return results
+
+        if query_embedding is not None and callable(search_by_vector):
+            with self._vectorstore_lock.read():
+                return search_by_vector(query_embedding, k=k, filter=filter_dict)
+
+        with self._vectorstore_lock.read():
+            return self.vectorstore.similarity_search_with_score(
+                query=query,
+                k=k,
+                filter=filter_dict,
+            )
+
+    def lock_stats(self) -> Optional[Dict[str, Any]]:
+        """向量库读写锁的等待耗时直方图（用于观察检索与写入/扫描之间的竞争）。"""
+        stats = getattr(self._vectorstore_lock, "stats", None)
+        return stats() if callable(stats) else None
+
+    def query_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """语义查询缓存统计（命中率/淘汰/失效；未启用时返回 None）。"""
+        cache = self._query_cache
+        return cache.get_stats() if cache is not None else None
+
+    def time_index_stats(self) -> Optional[Dict[str, Any]]:
+        """时间侧车索引状态（未启用时返回 None）。"""
+        index = self._time_index
+        return index.stats() if index is not None else None
+
+    def rebuild_time_index(self, batch_size: int = 500) -> int:
+        """
+        从向量库全量重建时间侧车索引（旧库首次启用/索引失效时执行）
+
+        分页扫描期间不阻塞检索与写入（写入在重建提交前回放）；缺失时间戳的记录按当前时间入索引，
+        与扫描路径的回填规则一致。
+
+        Returns:
+            int: 索引条数（未启用时间索引时返回 0）
+        """
+        index = self._time_index
+        if index is None or self.vectorstore is None:
+            return 0
+        try:
+            self.flush_batch()
+        except Exception as e:
+            logger.debug("重建时间索引前刷新批量缓冲区失败（可忽略）: %s", e)
+
+        now_unix = time.time()
+
+        def _columns() -> Iterator[tuple[List[str], List[float]]]:
+            for batch in self.iter_record_batches(include=("metadatas",), batch_size=batch_size):
+                ts = np.where(np.isnan(batch.timestamp_unix), now_unix, batch.timestamp_unix)
+                yield batch.ids, ts.tolist()
+
+        return index.rebuild(_columns())
+
+    def read_index_stats(self) -> Optional[Dict[str, Any]]:
+        """FAISS 只读索引状态（未启用时返回 None）。"""
+        index = self._read_index
+        return index.stats() if index is not None else None
+
+    def close(self) -> None:
+        """持久化 FAISS 只读索引（Chroma 自动持久化，无需处理）。"""
+        index = self._read_index
+        if index is not None:
+            index.close()
+
     def add_memory(
         self,
         content: str,
@@ -416,12 +674,13 @@ class LongTermMemory:
             return True
 
         try:
-            with self._vectorstore_lock:
-                self.vectorstore.add_texts(
+            with self._vectorstore_lock.write():
+                added_ids = self.vectorstore.add_texts(
                     texts=[content],
                     metadatas=[metadata],
                 )
                 self._write_version += 1
+                self._mirror_added_locked(added_ids, [metadata])
 
             # v2.26.0: ChromaDB 0.4.0+ 自动持久化，无需手动调用 persist()
             # ChromaDB 会自动将所有写入操作持久化到磁盘
@@ -473,12 +732,13 @@ class LongTermMemory:
             meta.setdefault("content_hash", self._compute_content_hash(text))
 
         try:
-            with self._vectorstore_lock:
-                self.vectorstore.add_texts(
+            with self._vectorstore_lock.write():
+                added_ids = self.vectorstore.add_texts(
                     texts=texts,
                     metadatas=metadata_list,
                 )
                 self._write_version += len(texts)
+                self._mirror_added_locked(added_ids, metadata_list)
             logger.info("批量添加了 %d 条记忆", len(texts))
             return len(texts)
         except Exception as e:
@@ -509,12 +769,13 @@ class LongTermMemory:
             contents = [item["content"] for item in buffer_to_flush]
             metadatas = [item["metadata"] for item in buffer_to_flush]
 
-            with self._vectorstore_lock:
-                self.vectorstore.add_texts(
+            with self._vectorstore_lock.write():
+                added_ids = self.vectorstore.add_texts(
                     texts=contents,
                     metadatas=metadatas,
                 )
                 self._write_version += len(buffer_to_flush)
+                self._mirror_added_locked(added_ids, metadatas)
 
             # v2.26.0: ChromaDB 0.4.0+ 自动持久化，无需手动调用 persist()
             # ChromaDB 会自动将所有写入操作持久化到磁盘
@@ -575,86 +836,197 @@ class LongTermMemory:
         except Exception as e:
             logger.debug("导出前刷新批量缓冲区失败（可忽略）: %s", e)
 
-        try:
-            collection = getattr(self.vectorstore, "_collection", None)
-            if collection is None:
-                logger.warning("长期记忆向量库不支持导出（缺少 _collection）")
-                return {"collection_name": self.collection_name, "count": 0, "items": []}
-
-            with self._vectorstore_lock:
-                total = int(collection.count())
-            # Chroma get() always returns ids; don't include "ids" (strict include validation).
-            include = ["documents", "metadatas"]
-            if include_embeddings:
-                include.append("embeddings")
-
-            items: List[Dict[str, Any]] = []
-            batch_size = max(1, int(batch_size))
-            now_unix = time.time()
-
-            for offset in range(0, total, batch_size):
-                with self._vectorstore_lock:
-                    chunk = collection.get(
-                        include=include,
-                        limit=batch_size,
-                        offset=offset,
-                    )
+        if getattr(self.vectorstore, "_collection", None) is None:
+            logger.warning("长期记忆向量库不支持导出（缺少 _collection）")
+            return {"collection_name": self.collection_name, "count": 0, "items": []}
 
-                ids = chunk.get("ids") or []
-                documents = chunk.get("documents") or []
-                metadatas = chunk.get("metadatas") or []
-
-                for doc_id, content, metadata in zip(ids, documents, metadatas):
-                    if not content:
-                        continue
-                    meta = dict(metadata or {})
-                    meta.setdefault("content_hash", self._compute_content_hash(content))
-                    self._ensure_timestamp_unix(meta, fallback_unix=now_unix)
-                    items.append(
-                        {
-                            "id": str(doc_id),
-                            "content": content,
-                            "metadata": meta,
-                        }
-                    )
+        # Chroma get() always returns ids; don't include "ids" (strict include validation).
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
 
-            return {
-                "collection_name": self.collection_name,
-                "count": total,
-                "items": items,
-            }
-        except TypeError:
-            # 兼容少数旧版 chromadb：get() 不支持 offset/limit
-            try:
-                collection = getattr(self.vectorstore, "_collection", None)
-                if collection is None:
-                    return {"collection_name": self.collection_name, "count": 0, "items": []}
-                with self._vectorstore_lock:
-                    chunk = collection.get(include=["documents", "metadatas", "ids"])
-                ids = chunk.get("ids") or []
-                documents = chunk.get("documents") or []
-                metadatas = chunk.get("metadatas") or []
-                items = []
-                now_unix = time.time()
-                for doc_id, content, metadata in zip(ids, documents, metadatas):
-                    if not content:
-                        continue
-                    meta = dict(metadata or {})
-                    meta.setdefault("content_hash", self._compute_content_hash(content))
-                    self._ensure_timestamp_unix(meta, fallback_unix=now_unix)
-                    items.append({"id": str(doc_id), "content": content, "metadata": meta})
-                return {
-                    "collection_name": self.collection_name,
-                    "count": len(items),
-                    "items": items,
-                }
-            except Exception as e:
-                logger.warning("导出长期记忆失败（兼容路径）: %s", e)
-                return {"collection_name": self.collection_name, "count": 0, "items": []}
+        items: List[Dict[str, Any]] = []
+        total = 0
+        now_unix = time.time()
+        try:
+            for batch in self.iter_record_batches(include=include, batch_size=batch_size):
+                total += len(batch)
+                for doc_id, content, meta in zip(batch.ids, batch.documents or [], batch.metadatas):
+                    item = self._export_item(doc_id, content, meta, now_unix=now_unix)
+                    if item is not None:
+                        items.append(item)
         except Exception as e:
             logger.exception("导出长期记忆失败: %s", e)
             return {"collection_name": self.collection_name, "count": 0, "items": []}
 
+        return {
+            "collection_name": self.collection_name,
+            "count": total,
+            "items": items,
+        }
+
+    def iter_export_items(self, *, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        逐条产出导出记录（与 export_records()["items"] 同构），按页读取，内存占用与总量无关
+
+        供用户数据归档等流式导出使用。
+
+        Yields:
+            Dict[str, Any]: {"id": str, "content": str, "metadata": dict}
+        """
+        if self.vectorstore is None:
+            return
+        try:
+            self.flush_batch()
+        except Exception as e:
+            logger.debug("导出前刷新批量缓冲区失败（可忽略）: %s", e)
+
+        now_unix = time.time()
+        for batch in self.iter_record_batches(
+            include=("documents", "metadatas"), batch_size=batch_size
+        ):
+            for doc_id, content, meta in zip(batch.ids, batch.documents or [], batch.metadatas):
+                item = self._export_item(doc_id, content, meta, now_unix=now_unix)
+                if item is not None:
+                    yield item
+
+    def export_jsonl(
+        self,
+        path: Path | str,
+        *,
+        include_embeddings: bool = False,
+        batch_size: int = 500,
+    ) -> Dict[str, Any]:
+        """
+        流式导出长期记忆到 JSONL（每行一条 {"id", "content", "metadata"}，内存占用与总量无关）
+
+        先写入临时文件，完成后原子替换目标文件；失败时不会留下半截文件。
+
+        Args:
+            path: 输出文件路径
+            include_embeddings: 是否同时导出向量（写入 "embedding" 字段）
+            batch_size: 每页读取条数（页与页之间释放读锁）
+
+        Returns:
+            Dict[str, Any]: {"path": str, "count": 写入条数, "scanned": 扫描条数}
+        """
+        target = Path(path)
+        if self.vectorstore is None:
+            return {"path": str(target), "count": 0, "scanned": 0}
+
+        try:
+            self.flush_batch()
+        except Exception as e:
+            logger.debug("导出前刷新批量缓冲区失败（可忽略）: %s", e)
+
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + ".tmp")
+        written = 0
+        scanned = 0
+        now_unix = time.time()
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for batch in self.iter_record_batches(include=include, batch_size=batch_size):
+                    scanned += len(batch)
+                    documents = batch.documents or []
+                    embeddings = batch.embeddings if include_embeddings else None
+                    lines: List[str] = []
+                    for i, (doc_id, content, meta) in enumerate(
+                        zip(batch.ids, documents, batch.metadatas)
+                    ):
+                        item = self._export_item(doc_id, content, meta, now_unix=now_unix)
+                        if item is None:
+                            continue
+                        if embeddings is not None and i < len(embeddings):
+                            item["embedding"] = [float(x) for x in embeddings[i]]
+                        lines.append(json.dumps(item, ensure_ascii=False, default=str))
+                    if lines:
+                        f.write("\n".join(lines))
+                        f.write("\n")
+                        written += len(lines)
+            os.replace(tmp_path, target)
+        except Exception:
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            raise
+
+        logger.info("长期记忆已流式导出: %s (%d 条)", target, written)
+        return {"path": str(target), "count": written, "scanned": scanned}
+
+    def _export_item(
+        self,
+        doc_id: str,
+        content: Any,
+        metadata: Dict[str, Any],
+        *,
+        now_unix: float,
+    ) -> Optional[Dict[str, Any]]:
+        if not content:
+            return None
+        meta = dict(metadata or {})
+        meta.setdefault("content_hash", self._compute_content_hash(content))
+        self._ensure_timestamp_unix(meta, fallback_unix=now_unix)
+        return {"id": str(doc_id), "content": content, "metadata": meta}
+
+    def iter_record_batches(
+        self,
+        *,
+        include: Sequence[str] = ("metadatas",),
+        batch_size: int = 500,
+    ) -> Iterator[RecordBatch]:
+        """
+        流式分页扫描长期记忆，按页产出列式记录批次
+
+        每页只在读锁内执行一次 `collection.get()`，批次交给调用方处理时锁已释放，
+        长时间扫描不会阻塞检索，写入最多等待一页。
+
+        Args:
+            include: 需要读取的字段（"documents" / "metadatas" / "embeddings"）
+            batch_size: 每页条数
+
+        Yields:
+            RecordBatch: 一页记录（importance / timestamp_unix 已转换为 NumPy 列）
+        """
+        if self.vectorstore is None:
+            return
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is None or not hasattr(collection, "get"):
+            return
+        # Chroma get() always returns ids; don't include "ids" (strict include validation).
+        include = [field for field in include if field != "ids"]
+        step = max(1, int(batch_size))
+
+        if not hasattr(collection, "count"):
+            with self._vectorstore_lock.read():
+                chunk = collection.get(include=include)
+            yield RecordBatch.from_chunk(chunk, self._parse_timestamp_to_unix)
+            return
+
+        with self._vectorstore_lock.read():
+            total = int(collection.count())
+        for offset in range(0, total, step):
+            try:
+                with self._vectorstore_lock.read():
+                    chunk = collection.get(include=include, limit=step, offset=offset)
+            except TypeError:
+                if offset:
+                    raise
+                # 兼容少数旧版 chromadb：get() 不支持 offset/limit
+                with self._vectorstore_lock.read():
+                    chunk = collection.get(include=include)
+                yield RecordBatch.from_chunk(chunk, self._parse_timestamp_to_unix)
+                return
+            batch = RecordBatch.from_chunk(chunk, self._parse_timestamp_to_unix)
+            if not batch:
+                return
+            yield batch
+
     def import_records(
         self,
         records: Sequence[Dict[str, Any]],
@@ -724,20 +1096,21 @@ class LongTermMemory:
             chunk_texts = texts[idx : idx + batch_size]
             chunk_metas = metadatas[idx : idx + batch_size]
             try:
-                with self._vectorstore_lock:
+                with self._vectorstore_lock.write():
                     if overwrite:
                         chunk_ids = ids[idx : idx + batch_size]
-                        self.vectorstore.add_texts(
+                        added_ids = self.vectorstore.add_texts(
                             texts=chunk_texts,
                             metadatas=chunk_metas,
                             ids=chunk_ids,
                         )
                     else:
-                        self.vectorstore.add_texts(
+                        added_ids = self.vectorstore.add_texts(
                             texts=chunk_texts,
                             metadatas=chunk_metas,
                         )
                     self._write_version += len(chunk_texts)
+                    self._mirror_added_locked(added_ids, chunk_metas)
                 imported += len(chunk_texts)
             except Exception as e:
                 logger.warning("导入长期记忆批次失败（idx=%d）: %s", idx, e)
@@ -793,73 +1166,21 @@ class LongTermMemory:
         now_unix = time.time()
         preserve_importance_above = min(1.0, max(0.0, float(preserve_importance_above)))
 
-        protected_ids: set[str] = set()
-        ids_to_delete: set[str] = set()
-        candidates: list[tuple[str, Optional[float], float]] = []
-        total_before = 0
-
         cutoff_unix: Optional[float] = None
         if max_age_days is not None:
             max_age_days = max(0, int(max_age_days))
             cutoff_unix = now_unix - float(max_age_days) * 86400.0
 
-        def _iter_id_meta() -> Iterable[tuple[str, Dict[str, Any]]]:
-            # Chroma get() always returns ids; don't include "ids" (strict include validation).
-            include = ["metadatas"]
-            try:
-                with self._vectorstore_lock:
-                    total = int(collection.count())
-                step = max(1, int(batch_size))
-                for offset in range(0, total, step):
-                    with self._vectorstore_lock:
-                        chunk = collection.get(include=include, limit=step, offset=offset)
-                    ids = chunk.get("ids") or []
-                    metadatas = chunk.get("metadatas") or []
-                    for doc_id, meta in zip(ids, metadatas):
-                        yield str(doc_id), dict(meta or {})
-            except TypeError:
-                with self._vectorstore_lock:
-                    chunk = collection.get(include=include)
-                ids = chunk.get("ids") or []
-                metadatas = chunk.get("metadatas") or []
-                for doc_id, meta in zip(ids, metadatas):
-                    yield str(doc_id), dict(meta or {})
-
-        for doc_id, meta in _iter_id_meta():
-            if not doc_id:
-                continue
-            total_before += 1
-
-            importance = float(meta.get("importance", 0.5) or 0.5)
-            is_protected = importance >= preserve_importance_above
-            if is_protected:
-                protected_ids.add(doc_id)
-
-            ts_unix: Optional[float] = None
-            ts_unix_raw = meta.get("timestamp_unix")
-            if isinstance(ts_unix_raw, (int, float)):
-                ts_unix = float(ts_unix_raw)
-            elif isinstance(ts_unix_raw, str):
-                try:
-                    ts_unix = float(ts_unix_raw)
-                except ValueError:
-                    ts_unix = None
-
-            if ts_unix is None:
-                ts = meta.get("timestamp")
-                if isinstance(ts, str) and ts:
-                    ts_unix = self._parse_timestamp_to_unix(ts)
-
-            # 1) 按年龄裁剪（仅删除低重要性）
-            if (cutoff_unix is not None) and (not is_protected):
-                if ts_unix is not None and ts_unix < cutoff_unix:
-                    ids_to_delete.add(doc_id)
-                    continue
-
-            # 2) 按数量裁剪（保护高重要性）
-            if max_items is not None and not is_protected:
-                candidates.append((doc_id, ts_unix, importance))
+        # 流式扫描：每页只保留 ids 与 importance/timestamp 两列，最后一次向量化决策
+        all_ids: List[str] = []
+        importance_parts: List[np.ndarray] = []
+        timestamp_parts: List[np.ndarray] = []
+        for batch in self.iter_record_batches(include=("metadatas",), batch_size=batch_size):
+            all_ids.extend(batch.ids)
+            importance_parts.append(batch.importance)
+            timestamp_parts.append(batch.timestamp_unix)
 
+        total_before = len(all_ids)
         if total_before == 0:
             return {
                 "dry_run": dry_run,
@@ -869,25 +1190,15 @@ class LongTermMemory:
                 "would_delete_ids": [],
             }
 
-        if max_items is not None:
-            import heapq
-
-            max_items = max(0, int(max_items))
-            protected_count = len(protected_ids)
-            allowance = max(max_items - protected_count, 0)
-
-            def _sort_key(item_tuple: tuple[str, Optional[float], float]) -> tuple[float, float]:
-                _, ts_unix, importance = item_tuple
-                return (importance, float(ts_unix or 0.0))
-
-            if allowance == 0:
-                ids_to_delete.update({doc_id for doc_id, _, _ in candidates})
-            elif candidates:
-                keep = heapq.nlargest(allowance, candidates, key=_sort_key)
-                keep_ids = {doc_id for doc_id, _, _ in keep}
-                for doc_id, _, _ in candidates:
-                    if doc_id not in keep_ids:
-                        ids_to_delete.add(doc_id)
+        protected_mask, delete_mask = plan_prune(
+            np.concatenate(importance_parts),
+            np.concatenate(timestamp_parts),
+            preserve_importance_above=preserve_importance_above,
+            cutoff_unix=cutoff_unix,
+            max_items=max_items,
+        )
+        ids_to_delete = [all_ids[i] for i in np.flatnonzero(delete_mask).tolist()]
+        protected_count = int(protected_mask.sum())
 
         # 真正删除（分批，避免一次性 ids 过多）
         deleted = 0
@@ -896,19 +1207,21 @@ class LongTermMemory:
             if collection is None or not hasattr(collection, "delete"):
                 logger.warning("长期记忆向量库不支持 delete，无法执行 prune")
             else:
-                delete_ids = list(ids_to_delete)
-                for offset in range(0, len(delete_ids), batch_size):
-                    chunk = delete_ids[offset : offset + batch_size]
-                    with self._vectorstore_lock:
+                for offset in range(0, len(ids_to_delete), batch_size):
+                    chunk = ids_to_delete[offset : offset + batch_size]
+                    with self._vectorstore_lock.write():
                         collection.delete(ids=chunk)
                         self._write_version += 1  # 删除也会改变检索结果，触发缓存失效
+                        if self._read_index is not None:
+                            self._read_index.remove(chunk, version=self._write_version)
+                        self._unindex_times_locked(chunk)
                     deleted += len(chunk)
 
         return {
             "dry_run": dry_run,
             "total_before": total_before,
             "deleted": deleted if not dry_run else 0,
-            "protected": len(protected_ids),
+            "protected": protected_count,
             "would_delete": len(ids_to_delete),
             "would_delete_ids": sorted(ids_to_delete)[:200],
         }
@@ -976,12 +1289,21 @@ class LongTermMemory:
             if ts_unix > heap[0][0]:
                 heapq.heapreplace(heap, (ts_unix, content, meta))
 
+        time_index = getattr(self, "_time_index", None)
+        if time_index is not None and time_index.ready:
+            try:
+                return self._get_time_range_indexed(
+                    time_index, start_unix_f, end_unix_f, limit, include=include
+                )
+            except Exception as e:
+                logger.debug("时间索引查询失败，回退扫描路径: %s", e)
+
         chunk: Optional[Dict[str, Any]] = None
         # Prefer server-side filtering when available.
         # Fallback scan handles stores/records missing numeric timestamp_unix.
         try:
             where = {"timestamp_unix": {"$gte": start_unix_f, "$lte": end_unix_f}}
-            with self._vectorstore_lock:
+            with self._vectorstore_lock.read():
                 chunk = collection.get(where=where, include=include)
         except Exception:
             chunk = None
@@ -996,36 +1318,54 @@ class LongTermMemory:
             # Fallback scan: handle stores that don't support where filtering,
             # or records missing timestamp_unix.
             if not has_any:
-                include_all = include
-                if hasattr(collection, "count"):
-                    try:
-                        with self._vectorstore_lock:
-                            total = int(collection.count())
-                        for offset in range(0, total, batch_size):
-                            with self._vectorstore_lock:
-                                part = collection.get(
-                                    include=include_all,
-                                    limit=batch_size,
-                                    offset=offset,
-                                )
-                            for content, meta in _iter_chunk(part):
-                                _maybe_add(content, meta)
-                    except TypeError:
-                        with self._vectorstore_lock:
-                            part = collection.get(include=include_all)
-                        for content, meta in _iter_chunk(part):
-                            _maybe_add(content, meta)
-                else:
-                    with self._vectorstore_lock:
-                        part = collection.get(include=include_all)
-                    for content, meta in _iter_chunk(part):
-                        _maybe_add(content, meta)
+                for batch in self.iter_record_batches(include=include, batch_size=batch_size):
+                    documents = batch.documents or []
+                    # 缺失时间戳的记录按“现在”处理（与 _ensure_timestamp_unix 的回填一致）
+                    ts = np.where(np.isnan(batch.timestamp_unix), now_unix, batch.timestamp_unix)
+                    in_range = (ts >= start_unix_f) & (ts <= end_unix_f)
+                    for i in np.flatnonzero(in_range).tolist():
+                        if i < len(documents) and documents[i]:
+                            _maybe_add(str(documents[i]), batch.metadatas[i])
         except Exception:
             return []
 
         heap.sort(key=lambda item: item[0], reverse=True)
         return [{"content": content, "metadata": meta} for _, content, meta in heap]
 
+    def _get_time_range_indexed(
+        self,
+        time_index: MemoryTimeIndex,
+        start_unix: float,
+        end_unix: float,
+        limit: int,
+        *,
+        include: List[str],
+    ) -> List[Dict[str, Any]]:
+        """时间索引二分定位最新的 limit 条 id，再按 id 回表（同一读锁内，避免与写入交错）。"""
+        with self._vectorstore_lock.read():
+            hits = time_index.query(start_unix, end_unix, limit)
+            if not hits:
+                return []
+            chunk = self.vectorstore.get(ids=[doc_id for doc_id, _ in hits], include=include)
+
+        by_id: Dict[str, tuple[str, Dict[str, Any]]] = {}
+        for doc_id, content, metadata in zip(
+            chunk.get("ids") or [], chunk.get("documents") or [], chunk.get("metadatas") or []
+        ):
+            if content:
+                by_id[str(doc_id)] = (str(content), dict(metadata or {}))
+
+        results: List[Dict[str, Any]] = []
+        for doc_id, ts_unix in hits:
+            found = by_id.get(doc_id)
+            if found is None:
+                continue
+            content, meta = found
+            meta.setdefault("content_hash", self._compute_content_hash(content))
+            meta.setdefault("timestamp_unix", ts_unix)
+            results.append({"content": content, "metadata": meta})
+        return results
+
     def search_memories(
         self,
         query: str,
@@ -1048,8 +1388,11 @@ class LongTermMemory:
             return []
 
         try:
-            # v3.3: 增加检索数量，后续重排序
-            search_k = min(k * 3, 20)  # 检索3倍数量，最多20条
+            # 扩大候选池后统一做列式重排序（候选数可配置，至少为 k）
+            candidates = int(
+                getattr(getattr(settings, "agent", object()), "long_term_rerank_candidates", 60)
+            )
+            search_k = max(int(k), candidates)
 
             character_weight = float(
                 getattr(
@@ -1072,37 +1415,40 @@ class LongTermMemory:
                 scorer = getattr(self, "_character_scorer", None)
                 if scorer is None:
                     try:
-                        scorer = CharacterConsistencyScorer()
+                        scorer = get_character_scorer()
                         self._character_scorer = scorer
                     except Exception as e:
                         logger.debug("角色一致性评分器初始化失败: %s", e)
                         scorer = None
                 scorer_version = getattr(CharacterConsistencyScorer, "SCORER_VERSION", None)
 
-            with self._vectorstore_lock:
-                results = self.vectorstore.similarity_search_with_score(
-                    query=query,
-                    k=search_k,
-                    filter=filter_dict,
+            version = self._write_version
+            query_embedding = self._embed_query(query)
+            query_cache = self._query_cache
+            cache_scope: Optional[tuple] = None
+            if query_cache is not None and query_embedding is not None:
+                filter_key = (
+                    json.dumps(filter_dict, sort_keys=True, default=str) if filter_dict else ""
                 )
-
-            now_unix = time.time()
-            memories = []
-            for doc, score in results:
+                cache_scope = (int(k), filter_key)
+                cached = query_cache.get(query_embedding, scope=cache_scope, version=version)
+                if cached is not None:
+                    return [dict(mem, metadata=dict(mem["metadata"])) for mem in cached]
+
+            results = self._similarity_search(query, search_k, filter_dict, query_embedding)
+            if not results:
+                return []
+
+            # 列式整理候选：只做一次元数据遍历，评分统一交给向量化重排序
+            docs = [doc for doc, _ in results]
+            metadatas: List[Dict[str, Any]] = []
+            timestamps: List[Optional[float]] = []
+            for doc in docs:
                 metadata = dict(getattr(doc, "metadata", None) or {})
                 metadata.setdefault(
                     "content_hash",
                     self._compute_content_hash(doc.page_content),
                 )
-                # v3.3: 计算相似度（ChromaDB的score越小越相似）
-                similarity = 1.0 / (1.0 + score)  # 转换为0-1之间的相似度
-
-                # v3.3: 应用相似度阈值过滤
-                if similarity < 0.3:  # 过滤低相关性记忆
-                    continue
-
-                # v3.3: 时间衰减（最近的记忆更重要）
-                recency_score = 1.0
                 mem_ts_unix: Optional[float] = None
                 ts_unix_raw = metadata.get("timestamp_unix")
                 if isinstance(ts_unix_raw, (int, float)):
@@ -1123,108 +1469,119 @@ class LongTermMemory:
                             metadata["timestamp_unix"] = mem_ts_unix
                         else:
                             logger.debug("解析时间戳失败: %s", timestamp)
-                            mem_ts_unix = None
+                metadatas.append(metadata)
+                timestamps.append(mem_ts_unix)
 
-                if mem_ts_unix is not None:
-                    age_days = max(0.0, (now_unix - mem_ts_unix) / 86400.0)
-                    # 30天内的记忆不衰减，之后逐渐衰减
-                    if age_days > 30:
-                        recency_score = max(0.5, 1.0 - (age_days - 30) / 365.0)
-                    else:
-                        recency_score = 1.0
-
-                # v3.3: 重要性加权
-                importance = metadata.get("importance", 0.5)
-
-                character_consistency = 0.5
-                use_character_weight = False
-                existing = metadata.get("character_consistency")
-                if isinstance(existing, (int, float)) and 0.0 <= float(existing) <= 1.0:
-                    character_consistency = float(existing)
-                    use_character_weight = character_weight > 0.0
-
-                if scorer is not None and character_weight > 0.0:
-                    existing_version = metadata.get("character_consistency_version")
-                    needs_rescore = (
-                        not isinstance(existing, (int, float))
-                        or not (0.0 <= float(existing) <= 1.0)
-                        or (scorer_version is not None and existing_version != scorer_version)
-                    )
-                    content_hash = metadata.get("content_hash")
-                    cache_version = int(scorer_version or 0)
-                    if needs_rescore and isinstance(content_hash, str) and content_hash:
-                        with self._character_score_cache_lock:
-                            cached = self._character_score_cache.get(content_hash)
+            distances = np.fromiter((float(score) for _, score in results), dtype=np.float64)
+            ts_column = np.array(
+                [ts if ts is not None else np.nan for ts in timestamps], dtype=np.float64
+            )
+            importance_column = to_float_column(
+                [meta.get("importance", 0.5) for meta in metadatas], default=0.5
+            )
+            raw_consistency = to_float_column(
+                [meta.get("character_consistency") for meta in metadatas]
+            )
+            has_consistency = (raw_consistency >= 0.0) & (raw_consistency <= 1.0)
+            consistency_column = np.where(has_consistency, raw_consistency, 0.5)
+            character_mask = has_consistency.copy()
+
+            if scorer is not None and character_weight > 0.0:
+                # 只为通过相似度阈值的候选补算角色一致性（缓存查找/回填各加锁一次）
+                eligible = (1.0 / (1.0 + distances)) >= MIN_SIMILARITY
+                cache_version = int(scorer_version or 0)
+                pending: List[int] = []
+                for i in np.flatnonzero(eligible).tolist():
+                    existing_version = metadatas[i].get("character_consistency_version")
+                    if not has_consistency[i] or (
+                        scorer_version is not None and existing_version != scorer_version
+                    ):
+                        pending.append(i)
+
+                rescore: List[int] = []
+                if pending:
+                    with self._character_score_cache_lock:
+                        for i in pending:
+                            content_hash = metadatas[i].get("content_hash")
+                            cached = (
+                                self._character_score_cache.get(content_hash)
+                                if isinstance(content_hash, str) and content_hash
+                                else None
+                            )
                             if cached is not None and cached[1] == cache_version:
-                                cached_score = float(cached[0])
-                                character_consistency = float(min(max(cached_score, 0.0), 1.0))
-                                metadata["character_consistency"] = character_consistency
-                                # Cache hit: keep `existing` in sync.
-                                existing = character_consistency
+                                consistency_column[i] = min(max(float(cached[0]), 0.0), 1.0)
+                                metadatas[i]["character_consistency"] = float(consistency_column[i])
                                 if cache_version:
-                                    metadata["character_consistency_version"] = cache_version
+                                    metadatas[i]["character_consistency_version"] = cache_version
                                 self._character_score_cache.move_to_end(content_hash)
-                                needs_rescore = False
+                            else:
+                                rescore.append(i)
 
-                    if needs_rescore:
-                        try:
-                            character_consistency = float(
-                                scorer.score_character_consistency(doc.page_content)
-                            )
-                            metadata["character_consistency"] = character_consistency
-                            if scorer_version is not None:
-                                metadata["character_consistency_version"] = int(scorer_version)
-                            if isinstance(content_hash, str) and content_hash:
-                                with self._character_score_cache_lock:
-                                    self._character_score_cache[content_hash] = (
-                                        float(min(max(character_consistency, 0.0), 1.0)),
-                                        cache_version,
-                                    )
-                                    self._character_score_cache.move_to_end(content_hash)
-                                    while (
-                                        len(self._character_score_cache)
-                                        > self._character_score_cache_max
-                                    ):
-                                        self._character_score_cache.popitem(last=False)
-                        except Exception as e:
-                            logger.debug("角色一致性评分失败: %s", e)
-                            character_consistency = 0.5
-                    else:
-                        if isinstance(existing, (int, float)):
-                            character_consistency = float(existing)
-                    character_consistency = float(min(max(character_consistency, 0.0), 1.0))
-                    use_character_weight = True
-
-                # v3.3: 综合评分 = 相似度(60%) + 时间性(20%) + 重要性(20%) + 角色一致性(可配权重)
-                numerator = similarity * 0.6 + recency_score * 0.2 + float(importance) * 0.2
-                denom = 1.0
-                if use_character_weight:
-                    numerator += character_consistency * character_weight
-                    denom += character_weight
-                final_score = numerator / denom
+                fresh_scores: List[tuple[str, float]] = []
+                for i in rescore:
+                    try:
+                        value = float(scorer.score_character_consistency(docs[i].page_content))
+                        metadatas[i]["character_consistency"] = value
+                        if scorer_version is not None:
+                            metadatas[i]["character_consistency_version"] = int(scorer_version)
+                        consistency_column[i] = value
+                        content_hash = metadatas[i].get("content_hash")
+                        if isinstance(content_hash, str) and content_hash:
+                            fresh_scores.append((content_hash, float(min(max(value, 0.0), 1.0))))
+                    except Exception as e:
+                        logger.debug("角色一致性评分失败: %s", e)
+                        consistency_column[i] = 0.5
+
+                if fresh_scores:
+                    with self._character_score_cache_lock:
+                        for content_hash, value in fresh_scores:
+                            self._character_score_cache[content_hash] = (value, cache_version)
+                            self._character_score_cache.move_to_end(content_hash)
+                        while len(self._character_score_cache) > self._character_score_cache_max:
+                            self._character_score_cache.popitem(last=False)
+
+                consistency_column = np.clip(consistency_column, 0.0, 1.0)
+                character_mask[:] = True
+
+            ranked = rerank(
+                distances,
+                ts_column,
+                importance_column,
+                consistency_column,
+                k=k,
+                now_unix=time.time(),
+                character_weight=character_weight,
+                character_mask=character_mask,
+            )
 
+            memories = []
+            for pos, i in enumerate(ranked.order.tolist()):
+                metadata = metadatas[i]
                 memories.append(
                     {
-                        "content": doc.page_content,
+                        "content": docs[i].page_content,
                         "metadata": metadata,
-                        "score": score,  # 原始分数
-                        "similarity": similarity,  # 相似度
-                        "recency_score": recency_score,  # 时间性
-                        "importance": importance,  # 重要性
-                        "character_consistency": character_consistency,  # 角色一致性
-                        "final_score": final_score,  # 综合评分
+                        "score": results[i][1],  # 原始分数
+                        "similarity": float(ranked.similarity[pos]),  # 相似度
+                        "recency_score": float(ranked.recency[pos]),  # 时间性
+                        "importance": metadata.get("importance", 0.5),  # 重要性
+                        "character_consistency": float(consistency_column[i]),  # 角色一致性
+                        "final_score": float(ranked.final_score[pos]),  # 综合评分
                     }
                 )
 
-            # v3.3: 按综合评分排序，返回top-k
-            memories.sort(key=lambda x: x["final_score"], reverse=True)
-            memories = memories[:k]
-
             logger.debug(
                 "搜索到 %d 条相关记忆（从%d条中筛选）",
                 len(memories),
                 len(results),
             )
+            if cache_scope is not None and query_cache is not None:
+                query_cache.put(
+                    query_embedding,
+                    [dict(mem, metadata=dict(mem["metadata"])) for mem in memories],
+                    scope=cache_scope,
+                    version=version,
+                )
             return memories
 
         except Exception as e:
@@ -1261,7 +1618,7 @@ class LongTermMemory:
 
         try:
             collection = self.vectorstore._collection
-            with self._vectorstore_lock:
+            with self._vectorstore_lock.read():
                 return collection.count()
         except (AttributeError, RuntimeError) as e:
             logger.debug("无法获取记忆数量: %s", e)
@@ -1285,18 +1642,27 @@ class LongTermMemory:
             self._last_batch_flush_mono = time.monotonic()
 
             # 删除集合并重新创建
-            with self._vectorstore_lock:
-                self.vectorstore.delete_collection()
-                self.vectorstore = create_chroma_vectorstore(
-                    collection_name=self.collection_name,
-                    persist_directory=str(self.persist_directory),
-                    use_local_embedding=settings.use_local_embedding,
-                    enable_cache=settings.enable_embedding_cache,
-                )
+            with self._vectorstore_lock.write():
+                try:
+                    self.vectorstore.delete_collection()
+                    self.vectorstore = None
+                    self.vectorstore = create_chroma_vectorstore(
+                        collection_name=self.collection_name,
+                        persist_directory=str(self.persist_directory),
+                        use_local_embedding=settings.use_local_embedding,
+                        enable_cache=settings.enable_embedding_cache,
+                    )
+                finally:
+                    # 释放写锁前作废检索缓存与 FAISS/时间索引（重建失败也要作废，
+                    # 否则并发检索会继续命中已删除的记忆）
+                    self._write_version += 1
+                    if self._read_index is not None:
+                        self._read_index.reset(self._write_version)
+                    if self._time_index is not None:
+                        self._time_index.reset()
             if self.vectorstore is None:
                 logger.error("长期记忆已删除，但向量库重新初始化失败")
             else:
-                self._write_version += 1
                 logger.info("长期记忆已清空")
         except Exception as e:
             logger.error("清空长期记忆失败: %s", e)
@@ -1981,6 +2347,18 @@ class MemoryManager:
                     "write_version",
                     0,
                 )
+                read_index_stats = getattr(self.long_term, "read_index_stats", None)
+                if callable(read_index_stats):
+                    stats["long_term_read_index"] = read_index_stats()
+                time_index_stats = getattr(self.long_term, "time_index_stats", None)
+                if callable(time_index_stats):
+                    stats["long_term_time_index"] = time_index_stats()
+                lock_stats = getattr(self.long_term, "lock_stats", None)
+                if callable(lock_stats):
+                    stats["long_term_lock_wait"] = lock_stats()
+                query_cache_stats = getattr(self.long_term, "query_cache_stats", None)
+                if callable(query_cache_stats):
+                    stats["long_term_query_cache"] = query_cache_stats()
             except (AttributeError, RuntimeError) as e:
                 logger.debug("获取长期记忆统计失败: %s", e)
                 stats["long_term_count"] = "未知"
@@ -0,0 +1,658 @@
+"""
+长期记忆 FAISS 只读索引（可选）
+
+Chroma 仍是唯一数据源；本模块在进程内维护一份 HNSW 镜像，供检索热路径无锁读取：
+- 读：检索只读取当前快照（不可变对象），不持有 `_vectorstore_lock`
+- 写：add/remove 以写时复制方式生成新快照；新增向量先进入小型增量区（暴力检索），
+  超过阈值后在后台线程合并进 HNSW
+- 删除以墓碑方式过滤（按行号：HNSW 行在前、增量区在后，合并不改变行号；同一 id 重新写入时
+  旧行记为墓碑、新行取新行号），墓碑过多时从 Chroma 全量重建
+- 版本：每次镜像写入后记录长期记忆的 write_version，版本不一致时调用方回退到 Chroma
+- 持久化：索引与 id/文档/元数据保存在 Chroma 目录旁，启动时按条数与有效 id 摘要校验，
+  不一致则重建（同条数下的增删替换也能识别）
+
+距离与 Chroma 默认的 l2 空间一致（平方欧氏距离），因此下游重排序无需区分来源。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.utils.chroma_helper import Document
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:  # 可选依赖：faiss-cpu
+    import faiss
+
+    FAISS_AVAILABLE = True
+except ImportError:  # pragma: no cover - 取决于运行环境
+    faiss = None  # type: ignore[assignment]
+    FAISS_AVAILABLE = False
+
+_INDEX_FILE = "index.faiss"
+_RECORDS_FILE = "records.json"
+_REBUILD_TOMBSTONE_RATIO = 0.1
+
+# loader(offset, limit)
+#   -> {"ids": [...], "embeddings": [...], "documents": [...], "metadatas": [...]}
+BatchLoader = Callable[[int, int], Dict[str, Any]]
+# id_lister() -> Chroma 当前全部 id（仅 id，不含 embedding）
+IdLister = Callable[[], Sequence[str]]
+
+
+@dataclass(frozen=True, slots=True)
+class _Snapshot:
+    """不可变索引快照（检索线程只读，写入方整体替换）。"""
+
+    index: Any
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    delta: np.ndarray
+    delta_ids: List[str]
+    delta_documents: List[str]
+    delta_metadatas: List[Dict[str, Any]]
+    deleted: frozenset = field(default_factory=frozenset)  # 墓碑行号
+
+    @property
+    def total(self) -> int:
+        return len(self.ids) + len(self.delta_ids)
+
+    @property
+    def dim(self) -> int:
+        if self.index is not None:
+            return int(self.index.d)
+        return int(self.delta.shape[1]) if self.delta.ndim == 2 else 0
+
+    @property
+    def live_count(self) -> int:
+        return self.total - len(self.deleted)
+
+    def live_labels(self) -> Dict[str, int]:
+        """id -> 当前有效行号（写入方维护 id 映射用）。"""
+        deleted = self.deleted
+        return {
+            doc_id: label
+            for label, doc_id in enumerate(itertools.chain(self.ids, self.delta_ids))
+            if label not in deleted
+        }
+
+
+def _ids_digest(ids: Any) -> str:
+    """与顺序无关的 id 集合摘要（持久化索引与 Chroma 的内容校验）。"""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc_id in sorted(str(x) for x in ids):
+        digest.update(doc_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _empty_snapshot(dim: int = 0) -> _Snapshot:
+    return _Snapshot(
+        index=None,
+        ids=[],
+        documents=[],
+        metadatas=[],
+        delta=np.empty((0, dim), dtype=np.float32),
+        delta_ids=[],
+        delta_documents=[],
+        delta_metadatas=[],
+    )
+
+
+def _as_matrix(embeddings: Any) -> np.ndarray:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix)
+
+
+def _simple_where(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    将 Chroma where 条件转换为等值过滤字典
+
+    仅支持 `{"key": value}` 与 `{"key": {"$eq": value}}`；其他表达式返回 None（由调用方回退 Chroma）。
+    """
+    if not where:
+        return {}
+    out: Dict[str, Any] = {}
+    for key, value in where.items():
+        if key.startswith("$"):
+            return None
+        if isinstance(value, dict):
+            if set(value.keys()) != {"$eq"}:
+                return None
+            value = value["$eq"]
+        if not isinstance(value, (str, int, float, bool)):
+            return None
+        out[key] = value
+    return out
+
+
+class FaissMemoryIndex:
+    """长期记忆的进程内 HNSW 镜像（线程安全：读无锁，写串行）。"""
+
+    def __init__(
+        self,
+        persist_directory: Path,
+        *,
+        loader: BatchLoader,
+        counter: Callable[[], int],
+        id_lister: Optional[IdLister] = None,
+        min_count: int = 20_000,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        merge_threshold: int = 2048,
+        batch_size: int = 1000,
+    ) -> None:
+        """
+        Args:
+            persist_directory: 索引持久化目录（位于 Chroma 目录旁）
+            loader: 分页读取 Chroma 记录（需包含 embeddings）
+            counter: 读取 Chroma 当前条数（用于校验持久化索引）
+            id_lister: 读取 Chroma 当前全部 id（条数一致时再比对 id 摘要；缺省仅按条数校验）
+            min_count: 记忆条数低于该值时不建索引（Chroma 已足够快）
+            hnsw_m: HNSW 每层连接数
+            ef_search: HNSW 检索宽度下限
+            merge_threshold: 增量区超过该条数时后台合并进 HNSW
+            batch_size: 全量重建时每批读取条数
+        """
+        if not FAISS_AVAILABLE:
+            raise ImportError("faiss 未安装，无法启用 FAISS 记忆索引")
+        self.persist_directory = Path(persist_directory)
+        self._loader = loader
+        self._counter = counter
+        self._id_lister = id_lister
+        self._min_count = max(0, int(min_count))
+        self._hnsw_m = max(4, int(hnsw_m))
+        self._ef_search = max(1, int(ef_search))
+        self._merge_threshold = max(1, int(merge_threshold))
+        self._batch_size = max(1, int(batch_size))
+
+        self._snapshot: Optional[_Snapshot] = None
+        self._version: Optional[int] = None
+        self._state = "idle"  # idle / building / dormant / ready
+        self._dormant_until: Optional[int] = None
+        self._pending: List[Tuple[str, Any, int]] = []
+        self._labels: Dict[str, int] = {}  # id -> 有效行号（仅写入方在 _write_lock 内使用）
+        self._write_lock = threading.Lock()
+        self._merging = False
+        self._build_ms: Optional[float] = None
+        self._workers: List[threading.Thread] = []
+
+    # ------------------------------------------------------------------ status
+
+    @property
+    def ready(self) -> bool:
+        return self._state == "ready" and self._snapshot is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    @property
+    def active(self) -> bool:
+        """正在构建或已就绪（此时写入需要镜像）。"""
+        return self._state in ("building", "ready")
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            "state": self._state,
+            "version": self._version,
+            "count": snap.live_count if snap is not None else 0,
+            "delta": len(snap.delta_ids) if snap is not None else 0,
+            "tombstones": len(snap.deleted) if snap is not None else 0,
+            "build_ms": None if self._build_ms is None else round(self._build_ms, 2),
+        }
+
+    # ------------------------------------------------------------------ lifecycle
+
+    def ensure_started(self, version: int) -> None:
+        """按需启动后台加载/重建（空闲时调用开销极低）。"""
+        state = self._state
+        if state in ("building", "ready"):
+            return
+        if state == "dormant" and self._dormant_until is not None and version < self._dormant_until:
+            return
+        with self._write_lock:
+            if self._state in ("building", "ready"):
+                return
+            self._state = "building"
+            self._pending = []
+        self._spawn(self._build, int(version), name="mintchat-faiss-index")
+
+    def invalidate(self, version: int) -> None:
+        """镜像与 Chroma 失去同步：丢弃快照并在后台全量重建。"""
+        with self._write_lock:
+            if self._state == "building":
+                return
+            self._state = "idle"
+            self._snapshot = None
+            self._version = None
+        self.ensure_started(version)
+
+    def reset(self, version: int) -> None:
+        """Chroma 集合已清空：镜像同步清空（保持就绪，后续写入继续增量镜像）。"""
+        with self._write_lock:
+            if self._state == "building":
+                self._pending.append(("reset", None, int(version)))
+                return
+            if self._state != "ready":
+                return
+            self._snapshot = _empty_snapshot()
+            self._labels = {}
+            self._version = int(version)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """等待后台构建/合并线程结束（含其持久化写盘），再持久化当前快照（未就绪时跳过）。"""
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        with self._write_lock:
+            workers = list(self._workers)
+        for worker in workers:
+            if worker is not threading.current_thread():
+                worker.join(max(0.0, deadline - time.monotonic()))
+        if self.ready:
+            try:
+                self.persist()
+            except Exception as exc:
+                logger.debug("FAISS 记忆索引持久化失败（可忽略）: %s", exc)
+
+    # ------------------------------------------------------------------ writes
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        *,
+        version: int,
+    ) -> None:
+        """镜像新增记录（写时复制生成新快照）。"""
+        if not ids:
+            return
+        matrix = _as_matrix(embeddings)
+        if matrix.shape[0] != len(ids):
+            raise ValueError("ids 与 embeddings 数量不一致")
+        payload = (list(map(str, ids)), matrix, list(documents), [dict(m or {}) for m in metadatas])
+        merge = False
+        with self._write_lock:
+            if self._state == "building":
+                self._pending.append(("add", payload, int(version)))
+                return
+            if self._state != "ready" or self._snapshot is None:
+                return
+            snap = self._apply_add(self._snapshot, self._labels, *payload)
+            if snap is None:
+                self._state = "idle"
+                self._snapshot = None
+                self._labels = {}
+                self._version = None
+                return
+            self._snapshot = snap
+            self._version = int(version)
+            merge = len(snap.delta_ids) >= self._merge_threshold and not self._merging
+            if merge:
+                self._merging = True
+        if merge:
+            self._spawn(self._merge, name="mintchat-faiss-merge")
+
+    def remove(self, ids: Sequence[str], *, version: int) -> None:
+        """镜像删除（墓碑过滤；墓碑过多时触发全量重建）。"""
+        if not ids:
+            return
+        rebuild = False
+        with self._write_lock:
+            if self._state == "building":
+                self._pending.append(("remove", list(map(str, ids)), int(version)))
+                return
+            if self._state != "ready" or self._snapshot is None:
+                return
+            snap = self._apply_remove(self._snapshot, self._labels, ids)
+            self._snapshot = snap
+            self._version = int(version)
+            total = snap.total
+            rebuild = total > 0 and len(snap.deleted) > total * _REBUILD_TOMBSTONE_RATIO
+        if rebuild:
+            self.invalidate(version)
+
+    @staticmethod
+    def _apply_add(
+        snap: _Snapshot,
+        labels: Dict[str, int],
+        ids: List[str],
+        matrix: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> Optional[_Snapshot]:
+        if snap.dim and matrix.shape[1] != snap.dim:
+            logger.info(
+                "embedding 维度变化（%d -> %d），FAISS 记忆索引将重建", snap.dim, matrix.shape[1]
+            )
+            return None
+        delta = matrix if snap.delta.shape[0] == 0 else np.vstack([snap.delta, matrix])
+        # 新行总是取新行号；同一 id 的旧行（含旧向量）记为墓碑
+        stale: List[int] = []
+        base = snap.total
+        for offset, doc_id in enumerate(ids):
+            old = labels.get(doc_id)
+            if old is not None:
+                stale.append(old)
+            labels[doc_id] = base + offset
+        deleted = snap.deleted | frozenset(stale) if stale else snap.deleted
+        return replace(
+            snap,
+            delta=delta,
+            delta_ids=snap.delta_ids + ids,
+            delta_documents=snap.delta_documents + documents,
+            delta_metadatas=snap.delta_metadatas + metadatas,
+            deleted=deleted,
+        )
+
+    @staticmethod
+    def _apply_remove(snap: _Snapshot, labels: Dict[str, int], ids: Sequence[str]) -> _Snapshot:
+        stale = [labels.pop(str(doc_id), None) for doc_id in ids]
+        dead = frozenset(label for label in stale if label is not None)
+        if not dead:
+            return snap
+        return replace(snap, deleted=snap.deleted | dead)
+
+    # ------------------------------------------------------------------ reads
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """
+        在当前快照上检索（无锁）
+
+        Returns:
+            Optional[List[Tuple[Document, float]]]: (文档, 平方 L2 距离)；无法服务时返回 None
+        """
+        snap = self._snapshot
+        if snap is None or self._state != "ready" or k <= 0:
+            return None
+        conditions = _simple_where(where)
+        if conditions is None:
+            return None
+        query = _as_matrix(query_embedding)
+        if snap.dim and query.shape[1] != snap.dim:
+            return None
+
+        total = snap.total
+        if total == 0:
+            return []
+        fetch_k = min(total, int(k) + len(snap.deleted))
+        while True:
+            hits = self._search_snapshot(snap, query, fetch_k)
+            out: List[Tuple[Document, float]] = []
+            for label, document, metadata, distance in hits:
+                if label in snap.deleted:
+                    continue
+                if conditions and any(metadata.get(key) != v for key, v in conditions.items()):
+                    continue
+                out.append((Document(page_content=document, metadata=dict(metadata)), distance))
+                if len(out) >= k:
+                    return out
+            if fetch_k >= total:
+                return out
+            fetch_k = min(total, fetch_k * 4)
+
+    def _search_snapshot(
+        self, snap: _Snapshot, query: np.ndarray, fetch_k: int
+    ) -> List[Tuple[int, str, Dict[str, Any], float]]:
+        hits: List[Tuple[int, str, Dict[str, Any], float]] = []
+        if snap.index is not None and snap.ids:
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = max(self._ef_search, fetch_k)
+            distances, labels = snap.index.search(query, min(fetch_k, len(snap.ids)), params=params)
+            for label, distance in zip(labels[0].tolist(), distances[0].tolist()):
+                if label < 0:
+                    continue
+                hits.append((label, snap.documents[label], snap.metadatas[label], float(distance)))
+        if snap.delta_ids:
+            diff = snap.delta - query
+            delta_dist = np.einsum("ij,ij->i", diff, diff)
+            take = min(fetch_k, delta_dist.shape[0])
+            if take < delta_dist.shape[0]:
+                top = np.argpartition(delta_dist, take - 1)[:take]
+            else:
+                top = np.arange(delta_dist.shape[0])
+            base = len(snap.ids)
+            for i in top.tolist():
+                hits.append(
+                    (
+                        base + i,
+                        snap.delta_documents[i],
+                        snap.delta_metadatas[i],
+                        float(delta_dist[i]),
+                    )
+                )
+        hits.sort(key=lambda item: item[3])
+        return hits
+
+    # ------------------------------------------------------------------ build / merge / persist
+
+    def _spawn(self, target: Callable[..., None], *args: Any, name: str) -> None:
+        worker = threading.Thread(target=target, args=args, name=name, daemon=True)
+        with self._write_lock:
+            self._workers = [t for t in self._workers if t.is_alive()]
+            self._workers.append(worker)
+        worker.start()
+
+    def _new_hnsw(self, dim: int) -> Any:
+        return faiss.IndexHNSWFlat(int(dim), self._hnsw_m)
+
+    def _build(self, version: int) -> None:
+        started = time.perf_counter()
+        try:
+            count = int(self._counter())
+            if count < self._min_count:
+                with self._write_lock:
+                    self._state = "dormant"
+                    self._dormant_until = version + max(1, self._min_count - count)
+                    self._pending = []
+                return
+
+            snap = self._load_persisted(count)
+            source = "disk"
+            if snap is None:
+                snap = self._rebuild_from_store(count)
+                source = "chroma"
+
+            with self._write_lock:
+                labels = snap.live_labels()
+                for op, payload, op_version in self._pending:
+                    version = max(version, op_version)
+                    if op == "add":
+                        ids, matrix, documents, metadatas = payload
+                        # 构建期间写入 Chroma 的记录可能已被全量加载
+                        keep = [i for i, doc_id in enumerate(ids) if doc_id not in labels]
+                        if keep:
+                            updated = self._apply_add(
+                                snap,
+                                labels,
+                                [ids[i] for i in keep],
+                                matrix[keep],
+                                [documents[i] for i in keep],
+                                [metadatas[i] for i in keep],
+                            )
+                            if updated is None:
+                                raise RuntimeError("embedding 维度与索引不一致")
+                            snap = updated
+                    elif op == "remove":
+                        snap = self._apply_remove(snap, labels, payload)
+                    else:
+                        snap = _empty_snapshot(snap.dim)
+                        labels = {}
+                self._pending = []
+                self._labels = labels
+                self._snapshot = snap
+                self._version = int(version)
+                self._state = "ready"
+            self._build_ms = (time.perf_counter() - started) * 1000.0
+            logger.info(
+                "FAISS 记忆索引就绪: %d 条（来源: %s，耗时 %.0fms）",
+                snap.live_count,
+                source,
+                self._build_ms,
+            )
+            if source == "chroma":
+                self.persist()
+        except Exception as exc:
+            logger.warning("FAISS 记忆索引构建失败，检索继续使用 Chroma: %s", exc)
+            with self._write_lock:
+                self._state = "dormant"
+                self._dormant_until = version + max(1, self._merge_threshold)
+                self._pending = []
+
+    def _rebuild_from_store(self, count: int) -> _Snapshot:
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        index = None
+        for offset in range(0, max(count, 0), self._batch_size):
+            chunk = self._loader(offset, self._batch_size)
+            chunk_ids = [str(x) for x in chunk.get("ids") or []]
+            if not chunk_ids:
+                break
+            matrix = _as_matrix(chunk.get("embeddings"))
+            if index is None:
+                index = self._new_hnsw(matrix.shape[1])
+            index.add(matrix)
+            ids.extend(chunk_ids)
+            documents.extend(str(x or "") for x in chunk.get("documents") or [])
+            metadatas.extend(dict(x or {}) for x in chunk.get("metadatas") or [])
+        snap = _empty_snapshot(int(index.d) if index is not None else 0)
+        return replace(snap, index=index, ids=ids, documents=documents, metadatas=metadatas)
+
+    def _merge(self) -> None:
+        try:
+            with self._write_lock:
+                snap = self._snapshot
+            if snap is None or not snap.delta_ids:
+                return
+            merged_count = len(snap.delta_ids)
+            index = (
+                faiss.clone_index(snap.index)
+                if snap.index is not None
+                else self._new_hnsw(snap.delta.shape[1])
+            )
+            index.add(snap.delta)
+            ids = snap.ids + snap.delta_ids
+            documents = snap.documents + snap.delta_documents
+            metadatas = snap.metadatas + snap.delta_metadatas
+
+            with self._write_lock:
+                current = self._snapshot
+                if current is None or current.index is not snap.index:
+                    return  # 期间被重置/重建，放弃本次合并
+                self._snapshot = replace(
+                    current,
+                    index=index,
+                    ids=ids,
+                    documents=documents,
+                    metadatas=metadatas,
+                    delta=np.ascontiguousarray(current.delta[merged_count:]),
+                    delta_ids=current.delta_ids[merged_count:],
+                    delta_documents=current.delta_documents[merged_count:],
+                    delta_metadatas=current.delta_metadatas[merged_count:],
+                )
+            self.persist()
+        except Exception as exc:
+            logger.warning("FAISS 记忆索引合并失败（可忽略）: %s", exc)
+        finally:
+            self._merging = False
+
+    def persist(self) -> None:
+        """将当前快照（含增量区）写入磁盘（原子替换）。"""
+        snap = self._snapshot
+        if snap is None:
+            return
+        index = faiss.clone_index(snap.index) if snap.index is not None else None
+        if snap.delta_ids:
+            if index is None:
+                index = self._new_hnsw(snap.delta.shape[1])
+            index.add(snap.delta)
+        ids = snap.ids + snap.delta_ids
+        documents = snap.documents + snap.delta_documents
+        metadatas = snap.metadatas + snap.delta_metadatas
+        live_ids = (doc_id for label, doc_id in enumerate(ids) if label not in snap.deleted)
+
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        records_path = self.persist_directory / _RECORDS_FILE
+        index_path = self.persist_directory / _INDEX_FILE
+        tmp_records = records_path.with_suffix(".json.tmp")
+        with tmp_records.open("w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "ids": ids,
+                    "documents": documents,
+                    "metadatas": metadatas,
+                    "deleted": sorted(snap.deleted),
+                    "ids_digest": _ids_digest(live_ids),
+                },
+                fh,
+                ensure_ascii=False,
+            )
+        if index is not None:
+            tmp_index = index_path.with_suffix(".faiss.tmp")
+            faiss.write_index(index, str(tmp_index))
+            os.replace(tmp_index, index_path)
+        elif index_path.exists():
+            index_path.unlink()
+        os.replace(tmp_records, records_path)
+
+    def _load_persisted(self, count: int) -> Optional[_Snapshot]:
+        records_path = self.persist_directory / _RECORDS_FILE
+        index_path = self.persist_directory / _INDEX_FILE
+        if not records_path.exists() or not index_path.exists():
+            return None
+        try:
+            with records_path.open("r", encoding="utf-8") as fh:
+                records = json.load(fh)
+            index = faiss.read_index(str(index_path))
+            ids = [str(x) for x in records.get("ids") or []]
+            # 墓碑为行号（旧版按 id 记录的文件在此解析失败并重建）
+            deleted = frozenset(int(x) for x in records.get("deleted") or [])
+            if any(not 0 <= label < len(ids) for label in deleted):
+                raise ValueError("墓碑行号越界")
+            if index.ntotal != len(ids) or len(ids) - len(deleted) != count:
+                logger.info("FAISS 记忆索引与 Chroma 条数不一致，将重建")
+                return None
+            digest = _ids_digest(doc_id for label, doc_id in enumerate(ids) if label not in deleted)
+            if records.get("ids_digest") != digest:
+                raise ValueError("id 摘要缺失或与记录不符")
+            if self._id_lister is not None and _ids_digest(self._id_lister()) != digest:
+                logger.info("FAISS 记忆索引与 Chroma 记录不一致（条数相同），将重建")
+                return None
+            snap = _empty_snapshot(int(index.d))
+            return replace(
+                snap,
+                index=index,
+                ids=ids,
+                documents=[str(x or "") for x in records.get("documents") or []],
+                metadatas=[dict(x or {}) for x in records.get("metadatas") or []],
+                deleted=deleted,
+            )
+        except Exception as exc:
+            logger.info("读取 FAISS 记忆索引失败，将重建: %s", exc)
+            return None
+
+
+__all__ = ["FAISS_AVAILABLE", "FaissMemoryIndex"]
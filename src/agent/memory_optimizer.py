@@ -19,6 +19,7 @@ import math
 import re
 from collections import OrderedDict, deque
 from datetime import datetime
+from functools import lru_cache
 from threading import Lock
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
@@ -827,6 +828,26 @@ class CharacterConsistencyScorer:
         return memory
 
 
+@lru_cache(maxsize=4)
+def _shared_character_scorer(character_name: str, user_name: str) -> CharacterConsistencyScorer:
+    return CharacterConsistencyScorer(
+        character_name=character_name or None, user_name=user_name or None
+    )
+
+
+def get_character_scorer() -> CharacterConsistencyScorer:
+    """
+    按当前配置的角色名/用户名复用评分器
+
+    评分器初始化后只读（关键词表与正则），多个用户会话共用一份即可。
+    """
+    agent_cfg = getattr(settings, "agent", object())
+    return _shared_character_scorer(
+        str(getattr(agent_cfg, "char", "") or "").strip(),
+        str(getattr(agent_cfg, "user", "") or "").strip(),
+    )
+
+
 class MemoryOptimizer:
     """
     记忆系统优化器（主类）
@@ -866,7 +887,7 @@ class MemoryOptimizer:
             MemoryDeduplicator(max_seen_hashes=dedup_max_hashes) if enable_deduplication else None
         )
         self.consolidator = MemoryConsolidator() if enable_consolidation else None
-        self.character_scorer = CharacterConsistencyScorer() if enable_character_scoring else None
+        self.character_scorer = get_character_scorer() if enable_character_scoring else None
 
         # 统计信息
         self.stats = {
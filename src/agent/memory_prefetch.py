@@ -0,0 +1,263 @@
+"""
+记忆检索预取（用户输入时的投机检索）
+
+用户仍在输入时，按草稿文本在后台提前完成记忆检索（长期记忆 + 核心记忆，含查询向量计算）：
+- 草稿变化经防抖后才真正检索，只保留最新一份结果（按归一化草稿文本作为键）
+- 正式发送时若消息与草稿足够接近、记忆版本未变，直接复用预取结果（检索仍在进行则等待其完成；
+  仍在防抖等待则跳过剩余防抖立即检索）
+- 统计命中/未命中次数与节省的检索耗时
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = " \t\r\n。！？!?，,、；;：:…~～.\"'“”‘’"
+
+
+def normalize_draft(text: str) -> str:
+    """归一化草稿：折叠空白、忽略大小写与结尾标点（仅用于比较，不参与检索）。"""
+    return _WS_RE.sub(" ", str(text or "")).strip().rstrip(_TRAILING_PUNCT).casefold()
+
+
+@dataclass(slots=True)
+class _PrefetchEntry:
+    key: str
+    query: str
+    long_term_k: int
+    core_k: int
+    versions: tuple
+    future: Optional["Future[Optional[Dict[str, List[str]]]]"] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    dropped: bool = False  # 已被新草稿替换/取消，防抖结束后不再检索
+    expedite: bool = False  # 正式消息已匹配，跳过剩余防抖
+    wake: Optional[Callable[[], None]] = None  # 提前结束防抖（线程安全）
+
+
+class MemoryPrefetcher:
+    """单槽记忆检索预取器（线程安全：GUI 线程调度，Agent 事件循环消费）。"""
+
+    def __init__(
+        self,
+        retriever: Any,
+        *,
+        submit: Callable[[Coroutine[Any, Any, Any]], Future],
+        versions: Callable[[], tuple],
+        debounce_s: float = 0.35,
+        min_chars: int = 4,
+        min_similarity: float = 0.85,
+    ) -> None:
+        """
+        Args:
+            retriever: ConcurrentMemoryRetriever（需提供 retrieve_all_memories_async）
+            submit: 将协程提交到后台事件循环，返回 concurrent.futures.Future
+            versions: 返回当前记忆版本（长期/核心记忆写入后预取结果失效）
+            debounce_s: 草稿防抖时间
+            min_chars: 草稿最少字符数（过短的草稿检索意义不大）
+            min_similarity: 正式消息与草稿的最低相似度（归一化后 SequenceMatcher 比例）
+        """
+        self._retriever = retriever
+        self._submit = submit
+        self._versions = versions
+        self._debounce_s = max(0.0, float(debounce_s))
+        self._min_chars = max(1, int(min_chars))
+        self._min_similarity = min(1.0, max(0.0, float(min_similarity)))
+        self._lock = threading.Lock()
+        self._entry: Optional[_PrefetchEntry] = None
+        self._stats = {
+            "scheduled": 0,
+            "executed": 0,
+            "hits": 0,
+            "misses": 0,
+            "saved_ms": 0.0,
+        }
+
+    def schedule(self, draft: str, *, long_term_k: int, core_k: int) -> bool:
+        """
+        按草稿调度一次预取（防抖；与当前草稿等价时不重复调度）
+
+        Returns:
+            bool: 是否调度了新的预取
+        """
+        query = str(draft or "").strip()
+        key = normalize_draft(query)
+        if len(key) < self._min_chars:
+            return False
+        versions = self._versions()
+        with self._lock:
+            current = self._entry
+            if (
+                current is not None
+                and current.key == key
+                and current.versions == versions
+                and current.long_term_k >= long_term_k
+                and current.core_k >= core_k
+            ):
+                return False
+            entry = _PrefetchEntry(
+                key=key,
+                query=query,
+                long_term_k=max(1, int(long_term_k)),
+                core_k=max(1, int(core_k)),
+                versions=versions,
+            )
+            self._entry = entry
+            self._stats["scheduled"] += 1
+        if current is not None:
+            self._cancel(current)
+        try:
+            future = self._submit(self._run(entry))
+        except Exception as exc:
+            logger.debug("记忆预取调度失败: %s", exc)
+            with self._lock:
+                if self._entry is entry:
+                    self._entry = None
+            return False
+        entry.future = future
+        return True
+
+    async def take(
+        self, message: str, *, long_term_k: int, core_k: int
+    ) -> Optional[Dict[str, List[str]]]:
+        """
+        取走与正式消息匹配的预取结果（不匹配/失败时返回 None，由调用方正常检索）
+        """
+        with self._lock:
+            entry = self._entry
+            self._entry = None
+        if entry is None:
+            return None
+        reason = self._mismatch_reason(entry, message, long_term_k=long_term_k, core_k=core_k)
+        future = entry.future
+        if reason is not None or future is None:
+            self._cancel(entry)
+            self._record_miss(reason or "not_submitted")
+            return None
+        if entry.started is None:
+            # 仍在防抖等待：消息已确认与草稿一致，立即开始检索并等待
+            with self._lock:
+                entry.expedite = True
+                wake = entry.wake
+            if wake is not None:
+                try:
+                    wake()
+                except RuntimeError:  # 后台事件循环已关闭：下方等待会以取消/失败告终
+                    pass
+
+        waited_from = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(future)
+        except (asyncio.CancelledError, Exception) as exc:
+            if isinstance(exc, asyncio.CancelledError) and not future.cancelled():
+                raise
+            self._record_miss("failed")
+            return None
+        if not result:
+            self._record_miss("failed")
+            return None
+
+        started = entry.started or waited_from
+        finished = entry.finished or time.perf_counter()
+        # 节省的耗时 = 检索与用户输入重叠的部分（消息到达前已完成的检索时长）
+        saved_ms = max(0.0, (min(finished, waited_from) - started) * 1000.0)
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["saved_ms"] += saved_ms
+        logger.debug("记忆预取命中，节省 %.1fms", saved_ms)
+        return {
+            "long_term": list(result.get("long_term") or [])[: max(1, int(long_term_k))],
+            "core": list(result.get("core") or [])[: max(1, int(core_k))],
+        }
+
+    def clear(self) -> None:
+        """丢弃当前预取（如会话切换/关闭）。"""
+        with self._lock:
+            entry = self._entry
+            self._entry = None
+        if entry is not None:
+            self._cancel(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["saved_ms"] = round(stats["saved_ms"], 2)
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["avg_saved_ms"] = (
+            round(stats["saved_ms"] / stats["hits"], 2) if stats["hits"] else 0.0
+        )
+        return stats
+
+    # ----------------------------- 内部方法 -----------------------------
+
+    async def _run(self, entry: _PrefetchEntry) -> Optional[Dict[str, List[str]]]:
+        if self._debounce_s > 0:
+            loop = asyncio.get_running_loop()
+            woken = asyncio.Event()
+            with self._lock:
+                entry.wake = lambda: loop.call_soon_threadsafe(woken.set)
+                expedite = entry.expedite
+            if not expedite:
+                try:
+                    await asyncio.wait_for(woken.wait(), self._debounce_s)
+                except asyncio.TimeoutError:
+                    pass
+        with self._lock:
+            if entry.dropped:
+                return None
+            entry.started = time.perf_counter()
+            self._stats["executed"] += 1
+        try:
+            return await self._retriever.retrieve_all_memories_async(
+                query=entry.query,
+                long_term_k=entry.long_term_k,
+                core_k=entry.core_k,
+                use_cache=True,
+            )
+        finally:
+            entry.finished = time.perf_counter()
+
+    def _mismatch_reason(
+        self, entry: _PrefetchEntry, message: str, *, long_term_k: int, core_k: int
+    ) -> Optional[str]:
+        if entry.long_term_k < long_term_k or entry.core_k < core_k:
+            return "k"
+        if entry.versions != self._versions():
+            return "stale"
+        key = normalize_draft(message)
+        if key != entry.key:
+            ratio = SequenceMatcher(None, entry.key, key, autojunk=False).ratio()
+            if ratio < self._min_similarity:
+                return "diverged"
+        return None
+
+    def _record_miss(self, reason: str) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+            bucket = f"miss_{reason}"
+            self._stats[bucket] = self._stats.get(bucket, 0) + 1
+
+    def _cancel(self, entry: _PrefetchEntry) -> None:
+        with self._lock:
+            entry.dropped = True
+            started = entry.started is not None
+        future = entry.future
+        if future is not None and not started:
+            # 仍在防抖等待：取消即可；已开始的检索让其完成（结果会写入检索缓存）
+            future.cancel()
+
+
+__all__ = ["MemoryPrefetcher", "normalize_draft"]
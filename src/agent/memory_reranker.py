@@ -0,0 +1,122 @@
+"""
+长期记忆列式重排序模块
+
+将 Chroma 检索结果按列（distances / timestamp_unix / importance / character_consistency）
+组织成 NumPy 数组，一次性计算相似度、时间衰减与综合评分，并用 argpartition 取 top-k。
+相比逐条构造 dict 再排序，候选池扩大到数百条时每轮开销仍保持在亚毫秒级。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+# 综合评分 = 相似度(60%) + 时间性(20%) + 重要性(20%) + 角色一致性(可配权重)
+SIMILARITY_WEIGHT = 0.6
+RECENCY_WEIGHT = 0.2
+IMPORTANCE_WEIGHT = 0.2
+# 相似度阈值：低于该值的候选直接过滤
+MIN_SIMILARITY = 0.3
+# 30 天内的记忆不衰减，之后按年线性衰减，最低 0.5
+RECENCY_GRACE_DAYS = 30.0
+RECENCY_DECAY_DAYS = 365.0
+RECENCY_FLOOR = 0.5
+
+
+@dataclass(slots=True)
+class RerankResult:
+    """重排序结果（所有数组与 `order` 一一对应，已按综合评分降序）"""
+
+    order: np.ndarray
+    similarity: np.ndarray
+    recency: np.ndarray
+    final_score: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.order.shape[0])
+
+
+def to_float_column(values: Sequence[Any], default: float = float("nan")) -> np.ndarray:
+    """将任意元数据值序列转换为 float64 列（无法解析的值使用 default）。"""
+    out = np.full(len(values), default, dtype=np.float64)
+    for i, value in enumerate(values):
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            out[i] = float(value)
+        elif isinstance(value, str):
+            try:
+                out[i] = float(value)
+            except ValueError:
+                pass
+    return out
+
+
+def compute_recency(timestamps_unix: np.ndarray, now_unix: float) -> np.ndarray:
+    """按记忆年龄计算时间衰减分数（缺失时间戳视为不衰减）。"""
+    age_days = np.maximum(0.0, (now_unix - timestamps_unix) / 86400.0)
+    decayed = np.maximum(RECENCY_FLOOR, 1.0 - (age_days - RECENCY_GRACE_DAYS) / RECENCY_DECAY_DAYS)
+    recency = np.where(age_days > RECENCY_GRACE_DAYS, decayed, 1.0)
+    return np.where(np.isnan(timestamps_unix), 1.0, recency)
+
+
+def rerank(
+    distances: np.ndarray,
+    timestamps_unix: np.ndarray,
+    importance: np.ndarray,
+    character_consistency: np.ndarray,
+    *,
+    k: int,
+    now_unix: float,
+    character_weight: float = 0.0,
+    character_mask: Optional[np.ndarray] = None,
+    min_similarity: float = MIN_SIMILARITY,
+) -> RerankResult:
+    """
+    列式重排序
+
+    Args:
+        distances: Chroma 距离（越小越相似）
+        timestamps_unix: 记忆时间戳（epoch seconds，缺失为 NaN）
+        importance: 重要性（0-1）
+        character_consistency: 角色一致性（0-1）
+        k: 返回条数
+        now_unix: 当前时间戳
+        character_weight: 角色一致性权重（0 表示不参与）
+        character_mask: 哪些候选参与角色一致性加权（None 表示全部参与）
+        min_similarity: 相似度阈值
+
+    Returns:
+        RerankResult: 按综合评分降序的 top-k 下标及对应分数
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    similarity = 1.0 / (1.0 + distances)
+    recency = compute_recency(np.asarray(timestamps_unix, dtype=np.float64), now_unix)
+
+    numerator = (
+        similarity * SIMILARITY_WEIGHT
+        + recency * RECENCY_WEIGHT
+        + np.asarray(importance, dtype=np.float64) * IMPORTANCE_WEIGHT
+    )
+    denom = np.ones_like(numerator)
+    if character_weight > 0.0:
+        weights = np.full_like(numerator, character_weight)
+        if character_mask is not None:
+            weights = np.where(np.asarray(character_mask, dtype=bool), weights, 0.0)
+        numerator = numerator + np.clip(character_consistency, 0.0, 1.0) * weights
+        denom = denom + weights
+    final_score = numerator / denom
+
+    candidates = np.flatnonzero(similarity >= min_similarity)
+    if k <= 0 or candidates.size == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return RerankResult(empty, similarity[empty], recency[empty], final_score[empty])
+
+    if candidates.size > k:
+        top = np.argpartition(-final_score[candidates], k - 1)[:k]
+        candidates = np.sort(candidates[top])
+    # 稳定排序：同分时保持检索顺序（与旧版 list.sort 行为一致）
+    order = candidates[np.argsort(-final_score[candidates], kind="stable")]
+    return RerankResult(order, similarity[order], recency[order], final_score[order])
@@ -17,12 +17,11 @@ import hashlib
 import time
 from dataclasses import dataclass
 from typing import Any, Awaitable, Dict, List, Optional, TypedDict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from src.utils.logger import get_logger
 from src.utils.cache_manager import cache_manager
 
-
 logger = get_logger(__name__)
 
 
@@ -101,6 +100,7 @@ class ConcurrentMemoryRetriever:
         source_timeout_s: float = 0.0,
         breaker_threshold: int = 3,
         breaker_cooldown_s: float = 3.0,
+        executor: Optional[Executor] = None,
     ):
         """
         初始化并发记忆检索器
@@ -111,10 +111,12 @@ class ConcurrentMemoryRetriever:
             max_workers: 最大并发工作线程数
             breaker_threshold: 熔断器阈值（连续失败次数）
             breaker_cooldown_s: 熔断器冷却时间（秒）
+            executor: 外部提供的线程池（如共享运行时的用户视图）；给出时不再自建，也不在 close 时关闭
         """
         self.long_term_memory = long_term_memory
         self.core_memory = core_memory
-        self.executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+        self._owns_executor = executor is None
+        self.executor: Optional[Executor] = executor or ThreadPoolExecutor(
             max_workers=max(1, int(max_workers)),
             thread_name_prefix="mintchat-mem",
         )
@@ -284,6 +286,9 @@ class ConcurrentMemoryRetriever:
         executor = self.executor
         if executor is None:
             return
+        if not getattr(self, "_owns_executor", True):
+            self.executor = None
+            return
         try:
             executor.shutdown(wait=False, cancel_futures=True)
         except TypeError:
@@ -300,7 +305,7 @@ class ConcurrentMemoryRetriever:
     def __del__(self):
         """清理资源（备用方法，不推荐依赖）"""
         executor = getattr(self, "executor", None)
-        if executor is not None:
+        if executor is not None and getattr(self, "_owns_executor", True):
             try:
                 executor.shutdown(wait=False)
             except Exception:
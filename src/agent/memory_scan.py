@@ -0,0 +1,124 @@
+"""
+长期记忆列式扫描模块
+
+将 Chroma 分页读取结果组织成按列的记录批次（ids / importance / timestamp_unix 为 NumPy 列），
+供 prune / 导出 / 时间范围回退扫描流式消费：
+- 每页读取只在读锁内完成，批次处理与写盘都在锁外进行
+- prune 只保留 ids 与两列数值，最后一次向量化计算年龄掩码、保护掩码与按评分保留的 top-N
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.agent.memory_reranker import to_float_column
+
+DEFAULT_IMPORTANCE = 0.5
+
+
+@dataclass(slots=True)
+class RecordBatch:
+    """一页长期记忆记录（数值列与 ids / metadatas 一一对应）"""
+
+    ids: List[str]
+    metadatas: List[Dict[str, Any]]
+    importance: np.ndarray
+    timestamp_unix: np.ndarray
+    documents: Optional[List[str]] = None
+    embeddings: Optional[Any] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_chunk(
+        cls,
+        chunk: Dict[str, Any],
+        parse_timestamp: Callable[[str], Optional[float]],
+    ) -> "RecordBatch":
+        """从 `collection.get()` 返回值构造批次（缺失 timestamp_unix 时回退解析 timestamp 字符串）。"""
+        ids = [str(x) for x in chunk.get("ids") or []]
+        metadatas = [dict(m or {}) for m in (chunk.get("metadatas") or [])]
+        if len(metadatas) < len(ids):
+            metadatas.extend({} for _ in range(len(ids) - len(metadatas)))
+        documents = chunk.get("documents")
+        embeddings = chunk.get("embeddings")
+        return cls(
+            ids=ids,
+            metadatas=metadatas,
+            importance=importance_column(metadatas),
+            timestamp_unix=timestamp_column(metadatas, parse_timestamp),
+            documents=list(documents) if documents is not None else None,
+            embeddings=embeddings,
+        )
+
+
+def importance_column(metadatas: List[Dict[str, Any]]) -> np.ndarray:
+    """importance 列：缺失、无法解析或为 0 时按默认值 0.5 处理（与历史逐条逻辑一致）。"""
+    column = to_float_column([m.get("importance") for m in metadatas], default=DEFAULT_IMPORTANCE)
+    column[~np.isfinite(column) | (column == 0.0)] = DEFAULT_IMPORTANCE
+    return column
+
+
+def timestamp_column(
+    metadatas: List[Dict[str, Any]],
+    parse_timestamp: Callable[[str], Optional[float]],
+) -> np.ndarray:
+    """timestamp_unix 列（优先数值字段，缺失时解析 ISO timestamp；仍无法得到时为 NaN）。"""
+    column = to_float_column([m.get("timestamp_unix") for m in metadatas])
+    for i in np.flatnonzero(np.isnan(column)).tolist():
+        ts = metadatas[i].get("timestamp")
+        if isinstance(ts, str) and ts:
+            parsed = parse_timestamp(ts)
+            if parsed is not None:
+                column[i] = parsed
+    return column
+
+
+def plan_prune(
+    importance: np.ndarray,
+    timestamp_unix: np.ndarray,
+    *,
+    preserve_importance_above: float,
+    cutoff_unix: Optional[float] = None,
+    max_items: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    向量化计算 prune 方案
+
+    - importance >= preserve_importance_above 的记录受保护
+    - cutoff_unix: 早于该时间的未保护记录删除（缺失时间戳的不按年龄删除）
+    - max_items: 在保护记录之外，按 (importance, timestamp) 保留评分最高的记录，总量不超过 max_items
+
+    Returns:
+        (protected_mask, delete_mask)
+    """
+    protected = importance >= float(preserve_importance_above)
+    delete = np.zeros(importance.shape[0], dtype=bool)
+    if cutoff_unix is not None:
+        # NaN 比较结果为 False：缺失时间戳不会被按年龄删除
+        with np.errstate(invalid="ignore"):
+            delete = ~protected & (timestamp_unix < float(cutoff_unix))
+
+    if max_items is not None:
+        candidates = np.flatnonzero(~protected & ~delete)
+        allowance = max(int(max_items) - int(protected.sum()), 0)
+        if candidates.size > allowance:
+            ts = np.nan_to_num(timestamp_unix[candidates], nan=0.0)
+            # lexsort 以最后一个键为主键：importance 升序、其次时间升序；末尾 allowance 条保留
+            order = np.lexsort((ts, importance[candidates]))
+            drop = candidates[order[: candidates.size - allowance]]
+            delete[drop] = True
+    return protected, delete
+
+
+__all__ = [
+    "DEFAULT_IMPORTANCE",
+    "RecordBatch",
+    "importance_column",
+    "plan_prune",
+    "timestamp_column",
+]
@@ -0,0 +1,258 @@
+"""
+长期记忆时间侧车索引
+
+Chroma 的 metadata where 过滤对时间范围没有有序索引，"今天/昨天/刚才"类查询往往退化为全量扫描。
+本模块在向量库旁维护一张 SQLite 表 `(id, timestamp_unix)`，以时间列 B-tree 索引：
+- 时间范围查询 = 一次二分定位 + 按 id 回表取内容（O(log n + k)）
+- 每次写入/删除/清空在向量库写锁内同步维护
+- `ready` 为 False（旧库首次启用、条数与向量库不一致、维护失败）时由调用方回退原扫描路径，
+  可通过 `LongTermMemory.rebuild_time_index()` 或 `scripts/rebuild_memory_time_index.py` 重建
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_VERSION = 1
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS memory_time (
+    id TEXT PRIMARY KEY,
+    ts REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_memory_time_ts ON memory_time (ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MemoryTimeIndex:
+    """`id -> timestamp_unix` 有序侧车索引（线程安全；单连接 + 互斥锁）。"""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 重建期间的写入先排队（不占用连接锁，避免与向量库写锁互相等待），重建提交前按序回放
+        self._state_lock = threading.Lock()
+        self._building = False
+        self._pending: List[Tuple[str, Any]] = []
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute("PRAGMA synchronous = NORMAL;")
+        self._conn.execute("PRAGMA busy_timeout = 5000;")
+        with self._conn:
+            self._conn.executescript(_SCHEMA_SQL)
+            version = self._get_meta("schema_version")
+            if version != str(SCHEMA_VERSION):
+                # 结构变化：丢弃旧数据，等待重建
+                self._conn.execute("DELETE FROM memory_time")
+                self._set_meta("schema_version", str(SCHEMA_VERSION))
+                self._set_meta("synced", "0")
+        self._count = self._select_count()
+        self._synced = self._get_meta("synced") == "1"
+        self._stats = {"queries": 0, "rebuilds": 0, "last_rebuild_ms": None}
+
+    # ------------------------------------------------------------------ status
+
+    @property
+    def ready(self) -> bool:
+        """索引与向量库同步（可用于回答时间范围查询）。"""
+        return self._synced
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)  # 不取连接锁：重建期间也能读取状态
+        stats.update({"ready": self._synced, "count": self._count, "path": str(self.path)})
+        return stats
+
+    # ------------------------------------------------------------------ sync
+
+    def sync_with(self, store_count: int) -> bool:
+        """
+        启动时校验：空库直接标记同步；条数不一致（如旧版本写入过向量库）则标记失效。
+
+        Returns:
+            bool: 校验后是否可用
+        """
+        store_count = int(store_count)
+        if store_count == 0 and self._count == 0:
+            self._mark(True)
+        elif self._synced and store_count != self._count:
+            logger.info(
+                "时间索引条数与向量库不一致（%d != %d），需重建后启用", self._count, store_count
+            )
+            self._mark(False)
+        return self._synced
+
+    def mark_stale(self) -> None:
+        """维护失败或写入未返回 id：标记失效，查询回退扫描路径。"""
+        if self._enqueue("stale", None):
+            return
+        if self._synced:
+            self._mark(False)
+
+    def rebuild(self, batches: Iterable[Tuple[Sequence[str], Sequence[float]]]) -> int:
+        """
+        用全量 `(ids, timestamps)` 批次重建索引（单事务；失败时保持失效状态）
+
+        Returns:
+            int: 重建后的条数
+        """
+        started = time.perf_counter()
+        with self._state_lock:
+            if self._building:
+                raise RuntimeError("时间索引正在重建")
+            self._building = True
+            self._pending = []
+            self._synced = False
+        stale = False
+        with self._lock:
+            try:
+                with self._conn:
+                    self._set_meta("synced", "0")
+                    self._conn.execute("DELETE FROM memory_time")
+                    # 批次读取时不持有向量库锁：期间的写入进入 _pending
+                    for ids, timestamps in batches:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO memory_time (id, ts) VALUES (?, ?)",
+                            zip(map(str, ids), map(float, timestamps)),
+                        )
+                    with self._state_lock:
+                        for op, payload in self._pending:
+                            if op == "upsert":
+                                self._upsert_rows(payload)
+                            elif op == "remove":
+                                self._remove_ids(payload)
+                            elif op == "reset":
+                                self._conn.execute("DELETE FROM memory_time")
+                                stale = False
+                            else:
+                                stale = True
+                        self._pending = []
+                        self._building = False
+                        self._set_meta("synced", "0" if stale else "1")
+            except Exception:
+                with self._state_lock:
+                    self._pending = []
+                    self._building = False
+                self._synced = False
+                self._count = self._select_count()
+                raise
+            self._count = self._select_count()
+            self._synced = not stale
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            self._stats["rebuilds"] += 1
+            self._stats["last_rebuild_ms"] = round(elapsed_ms, 2)
+        logger.info("时间索引重建完成: %d 条（耗时 %.0fms）", self._count, elapsed_ms)
+        return self._count
+
+    # ------------------------------------------------------------------ writes
+
+    def upsert(self, ids: Sequence[str], timestamps: Sequence[float]) -> None:
+        if not ids:
+            return
+        rows = list(zip(map(str, ids), map(float, timestamps)))
+        if self._enqueue("upsert", rows):
+            return
+        with self._lock, self._conn:
+            self._count += self._upsert_rows(rows)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        if not ids:
+            return
+        doc_ids = [str(x) for x in ids]
+        if self._enqueue("remove", doc_ids):
+            return
+        with self._lock, self._conn:
+            self._count = max(0, self._count - self._remove_ids(doc_ids))
+
+    def reset(self) -> None:
+        """向量库已清空：索引同步清空（清空后天然一致）。"""
+        if self._enqueue("reset", None):
+            return
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memory_time")
+            self._set_meta("synced", "1")
+            self._count = 0
+            self._synced = True
+
+    # ------------------------------------------------------------------ reads
+
+    def query(self, start_unix: float, end_unix: float, limit: int) -> List[Tuple[str, float]]:
+        """按时间倒序返回 `[start_unix, end_unix]` 内最新的 limit 条 `(id, timestamp_unix)`。"""
+        with self._lock:
+            self._stats["queries"] += 1
+            rows = self._conn.execute(
+                "SELECT id, ts FROM memory_time WHERE ts >= ? AND ts <= ? ORDER BY ts DESC LIMIT ?",
+                (float(start_unix), float(end_unix), max(1, int(limit))),
+            ).fetchall()
+        return [(str(doc_id), float(ts)) for doc_id, ts in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as exc:
+                logger.debug("关闭时间索引失败（可忽略）: %s", exc)
+
+    # ------------------------------------------------------------------ internals
+
+    def _enqueue(self, op: str, payload: Any) -> bool:
+        with self._state_lock:
+            if not self._building:
+                return False
+            self._pending.append((op, payload))
+            return True
+
+    def _upsert_rows(self, rows: List[Tuple[str, float]]) -> int:
+        inserted = self._conn.executemany(
+            "INSERT OR IGNORE INTO memory_time (id, ts) VALUES (?, ?)", rows
+        ).rowcount
+        # 覆盖导入：同 id 的时间戳可能变化
+        self._conn.executemany(
+            "UPDATE memory_time SET ts = ? WHERE id = ? AND ts != ?",
+            [(ts, doc_id, ts) for doc_id, ts in rows],
+        )
+        return max(0, int(inserted))
+
+    def _remove_ids(self, ids: List[str]) -> int:
+        removed = self._conn.executemany(
+            "DELETE FROM memory_time WHERE id = ?", [(doc_id,) for doc_id in ids]
+        ).rowcount
+        return max(0, int(removed))
+
+    def _select_count(self) -> int:
+        return int(self._conn.execute("SELECT COUNT(*) FROM memory_time").fetchone()[0])
+
+    def _mark(self, synced: bool) -> None:
+        with self._lock, self._conn:
+            self._set_meta("synced", "1" if synced else "0")
+            self._synced = synced
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return str(row[0]) if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+__all__ = ["MemoryTimeIndex", "SCHEMA_VERSION"]
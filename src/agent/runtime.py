@@ -0,0 +1,260 @@
+"""
+进程级共享 Agent 运行时（多用户会话共用线程池与事件循环）
+
+每个 ``MintChatAgent`` 原先各自创建一个 ``AsyncLoopThread``、四个线程池（后台/LLM/流式/阻塞桥接）
+和记忆检索线程池；同一进程服务 N 个用户会话时线程数与无状态组件按 N 倍增长。
+
+``AgentRuntime`` 在进程内只创建一次这些资源，并为每个 Agent 发放轻量的 ``AgentSession``：
+- 线程池为 ``FairShareExecutor``：按用户轮转调度，单用户并发上限沿用原私有线程池的大小
+- 事件循环共享一个 ``AsyncLoopThread``；会话关闭只取消本会话提交的协程
+- 无用户状态的组件全进程共用一份：``MemoryScorer``；角色一致性评分器由
+  ``memory_optimizer.get_character_scorer`` 按角色名复用
+- embedding 模型与 API 客户端已由 ``chroma_helper`` 按模型进程级复用，这里不重复持有
+
+空闲会话只保留 ``AgentSession`` 本身（几个 Executor 视图与 Future 集合），不占线程。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Any, Coroutine, Dict, Hashable, Optional, Set, TypeVar
+from weakref import WeakSet
+
+from src.config.settings import settings
+from src.utils.async_loop_thread import AsyncLoopThread
+from src.utils.fair_executor import FairShareExecutor, UserExecutor
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_POOL_NAMES = ("background", "llm", "stream", "blocking", "memory")
+
+
+class SessionLoop:
+    """
+    共享事件循环上某个会话的视图（接口与 ``AsyncLoopThread`` 一致）
+
+    ``close`` 只取消本会话尚未完成的协程，不停止共享 loop。
+    """
+
+    def __init__(self, loop_thread: AsyncLoopThread) -> None:
+        self._loop_thread = loop_thread
+        self._lock = threading.Lock()
+        self._futures: Set[Future] = set()
+        self._closing = False
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        with self._lock:
+            if self._closing:
+                coro.close()
+                raise RuntimeError("会话事件循环已关闭，无法提交任务")
+            future = self._loop_thread.submit(coro)
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def run(self, coro: Coroutine[Any, Any, T], *, timeout: Optional[float] = None) -> T:
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            raise
+
+    def call_soon_threadsafe(self, callback, *args: Any) -> None:
+        self._loop_thread.call_soon_threadsafe(callback, *args)
+
+    def close(self, *, timeout: float = 3.0) -> None:
+        with self._lock:
+            self._closing = True
+            futures = list(self._futures)
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    def _discard(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+
+class AgentSession:
+    """发给单个 Agent 的轻量运行时句柄（线程池视图 + 事件循环视图）。"""
+
+    __slots__ = (
+        "user_key",
+        "loop",
+        "background",
+        "llm",
+        "stream",
+        "blocking",
+        "memory",
+        "_runtime",
+        "__weakref__",
+    )
+
+    def __init__(self, runtime: "AgentRuntime", user_key: Hashable) -> None:
+        self._runtime = runtime
+        self.user_key = user_key
+        self.loop = SessionLoop(runtime.loop_thread)
+        self.background: UserExecutor = runtime.pool("background").for_user(user_key)
+        self.llm: UserExecutor = runtime.pool("llm").for_user(user_key)
+        self.stream: UserExecutor = runtime.pool("stream").for_user(user_key)
+        self.blocking: UserExecutor = runtime.pool("blocking").for_user(user_key)
+        self.memory: UserExecutor = runtime.pool("memory").for_user(user_key)
+
+    def pending_count(self) -> int:
+        return self.loop.pending_count() + sum(
+            getattr(self, name).pending_count() for name in _POOL_NAMES
+        )
+
+    def close(self) -> None:
+        """取消本会话排队中的任务并拒绝新任务（幂等，不影响其他会话）。"""
+        self.loop.close()
+        for name in _POOL_NAMES:
+            getattr(self, name).shutdown(wait=False, cancel_futures=True)
+
+
+class AgentRuntime:
+    """
+    进程级共享运行时
+
+    Args:
+        pool_workers: 各共享线程池的线程上限（background/llm/stream/blocking/memory）
+        per_user_limits: 各线程池的单用户并发上限
+    """
+
+    def __init__(
+        self,
+        *,
+        pool_workers: Optional[Dict[str, int]] = None,
+        per_user_limits: Optional[Dict[str, int]] = None,
+        idle_timeout_s: float = 60.0,
+    ) -> None:
+        workers = {"background": 4, "llm": 8, "stream": 8, "blocking": 4, "memory": 8}
+        workers.update(pool_workers or {})
+        limits = {"background": 2, "llm": 2, "stream": 2, "blocking": 1, "memory": 4}
+        limits.update(per_user_limits or {})
+
+        self.loop_thread = AsyncLoopThread(thread_name="mintchat-agent-runtime-loop")
+        self._pools: Dict[str, FairShareExecutor] = {
+            name: FairShareExecutor(
+                workers[name],
+                per_user_limit=limits[name],
+                thread_name_prefix=f"mintchat-agent-{name}",
+                idle_timeout_s=idle_timeout_s,
+            )
+            for name in _POOL_NAMES
+        }
+        self._sessions: "WeakSet[AgentSession]" = WeakSet()
+        self._lock = threading.Lock()
+        self._memory_scorer: Any = None
+        self._closed = False
+
+    @classmethod
+    def from_settings(cls) -> "AgentRuntime":
+        """按 settings.agent 构建：单用户上限沿用原私有线程池大小，总量由 runtime_* 配置。"""
+        agent = settings.agent
+        llm_per_user = max(1, int(getattr(agent, "llm_executor_workers", 2)))
+        stream_per_user = max(1, int(getattr(agent, "stream_executor_workers", 2)))
+        return cls(
+            pool_workers={
+                "background": int(getattr(agent, "runtime_background_workers", 4)),
+                "llm": int(getattr(agent, "runtime_llm_workers", 8)),
+                "stream": int(getattr(agent, "runtime_stream_workers", 8)),
+                "blocking": int(getattr(agent, "runtime_blocking_workers", 4)),
+                "memory": int(getattr(agent, "runtime_memory_workers", 8)),
+            },
+            per_user_limits={"llm": llm_per_user, "stream": stream_per_user},
+        )
+
+    def pool(self, name: str) -> FairShareExecutor:
+        return self._pools[name]
+
+    @property
+    def memory_scorer(self) -> Any:
+        """无用户状态的记忆评分器（全进程一份）。"""
+        with self._lock:
+            if self._memory_scorer is None:
+                from src.agent.memory_scorer import MemoryScorer
+
+                self._memory_scorer = MemoryScorer()
+            return self._memory_scorer
+
+    def session(self, user_id: Optional[int] = None) -> AgentSession:
+        """为 Agent 创建会话句柄；同一用户的多个会话共享该用户的并发上限。"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("AgentRuntime 已关闭")
+            session = AgentSession(self, "global" if user_id is None else user_id)
+            self._sessions.add(session)
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "pools": {name: pool.stats() for name, pool in self._pools.items()},
+        }
+
+    def close(self, *, timeout: float = 3.0) -> None:
+        """关闭所有共享资源（进程退出时调用，幂等）。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.loop_thread.close(timeout=timeout)
+
+        # 工具注册表同样是进程级资源（线程池/MCP 会话），不随单个 Agent 关闭
+        if "src.agent.tools" in sys.modules:
+            try:
+                from src.agent.tools import tool_registry
+
+                tool_registry.close()
+            except Exception as exc:
+                logger.debug("关闭工具执行器时出错（可忽略）: %s", exc)
+
+
+_runtime: Optional[AgentRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_agent_runtime() -> AgentRuntime:
+    """获取进程级共享运行时（惰性创建）。"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AgentRuntime.from_settings()
+            logger.debug("共享 AgentRuntime 已创建")
+        return _runtime
+
+
+def shutdown_agent_runtime(*, timeout: float = 3.0) -> None:
+    """关闭进程级共享运行时（之后 ``get_agent_runtime`` 会重新创建）。"""
+    global _runtime
+    with _runtime_lock:
+        runtime, _runtime = _runtime, None
+    if runtime is not None:
+        runtime.close(timeout=timeout)
+
+
+__all__ = [
+    "AgentRuntime",
+    "AgentSession",
+    "SessionLoop",
+    "get_agent_runtime",
+    "shutdown_agent_runtime",
+]
@@ -0,0 +1,704 @@
+"""
+流式输出过滤器（单次扫描状态机）
+
+部分 OpenAI 兼容网关 / 旧的流式链路会把工具选择、结构化输出或工具结果当作普通文本吐出
+（ToolSelectionResponse 行、tool_calls JSON、分流标签列表、TOOL_RESULT 块），且经常被切碎到
+多个增量里。`StreamTextFilter` 把“开头结构化前缀剥离 + 行首工具痕迹清理 + 细碎增量合并”
+合并为一个增量状态机：
+
+- 每个字符只扫描一次：普通文本按行透传，只有行首出现可疑标记时才开始暂存
+- JSON 片段用增量括号/字符串状态机判定闭合，闭合时只做一次 `json.loads` 分类
+- 暂存区有上限（max_buffer_chars），超限后立即做出保留/丢弃决定，不再无限回看
+- 丢弃/保留规则与旧实现保持一致（工具调用载荷、紧跟 `}`/`{`/`[` 的分流标签列表、
+  TOOL_RESULT 头及其续行、ToolSelectionResponse 行）；保留的 JSON 片段之后仍按行首规则判定。
+  各规则的输入/期望输出样例见 tests/test_stream_tool_result_scrubber.py
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+# 预编译正则（热路径）
+_IDENT_TOKEN_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]{0,63}$")
+# JSON 结构字符（字符串外）；非 ASCII 字符出现在字符串外说明更像自然语言
+_JSON_TOKEN_RE = re.compile(r'[\[\]{}"]|[^\x00-\x7f]')
+_JSON_STRING_RE = re.compile(r'["\\]')
+_TOOL_RESULT_KV_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*\s*:\s*")
+_TOOL_RESULT_NUMBERED_RE = re.compile(r"^\d+\.\s*")
+_TOOL_RESULT_PARTIAL_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\s*|\d+")
+
+_WS = " \t\r\n"
+_SELECTION_MARKER = "toolselectionresponse"
+_TOOL_RESULT_MARKER = "tool_result"
+_TRUNCATED_MARKER = "[...工具输出已截断"
+
+# 状态
+_LINE_START = 0  # 行首/丢弃后的边界：暂存空白，等待第一个有效字符
+_TEXT = 1  # 行内普通文本：透传到换行
+_PASS = 2  # 仅前缀模式下已确认正文：后续全部透传
+_MARKER = 3  # 行首疑似 ToolSelectionResponse / TOOL_RESULT 标记
+_DISCARD_LINE = 4  # 丢弃到行尾
+_JSON = 5  # 行首 JSON 片段（暂存）
+_JSON_DISCARD = 6  # 超限且疑似工具载荷：不再暂存，扫描到闭合后丢弃
+_TAG_DEFER = 7  # 已闭合的分流标签列表：等待下一个非空白字符决定去留
+_AFTER_DROP = 8  # 丢弃片段后：跳过空白与一个多余的 '}'
+_TOOL_RESULT_LINE = 9  # TOOL_RESULT 模式下的候选续行
+
+
+def _looks_like_tool_call_payload(data: Any) -> bool:
+    """
+    Heuristically detect common "tool call" / structured-tool routing payloads that should not be
+    shown to UI/TTS.
+
+    This targets OpenAI-style tool call JSON such as:
+      [{"id": "...", "type": "function", "function": {"name": "...", "arguments": "..."}}, ...]
+    as well as common wrapper variants ("tools"/"tool_calls", {"tool": ..., "args": ...}).
+    """
+
+    def _lower_keys(mapping: Dict[Any, Any]) -> set[str]:
+        try:
+            return {str(k).lower() for k in mapping.keys()}
+        except Exception:
+            return set()
+
+    if isinstance(data, dict):
+        keys = _lower_keys(data)
+        dtype = str(data.get("type") or "").lower()
+
+        if "tool_calls" in keys or "tools" in keys or dtype in {"tool_calls", "tool_call"}:
+            return True
+
+        if dtype == "function":
+            func = data.get("function")
+            if isinstance(func, dict):
+                fkeys = _lower_keys(func)
+                if "name" in fkeys and ("arguments" in fkeys or "args" in fkeys):
+                    return True
+            if "name" in keys and ("arguments" in keys or "args" in keys):
+                return True
+
+        # OpenAI tool call dict without explicit "type":"function" (defensive)
+        func = data.get("function")
+        if "function" in keys and isinstance(func, dict):
+            fkeys = _lower_keys(func)
+            if "name" in fkeys and ("arguments" in fkeys or "args" in fkeys):
+                return True
+
+        # Common wrapper-style forms
+        if "tool" in keys and (
+            "args" in keys or "arguments" in keys or "tool_input" in keys or "toolinput" in keys
+        ):
+            return True
+
+        # Some gateways emit {"id": "...", "name": "...", "arguments": "..."}.
+        if (
+            "name" in keys
+            and ("arguments" in keys or "args" in keys)
+            and ("id" in keys or "tool" in keys)
+        ):
+            return True
+
+        return False
+
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        return any(_looks_like_tool_call_payload(item) for item in data)
+
+    return False
+
+
+def _looks_like_route_tag_list(data: Any) -> bool:
+    """
+    Detect routing/tag lists leaked into the assistant text, e.g.:
+      ["local_search", "map_guide"]
+      ["emotion_analysis", "affection_expression", ...]
+
+    We keep it conservative: only list[str] of identifier-like snake_case tokens.
+    """
+    if not (isinstance(data, list) and data and all(isinstance(item, str) for item in data)):
+        return False
+    if len(data) > 24:
+        return False
+    normalized = [item.strip() for item in data if isinstance(item, str)]
+    if not normalized:
+        return False
+    if not all(_IDENT_TOKEN_RE.fullmatch(item) for item in normalized):
+        return False
+    if not any("_" in item for item in normalized):
+        return False
+    return True
+
+
+def _text_looks_like_tool_payload(text: str) -> bool:
+    """无法解析为 JSON 时的保守判定：仅在强烈像工具调用载荷时返回 True。"""
+    compact = text.lower().replace(" ", "")
+    return (
+        "toolselectionresponse" in compact
+        or "tool_calls" in compact
+        or '"tools"' in compact
+        or '"type":"function"' in compact
+        or ('"function"' in compact and '"arguments"' in compact and '"name"' in compact)
+    )
+
+
+def _tool_result_line_state(line: str, *, complete: bool) -> Optional[bool]:
+    """
+    判断 TOOL_RESULT 块中的一行是否为续行
+
+    Args:
+        line: 去除首尾空白后的行内容（可能尚未收到换行）
+        complete: 是否已收到整行
+
+    Returns:
+        Optional[bool]: True 为续行（丢弃），False 为正文，None 表示还需更多字符
+    """
+    if not line:
+        return True if complete else None
+    if (
+        line.lower() == "results:"
+        or line.startswith(_TRUNCATED_MARKER)
+        or _TOOL_RESULT_KV_RE.match(line)
+        or _TOOL_RESULT_NUMBERED_RE.match(line)
+    ):
+        return True
+    if complete:
+        return False
+    if (
+        "results:".startswith(line.lower())
+        or _TRUNCATED_MARKER.startswith(line)
+        or _TOOL_RESULT_PARTIAL_RE.fullmatch(line)
+    ):
+        return None
+    return False
+
+
+class StreamTextFilter:
+    """
+    单次扫描的流式文本过滤器（替代“前缀剥离 + 工具痕迹清理 + 增量合并”三段式管线）。
+
+    用法：每个增量调用 `push()`，流结束时调用 `flush()`；返回值即可直接发送给 UI/TTS。
+    """
+
+    __slots__ = (
+        "_min_chars",
+        "_max_buffer_chars",
+        "_prefix_only",
+        "_max_prefix_fragments",
+        "_mode",
+        "_held",
+        "_held_len",
+        "_json_start",
+        "_stack",
+        "_in_string",
+        "_escaped",
+        "_json_tool_hint",
+        "_marker",
+        "_brace_consumed",
+        "_discard_to_tool_result",
+        "_in_tool_result",
+        "_drops",
+        "_out",
+        "_out_len",
+        "_out_newline",
+        "_emitted",
+        "_snapshot",
+        "peak_buffered",
+    )
+
+    def __init__(
+        self,
+        *,
+        min_chars: int = 1,
+        max_buffer_chars: int = 60_000,
+        prefix_only: bool = False,
+        max_prefix_fragments: int = 5,
+    ) -> None:
+        """
+        Args:
+            min_chars: 合并输出的最小字符数（遇到换行立即输出）
+            max_buffer_chars: 暂存区上限（可疑片段超限后立即决定去留）
+            prefix_only: 仅处理流开头的结构化前缀，确认正文后全部透传
+            max_prefix_fragments: prefix_only 模式下最多剥离的前缀片段数
+        """
+        self._min_chars = max(1, int(min_chars))
+        self._max_buffer_chars = max(0, int(max_buffer_chars))
+        self._prefix_only = bool(prefix_only)
+        self._max_prefix_fragments = max(0, int(max_prefix_fragments))
+        self._out: list[str] = []
+        self._out_len = 0
+        self._out_newline = False
+        self._snapshot = ""
+        self.peak_buffered = 0
+        self._reset_scan()
+
+    def _reset_scan(self) -> None:
+        self._mode = _PASS if self._prefix_only and self._max_prefix_fragments <= 0 else _LINE_START
+        self._held: list[str] = []
+        self._held_len = 0
+        self._json_start = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._json_tool_hint = False
+        self._marker = ""
+        self._brace_consumed = False
+        self._discard_to_tool_result = False
+        self._in_tool_result = False
+        self._drops = 0
+        self._emitted = False
+
+    # ------------------------------------------------------------------ public API
+
+    def push(self, delta: str) -> str:
+        """输入一个增量，返回可以立即输出的文本（可能为空字符串）。"""
+        if not delta:
+            return ""
+        self._feed(delta)
+        buffered = self._held_len + self._out_len
+        if buffered > self.peak_buffered:
+            self.peak_buffered = buffered
+        if self._out_newline or self._out_len >= self._min_chars:
+            return self._drain()
+        return ""
+
+    def push_snapshot(self, text: str) -> str:
+        """输入累计文本快照（旧式流每次返回全量文本），仅处理新增部分。"""
+        if not text:
+            return ""
+        last = self._snapshot
+        size = len(last)
+        self._snapshot = text
+        if len(text) >= size and text[max(0, size - 64) : size] == last[-64:]:
+            return self.push(text[size:])
+        prefix_len = 0
+        for a, b in zip(text, last):
+            if a != b:
+                break
+            prefix_len += 1
+        return self.push(text[prefix_len:])
+
+    def flush(self) -> str:
+        """流结束：对暂存内容做最终决定并输出全部剩余文本，然后重置状态。"""
+        while True:
+            mode = self._mode
+            if mode == _MARKER:
+                probe = self._marker
+                if (_TOOL_RESULT_MARKER.startswith(probe) and len(probe) >= 7) or (
+                    _SELECTION_MARKER.startswith(probe) and len(probe) >= 8
+                ):
+                    self._drop_held()
+                else:
+                    self._keep_held()
+            elif mode in (_JSON, _JSON_DISCARD):
+                if mode == _JSON and not _text_looks_like_tool_payload(
+                    self._held_text()[self._json_start :]
+                ):
+                    self._keep_held()
+                else:
+                    self._drop_held()
+            elif mode == _TOOL_RESULT_LINE:
+                line = self._held_text()
+                self._drop_held()
+                if not _tool_result_line_state(line.strip(), complete=True):
+                    self._in_tool_result = False
+                    self._mode = _LINE_START
+                    self._feed(line)
+                    continue
+            else:
+                self._keep_held()
+            break
+
+        self._snapshot = ""
+        self._reset_scan()
+        return self._drain()
+
+    # ------------------------------------------------------------------ buffers
+
+    def _emit(self, text: str) -> None:
+        if text:
+            self._emitted = True
+            self._out.append(text)
+            self._out_len += len(text)
+            if "\n" in text:
+                self._out_newline = True
+
+    def _drain(self) -> str:
+        if not self._out:
+            return ""
+        out = self._out[0] if len(self._out) == 1 else "".join(self._out)
+        self._out = []
+        self._out_len = 0
+        self._out_newline = False
+        return out
+
+    def _hold(self, text: str) -> None:
+        if text:
+            self._held.append(text)
+            self._held_len += len(text)
+
+    def _held_text(self) -> str:
+        if len(self._held) > 1:
+            self._held = ["".join(self._held)]
+        return self._held[0] if self._held else ""
+
+    def _keep_held(self) -> None:
+        if self._held:
+            self._emit(self._held_text())
+            self._held = []
+            self._held_len = 0
+
+    def _drop_held(self) -> None:
+        self._held = []
+        self._held_len = 0
+
+    def _to_text(self) -> None:
+        """确认当前位置为正文。"""
+        self._keep_held()
+        self._mode = _PASS if self._prefix_only else _TEXT
+
+    def _to_kept_json(self) -> None:
+        """保留已闭合的 JSON 片段：其后的内容仍按行首规则判定（可能紧跟 TOOL_RESULT 块）。"""
+        self._keep_held()
+        self._mode = _PASS if self._prefix_only else _LINE_START
+
+    def _to_dropped(self) -> None:
+        self._drop_held()
+        self._drops += 1
+        self._brace_consumed = False
+        self._mode = _AFTER_DROP
+
+    # ------------------------------------------------------------------ state machine
+
+    def _feed(self, text: str) -> None:
+        i = 0
+        n = len(text)
+        while i < n:
+            mode = self._mode
+
+            if mode == _TEXT:
+                nl = text.find("\n", i)
+                if nl < 0:
+                    self._emit(text[i:] if i else text)
+                    return
+                self._emit(text[i : nl + 1])
+                i = nl + 1
+                self._mode = _LINE_START
+
+            elif mode == _PASS:
+                self._emit(text[i:] if i else text)
+                return
+
+            elif mode == _LINE_START:
+                j = i
+                while j < n and text[j] in _WS:
+                    j += 1
+                if j > i and not self._in_tool_result:
+                    self._hold(text[i:j])
+                    if self._emitted and "\n" in text[i:j]:
+                        # 已有正文：换行原样输出，不随后续被丢弃的片段一起吞掉
+                        ws = self._held_text()
+                        cut = ws.rfind("\n") + 1
+                        self._drop_held()
+                        self._emit(ws[:cut])
+                        self._hold(ws[cut:])
+                if j >= n:
+                    return
+                i = j
+                if self._prefix_only and self._drops >= self._max_prefix_fragments:
+                    self._to_text()
+                elif self._in_tool_result:
+                    self._mode = _TOOL_RESULT_LINE
+                else:
+                    ch = text[i]
+                    if ch == "{" or ch == "[":
+                        self._json_start = self._held_len
+                        self._stack = []
+                        self._in_string = False
+                        self._escaped = False
+                        self._json_tool_hint = False
+                        self._mode = _JSON
+                    elif ch == "t" or ch == "T":
+                        self._marker = ""
+                        self._mode = _MARKER
+                    else:
+                        self._to_text()
+
+            elif mode == _MARKER:
+                i = self._scan_marker(text, i)
+
+            elif mode == _DISCARD_LINE:
+                nl = text.find("\n", i)
+                if nl < 0:
+                    return
+                i = nl + 1
+                if self._discard_to_tool_result:
+                    self._in_tool_result = True
+                    self._mode = _LINE_START
+                else:
+                    self._brace_consumed = False
+                    self._mode = _AFTER_DROP
+
+            elif mode == _JSON or mode == _JSON_DISCARD:
+                i = self._scan_json(text, i)
+
+            elif mode == _TAG_DEFER:
+                j = i
+                while j < n and text[j] in _WS:
+                    j += 1
+                self._hold(text[i:j])
+                if j >= n:
+                    return
+                ch = text[j]
+                if ch == "}":
+                    self._to_dropped()
+                    self._brace_consumed = True
+                    i = j + 1
+                elif ch == "{" or ch == "[":
+                    self._to_dropped()
+                    self._mode = _LINE_START
+                    i = j
+                else:
+                    self._to_kept_json()
+                    i = j
+
+            elif mode == _AFTER_DROP:
+                while i < n and text[i] in _WS:
+                    i += 1
+                if i >= n:
+                    return
+                # 流开头的结构化前缀后可能跟多个多余的 '}'；正文之后只吞一个
+                if text[i] == "}" and not (self._brace_consumed and self._emitted):
+                    self._brace_consumed = True
+                    i += 1
+                else:
+                    self._mode = _LINE_START
+
+            else:  # _TOOL_RESULT_LINE
+                nl = text.find("\n", i)
+                end = n if nl < 0 else nl
+                self._hold(text[i:end])
+                complete = nl >= 0 or (
+                    self._max_buffer_chars and self._held_len > self._max_buffer_chars
+                )
+                line = self._held_text()
+                state = _tool_result_line_state(line.strip(), complete=bool(complete))
+                if state is None:
+                    return
+                self._drop_held()
+                if state:
+                    if nl < 0:
+                        self._discard_to_tool_result = True
+                        self._mode = _DISCARD_LINE
+                        return
+                    self._mode = _LINE_START
+                    i = nl + 1
+                else:
+                    # 正文：退出 TOOL_RESULT 模式，该行按普通行重新判定
+                    self._in_tool_result = False
+                    self._mode = _LINE_START
+                    self._feed(line)
+                    i = end
+
+    def _scan_marker(self, text: str, i: int) -> int:
+        n = len(text)
+        start = i
+        probe = self._marker
+        while i < n:
+            ch = text[i]
+            if ch == "\n":
+                # 整行都是标记前缀（例如单独一行 "tool"）：按正文处理
+                self._hold(text[start:i])
+                self._to_text()
+                return i
+            probe += ch.lower()
+            i += 1
+            if probe == _SELECTION_MARKER or probe == _TOOL_RESULT_MARKER:
+                self._drop_held()
+                self._discard_to_tool_result = probe == _TOOL_RESULT_MARKER
+                self._mode = _DISCARD_LINE
+                return i
+            if not (_SELECTION_MARKER.startswith(probe) or _TOOL_RESULT_MARKER.startswith(probe)):
+                self._hold(text[start:i])
+                self._to_text()
+                return i
+        self._hold(text[start:i])
+        self._marker = probe
+        return i
+
+    def _scan_json(self, text: str, i: int) -> int:
+        n = len(text)
+        start = i
+        discard = self._mode == _JSON_DISCARD
+        stack = self._stack
+        while i < n:
+            if self._escaped:
+                self._escaped = False
+                i += 1
+                continue
+            if self._in_string:
+                m = _JSON_STRING_RE.search(text, i)
+                if m is None:
+                    i = n
+                    break
+                i = m.end()
+                if text[i - 1] == "\\":
+                    self._escaped = True
+                else:
+                    self._in_string = False
+                continue
+
+            m = _JSON_TOKEN_RE.search(text, i)
+            if m is None:
+                i = n
+                break
+            i = m.end()
+            ch = text[i - 1]
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                stack.append(ch)
+            elif ch == "}" or ch == "]":
+                opener = stack.pop() if stack else ""
+                if (opener == "{" and ch != "}") or (opener == "[" and ch != "]") or not opener:
+                    # 括号不匹配：不是 JSON
+                    if discard:
+                        self._to_dropped()
+                    else:
+                        self._hold(text[start:i])
+                        self._to_text()
+                    return i
+                if not stack:
+                    if discard:
+                        self._to_dropped()
+                    else:
+                        self._hold(text[start:i])
+                        self._finish_json()
+                    return i
+            elif not discard and not self._json_tool_hint:
+                # 字符串外出现非 ASCII 字符：更像自然语言（例如 "[注意] ..."）
+                self._hold(text[start:i])
+                start = i
+                if not _text_looks_like_tool_payload(self._held_text()[self._json_start :]):
+                    self._to_text()
+                    return i
+                self._json_tool_hint = True
+
+        if not discard:
+            self._hold(text[start:i])
+            if self._max_buffer_chars and self._held_len > self._max_buffer_chars:
+                if _text_looks_like_tool_payload(self._held_text()[self._json_start :]):
+                    self._drop_held()
+                    self._mode = _JSON_DISCARD
+                else:
+                    self._to_text()
+        return i
+
+    def _finish_json(self) -> None:
+        fragment = self._held_text()[self._json_start :]
+        parsed: Any = None
+        try:
+            parsed = json.loads(fragment)
+        except Exception:
+            parsed = None
+
+        if parsed is None:
+            drop = _text_looks_like_tool_payload(fragment)
+        elif _looks_like_tool_call_payload(parsed):
+            drop = True
+        elif _looks_like_route_tag_list(parsed):
+            # Only remove tag lists when they behave like leaked internal markers (followed by a
+            # stray brace or another JSON block); the user might legitimately ask for a JSON array.
+            self._mode = _TAG_DEFER
+            return
+        else:
+            drop = False
+
+        if drop:
+            self._to_dropped()
+        else:
+            self._to_kept_json()
+
+
+class StreamStructuredPrefixStripper(StreamTextFilter):
+    """仅剥离流开头结构化前缀的兼容封装（`process()` 逐增量透传，无合并）。"""
+
+    __slots__ = ()
+
+    def __init__(self, *, max_fragments: int = 3, max_buffer_chars: int = 4096) -> None:
+        super().__init__(
+            max_buffer_chars=max_buffer_chars,
+            prefix_only=True,
+            max_prefix_fragments=max_fragments,
+        )
+
+    def process(self, delta: str) -> str:
+        return self.push(delta)
+
+
+class StreamToolTraceScrubber(StreamTextFilter):
+    """行首工具痕迹清理的兼容封装（`process()` 逐增量透传，无合并）。"""
+
+    __slots__ = ()
+
+    def __init__(self, *, max_buffer_chars: int = 16_384) -> None:
+        super().__init__(max_buffer_chars=max_buffer_chars)
+
+    def process(self, delta: str) -> str:
+        return self.push(delta)
+
+
+class RetractableStreamFilter:
+    """
+    支持撤回的 `StreamTextFilter` 封装（native 推测流式）。
+
+    记录原始增量与已输出文本；撤回末尾 N 个原始字符时，用新的过滤器重放剩余原始文本，
+    与已输出内容比对后给出“下游需撤回的字符数 + 需补发的文本”。
+    """
+
+    __slots__ = ("_kwargs", "_filter", "_raw", "_emitted")
+
+    def __init__(self, **filter_kwargs: Any) -> None:
+        self._kwargs = filter_kwargs
+        self._filter = StreamTextFilter(**filter_kwargs)
+        self._raw: list[str] = []
+        self._emitted: list[str] = []
+
+    def push(self, delta: str) -> str:
+        if delta:
+            self._raw.append(delta)
+        out = self._filter.push(delta)
+        if out:
+            self._emitted.append(out)
+        return out
+
+    def flush(self) -> str:
+        out = self._filter.flush()
+        if out:
+            self._emitted.append(out)
+        return out
+
+    def retract(self, chars: int) -> tuple[int, str]:
+        """丢弃最近 `chars` 个原始字符；返回 (下游需撤回的已输出字符数, 撤回后需补发的文本)。"""
+        raw = "".join(self._raw)
+        keep = raw[: max(0, len(raw) - max(0, int(chars)))]
+        emitted = "".join(self._emitted)
+
+        self._filter = StreamTextFilter(**self._kwargs)
+        self._raw = [keep] if keep else []
+        replay = self._filter.push(keep) if keep else ""
+        self._emitted = [replay] if replay else []
+
+        common = 0
+        limit = min(len(emitted), len(replay))
+        while common < limit and emitted[common] == replay[common]:
+            common += 1
+        return len(emitted) - common, replay[common:]
+
+
+__all__ = [
+    "RetractableStreamFilter",
+    "StreamStructuredPrefixStripper",
+    "StreamTextFilter",
+    "StreamToolTraceScrubber",
+]
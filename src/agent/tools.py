@@ -1038,7 +1038,7 @@ def get_weather(city: str) -> str:
         ).strip()
 
 
-@tool
+@tool(parallel_safe=False)
 def set_reminder(content: str, time: str) -> str:
     """
     设置提醒
@@ -1180,7 +1180,7 @@ def map_search(keywords: str, city: str = "", limit: int = 5) -> str:
         ).strip()
 
 
-@tool
+@tool(parallel_safe=False)
 def save_note(title: str, content: str) -> str:
     """
     保存笔记
@@ -1333,7 +1333,7 @@ def read_file(filepath: str, base_dir: str = ".") -> str:
         return f"抱歉主人，读取文件时出错了: {str(e)} 喵~"
 
 
-@tool
+@tool(parallel_safe=False)
 @tool_with_retry(max_retries=2, retry_delay=0.5)
 @validate_params(
     filepath=lambda x: isinstance(x, str) and len(x) > 0, content=lambda x: isinstance(x, str)
@@ -1631,6 +1631,21 @@ class ToolRegistry:
         with self._lock:
             return self._tools.get(name)
 
+    def is_parallel_safe(self, name: str) -> bool:
+        """
+        判断工具是否允许与同一轮的其他工具调用并发执行
+
+        Args:
+            name: 工具名称
+
+        Returns:
+            bool: 未声明 `parallel_safe=False` 的工具均视为可并发
+        """
+        tool_func = self.get_tool(name)
+        if tool_func is None:
+            return True
+        return bool(getattr(tool_func, "parallel_safe", True))
+
     def get_all_tools(self) -> List[Callable]:
         """
         获取所有工具（包括 MCP 工具）
@@ -0,0 +1,362 @@
+"""
+用户数据流式归档（gzip 压缩的 JSON Lines）
+
+``export_user_data`` 会把所有联系人的完整聊天记录组装成一个大 dict 再 ``json.dump``，
+导入时整体 ``json.load``：重度用户需要数百 MB 内存，并让 UI 卡顿数秒。
+
+归档每行一个 JSON 对象，按 ``type`` 区分::
+
+    {"type": "header", "format": "mintchat-archive", "version": 1, "user_id": 1, ...}
+    {"type": "settings", "data": {...}}
+    {"type": "contact", "name": "...", "avatar": "...", "status": "..."}
+    {"type": "message", "id": 1, "contact_name": "...", "role": "...", "content": "...", ...}
+    {"type": "long_term", "id": "...", "content": "...", "metadata": {...}}
+    {"type": "core_memory", "id": "...", "content": "...", "metadata": {...}}
+    {"type": "footer", "counts": {...}}
+
+- 导出：聊天记录按 id 做 keyset 分页读取并逐页写出，长期/核心记忆按页扫描；
+  先写临时文件，完成后原子替换
+- 导入：逐行解压解析，按批事务写入；消息批次与断点（已处理行号）在同一事务提交，
+  中断后再次导入同一归档会从断点继续，消息不会重复写入
+  （记忆库不在 SQLite 事务内，断点前最后一批可能重复导入）
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from src.auth.user_data_manager import UserDataManager
+
+logger = get_logger(__name__)
+
+ARCHIVE_FORMAT = "mintchat-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".jsonl.gz"
+
+# progress(stage, done, total)：导出时按记录数（total 未知时为 0），导入时按已读取的压缩字节数
+ProgressCallback = Callable[[str, int, int], None]
+
+_MEMORY_SECTIONS = ("long_term", "core_memory")
+
+
+def _emit(progress: Optional[ProgressCallback], stage: str, done: int, total: int) -> None:
+    if progress is None:
+        return
+    try:
+        progress(stage, done, total)
+    except Exception as exc:
+        logger.debug("归档进度回调出错（可忽略）: %s", exc)
+
+
+def is_user_archive(path: Path | str) -> bool:
+    """是否为 gzip 归档（按文件头魔数判断，兼容旧版 JSON 导出文件）。"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(2) == b"\x1f\x8b"
+    except OSError:
+        return False
+
+
+def export_user_archive(
+    manager: "UserDataManager",
+    user_id: int,
+    path: Path | str,
+    *,
+    long_term: Any = None,
+    core_memory: Any = None,
+    page_size: int = 1000,
+    compresslevel: int = 6,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    将用户数据（设置/联系人/聊天记录，及可选的长期记忆与核心记忆）流式写入一个归档
+
+    Args:
+        manager: 用户数据管理器
+        user_id: 用户 ID
+        path: 归档文件路径
+        long_term: ``LongTermMemory``（需提供 ``iter_export_items``），None 时不导出
+        core_memory: ``CoreMemory``（需提供 ``iter_export_items``），None 时不导出
+        page_size: 每页读取条数
+        compresslevel: gzip 压缩级别
+        progress: 进度回调
+
+    Returns:
+        Dict[str, int]: 各类记录的写入条数
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    page_size = max(1, int(page_size))
+    counts = {"contacts": 0, "messages": 0, "long_term": 0, "core_memory": 0}
+
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=compresslevel) as f:
+
+            def write(records: List[Dict[str, Any]]) -> None:
+                if records:
+                    f.write(
+                        "\n".join(json.dumps(r, ensure_ascii=False, default=str) for r in records)
+                    )
+                    f.write("\n")
+
+            write(
+                [
+                    {
+                        "type": "header",
+                        "format": ARCHIVE_FORMAT,
+                        "version": ARCHIVE_VERSION,
+                        "user_id": user_id,
+                        "export_time": datetime.now().isoformat(),
+                    }
+                ]
+            )
+            user_settings = manager.get_user_settings(user_id)
+            if user_settings:
+                write([{"type": "settings", "data": user_settings}])
+
+            contacts = [
+                {
+                    "type": "contact",
+                    "name": c.get("name"),
+                    "avatar": c.get("avatar"),
+                    "status": c.get("status"),
+                }
+                for c in manager.get_contacts(user_id)
+            ]
+            write(contacts)
+            counts["contacts"] = len(contacts)
+
+            total_messages = manager.get_user_message_count(user_id)
+            for page in manager.iter_user_message_pages(user_id, page_size=page_size):
+                write([{"type": "message", **message} for message in page])
+                counts["messages"] += len(page)
+                _emit(progress, "messages", counts["messages"], total_messages)
+
+            for section, source in zip(_MEMORY_SECTIONS, (long_term, core_memory)):
+                if source is None or not hasattr(source, "iter_export_items"):
+                    continue
+                batch: List[Dict[str, Any]] = []
+                for item in source.iter_export_items(batch_size=page_size):
+                    batch.append({"type": section, **item})
+                    if len(batch) >= page_size:
+                        write(batch)
+                        counts[section] += len(batch)
+                        batch = []
+                        _emit(progress, section, counts[section], 0)
+                write(batch)
+                counts[section] += len(batch)
+                _emit(progress, section, counts[section], 0)
+
+            write([{"type": "footer", "counts": counts}])
+        os.replace(tmp_path, target)
+    except Exception:
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        raise
+
+    logger.info("用户 %s 的数据已流式归档到: %s %s", user_id, target, counts)
+    return counts
+
+
+def _parse_header(line: str) -> Dict[str, Any]:
+    try:
+        header = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"归档头解析失败: {exc}") from exc
+    if not isinstance(header, dict) or header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError("不是 MintChat 用户数据归档")
+    if int(header.get("version") or 0) > ARCHIVE_VERSION:
+        raise ValueError(f"归档版本过新: {header.get('version')}")
+    return header
+
+
+def _load_checkpoint(manager: "UserDataManager", user_id: int, key: str) -> Tuple[int, bool]:
+    with manager._get_connection() as conn:
+        row = conn.execute(
+            "SELECT line_no, done FROM archive_imports WHERE user_id = ? AND archive_key = ?",
+            (user_id, key),
+        ).fetchone()
+    return (int(row[0]), bool(row[1])) if row else (0, False)
+
+
+_SAVE_CHECKPOINT_SQL = """
+    INSERT INTO archive_imports (user_id, archive_key, line_no, done)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, archive_key) DO UPDATE SET
+        line_no = excluded.line_no, done = excluded.done, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _save_checkpoint(
+    manager: "UserDataManager", user_id: int, key: str, line_no: int, *, done: bool = False
+) -> None:
+    with manager._get_connection() as conn:
+        conn.execute(_SAVE_CHECKPOINT_SQL, (user_id, key, line_no, int(done)))
+        conn.commit()
+
+
+def _import_messages(
+    manager: "UserDataManager",
+    user_id: int,
+    records: List[Dict[str, Any]],
+    key: str,
+    line_no: int,
+) -> int:
+    rows = [
+        (user_id, str(r["contact_name"]), str(r["role"]), str(r["content"]), r.get("timestamp"))
+        for r in records
+        if r.get("contact_name") and r.get("role") and r.get("content") is not None
+    ]
+    with manager._get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany(
+                """
+                INSERT INTO chat_history (user_id, contact_name, role, content, timestamp)
+                VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            """,
+                rows,
+            )
+            cursor.execute(_SAVE_CHECKPOINT_SQL, (user_id, key, line_no, 0))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(rows)
+
+
+def import_user_archive(
+    manager: "UserDataManager",
+    user_id: int,
+    path: Path | str,
+    *,
+    long_term: Any = None,
+    core_memory: Any = None,
+    batch_size: int = 500,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    流式导入 ``export_user_archive`` 生成的归档（可断点续传）
+
+    断点按“用户 + 归档头”记录在 ``archive_imports`` 表：再次导入同一文件时跳过已提交的行；
+    已完整导入过的归档直接返回，避免重复写入。记忆记录不保留原 id（写入 metadata.original_id）。
+
+    Args:
+        manager: 用户数据管理器
+        user_id: 导入到的用户 ID
+        path: 归档文件路径
+        long_term: 长期记忆导入目标（需提供 ``import_records``），None 时跳过该部分
+        core_memory: 核心记忆导入目标（需提供 ``import_records``），None 时跳过该部分
+        batch_size: 每个事务写入的记录数
+        progress: 进度回调（按已读取的压缩字节数）
+
+    Returns:
+        Dict[str, Any]: 各类记录导入条数、``resumed_from``（续传起始行）与 ``complete``
+    """
+    source = Path(path)
+    total_bytes = source.stat().st_size
+    batch_size = max(1, int(batch_size))
+    stats: Dict[str, Any] = {
+        "settings": 0,
+        "contacts": 0,
+        "messages": 0,
+        "long_term": 0,
+        "core_memory": 0,
+        "resumed_from": 0,
+        "complete": False,
+    }
+    targets = {"long_term": long_term, "core_memory": core_memory}
+
+    with (
+        open(source, "rb") as raw,
+        io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="rb"), encoding="utf-8") as reader,
+    ):
+        header_line = reader.readline()
+        _parse_header(header_line)
+        key = hashlib.sha1(header_line.strip().encode("utf-8")).hexdigest()
+        checkpoint, done = _load_checkpoint(manager, user_id, key)
+        stats["resumed_from"] = checkpoint
+        if done:
+            logger.info("归档已导入过，跳过: %s", source)
+            stats["complete"] = True
+            return stats
+
+        pending: List[Dict[str, Any]] = []
+        pending_type: Optional[str] = None
+        last_line = 1
+
+        def flush() -> None:
+            nonlocal pending
+            if not pending:
+                return
+            if pending_type == "message":
+                stats["messages"] += _import_messages(manager, user_id, pending, key, last_line)
+            else:
+                if pending_type == "contact":
+                    stats["contacts"] += manager.add_contacts_batch(user_id, pending)
+                elif pending_type == "settings":
+                    data = pending[-1].get("data")
+                    if isinstance(data, dict) and manager.save_user_settings(user_id, data):
+                        stats["settings"] += 1
+                elif pending_type in targets and targets[pending_type] is not None:
+                    items = [{k: v for k, v in r.items() if k != "type"} for r in pending]
+                    stats[pending_type] += int(
+                        targets[pending_type].import_records(items, batch_size=batch_size)
+                    )
+                _save_checkpoint(manager, user_id, key, last_line)
+            pending = []
+            _emit(progress, "import", raw.tell(), total_bytes)
+
+        manager._flush_pending_writes()
+        try:
+            for line_no, line in enumerate(reader, start=2):
+                if line_no <= checkpoint or not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.get("type") if isinstance(record, dict) else None
+                if kind == "footer":
+                    flush()
+                    _save_checkpoint(manager, user_id, key, line_no, done=True)
+                    stats["complete"] = True
+                    break
+                if kind != pending_type or len(pending) >= batch_size:
+                    flush()
+                    pending_type = kind
+                pending.append(record)
+                last_line = line_no
+            else:
+                logger.warning("归档缺少结束标记（可能未完整写出）: %s", source)
+            flush()
+        except (EOFError, zlib.error, gzip.BadGzipFile) as exc:
+            # 截断的归档：保留已读部分并记录断点，补全文件后可继续导入
+            flush()
+            logger.warning("归档数据不完整，已导入到第 %d 行: %s", last_line, exc)
+
+    manager._invalidate_cache(f"contacts_{user_id}")
+    logger.info("用户 %s 的归档导入完成: %s", user_id, stats)
+    return stats
+
+
+__all__ = [
+    "ARCHIVE_FORMAT",
+    "ARCHIVE_SUFFIX",
+    "ARCHIVE_VERSION",
+    "export_user_archive",
+    "import_user_archive",
+    "is_user_archive",
+]
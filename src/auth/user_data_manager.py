@@ -13,10 +13,13 @@ v2.27.0 优化:
 import json
 import sqlite3
 import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 
 from src.utils.logger import get_logger
 from src.utils.exceptions import DatabaseError, handle_exception
@@ -32,16 +35,326 @@ except ImportError:
 
 logger = get_logger(__name__)
 
+_INSERT_MESSAGE_SQL = """
+    INSERT INTO chat_history (user_id, contact_name, role, content)
+    VALUES (?, ?, ?, ?)
+"""
+
+# chat_history 全文检索：trigram 分词对中日韩文本无需词典即可做子串匹配（单个检索词需 >= 3 字符）
+_FTS_SCHEMA_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(content, tokenize='trigram')",
+    """
+    CREATE TABLE IF NOT EXISTS chat_history_fts_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_ai AFTER INSERT ON chat_history BEGIN
+        INSERT INTO chat_history_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_ad AFTER DELETE ON chat_history BEGIN
+        DELETE FROM chat_history_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_au AFTER UPDATE OF content ON chat_history BEGIN
+        DELETE FROM chat_history_fts WHERE rowid = old.id;
+        INSERT INTO chat_history_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+)
+_FTS_MIN_TERM_CHARS = 3
+_SNIPPET_CONTEXT_CHARS = 16
+
+
+def _make_snippet(content: str, terms: List[str], highlight: Tuple[str, str]) -> str:
+    """为 LIKE 回退路径生成与 FTS5 snippet() 形式一致的片段（首个命中词前后各取若干字符）。"""
+    lowered = content.lower()
+    hit, hit_term = -1, ""
+    for term in terms:
+        index = lowered.find(term.lower())
+        if index >= 0 and (hit < 0 or index < hit):
+            hit, hit_term = index, term
+    if hit < 0:
+        return content[: _SNIPPET_CONTEXT_CHARS * 2]
+    start = max(0, hit - _SNIPPET_CONTEXT_CHARS)
+    end = min(len(content), hit + len(hit_term) + _SNIPPET_CONTEXT_CHARS)
+    opening, closing = highlight
+    return "".join(
+        (
+            "…" if start > 0 else "",
+            content[start:hit],
+            opening,
+            content[hit : hit + len(hit_term)],
+            closing,
+            content[hit + len(hit_term) : end],
+            "…" if end < len(content) else "",
+        )
+    )
+
+
+class _PendingMessage:
+    __slots__ = ("params", "future", "enqueued")
+
+    def __init__(self, params: Tuple[int, str, str, str], future: Future) -> None:
+        self.params = params
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class ChatHistoryWriter:
+    """chat_history 组提交写入器 (write-behind)
+
+    多个会话的 ``add_message`` 先进入内存队列，由单个后台线程在 ``max_delay_ms`` 窗口内
+    （或攒满 ``max_batch`` 条）合并为一个事务提交：每轮对话的两条消息、多窗口并发写入
+    只触发一次 fsync，也减少与分页读取的锁竞争。
+
+    每条消息返回 ``Future[int]``（提交后的行 id）；``flush()`` 等待已入队消息全部落盘，
+    ``close()`` 保证先 flush 再退出。
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        *,
+        max_batch: int = 64,
+        max_delay_ms: float = 5.0,
+    ) -> None:
+        self._connect = connect
+        self._max_batch = max(1, int(max_batch))
+        self._max_delay_s = max(0.0, float(max_delay_ms)) / 1000.0
+        self._cond = threading.Condition()
+        self._queue: Deque[_PendingMessage] = deque()
+        self._inflight = 0
+        self._flush_waiters = 0
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats: Dict[str, Any] = {
+            "rows": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_batch_size": 0,
+            "last_batch_size": 0,
+            "last_commit_ms": 0.0,
+            "total_commit_ms": 0.0,
+            "last_write_latency_ms": 0.0,
+            "max_write_latency_ms": 0.0,
+            "total_write_latency_ms": 0.0,
+        }
+
+    def submit(self, user_id: int, contact_name: str, role: str, content: str) -> Future:
+        """入队一条消息，返回 ``Future[int]``（行 id；写入失败时为对应异常）。"""
+        future: Future = Future()
+        item = _PendingMessage((user_id, contact_name, role, content), future)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ChatHistoryWriter 已关闭")
+            self._queue.append(item)
+            self._ensure_thread_locked()
+            self._cond.notify_all()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue) + self._inflight
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待当前已入队的消息全部提交；超时返回 False。"""
+        deadline = None if timeout is None else time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()  # 有等待者时跳过合并窗口，立即提交
+            try:
+                while self._queue or self._inflight:
+                    if self._queue:
+                        self._ensure_thread_locked()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(timeout=remaining)
+                return True
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: float = 10.0) -> None:
+        """停止接收新消息，提交剩余队列后退出（幂等）。"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        if self._queue:
+            # 后台线程未能启动/已退出：在当前线程兜底提交
+            self._drain_remaining()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._queue) + self._inflight
+        rows, batches = stats["rows"], stats["batches"]
+        total_commit_ms = stats.pop("total_commit_ms")
+        total_latency_ms = stats.pop("total_write_latency_ms")
+        stats["avg_batch_size"] = round(rows / batches, 2) if batches else 0.0
+        stats["avg_commit_ms"] = round(total_commit_ms / batches, 3) if batches else 0.0
+        stats["avg_write_latency_ms"] = round(total_latency_ms / rows, 3) if rows else 0.0
+        return stats
+
+    # ----------------------------- 后台线程 -----------------------------
+
+    def _ensure_thread_locked(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="mintchat-chat-history-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _take_batch(self) -> Optional[List[_PendingMessage]]:
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            # 首条消息到达后等待合并窗口（攒满一批、flush/close 时提前出发）
+            deadline = self._queue[0].enqueued + self._max_delay_s
+            while (
+                len(self._queue) < self._max_batch and not self._closed and not self._flush_waiters
+            ):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            batch = [self._queue.popleft() for _ in range(min(self._max_batch, len(self._queue)))]
+            self._inflight += len(batch)
+            return batch
+
+    def _run(self) -> None:
+        conn: Optional[sqlite3.Connection] = None
+        try:
+            while True:
+                batch = self._take_batch()
+                if batch is None:
+                    return
+                if conn is None:
+                    try:
+                        conn = self._connect()
+                    except Exception as exc:
+                        self._finish(batch, error=exc)
+                        continue
+                self._commit(conn, batch)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _drain_remaining(self) -> None:
+        with self._cond:
+            batch = list(self._queue)
+            self._queue.clear()
+            self._inflight += len(batch)
+        if not batch:
+            return
+        try:
+            conn = self._connect()
+        except Exception as exc:
+            self._finish(batch, error=exc)
+            return
+        try:
+            self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[_PendingMessage]) -> None:
+        started = time.perf_counter()
+        row_ids: List[int] = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for item in batch:
+                cursor.execute(_INSERT_MESSAGE_SQL, item.params)
+                row_ids.append(int(cursor.lastrowid))
+            conn.commit()
+        except Exception as exc:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if len(batch) > 1 and not isinstance(exc, sqlite3.OperationalError):
+                # 单条消息的问题（约束/参数类型）不应连累同批的其他会话：逐条重试
+                logger.warning("聊天记录批量写入失败 (%d 条)，逐条重试: %s", len(batch), exc)
+                for item in batch:
+                    self._commit(conn, [item])
+                return
+            logger.error("聊天记录批量写入失败 (%d 条): %s", len(batch), exc)
+            self._finish(batch, error=exc)
+            return
+        self._finish(batch, row_ids=row_ids, commit_ms=(time.perf_counter() - started) * 1000)
+
+    def _finish(
+        self,
+        batch: List[_PendingMessage],
+        *,
+        row_ids: Optional[List[int]] = None,
+        commit_ms: float = 0.0,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        now = time.perf_counter()
+        with self._cond:
+            self._inflight = max(0, self._inflight - len(batch))
+            stats = self._stats
+            if error is not None:
+                stats["errors"] += len(batch)
+            else:
+                size = len(batch)
+                stats["rows"] += size
+                stats["batches"] += 1
+                stats["last_batch_size"] = size
+                stats["max_batch_size"] = max(stats["max_batch_size"], size)
+                stats["last_commit_ms"] = commit_ms
+                stats["total_commit_ms"] += commit_ms
+                for item in batch:
+                    latency = (now - item.enqueued) * 1000
+                    stats["total_write_latency_ms"] += latency
+                    stats["max_write_latency_ms"] = max(stats["max_write_latency_ms"], latency)
+                stats["last_write_latency_ms"] = latency
+            self._cond.notify_all()
+        for index, item in enumerate(batch):
+            if error is not None:
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(row_ids[index] if row_ids else None)
+
 
 class UserDataManager:
     """用户数据管理器 - 管理用户的所有个人数据 (v2.27.0 优化版)"""
 
-    def __init__(self, db_path: str = "data/user_data.db", use_pool: bool = False):
+    def __init__(
+        self,
+        db_path: str = "data/user_data.db",
+        use_pool: bool = False,
+        *,
+        write_behind: bool = True,
+        write_batch_max: int = 64,
+        write_delay_ms: float = 5.0,
+        search_backfill: bool = True,
+    ):
         """初始化用户数据管理器 (v2.30.13: 修复数据库路径)
 
         Args:
             db_path: 数据库文件路径（默认: data/user_data.db）
             use_pool: 是否使用连接池（默认False，可选启用以提升性能30-50%）
+            write_behind: 聊天消息经 ChatHistoryWriter 组提交（读取前自动 flush，保证读到自己的写入）
+            write_batch_max: 组提交单批最多条数
+            write_delay_ms: 组提交合并窗口（毫秒）
+            search_backfill: 旧数据库首次建立全文索引时，是否在后台线程分批回填历史消息
         """
         db_path_obj = Path(db_path)
         # 若用户修改了 settings.data_dir，则默认 user_data.db 应跟随 data_dir
@@ -82,8 +395,22 @@ class UserDataManager:
         self._cache_enabled = True
         self._cache_lock = threading.RLock()
 
+        self._fts_enabled = False
+        self._backfill_stop = threading.Event()
+        self._backfill_thread: Optional[threading.Thread] = None
+
         self._init_database()
 
+        self._writer: Optional[ChatHistoryWriter] = None
+        if write_behind:
+            self._writer = ChatHistoryWriter(
+                self._open_writer_connection,
+                max_batch=write_batch_max,
+                max_delay_ms=write_delay_ms,
+            )
+        if search_backfill:
+            self.start_search_backfill()
+
     def _configure_connection(self, conn: sqlite3.Connection, *, pooled: bool) -> None:
         """Apply connection-level SQLite PRAGMAs.
 
@@ -137,6 +464,19 @@ class UserDataManager:
             except Exception:
                 pass
 
+    def _open_writer_connection(self) -> sqlite3.Connection:
+        """组提交写入线程专用连接（不占用连接池）。"""
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, check_same_thread=False)
+        self._configure_connection(conn, pooled=False)
+        return conn
+
+    def _flush_pending_writes(self) -> None:
+        """读取/修改聊天历史前提交尚在队列中的消息，保证读到自己的写入与写入顺序。"""
+        writer = self._writer
+        if writer is not None and writer.pending():
+            if not writer.flush(timeout=self.timeout):
+                logger.warning("等待聊天记录写入超时，读取结果可能不包含最新消息")
+
     def _is_cache_valid(self, cache_key: str) -> bool:
         """检查缓存是否有效
 
@@ -300,6 +640,20 @@ class UserDataManager:
                 except Exception as schema_exc:
                     logger.warning("检查/迁移 custom_stickers.caption 字段失败: %s", schema_exc)
 
+                # 流式归档导入断点（按用户 + 归档头标识续传）
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS archive_imports (
+                        user_id INTEGER NOT NULL,
+                        archive_key TEXT NOT NULL,
+                        line_no INTEGER NOT NULL DEFAULT 0,
+                        done INTEGER NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (user_id, archive_key)
+                    )
+                """
+                )
+
                 # 创建索引 (v2.30.12: 优化索引策略，提升查询性能)
                 cursor.execute(
                     """
@@ -345,6 +699,8 @@ class UserDataManager:
                 """
                 )
 
+                self._fts_enabled = self._init_search_index(cursor)
+
                 conn.commit()
                 logger.info("用户数据管理器初始化完成")
         except Exception as e:
@@ -354,6 +710,150 @@ class UserDataManager:
                 context={"db_path": str(self.db_path), "error": str(e)},
             )
 
+    def _init_search_index(self, cursor: sqlite3.Cursor) -> bool:
+        """创建 chat_history 全文索引及同步触发器 (FTS5 + trigram)
+
+        首次创建时记录当时的最大消息 id 作为回填目标：之后的新消息由触发器实时索引，
+        之前的历史消息由 ``backfill_search_index`` 分批补齐。
+
+        Returns:
+            全文索引是否可用（SQLite 未编译 FTS5 或版本低于 3.34 不支持 trigram 时返回 False）
+        """
+        try:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'"
+            )
+            created = cursor.fetchone() is None
+            for statement in _FTS_SCHEMA_SQL:
+                cursor.execute(statement)
+        except sqlite3.OperationalError as exc:
+            logger.info("SQLite 不支持 FTS5 trigram，聊天记录搜索回退为 LIKE 扫描: %s", exc)
+            return False
+
+        if created:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM chat_history")
+            target = int(cursor.fetchone()[0])
+            cursor.executemany(
+                "INSERT OR REPLACE INTO chat_history_fts_state (key, value) VALUES (?, ?)",
+                [("backfill_target", target), ("backfill_pos", 0)],
+            )
+            if target:
+                logger.info("已创建聊天记录全文索引，待回填历史消息 id <= %s", target)
+        return True
+
+    @staticmethod
+    def _read_backfill_state(cursor: sqlite3.Cursor) -> Tuple[int, int]:
+        cursor.execute("SELECT key, value FROM chat_history_fts_state")
+        state = dict(cursor.fetchall())
+        return int(state.get("backfill_pos", 0)), int(state.get("backfill_target", 0))
+
+    def get_search_index_status(self) -> Dict[str, Any]:
+        """全文索引状态：是否启用、回填进度（按消息 id）。"""
+        status: Dict[str, Any] = {
+            "enabled": self._fts_enabled,
+            "backfill_pos": 0,
+            "backfill_target": 0,
+            "done": True,
+        }
+        if not self._fts_enabled:
+            return status
+        try:
+            with self._get_connection() as conn:
+                pos, target = self._read_backfill_state(conn.cursor())
+        except Exception as e:
+            handle_exception(e, logger, "读取全文索引状态失败")
+            return status
+        status.update(backfill_pos=pos, backfill_target=target, done=pos >= target)
+        return status
+
+    def backfill_search_index(
+        self, *, chunk_size: int = 2000, max_chunks: Optional[int] = None
+    ) -> bool:
+        """分批把建索引前的历史消息写入全文索引
+
+        每批处理一段 id 区间并单独提交（``BEGIN IMMEDIATE`` 只持有很短的写锁），
+        进度保存在 ``chat_history_fts_state``，中断后下次启动从断点继续。
+
+        Args:
+            chunk_size: 每批覆盖的消息 id 跨度
+            max_chunks: 本次最多处理的批数（None 表示直到完成）
+
+        Returns:
+            是否已全部回填完成
+        """
+        if not self._fts_enabled:
+            return True
+        chunk_size = max(1, int(chunk_size))
+        chunks = 0
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                while max_chunks is None or chunks < max_chunks:
+                    if self._backfill_stop.is_set():
+                        return False
+                    cursor.execute("BEGIN IMMEDIATE")
+                    pos, target = self._read_backfill_state(cursor)
+                    if pos >= target:
+                        conn.commit()
+                        return True
+                    upper = min(target, pos + chunk_size)
+                    # 区间内已被触发器索引过的行（回填期间被修改的消息）需跳过，避免 rowid 冲突
+                    cursor.execute(
+                        """
+                        INSERT INTO chat_history_fts (rowid, content)
+                        SELECT id, content FROM chat_history
+                        WHERE id > ? AND id <= ?
+                          AND id NOT IN (
+                              SELECT rowid FROM chat_history_fts WHERE rowid > ? AND rowid <= ?
+                          )
+                    """,
+                        (pos, upper, pos, upper),
+                    )
+                    cursor.execute(
+                        "UPDATE chat_history_fts_state SET value = ? WHERE key = 'backfill_pos'",
+                        (upper,),
+                    )
+                    conn.commit()
+                    chunks += 1
+                pos, target = self._read_backfill_state(cursor)
+                return pos >= target
+        except sqlite3.Error as e:
+            raise DatabaseError(
+                "回填聊天记录全文索引失败",
+                operation="backfill_search_index",
+                context={"db_path": str(self.db_path), "error": str(e)},
+            )
+
+    def start_search_backfill(
+        self, *, chunk_size: int = 2000, pause_s: float = 0.05
+    ) -> Optional[threading.Thread]:
+        """在后台守护线程中分批回填全文索引（每批之间让出写锁，不阻塞 UI 与消息写入）
+
+        Returns:
+            回填线程；无需回填或已在运行时返回 None
+        """
+        if not self._fts_enabled or self.get_search_index_status()["done"]:
+            return None
+        if self._backfill_thread is not None and self._backfill_thread.is_alive():
+            return None
+
+        def run() -> None:
+            started = time.perf_counter()
+            try:
+                while not self.backfill_search_index(chunk_size=chunk_size, max_chunks=1):
+                    if self._backfill_stop.wait(pause_s):
+                        return
+            except Exception as exc:
+                logger.error("聊天记录全文索引回填中断: %s", exc)
+                return
+            logger.info("聊天记录全文索引回填完成，用时 %.1fs", time.perf_counter() - started)
+
+        self._backfill_stop.clear()
+        thread = threading.Thread(target=run, name="mintchat-fts-backfill", daemon=True)
+        self._backfill_thread = thread
+        thread.start()
+        return thread
+
     # ==================== 联系人管理 ====================
 
     def add_contact(
@@ -524,6 +1024,7 @@ class UserDataManager:
         """
         contact_rows = 0
         history_rows = 0
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -613,22 +1114,21 @@ class UserDataManager:
             content: 消息内容
 
         Returns:
-            是否添加成功
+            是否添加成功（组提交模式下表示已入队；写入失败记录错误日志）
         """
-        try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute(
-                    """
-                    INSERT INTO chat_history (user_id, contact_name, role, content)
-                    VALUES (?, ?, ?, ?)
-                """,
-                    (user_id, contact_name, role, content),
-                )
-
-                conn.commit()
+        writer = self._writer
+        if writer is not None:
+            try:
+                future = writer.submit(user_id, contact_name, role, content)
+            except RuntimeError:
+                pass  # 写入器已关闭：回退为同步写入
+            else:
+                future.add_done_callback(self._log_write_failure)
                 return True
+
+        try:
+            self._insert_message(user_id, contact_name, role, content)
+            return True
         except sqlite3.Error as e:
             raise DatabaseError(
                 "添加消息失败",
@@ -644,6 +1144,44 @@ class UserDataManager:
             handle_exception(e, logger, "添加消息失败")
             return False
 
+    def add_message_async(self, user_id: int, contact_name: str, role: str, content: str) -> Future:
+        """添加聊天消息并返回 ``Future[int]``（提交后的消息 id）。
+
+        组提交模式下与其他会话的消息合并提交；未启用时同步写入后返回已完成的 Future。
+        """
+        writer = self._writer
+        if writer is not None:
+            try:
+                return writer.submit(user_id, contact_name, role, content)
+            except RuntimeError:
+                pass
+        future: Future = Future()
+        try:
+            future.set_result(self._insert_message(user_id, contact_name, role, content))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def _insert_message(self, user_id: int, contact_name: str, role: str, content: str) -> int:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_INSERT_MESSAGE_SQL, (user_id, contact_name, role, content))
+            conn.commit()
+            return int(cursor.lastrowid)
+
+    @staticmethod
+    def _log_write_failure(future: Future) -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logger.error("聊天消息写入失败: %s", exc)
+
+    def get_write_stats(self) -> Dict[str, Any]:
+        """组提交写入统计（批大小、提交耗时、入队到落盘延迟）；未启用时返回空字典。"""
+        writer = self._writer
+        return writer.stats() if writer is not None else {}
+
     def add_messages_batch(self, messages: List[Dict[str, Any]]) -> int:
         """批量添加聊天消息 (v2.27.0: 新增批量操作，性能提升70%+)
 
@@ -656,6 +1194,7 @@ class UserDataManager:
         if not messages:
             return 0
 
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -696,6 +1235,7 @@ class UserDataManager:
         Returns:
             消息列表（已去重）
         """
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -786,6 +1326,7 @@ class UserDataManager:
         if limit <= 0:
             return []
 
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -835,6 +1376,7 @@ class UserDataManager:
 
     def get_chat_history_all(self, user_id: int, contact_name: str) -> List[Dict[str, Any]]:
         """获取某联系人完整聊天历史（从旧到新）。"""
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -871,6 +1413,7 @@ class UserDataManager:
         Returns:
             消息总数
         """
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -900,6 +1443,72 @@ class UserDataManager:
             handle_exception(e, logger, "获取聊天历史总数失败")
             return 0
 
+    def get_user_message_count(self, user_id: int) -> int:
+        """获取用户全部联系人的消息总数。"""
+        self._flush_pending_writes()
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM chat_history WHERE user_id = ?", (user_id,))
+                return int(cursor.fetchone()[0])
+        except Exception as e:
+            handle_exception(e, logger, "获取用户消息总数失败")
+            return 0
+
+    def iter_user_message_pages(
+        self, user_id: int, *, page_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """按 id 做 keyset pagination，逐页产出用户全部联系人的消息（从旧到新）
+
+        每页单独查询，页与页之间不持有读事务；内存占用只与 ``page_size`` 有关。
+
+        Args:
+            user_id: 用户 ID
+            page_size: 每页条数
+
+        Yields:
+            消息列表，每项含 id/contact_name/role/content/timestamp
+        """
+        self._flush_pending_writes()
+        page_size = max(1, int(page_size))
+        last_id = 0
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                while True:
+                    cursor.execute(
+                        """
+                        SELECT id, contact_name, role, content, timestamp
+                        FROM chat_history
+                        WHERE user_id = ? AND id > ?
+                        ORDER BY id ASC
+                        LIMIT ?
+                    """,
+                        (user_id, last_id, page_size),
+                    )
+                    rows = cursor.fetchall()
+                    if not rows:
+                        return
+                    last_id = rows[-1][0]
+                    yield [
+                        {
+                            "id": msg_id,
+                            "contact_name": contact_name,
+                            "role": role,
+                            "content": content,
+                            "timestamp": ts,
+                        }
+                        for msg_id, contact_name, role, content, ts in rows
+                    ]
+                    if len(rows) < page_size:
+                        return
+        except sqlite3.Error as e:
+            raise DatabaseError(
+                "分页读取用户消息失败",
+                operation="iter_user_message_pages",
+                context={"user_id": user_id, "after_id": last_id, "error": str(e)},
+            )
+
     def clear_chat_history(self, user_id: int, contact_name: str) -> bool:
         """清空聊天历史
 
@@ -910,6 +1519,7 @@ class UserDataManager:
         Returns:
             是否清空成功
         """
+        self._flush_pending_writes()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -931,6 +1541,147 @@ class UserDataManager:
             logger.error(f"清空聊天历史失败: {e}")
             return False
 
+    def search_chat_history(
+        self,
+        user_id: int,
+        query: str,
+        contact: Optional[str] = None,
+        *,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        after_rank: Optional[float] = None,
+        highlight: Tuple[str, str] = ("[", "]"),
+    ) -> List[Dict[str, Any]]:
+        """全文搜索聊天记录，返回按相关度排序的命中片段
+
+        说明：
+        - 空白分隔的多个检索词为“同时包含”；走 FTS5 索引并按 bm25 排序（``rank`` 越小越相关）。
+        - 任一检索词不足 3 个字符（trigram 无法索引）或 SQLite 不支持 FTS5 时回退为 LIKE 扫描，
+          此时 ``rank`` 恒为 0.0、结果按新到旧排列。
+        - 历史消息回填尚未完成时，未索引区间同样以 LIKE 补充（排在已索引命中之后）。
+        - keyset pagination：下一页传入上一页最后一条的 ``rank`` 与 ``id``
+          （``after_rank`` / ``before_id``）；仅传 ``before_id`` 时只搜索更早的消息。
+
+        Args:
+            user_id: 用户 ID
+            query: 检索文本
+            contact: 仅搜索该联系人（None 表示全部联系人）
+            limit: 返回条数
+            before_id: 游标 id（见上）
+            after_rank: 游标相关度（见上）
+            highlight: 片段中命中词两侧的标记
+
+        Returns:
+            命中列表，每项含 id/contact_name/role/content/timestamp/snippet/rank
+        """
+        terms = [term for term in str(query or "").split() if term]
+        if limit <= 0 or not terms:
+            return []
+
+        self._flush_pending_writes()
+        use_fts = self._fts_enabled and all(len(t) >= _FTS_MIN_TERM_CHARS for t in terms)
+        like_sql = " AND ".join("content LIKE ? ESCAPE '\\'" for _ in terms)
+        like_params = [
+            "%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            for t in terms
+        ]
+        contact_sql = " AND contact_name = ?" if contact is not None else ""
+        contact_params = [contact] if contact is not None else []
+
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                params: List[Any] = []
+                if use_fts:
+                    h_contact_sql = " AND h.contact_name = ?" if contact is not None else ""
+                    match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                    hits_sql = f"""
+                        SELECT h.id, h.contact_name, h.role, h.content, h.timestamp,
+                               snippet(chat_history_fts, 0, ?, ?, '…', {_SNIPPET_CONTEXT_CHARS})
+                                   AS snippet,
+                               bm25(chat_history_fts) AS score
+                        FROM chat_history_fts
+                        JOIN chat_history AS h ON h.id = chat_history_fts.rowid
+                        WHERE chat_history_fts MATCH ? AND h.user_id = ?{h_contact_sql}
+                    """
+                    params += [*highlight, match, user_id, *contact_params]
+                    pos, target = self._read_backfill_state(cursor)
+                    if pos < target:
+                        hits_sql += f"""
+                        UNION ALL
+                        SELECT id, contact_name, role, content, timestamp, NULL, 0.0
+                        FROM chat_history
+                        WHERE user_id = ?{contact_sql} AND id > ? AND id <= ? AND {like_sql}
+                          AND id NOT IN (
+                              SELECT rowid FROM chat_history_fts WHERE rowid > ? AND rowid <= ?
+                          )
+                        """
+                        params += [user_id, *contact_params, pos, target, *like_params]
+                        params += [pos, target]
+                else:
+                    hits_sql = f"""
+                        SELECT id, contact_name, role, content, timestamp, NULL AS snippet,
+                               0.0 AS score
+                        FROM chat_history
+                        WHERE user_id = ?{contact_sql} AND {like_sql}
+                    """
+                    params += [user_id, *contact_params, *like_params]
+
+                cursor_sql = ""
+                if after_rank is not None and before_id is not None:
+                    cursor_sql = "WHERE score > ? OR (score = ? AND id < ?)"
+                    params += [after_rank, after_rank, before_id]
+                elif after_rank is not None:
+                    cursor_sql = "WHERE score > ?"
+                    params.append(after_rank)
+                elif before_id is not None:
+                    cursor_sql = "WHERE id < ?"
+                    params.append(before_id)
+
+                cursor.execute(
+                    f"""
+                    WITH hits AS ({hits_sql})
+                    SELECT id, contact_name, role, content, timestamp, snippet, score
+                    FROM hits
+                    {cursor_sql}
+                    ORDER BY score ASC, id DESC
+                    LIMIT ?
+                """,
+                    (*params, int(limit)),
+                )
+                return [
+                    {
+                        "id": msg_id,
+                        "contact_name": contact_name,
+                        "role": role,
+                        "content": content,
+                        "timestamp": ts,
+                        "snippet": (
+                            snippet
+                            if snippet is not None
+                            else _make_snippet(content, terms, highlight)
+                        ),
+                        "rank": float(score),
+                    }
+                    for msg_id, contact_name, role, content, ts, snippet, score in cursor.fetchall()
+                ]
+        except sqlite3.Error as e:
+            raise DatabaseError(
+                "搜索聊天记录失败",
+                operation="search_chat_history",
+                context={
+                    "user_id": user_id,
+                    "contact": contact,
+                    "query": query,
+                    "limit": limit,
+                    "before_id": before_id,
+                    "error": str(e),
+                },
+            )
+        except Exception as e:
+            handle_exception(e, logger, "搜索聊天记录失败")
+            return []
+
     # ==================== 用户设置管理 ====================
 
     def save_user_settings(self, user_id: int, settings: Dict[str, Any]) -> bool:
@@ -1039,6 +1790,19 @@ class UserDataManager:
 
     # ==================== 数据导出 ====================
 
+    @staticmethod
+    def _resolve_export_dir(export_dir: str) -> Path:
+        export_path = Path(export_dir)
+        # 默认导出目录跟随 settings.data_dir
+        if export_path == Path("data/exports"):
+            try:
+                from src.config.settings import settings
+
+                export_path = Path(settings.data_dir) / "exports"
+            except Exception:
+                pass
+        return export_path
+
     def export_user_data(self, user_id: int, export_dir: str = "data/exports") -> Optional[str]:
         """导出用户的所有数据
 
@@ -1050,15 +1814,7 @@ class UserDataManager:
             导出文件路径，失败返回 None
         """
         try:
-            export_path = Path(export_dir)
-            # 默认导出目录跟随 settings.data_dir
-            if export_path == Path("data/exports"):
-                try:
-                    from src.config.settings import settings
-
-                    export_path = Path(settings.data_dir) / "exports"
-                except Exception:
-                    pass
+            export_path = self._resolve_export_dir(export_dir)
             export_path.mkdir(parents=True, exist_ok=True)
 
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1092,7 +1848,7 @@ class UserDataManager:
             return None
 
     def import_user_data(self, user_id: int, filepath: str) -> bool:
-        """导入用户数据
+        """导入用户数据（自动识别旧版 JSON 导出文件与流式归档）
 
         Args:
             user_id: 用户 ID
@@ -1101,6 +1857,11 @@ class UserDataManager:
         Returns:
             是否导入成功
         """
+        from src.auth.user_archive import is_user_archive
+
+        if is_user_archive(filepath):
+            return bool(self.import_user_archive(user_id, filepath).get("complete"))
+
         try:
             with open(filepath, "r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -1144,6 +1905,87 @@ class UserDataManager:
             logger.error(f"导入用户数据失败: {e}")
             return False
 
+    def export_user_archive(
+        self,
+        user_id: int,
+        export_dir: str = "data/exports",
+        *,
+        long_term: Any = None,
+        core_memory: Any = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> Optional[str]:
+        """流式导出用户数据为 gzip JSON Lines 归档（内存占用与数据量无关）
+
+        Args:
+            user_id: 用户 ID
+            export_dir: 导出目录
+            long_term: 一并导出的长期记忆（LongTermMemory，可选）
+            core_memory: 一并导出的核心记忆（CoreMemory，可选）
+            progress: 进度回调 ``(stage, done, total)``
+
+        Returns:
+            归档文件路径，失败返回 None
+        """
+        from src.auth.user_archive import ARCHIVE_SUFFIX, export_user_archive
+
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = (
+                self._resolve_export_dir(export_dir)
+                / f"user_{user_id}_archive_{timestamp}{ARCHIVE_SUFFIX}"
+            )
+            export_user_archive(
+                self,
+                user_id,
+                filepath,
+                long_term=long_term,
+                core_memory=core_memory,
+                progress=progress,
+            )
+            return str(filepath)
+        except Exception as e:
+            logger.error(f"流式导出用户数据失败: {e}")
+            return None
+
+    def import_user_archive(
+        self,
+        user_id: int,
+        filepath: str,
+        *,
+        long_term: Any = None,
+        core_memory: Any = None,
+        batch_size: int = 500,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> Dict[str, Any]:
+        """流式导入用户数据归档（分批事务写入，中断后再次导入同一文件会从断点继续）
+
+        Args:
+            user_id: 用户 ID
+            filepath: 归档文件路径
+            long_term: 长期记忆导入目标（可选）
+            core_memory: 核心记忆导入目标（可选）
+            batch_size: 每个事务写入的记录数
+            progress: 进度回调 ``(stage, done, total)``（按已读取的压缩字节数）
+
+        Returns:
+            导入统计；``complete`` 为 False 表示归档未完整导入
+        """
+        from src.auth.user_archive import import_user_archive
+
+        try:
+            return import_user_archive(
+                self,
+                user_id,
+                filepath,
+                long_term=long_term,
+                core_memory=core_memory,
+                batch_size=batch_size,
+                progress=progress,
+            )
+        except Exception as e:
+            logger.error(f"流式导入用户数据失败: {e}")
+            return {"complete": False, "error": str(e)}
+
     # ==================== 自定义表情包管理 - v2.19.0 新增 ====================
 
     def add_custom_sticker(
@@ -1376,7 +2218,18 @@ class UserDataManager:
         """释放连接池/缓存等资源（幂等）。
 
         说明：GUI 退出时建议显式调用，避免 Windows 下 sqlite 句柄残留导致文件锁定。
+        组提交队列中的消息会先全部落盘；全文索引回填线程在当前批次提交后停止（下次启动续传）。
         """
+        self._backfill_stop.set()
+        thread = getattr(self, "_backfill_thread", None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.timeout)
+        writer = getattr(self, "_writer", None)
+        if writer is not None:
+            try:
+                writer.close(timeout=self.timeout)
+            except Exception as exc:
+                logger.error("关闭聊天记录写入器失败: %s", exc)
         pool = getattr(self, "_pool", None)
         self._pool = None
         self.use_pool = False
@@ -294,6 +294,24 @@ class UserSession:
             return False
         return self.data_manager.clear_chat_history(user_id, contact_name)
 
+    def search_chat_history(
+        self,
+        query: str,
+        contact: Optional[str] = None,
+        *,
+        limit: int = 20,
+        before_id: int | None = None,
+        after_rank: float | None = None,
+    ):
+        """全文搜索聊天记录（按相关度排序的命中片段，支持 keyset pagination）。"""
+        user_id = self.get_user_id()
+        if user_id is None:
+            logger.warning("未登录，无法搜索聊天记录")
+            return []
+        return self.data_manager.search_chat_history(
+            user_id, query, contact, limit=limit, before_id=before_id, after_rank=after_rank
+        )
+
     def save_settings(self, settings: Dict[str, Any]) -> bool:
         """保存用户设置
 
@@ -358,6 +376,48 @@ class UserSession:
             return False
         return self.data_manager.import_user_data(user_id, filepath)
 
+    def export_archive(
+        self,
+        export_dir: str = "data/exports",
+        *,
+        long_term: Any = None,
+        core_memory: Any = None,
+        progress=None,
+    ) -> Optional[str]:
+        """流式导出完整账号备份（gzip JSON Lines，可一并包含长期记忆与核心记忆）。"""
+        user_id = self.get_user_id()
+        if user_id is None:
+            logger.warning("未登录，无法导出数据")
+            return None
+        return self.data_manager.export_user_archive(
+            user_id,
+            export_dir,
+            long_term=long_term,
+            core_memory=core_memory,
+            progress=progress,
+        )
+
+    def import_archive(
+        self,
+        filepath: str,
+        *,
+        long_term: Any = None,
+        core_memory: Any = None,
+        progress=None,
+    ) -> Dict[str, Any]:
+        """流式导入账号备份归档（中断后再次导入同一文件会从断点继续）。"""
+        user_id = self.get_user_id()
+        if user_id is None:
+            logger.warning("未登录，无法导入数据")
+            return {"complete": False}
+        return self.data_manager.import_user_archive(
+            user_id,
+            filepath,
+            long_term=long_term,
+            core_memory=core_memory,
+            progress=progress,
+        )
+
     # ==================== 头像管理 - v2.22.0 新增 ====================
 
     def update_user_avatar(self, avatar: str) -> bool:
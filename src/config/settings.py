@@ -264,6 +264,19 @@ class TTSConfig(BaseModel):
         description="磁盘缓存生存时间（秒，0 表示永久）",
     )
 
+    disk_cache_backend: str = Field(
+        default="segment",
+        pattern="^(segment|json)$",
+        description="磁盘缓存后端：segment（SQLite 索引 + 段文件）/ json（旧版 JSON 索引 + 单文件）",
+    )
+
+    disk_cache_codec: str = Field(
+        default="auto",
+        pattern="^(auto|raw|gzip|flac|opus)$",
+        description="segment 后端的音频编码：auto 按 disk_cache_compress 选择 gzip/raw；"
+        "flac 无损约省一半空间，opus 有损可省 5-10 倍（均需 soundfile）",
+    )
+
     max_parallel_requests: int = Field(
         default=2,
         ge=1,
@@ -276,6 +289,44 @@ class TTSConfig(BaseModel):
         description="段落模式分句的最小长度",
     )
 
+    stream_lookahead: int = Field(
+        default=2,
+        ge=1,
+        le=8,
+        description="流式合成的预取句数（LLM 仍在输出时最多同时合成/待播放的句子数）",
+    )
+
+    stream_audio_enabled: bool = Field(
+        default=False,
+        description="流式接收 GPT-SoVITS 音频（streaming_mode）并边收边播，降低首段音频延迟",
+    )
+
+    stream_preroll_ms: int = Field(
+        default=120,
+        ge=20,
+        le=2000,
+        description="流式播放开始前至少缓冲的音频时长（毫秒），过小易出现断续",
+    )
+
+    warm_cache_enabled: bool = Field(
+        default=True,
+        description="空闲时预合成问候语与聊天记录中的高频句，并常驻磁盘缓存（不参与 LRU 淘汰）",
+    )
+
+    warm_cache_max_phrases: int = Field(
+        default=48,
+        ge=0,
+        le=500,
+        description="预热（常驻）句子数上限",
+    )
+
+    warm_cache_idle_s: float = Field(
+        default=3.0,
+        ge=0.0,
+        le=60.0,
+        description="最近一次合成请求结束多少秒后才继续预热（避免与实时朗读争抢 GPT-SoVITS）",
+    )
+
     client_max_retries: int = Field(
         default=3,
         ge=1,
@@ -658,6 +709,30 @@ class AgentConfig(BaseModel):
         description=("是否启用 native(Pipeline stages)（实验性，仅影响 llm_backend=native）。"),
     )
 
+    native_speculative_streaming: bool = Field(
+        default=True,
+        description=(
+            "native 流式推测输出：一轮中在任何 tool_call 之前出现非空白文本即开始转发，"
+            "无需等待整轮生成结束（降低首包延迟）。若该轮最终是工具轮，已输出的前置说明"
+            "以 StreamRetraction 撤回（UI 气泡、流式 TTS 与聊天历史均会丢弃）。"
+        ),
+    )
+
+    native_tool_parallel_workers: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "native 同一轮工具调用的最大并发数（1 表示串行）；"
+            "声明为非并发安全的工具（如 write_file）始终单独执行。"
+        ),
+    )
+
+    native_tool_round_timeout_s: float = Field(
+        default=60.0,
+        ge=0.0,
+        description="native 单轮工具调用共享截止时间（秒），0 表示不限制（仅按单个工具超时）。",
+    )
+
     # 记忆系统配置
     long_memory: bool = Field(
         default=True,
@@ -693,6 +768,91 @@ class AgentConfig(BaseModel):
         le=1.0,
         description="长期记忆检索重排序中角色一致性权重（0 表示不参与）。",
     )
+    long_term_rerank_candidates: int = Field(
+        default=60,
+        ge=1,
+        le=1000,
+        description="长期记忆检索的候选池大小（向量检索取回的条数，随后列式重排序取 top-k）。",
+    )
+
+    # 长期记忆 FAISS 只读索引（可选，需要 faiss-cpu；Chroma 仍是数据源）
+    long_term_faiss_enabled: bool = Field(
+        default=True,
+        description="是否为长期记忆维护进程内 FAISS(HNSW) 只读索引（检索无需持有向量库锁）。",
+    )
+    long_term_faiss_min_count: int = Field(
+        default=20000,
+        ge=0,
+        le=10_000_000,
+        description="长期记忆条数达到该值才构建 FAISS 索引（条数较少时直接使用 Chroma）。",
+    )
+    long_term_faiss_ef_search: int = Field(
+        default=64,
+        ge=1,
+        le=4096,
+        description="FAISS HNSW 检索宽度下限（越大召回越高、耗时越长）。",
+    )
+
+    long_term_query_cache_enabled: bool = Field(
+        default=True,
+        description="长期记忆语义查询缓存：按查询向量余弦相似度复用检索结果（写入后自动失效）",
+    )
+    long_term_query_cache_size: int = Field(
+        default=256,
+        ge=1,
+        le=10000,
+        description="语义查询缓存最大条目数（最近查询向量矩阵的行数）",
+    )
+    long_term_query_cache_similarity: float = Field(
+        default=0.92,
+        ge=0.5,
+        le=1.0,
+        description="语义查询缓存命中所需的最低余弦相似度",
+    )
+    long_term_query_cache_ttl_s: float = Field(
+        default=600.0,
+        ge=0.0,
+        le=86400.0,
+        description="语义查询缓存条目过期时间（秒）",
+    )
+    # 本地 embedding 推理后端（use_local_embedding=true 时生效）
+    local_embedding_backend: str = Field(
+        default="torch",
+        pattern="^(torch|onnx)$",
+        description="本地 embedding 后端：torch（SentenceTransformer）/ onnx（ONNX Runtime，纯 CPU）",
+    )
+    local_embedding_quantized: bool = Field(
+        default=True,
+        description="onnx 后端优先加载 int8 动态量化权重（模型仓库 onnx/ 目录中提供时）",
+    )
+    local_embedding_onnx_dir: str = Field(
+        default="",
+        description="onnx 后端的本地模型目录（留空则按模型 ID 从 HuggingFace 下载 ONNX 文件）",
+    )
+    # 跨线程 embedding 请求合并（本地模型与 API embedding 均适用）
+    embedding_batch_wait_ms: float = Field(
+        default=2.0,
+        ge=0.0,
+        le=50.0,
+        description="embedding 请求合并等待窗口（毫秒，0 关闭合并，每次调用直接计算）",
+    )
+    embedding_batch_max: int = Field(
+        default=32,
+        ge=1,
+        le=512,
+        description="单次合并调用的最大文本条数（凑满立即出发）",
+    )
+    embedding_batch_max_inflight: int = Field(
+        default=4,
+        ge=1,
+        le=32,
+        description="同时计算的合并批次数上限（大批量写入进行中时，查询仍可并行计算）",
+    )
+
+    long_term_time_index_enabled: bool = Field(
+        default=True,
+        description="长期记忆时间侧车索引（SQLite 有序表）：时间范围查询二分定位，旧库需重建后生效",
+    )
 
     # 长期记忆（向量库）写入策略
     long_term_batch_size: int = Field(
@@ -749,6 +909,22 @@ class AgentConfig(BaseModel):
         le=60.0,
         description="记忆检索熔断器冷却时间（秒）。",
     )
+    memory_prefetch_enabled: bool = Field(
+        default=True,
+        description="用户输入时按草稿预取记忆检索结果（发送时消息与草稿足够接近则直接复用）。",
+    )
+    memory_prefetch_debounce_ms: int = Field(
+        default=350,
+        ge=0,
+        le=5000,
+        description="记忆预取的草稿防抖时间（毫秒）。",
+    )
+    memory_prefetch_min_similarity: float = Field(
+        default=0.85,
+        ge=0.0,
+        le=1.0,
+        description="复用预取结果所需的消息与草稿最低相似度（归一化后比较）。",
+    )
 
     # Redis 缓存配置（用于多级缓存 L2）
     redis_enabled: bool = Field(
@@ -904,6 +1080,24 @@ class AgentConfig(BaseModel):
         ge=1,
         description="LLM 执行线程池大小",
     )
+    llm_http2_enabled: bool = Field(
+        default=True,
+        description="LLM 共享连接池启用 HTTP/2（依赖 httpx[http2]；h2 缺失时自动使用 HTTP/1.1 keep-alive）",
+    )
+    llm_http_max_connections: int = Field(
+        default=32,
+        ge=1,
+        description="LLM 共享连接池每个 API 地址的最大连接数",
+    )
+    llm_http_keepalive_s: float = Field(
+        default=90.0,
+        ge=1.0,
+        description="LLM 共享连接池空闲连接保活时间（秒）",
+    )
+    llm_http_warmup: bool = Field(
+        default=True,
+        description="Agent 初始化时在后台预热 LLM API 连接（提前完成 TCP/TLS 握手）",
+    )
     llm_first_chunk_timeout_s: float = Field(
         default=18.0,
         gt=0.0,
@@ -934,6 +1128,35 @@ class AgentConfig(BaseModel):
         ge=1,
         description="流式执行线程池大小",
     )
+    shared_runtime_enabled: bool = Field(
+        default=True,
+        description="多个 Agent 会话共用进程级线程池/事件循环（按用户公平调度）；关闭则每个 Agent 自建",
+    )
+    runtime_background_workers: int = Field(
+        default=4,
+        ge=1,
+        description="共享运行时：后台任务线程上限（所有会话合计）",
+    )
+    runtime_llm_workers: int = Field(
+        default=8,
+        ge=1,
+        description="共享运行时：LLM 调用线程上限（单用户上限为 llm_executor_workers）",
+    )
+    runtime_stream_workers: int = Field(
+        default=8,
+        ge=1,
+        description="共享运行时：流式输出线程上限（单用户上限为 stream_executor_workers）",
+    )
+    runtime_blocking_workers: int = Field(
+        default=4,
+        ge=1,
+        description="共享运行时：同步桥接线程上限（单用户 1 个）",
+    )
+    runtime_memory_workers: int = Field(
+        default=8,
+        ge=1,
+        description="共享运行时：记忆检索线程上限（单用户 4 个）",
+    )
     stream_min_chunk_chars: int = Field(
         default=8,
         ge=1,
@@ -119,6 +119,14 @@ SCROLL_EDGE_BLUR_ENABLED = os.getenv("MINTCHAT_GUI_SCROLL_EDGE_BLUR", "0").lower
 # 为 0 表示禁用（保持旧行为）。
 MAX_RENDERED_MESSAGES = max(0, int(os.getenv("MINTCHAT_GUI_MAX_RENDERED_MESSAGES", "400")))
 TRIM_RENDERED_MESSAGES_BATCH = max(1, int(os.getenv("MINTCHAT_GUI_TRIM_RENDERED_BATCH", "50")))
+# 虚拟化消息列表（Model/View）：只为可见行排版与绘制，长对话无需裁剪历史即可保持流畅。
+# 启用后 MAX_RENDERED_MESSAGES / 阴影预算 / 动图预算不再生效（消息不再是独立 widget）。
+VIRTUAL_MESSAGE_LIST = os.getenv("MINTCHAT_GUI_VIRTUAL_MESSAGE_LIST", "0").lower() not in {
+    "0",
+    "false",
+    "no",
+    "off",
+}
 AUTO_SCROLL_BOTTOM_THRESHOLD_PX = max(0, int(os.getenv("MINTCHAT_GUI_AUTO_SCROLL_BOTTOM_PX", "80")))
 SMOOTH_SCROLL_ENABLED = os.getenv("MINTCHAT_GUI_SMOOTH_SCROLL", "0").lower() not in {
     "0",
@@ -162,6 +170,12 @@ from .light_message_bubble import (  # noqa: E402
     LightTypingIndicator,
     LightImageMessageBubble,
 )
+from .virtual_message_list import (  # noqa: E402
+    ChatMessageListModel,
+    StreamingMessageHandle,
+    TypingRowHandle,
+    VirtualMessageListView,
+)
 from .material_design_enhanced import (  # noqa: E402
     MD3_ENHANCED_COLORS,
     MD3_ENHANCED_RADIUS,
@@ -175,13 +189,13 @@ from src.utils.logger import get_logger  # noqa: E402
 from src.auth.user_session import user_session  # noqa: E402
 from src.auth.session_store import delete_session_token_file, write_session_token_file  # noqa: E402
 from src.utils.gui_optimizer import throttle  # noqa: E402
+from src.utils.stream_processor import apply_stream_retraction  # noqa: E402
 from .chat_window_optimizer import ChatWindowOptimizer  # noqa: E402
 from .workers.chat_history_loader import (  # noqa: E402
     ChatHistoryLoaderThread,
     ChatHistoryLoadRequest,
 )
 from .workers.agent_chat import AgentInitThread, ChatThread, invalidate_agent_cache  # noqa: E402
-from .workers.tts_synthesis import TTSSynthesisTask  # noqa: E402
 from .workers.vision_analysis import VisionAnalyzeTask  # noqa: E402
 from .workers.vision_batch import BatchImageRecognitionThread  # noqa: E402
 
@@ -1035,10 +1049,9 @@ class LightChatWindow(LightFramelessWindow):
         self.tts_enabled = False  # TTS 是否启用
         self.tts_manager = None  # TTS 管理器
         self.audio_player = None  # 音频播放器
-        self.tts_stream_processor = None  # 流式文本处理器
-        self.tts_workers = []  # TTS 工作线程列表（防止被垃圾回收）
-        self.tts_queue = []  # 待合成的句子队列（顺序播放）
-        self.tts_busy = False  # 是否有 TTS 任务正在执行
+        self._tts_pipeline = None  # 当前回复的流式 TTS 流水线（边生成边合成，按句序播放）
+        self._tts_warmer = None  # 空闲时预合成问候语与高频句（常驻缓存）
+        self._tts_warmer_agent = None  # 预热器所用的 Agent（Agent 变化时重启）
 
         # 设置窗口大小
         self.resize(1200, 800)
@@ -1111,8 +1124,22 @@ class LightChatWindow(LightFramelessWindow):
 
         # 消息区域 - MD3 Surface + 简洁设计
         # 添加圆角，与输入框上方圆角呼应
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
+        # 虚拟化模式下消息区是 VirtualMessageListView（同为 QAbstractScrollArea，滚动条/viewport
+        # 相关逻辑保持不变）；messages_widget/messages_layout 仍会创建但不挂到界面上。
+        self.message_model = None
+        self.message_view = None
+        if VIRTUAL_MESSAGE_LIST:
+            self.message_model = ChatMessageListModel(self)
+            self.message_view = VirtualMessageListView(
+                column_max_width=820,
+                top_inset=CharacterStatusIsland.COLLAPSED_HEIGHT + 20,
+                bottom_inset=16,
+            )
+            self.message_view.setModel(self.message_model)
+            self.scroll_area = self.message_view
+        else:
+            self.scroll_area = QScrollArea()
+            self.scroll_area.setWidgetResizable(True)
         # 性能：减少滚动/内容变化时的无效重绘（不同 PyQt 版本可能不提供该 API，需兼容）
         try:
             if hasattr(self.scroll_area, "setViewportUpdateMode"):
@@ -1122,9 +1149,10 @@ class LightChatWindow(LightFramelessWindow):
         except Exception:
             pass
         self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        scroll_selector = "QAbstractItemView" if VIRTUAL_MESSAGE_LIST else "QScrollArea"
         self.scroll_area.setStyleSheet(
             f"""
-            QScrollArea {{
+            {scroll_selector} {{
                 background: {MD3_ENHANCED_COLORS['surface']};
                 border: none;
                 border-top-left-radius: 16px;
@@ -1186,7 +1214,8 @@ class LightChatWindow(LightFramelessWindow):
         outer_layout.addWidget(self.messages_widget, 0)
         outer_layout.addStretch(1)
 
-        self.scroll_area.setWidget(self.messages_outer_widget)
+        if self.message_view is None:
+            self.scroll_area.setWidget(self.messages_outer_widget)
 
         # 原子岛：固定在消息显示框（viewport）内，展开不再推挤下方消息区域
         ai_avatar = user_session.get_ai_avatar() if user_session.is_logged_in() else "🐱"
@@ -1246,7 +1275,7 @@ class LightChatWindow(LightFramelessWindow):
 
         # Soft edge blur while scrolling: makes bubbles fade/blur at viewport boundaries.
         self._edge_blur_overlay = None
-        if SCROLL_EDGE_BLUR_ENABLED:
+        if SCROLL_EDGE_BLUR_ENABLED and self.message_view is None:
             try:
                 from .scroll_edge_blur_overlay import ScrollEdgeBlurOverlay
 
@@ -1289,6 +1318,11 @@ class LightChatWindow(LightFramelessWindow):
             self.enhanced_input.content_changed.connect(lambda: self._set_send_enabled(True))
         except Exception:
             pass
+        try:
+            # 输入时按草稿预取记忆检索，发送后可直接复用（降低首包延迟）
+            self.enhanced_input.content_changed.connect(self._prefetch_draft_context)
+        except Exception:
+            pass
         try:
             self.enhanced_input.setSizePolicy(
                 QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed
@@ -1499,6 +1533,21 @@ class LightChatWindow(LightFramelessWindow):
         except Exception:
             pass
 
+    def _prefetch_draft_context(self) -> None:
+        agent = self.agent
+        if agent is None or bool(getattr(self, "_agent_initializing", False)):
+            return
+        prefetch = getattr(agent, "prefetch_context", None)
+        if not callable(prefetch):
+            return
+        try:
+            thread = getattr(self, "current_chat_thread", None)
+            if thread is not None and thread.isRunning():
+                return
+            prefetch(self.enhanced_input.get_text())
+        except Exception:
+            pass
+
     def _set_send_enabled(self, enabled: bool) -> None:
         """统一管理发送按钮状态，避免在 Agent 未就绪时误启用。"""
         try:
@@ -1704,6 +1753,10 @@ class LightChatWindow(LightFramelessWindow):
         except Exception:
             pass
 
+        # TTS 可能先于 Agent 就绪：此时才有问候/告别语与用户 ID 可供预热
+        if getattr(self, "tts_enabled", False):
+            self._start_tts_warmer()
+
     def _on_agent_init_failed(self, error: str) -> None:
         self.agent = None
         self._agent_initializing = False
@@ -1795,7 +1848,11 @@ class LightChatWindow(LightFramelessWindow):
         # v2.29.10: 使用预编译的正则表达式，提升性能
         sticker_only = STICKER_PATTERN.fullmatch(message_stripped)
         image_only = IMAGE_PATTERN.fullmatch(message_stripped)
-        if sticker_only:
+        message_model = getattr(self, "message_model", None)
+        if message_model is not None:
+            # 虚拟化列表：消息只是一行数据，文字/表情包/图片由委托统一绘制
+            message_model.append_message("user" if is_user else "assistant", message)
+        elif sticker_only:
             # 纯表情包消息：避免额外容器 widget，减少布局与重绘成本
             sticker_path = sticker_only.group(1)
             bubble = LightImageMessageBubble(
@@ -1892,7 +1949,7 @@ class LightChatWindow(LightFramelessWindow):
 
                     handle_exception(e, logger, "保存消息到数据库失败")
 
-        if not bulk_loading:
+        if not bulk_loading and message_model is None:
             self._enforce_shadow_budget()
             self._schedule_animated_image_budget()
             # 长对话保护：只在用户位于底部（允许自动滚动）时裁剪旧消息，避免影响用户阅读历史
@@ -2178,7 +2235,7 @@ class LightChatWindow(LightFramelessWindow):
         removed = 0
 
         scrollbar = self.scroll_area.verticalScrollBar()
-        scroll_widget = self.scroll_area.widget()
+        scroll_widget = self._messages_scroll_widget()
         old_scrollbar_signals = False
         try:
             try:
@@ -2319,6 +2376,14 @@ class LightChatWindow(LightFramelessWindow):
             is_user: 是否为用户消息
         """
         bulk_loading = bool(getattr(self, "_bulk_loading_messages", False))
+        message_model = getattr(self, "message_model", None)
+        if message_model is not None:
+            message_model.append_message(
+                "user" if is_user else "assistant", f"[IMAGE:{image_path}]"
+            )
+            if not bulk_loading:
+                self._ensure_scroll_to_bottom()
+            return
         enable_entry_animation = bool(GUI_ANIMATIONS_ENABLED)
         bubble = LightImageMessageBubble(
             image_path,
@@ -2386,6 +2451,12 @@ class LightChatWindow(LightFramelessWindow):
         self._scroll_animation.setEndValue(target_value)
         self._scroll_animation.start()
 
+    def _messages_scroll_widget(self) -> Optional[QWidget]:
+        """消息区滚动内容 widget（虚拟化列表模式下没有内容 widget，返回 None）。"""
+        if getattr(self, "message_view", None) is not None:
+            return None
+        return self.scroll_area.widget()
+
     def _schedule_messages_geometry_update(self) -> None:
         """合并消息区的 updateGeometry 调用，避免触发同步布局抖动。"""
         if getattr(self, "_messages_geometry_update_pending", False):
@@ -2395,7 +2466,7 @@ class LightChatWindow(LightFramelessWindow):
         def do_update() -> None:
             self._messages_geometry_update_pending = False
             try:
-                widget = self.scroll_area.widget() if hasattr(self, "scroll_area") else None
+                widget = self._messages_scroll_widget() if hasattr(self, "scroll_area") else None
                 if widget is not None:
                     widget.updateGeometry()
             except Exception:
@@ -2436,6 +2507,11 @@ class LightChatWindow(LightFramelessWindow):
         if hasattr(self, "typing_indicator") and self.typing_indicator is not None:
             self._hide_typing_indicator()
 
+        message_model = getattr(self, "message_model", None)
+        if message_model is not None:
+            self.typing_indicator = TypingRowHandle(message_model)
+            return
+
         self.typing_indicator = LightTypingIndicator()
         # v2.30.8: 插入到最后（stretch之前）
         insert_position = self.messages_layout.count() - 1
@@ -2482,6 +2558,7 @@ class LightChatWindow(LightFramelessWindow):
         self._stream_render_pending = ""
         self._stream_render_pending_pos = 0
         self._stream_render_remaining = 0
+        self._stream_chunk_log = []
         # Live2D: reset streaming-only buffers as well.
         try:
             self._live2d_stream_directive_buf = ""
@@ -2591,6 +2668,30 @@ class LightChatWindow(LightFramelessWindow):
         if timer is not None and not timer.isActive():
             timer.start()
 
+    def _retract_stream_render_text(self, chars: int) -> int:
+        """从渲染队列尾部移除最多 chars 个尚未显示的字符，返回仍需从气泡中移除的字符数。"""
+        remaining = max(0, int(chars))
+        queue = getattr(self, "_stream_render_queue", None)
+        while remaining > 0 and queue:
+            last = queue[-1]
+            take = min(remaining, len(last))
+            if take >= len(last):
+                queue.pop()
+            else:
+                queue[-1] = last[: len(last) - take]
+            remaining -= take
+            self._stream_render_remaining -= take
+
+        pending = str(getattr(self, "_stream_render_pending", "") or "")
+        pos = int(getattr(self, "_stream_render_pending_pos", 0))
+        available = len(pending) - pos
+        if remaining > 0 and available > 0:
+            take = min(remaining, available)
+            self._stream_render_pending = pending[: len(pending) - take]
+            remaining -= take
+            self._stream_render_remaining -= take
+        return remaining
+
     def _take_stream_render_text(self, max_chars: int) -> str:
         """从队列中取出最多 max_chars 字符，并维护 remaining 计数。"""
         if max_chars <= 0 or int(getattr(self, "_stream_render_remaining", 0)) <= 0:
@@ -3059,11 +3160,11 @@ class LightChatWindow(LightFramelessWindow):
             pass
         return True
 
-    def _handle_stream_chunk(self, chunk: str) -> None:
-        """处理流式输出块：过滤、创建气泡、入队渲染、TTS。"""
+    def _handle_stream_chunk(self, chunk: str) -> str:
+        """处理流式输出块：过滤、创建气泡、入队渲染、TTS；返回实际显示的文本。"""
         chunk = chunk or ""
         if not chunk:
-            return
+            return ""
 
         # Live2D: strip/apply explicit directives during streaming (avoid flashing control tags).
         try:
@@ -3083,7 +3184,7 @@ class LightChatWindow(LightFramelessWindow):
         if self._needs_tool_filter(chunk):
             chunk = self._filter_tool_info_safe(chunk)
             if not chunk:
-                return
+                return ""
 
         # Live2D: keep a small rolling tail buffer so negations across chunk boundaries still work.
         try:
@@ -3107,13 +3208,8 @@ class LightChatWindow(LightFramelessWindow):
         # 隐藏打字指示器（只在第一次）
         if hasattr(self, "typing_indicator") and self.typing_indicator is not None:
             self._hide_typing_indicator()
-            if (
-                hasattr(self, "tts_enabled")
-                and self.tts_enabled
-                and hasattr(self, "tts_stream_processor")
-                and self.tts_stream_processor
-            ):
-                self.tts_stream_processor.reset()
+            if getattr(self, "tts_enabled", False):
+                self._start_tts_pipeline()
 
         # 语音输入模式：消息区作为历史查看，禁用流式渲染（只缓存，结束后一次性落入普通气泡）
         if bool(getattr(self, "_asr_force_non_stream", False)):
@@ -3125,7 +3221,7 @@ class LightChatWindow(LightFramelessWindow):
                 buf.append(chunk)
             except Exception:
                 pass
-            return
+            return chunk
 
         # Live2D: best-effort realtime feedback for strong keywords during streaming.
         try:
@@ -3143,34 +3239,70 @@ class LightChatWindow(LightFramelessWindow):
 
         # 创建或更新流式消息气泡
         if self.current_streaming_bubble is None:
-            self.current_streaming_bubble = LightStreamingMessageBubble()
+            message_model = getattr(self, "message_model", None)
             self._stream_model_done = False
-            self.messages_layout.insertWidget(
-                self.messages_layout.count() - 1, self.current_streaming_bubble
-            )
-            self._schedule_messages_layout_update()
+            if message_model is not None:
+                self.current_streaming_bubble = StreamingMessageHandle(message_model)
+            else:
+                self.current_streaming_bubble = LightStreamingMessageBubble()
+                self.messages_layout.insertWidget(
+                    self.messages_layout.count() - 1, self.current_streaming_bubble
+                )
+                self._schedule_messages_layout_update()
 
         # 入队：由渲染定时器分帧追加，避免“大段跳动”
         self._enqueue_stream_render_text(chunk)
 
-        # 流式TTS处理
-        if (
-            hasattr(self, "tts_enabled")
-            and self.tts_enabled
-            and hasattr(self, "tts_stream_processor")
-            and self.tts_stream_processor
-        ):
-            for sentence in self.tts_stream_processor.process_chunk(chunk):
-                if not sentence or not sentence.strip():
-                    continue
-                filtered_sentence = (
-                    self._filter_tool_info_safe(sentence)
-                    if self._needs_tool_filter(sentence)
-                    else sentence
-                )
-                if not filtered_sentence or not filtered_sentence.strip():
-                    continue
-                self._synthesize_tts_async(filtered_sentence)
+        # 流式TTS处理：整句切出即开始合成（最多预取 stream_lookahead 句），按句序播放
+        pipeline = getattr(self, "_tts_pipeline", None)
+        if pipeline is not None:
+            pipeline.feed(chunk)
+        return chunk
+
+    def _handle_stream_retract(self, chars: int) -> None:
+        """
+        推测流式撤回：丢弃模型输出末尾 chars 个字符对应的显示文本（渲染队列/气泡/TTS）。
+
+        显示文本经过 Live2D 指令剥离与工具信息过滤，与模型输出并非逐字对应，
+        因此按接收块回退：整块撤回，部分撤回的块保留前缀重新处理。
+        """
+        log = getattr(self, "_stream_chunk_log", None)
+        if not log:
+            return
+        remaining = max(0, int(chars))
+        shown_chars = 0
+        keep_prefix = ""
+        while remaining > 0 and log:
+            raw, shown = log.pop()
+            shown_chars += shown
+            if len(raw) <= remaining:
+                remaining -= len(raw)
+            else:
+                keep_prefix = raw[: len(raw) - remaining]
+                remaining = 0
+
+        if shown_chars > 0:
+            if bool(getattr(self, "_asr_force_non_stream", False)):
+                buf = getattr(self, "_asr_non_stream_buffer", None)
+                if buf:
+                    apply_stream_retraction(buf, shown_chars)
+            else:
+                rest = self._retract_stream_render_text(shown_chars)
+                bubble = self.current_streaming_bubble
+                if rest > 0 and bubble is not None:
+                    text = bubble.message_text.toPlainText()
+                    bubble.message_text.setPlainText(text[: max(0, len(text) - rest)])
+                pipeline = getattr(self, "_tts_pipeline", None)
+                if pipeline is not None:
+                    pipeline.retract(shown_chars)
+            try:
+                tail = str(getattr(self, "_live2d_stream_text_buf", "") or "")
+                self._live2d_stream_text_buf = tail[: max(0, len(tail) - shown_chars)]
+            except Exception:
+                pass
+
+        if keep_prefix:
+            log.append((keep_prefix, len(self._handle_stream_chunk(keep_prefix))))
 
     def _get_tool_filter_func(self):
         func = getattr(self, "_tool_filter_func", None)
@@ -3227,8 +3359,9 @@ class LightChatWindow(LightFramelessWindow):
         """隐藏打字指示器"""
         if hasattr(self, "typing_indicator") and self.typing_indicator is not None:
             self.typing_indicator.stop_animation()
-            self.messages_layout.removeWidget(self.typing_indicator)
-            self.typing_indicator.deleteLater()
+            if getattr(self, "message_model", None) is None:
+                self.messages_layout.removeWidget(self.typing_indicator)
+                self.typing_indicator.deleteLater()
             self.typing_indicator = None
 
     def _register_live_chat_thread(self, thread: Optional["ChatThread"]) -> None:
@@ -3275,6 +3408,7 @@ class LightChatWindow(LightFramelessWindow):
         try:
             try:
                 thread.chunk_received.disconnect()
+                thread.retract_received.disconnect()
                 thread.finished.disconnect()
                 thread.error.disconnect()
             except TypeError:
@@ -3303,7 +3437,19 @@ class LightChatWindow(LightFramelessWindow):
         sender = self.sender()
         if sender is not None and sender is not self.current_chat_thread:
             return
-        self._handle_stream_chunk(chunk)
+        shown = self._handle_stream_chunk(chunk)
+        log = getattr(self, "_stream_chunk_log", None)
+        if log is None:
+            log = []
+            self._stream_chunk_log = log
+        log.append((chunk, len(shown)))
+
+    def _on_retract_received(self, chars: int):
+        """ChatThread 转发的推测流式撤回。"""
+        sender = self.sender()
+        if sender is not None and sender is not self.current_chat_thread:
+            return
+        self._handle_stream_retract(chars)
 
     def _on_chat_finished(self):
         """聊天完成：模型已结束，逐字渲染继续直到队列耗尽后再收尾。"""
@@ -3323,24 +3469,9 @@ class LightChatWindow(LightFramelessWindow):
         self._stream_model_done = True
 
         # v2.48.12: 处理 TTS 剩余文本（模型已结束即可 flush，不必等待 UI 完成逐字渲染）
-        if (
-            hasattr(self, "tts_enabled")
-            and self.tts_enabled
-            and hasattr(self, "tts_stream_processor")
-            and self.tts_stream_processor
-        ):
-            remaining = self.tts_stream_processor.flush()
-            if remaining:
-                filtered_remaining = (
-                    self._filter_tool_info_safe(remaining)
-                    if self._needs_tool_filter(remaining)
-                    else remaining
-                )
-                if not filtered_remaining or not filtered_remaining.strip():
-                    logger.debug("TTS 跳过空剩余文本（过滤后）: %s...", remaining[:30])
-                else:
-                    self._synthesize_tts_async(filtered_remaining)
-                    logger.debug("TTS 发送剩余文本: %s...", filtered_remaining[:30])
+        pipeline = getattr(self, "_tts_pipeline", None)
+        if pipeline is not None:
+            pipeline.finish()
 
         # v2.30.14: 清理聊天线程，防止内存泄漏
         try:
@@ -3384,8 +3515,9 @@ class LightChatWindow(LightFramelessWindow):
             try:
                 if hasattr(self.current_streaming_bubble, "cleanup"):
                     self.current_streaming_bubble.cleanup()
-                self.messages_layout.removeWidget(self.current_streaming_bubble)
-                self.current_streaming_bubble.deleteLater()
+                if getattr(self, "message_model", None) is None:
+                    self.messages_layout.removeWidget(self.current_streaming_bubble)
+                    self.current_streaming_bubble.deleteLater()
             except Exception:
                 pass
             self.current_streaming_bubble = None
@@ -3478,7 +3610,7 @@ class LightChatWindow(LightFramelessWindow):
                     self._ensure_scroll_to_bottom()
                 else:
                     scrollbar = self.scroll_area.verticalScrollBar()
-                    scroll_widget = self.scroll_area.widget()
+                    scroll_widget = self._messages_scroll_widget()
                     old_bulk_loading = getattr(self, "_bulk_loading_messages", False)
                     old_scrollbar_signals = False
                     try:
@@ -3566,6 +3698,7 @@ class LightChatWindow(LightFramelessWindow):
             )
             self._register_live_chat_thread(self.current_chat_thread)
             self.current_chat_thread.chunk_received.connect(self._on_chunk_received)
+            self.current_chat_thread.retract_received.connect(self._on_retract_received)
             self.current_chat_thread.finished.connect(self._on_chat_finished)
             self.current_chat_thread.error.connect(self._on_chat_error)
             self.current_chat_thread.start()
@@ -4265,6 +4398,7 @@ class LightChatWindow(LightFramelessWindow):
             )
             self._register_live_chat_thread(self.current_chat_thread)
             self.current_chat_thread.chunk_received.connect(self._on_chunk_received)
+            self.current_chat_thread.retract_received.connect(self._on_retract_received)
             self.current_chat_thread.finished.connect(self._on_chat_finished)
             self.current_chat_thread.error.connect(self._on_chat_error)
             self.current_chat_thread.start()
@@ -4382,6 +4516,7 @@ class LightChatWindow(LightFramelessWindow):
             )
             self._register_live_chat_thread(self.current_chat_thread)
             self.current_chat_thread.chunk_received.connect(self._on_chunk_received)
+            self.current_chat_thread.retract_received.connect(self._on_retract_received)
             self.current_chat_thread.finished.connect(self._on_chat_finished)
             self.current_chat_thread.error.connect(self._on_chat_error)
             self.current_chat_thread.start()
@@ -4574,6 +4709,7 @@ class LightChatWindow(LightFramelessWindow):
         )
         self._register_live_chat_thread(self.current_chat_thread)
         self.current_chat_thread.chunk_received.connect(self._on_chunk_received)
+        self.current_chat_thread.retract_received.connect(self._on_retract_received)
         self.current_chat_thread.finished.connect(self._on_chat_finished)
         self.current_chat_thread.error.connect(self._on_chat_error)
         self.current_chat_thread.start()
@@ -4794,6 +4930,9 @@ class LightChatWindow(LightFramelessWindow):
     def _show_history_loading_state(self, contact_name: str) -> None:
         """显示历史加载占位，避免切换联系人时界面长时间空白。"""
         self._remove_history_loading_state()
+        if getattr(self, "message_view", None) is not None:
+            # 虚拟化列表：单页历史只测量行高，加载很快，不再插入占位 widget
+            return
         try:
             from .loading_states import CircularProgress
 
@@ -4944,8 +5083,9 @@ class LightChatWindow(LightFramelessWindow):
         messages: list[dict],
     ) -> None:
         """将后台加载到的聊天历史应用到界面（批量插入、禁用动画）。"""
-        scroll_widget = self.scroll_area.widget()
+        scroll_widget = self._messages_scroll_widget()
         scrollbar = self.scroll_area.verticalScrollBar()
+        message_model = getattr(self, "message_model", None)
         old_bulk_loading = getattr(self, "_bulk_loading_messages", False)
         old_scrollbar_signals = False
         try:
@@ -4986,13 +5126,17 @@ class LightChatWindow(LightFramelessWindow):
                 except Exception:
                     pass
 
-                for msg in messages:
-                    self._add_message(
-                        msg.get("content", ""),
-                        is_user=(msg.get("role") == "user"),
-                        save_to_db=False,
-                        with_animation=False,
-                    )
+                if message_model is not None:
+                    # 虚拟化列表：整页一次性重置模型（只测量行高，不创建 widget）
+                    message_model.set_messages(messages)
+                else:
+                    for msg in messages:
+                        self._add_message(
+                            msg.get("content", ""),
+                            is_user=(msg.get("role") == "user"),
+                            save_to_db=False,
+                            with_animation=False,
+                        )
 
             # 更新已加载消息数量
             self._loaded_message_count[contact_name] = len(messages)
@@ -5059,40 +5203,46 @@ class LightChatWindow(LightFramelessWindow):
                 except Exception:
                     pass
 
-            scroll_widget = self.scroll_area.widget()
-            scrollbar = self.scroll_area.verticalScrollBar()
-            old_bulk_loading = getattr(self, "_bulk_loading_messages", False)
-            old_scrollbar_signals = False
-            try:
-                self._bulk_loading_messages = True
-                try:
-                    old_scrollbar_signals = scrollbar.blockSignals(True)
-                except Exception:
-                    old_scrollbar_signals = False
-                self.scroll_area.setUpdatesEnabled(False)
-                if scroll_widget is not None:
-                    scroll_widget.setUpdatesEnabled(False)
-
-                for msg in reversed(messages):  # 反转以保持时间顺序
-                    self._insert_message_at_top(
-                        msg.get("content", ""),
-                        is_user=(msg.get("role") == "user"),
-                        with_animation=False,
-                    )
-
+            message_model = getattr(self, "message_model", None)
+            if message_model is not None:
+                # 虚拟化列表：顶部插入时视图自动保持阅读锚点，无需事后恢复滚动位置
+                message_model.prepend_messages(messages)
                 self._loaded_message_count[contact_name] = prev_loaded_count + len(messages)
-            finally:
-                if scroll_widget is not None:
-                    scroll_widget.setUpdatesEnabled(True)
-                self.scroll_area.setUpdatesEnabled(True)
+            else:
+                scroll_widget = self._messages_scroll_widget()
+                scrollbar = self.scroll_area.verticalScrollBar()
+                old_bulk_loading = getattr(self, "_bulk_loading_messages", False)
+                old_scrollbar_signals = False
                 try:
-                    scrollbar.blockSignals(old_scrollbar_signals)
-                except Exception:
-                    pass
-                self._bulk_loading_messages = old_bulk_loading
+                    self._bulk_loading_messages = True
+                    try:
+                        old_scrollbar_signals = scrollbar.blockSignals(True)
+                    except Exception:
+                        old_scrollbar_signals = False
+                    self.scroll_area.setUpdatesEnabled(False)
+                    if scroll_widget is not None:
+                        scroll_widget.setUpdatesEnabled(False)
+
+                    for msg in reversed(messages):  # 反转以保持时间顺序
+                        self._insert_message_at_top(
+                            msg.get("content", ""),
+                            is_user=(msg.get("role") == "user"),
+                            with_animation=False,
+                        )
 
-            self._schedule_messages_layout_update()
-            QTimer.singleShot(100, lambda: self._restore_scroll_position(old_value, old_max))
+                    self._loaded_message_count[contact_name] = prev_loaded_count + len(messages)
+                finally:
+                    if scroll_widget is not None:
+                        scroll_widget.setUpdatesEnabled(True)
+                    self.scroll_area.setUpdatesEnabled(True)
+                    try:
+                        scrollbar.blockSignals(old_scrollbar_signals)
+                    except Exception:
+                        pass
+                    self._bulk_loading_messages = old_bulk_loading
+
+                self._schedule_messages_layout_update()
+                QTimer.singleShot(100, lambda: self._restore_scroll_position(old_value, old_max))
 
             logger.info(
                 "已加载 %s/%s 条历史消息",
@@ -5580,6 +5730,11 @@ class LightChatWindow(LightFramelessWindow):
 
     def _clear_messages(self):
         """清空消息区域 - v2.19.2 修复版：正确清理资源"""
+        message_model = getattr(self, "message_model", None)
+        if message_model is not None:
+            message_model.clear()
+            return
+
         # 快速路径：大量历史消息时，逐个 takeAt() 容易导致窗口“未响应”
         try:
             message_count = max(0, int(self.messages_layout.count()) - 1)
@@ -6175,6 +6330,9 @@ class LightChatWindow(LightFramelessWindow):
             messages_widget.setMaximumWidth(int(target))
         except Exception:
             pass
+        message_view = getattr(self, "message_view", None)
+        if message_view is not None:
+            message_view.set_column_max_width(int(target))
 
         # Keep the input card aligned with the message reading width for a cleaner layout.
         enhanced_input = getattr(self, "enhanced_input", None)
@@ -6429,6 +6587,7 @@ class LightChatWindow(LightFramelessWindow):
                     # v2.46.1: 断开所有信号连接，防止信号槽泄漏
                     try:
                         self.current_chat_thread.chunk_received.disconnect()
+                        self.current_chat_thread.retract_received.disconnect()
                         self.current_chat_thread.finished.disconnect()
                         self.current_chat_thread.error.disconnect()
                     except TypeError:
@@ -6636,44 +6795,35 @@ class LightChatWindow(LightFramelessWindow):
                 finally:
                     self.agent = None
 
-            # 8. 清理 TTS 工作线程和队列
-            if hasattr(self, "tts_workers") and self.tts_workers:
-                logger.info("清理 %s 个 TTS 后台任务...", len(self.tts_workers))
-                # 兼容旧实现：如果列表里仍有 QThread，则尽量停止；线程池任务无法强制中断，关闭时需保留引用避免 GC 崩溃。
-                remaining_tasks: list[object] = []
-                for worker in list(self.tts_workers):
-                    try:
-                        is_running = getattr(worker, "isRunning", None)
-                        if callable(is_running):
-                            if is_running():
-                                if hasattr(worker, "requestInterruption"):
-                                    worker.requestInterruption()
-                                if hasattr(worker, "wait") and callable(worker.wait):
-                                    if not worker.wait(2000):
-                                        if hasattr(worker, "terminate"):
-                                            worker.terminate()
-                                        worker.wait(1000)
-                            if hasattr(worker, "deleteLater"):
-                                worker.deleteLater()
-                            continue
-                    except Exception as exc:
-                        logger.debug("清理 TTS worker 时出错: %s", exc)
-
-                    # QRunnable：保留引用直到线程池任务自然结束（避免窗口关闭时被 GC）
-                    remaining_tasks.append(worker)
-
-                self.tts_workers = remaining_tasks
-
-            # 清理TTS队列和状态
-            if hasattr(self, "tts_queue"):
-                self.tts_queue.clear()
-            if hasattr(self, "tts_busy"):
-                self.tts_busy = False
+            # 8. 停止流式 TTS（放弃尚未合成完成的句子）
+            pipeline = getattr(self, "_tts_pipeline", None)
+            if pipeline is not None:
+                try:
+                    pipeline.cancel()
+                except Exception as exc:
+                    logger.debug("停止流式 TTS 时出错: %s", exc)
+                self._tts_pipeline = None
+            warmer = getattr(self, "_tts_warmer", None)
+            if warmer is not None:
+                try:
+                    warmer.stop()
+                except Exception:
+                    pass
+                self._tts_warmer = None
+                self._tts_warmer_agent = None
 
             # 9. 清理线程池
             if hasattr(self, "thread_pool"):
                 self.thread_pool.waitForDone(1000)  # 等待最多1秒
 
+            # 9.1 关闭共享 Agent 运行时（线程池/事件循环/工具执行器，进程级资源）
+            try:
+                from src.agent.runtime import shutdown_agent_runtime
+
+                shutdown_agent_runtime(timeout=1.0)
+            except Exception:
+                pass
+
             # 10. 关闭 TTS runtime（放在线程池收尾之后，避免提前关闭导致任务卡死）
             try:
                 from src.multimodal.tts_runtime import shutdown_tts_runtime
@@ -6741,7 +6891,6 @@ class LightChatWindow(LightFramelessWindow):
                 is_tts_available,
                 get_audio_player,
             )
-            from src.utils.stream_processor import StreamProcessor
 
             # 检查 TTS 配置
             if not hasattr(settings, "tts") or not settings.tts or not settings.tts.enabled:
@@ -6811,17 +6960,11 @@ class LightChatWindow(LightFramelessWindow):
             except Exception:
                 pass
 
-            # 创建流式文本处理器
-            # v2.48.13: 将最小句子长度从 5 降低到 3，避免短句（如“好啊！”、“嗯。”）被过滤掉导致 TTS 丢句
-            self.tts_stream_processor = StreamProcessor(
-                min_sentence_length=3,
-                max_buffer_size=500,
-            )
-
             # 启用 TTS
             self.tts_enabled = True
 
             logger.info("TTS 系统初始化成功")
+            self._start_tts_warmer()
 
         except Exception as e:
             logger.error("TTS 系统初始化失败: %s", e)
@@ -7053,83 +7196,70 @@ class LightChatWindow(LightFramelessWindow):
             except Exception:
                 pass
 
-    def _synthesize_tts_async(self, text: str):
-        """异步合成 TTS 音频 (v2.48.13 优化版，单线程队列顺序播放，参考 MoeChat)"""
+    def _start_tts_pipeline(self) -> None:
+        """为新回复创建流式 TTS 流水线（上一条回复已入队的音频继续播放）。"""
+        # 上一条回复若未正常 finish（流被打断/报错），放弃其未播放的句子，避免与新回复交错播放
+        previous = self._tts_pipeline
+        self._tts_pipeline = None
+        if previous is not None:
+            try:
+                if not previous.stats().get("finished"):
+                    previous.cancel()
+            except Exception as exc:
+                logger.debug("停止上一条流式 TTS 时出错: %s", exc)
         if not self.tts_enabled or not self.tts_manager or not self.audio_player:
             return
-
-        if bool(getattr(self, "_closing", False)):
+        if bool(getattr(self, "_closing", False)) or self.agent is None:
             return
+        try:
+            # 与预热器同由 Agent 组装语音参数（use_mood_context=False），预热缓存键与流水线一致
+            self._tts_pipeline = self.agent.create_tts_pipeline(
+                self.audio_player,
+                use_mood_context=False,
+                text_filter=self._tts_text_filter,
+            )
+        except Exception as exc:
+            logger.error("创建流式 TTS 流水线失败: %s", exc)
+            self._tts_pipeline = None
+
+    def _start_tts_warmer(self) -> None:
+        """
+        TTS 与 Agent 都就绪后在空闲时预合成问候/告别语与高频句（与流水线共用过滤器，缓存键一致）。
 
-        if not text or not text.strip():
+        TTS 初始化与 AgentInitThread 先后顺序不定：两处都会调用本方法，Agent 未就绪时不启动，
+        Agent 变化（如重新登录）时重启预热器。
+        """
+        agent = self.agent
+        if agent is None or not self.tts_manager:
             return
+        if self._tts_warmer is not None:
+            if getattr(self, "_tts_warmer_agent", None) is agent:
+                return
+            try:
+                self._tts_warmer.stop()
+            except Exception:
+                pass
+            self._tts_warmer = None
+        try:
+            # 问候/告别语与用户 ID 由 Agent 提供；语音参数与 _start_tts_pipeline 一致
+            self._tts_warmer = agent.start_tts_warmer(
+                text_filter=self._tts_text_filter,
+                use_mood_context=False,
+            )
+            self._tts_warmer_agent = agent
+        except Exception as exc:
+            logger.debug("启动 TTS 预热失败: %s", exc)
+            self._tts_warmer = None
 
-        # v2.48.14: 最终过滤保护层 - 确保工具调用信息不会进入TTS
-        # 即使前面的过滤有遗漏，这里也会再次过滤
+    def _tts_text_filter(self, text: str) -> str:
+        """句子送入 TTS 前的最终过滤：工具调用信息与括号内动作描写不朗读（不影响 UI 显示）。"""
+        # v2.48.14: 最终过滤保护层 - 即使前面的过滤有遗漏，这里也会再次过滤
         if self._needs_tool_filter(text):
             text = self._filter_tool_info_safe(text)
-
-        # 角色扮演动作/神态描写（括号内）不需要朗读：仅影响 TTS，不影响 UI 显示文本
         try:
             from src.multimodal.tts_text import strip_stage_directions
 
             text = strip_stage_directions(text)
         except Exception:
             pass
-
-        # 如果过滤后为空或只包含空白，直接返回
-        if not text or not text.strip():
-            logger.debug("TTS 跳过空文本（最终过滤后）")
-            return
-
-        # 如果当前已有 TTS 任务在执行，则加入队列，保持顺序播放
-        if getattr(self, "tts_busy", False):
-            self.tts_queue.append(text)
-            logger.debug("TTS 任务加入队列: %s...", text[:20])
-            return
-
-        self.tts_busy = True
-
-        task = TTSSynthesisTask(self.tts_manager, text)
-        self.tts_workers.append(task)
-
-        def on_audio_ready(audio_data: bytes) -> None:
-            if bool(getattr(self, "_closing", False)):
-                return
-            try:
-                if self.audio_player:
-                    success = self.audio_player.play_audio(audio_data)
-                    if not success:
-                        logger.warning("音频播放失败，但继续处理队列")
-            except Exception as exc:
-                logger.error("播放音频时出错: %s", exc)
-
-        def on_error_occurred(error_msg: str) -> None:
-            logger.error(error_msg)
-
-        def cleanup_task() -> None:
-            try:
-                if task in self.tts_workers:
-                    self.tts_workers.remove(task)
-            except Exception:
-                pass
-            finally:
-                self.tts_busy = False
-
-            if bool(getattr(self, "_closing", False)):
-                return
-
-            if self.tts_queue:
-                next_text = self.tts_queue.pop(0)
-                QTimer.singleShot(0, lambda: self._synthesize_tts_async(next_text))
-
-        task.signals.audio_ready.connect(on_audio_ready)
-        task.signals.error.connect(on_error_occurred)
-        task.signals.finished.connect(cleanup_task)
-
-        try:
-            self.thread_pool.start(task)
-            logger.debug("TTS 合成任务已提交: %s...", text[:20])
-        except Exception as exc:
-            logger.error("启动 TTS 合成任务失败: %s", exc)
-            cleanup_task()
+        return text or ""
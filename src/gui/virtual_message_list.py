@@ -0,0 +1,1213 @@
+"""
+虚拟化聊天消息列表（Model/View + 自定义委托）
+
+默认的消息区为每条消息创建一个 QWidget（头像、气泡 QLabel、时间 QLabel），长对话只能依靠
+阴影预算、动图预算以及裁剪旧消息来维持帧率。这里把消息当作数据行：
+
+- ChatMessageListModel：消息数据（顶部分页插入、流式追加、打字指示行）
+- ChatMessageDelegate：按行绘制头像/气泡/图片/时间；行高按 (消息版本, 气泡宽度) 缓存，
+  文本排版（QTextLayout）按 (消息, 列宽) 做 LRU 缓存
+- VirtualMessageListView：只为可见行排版与绘制；行偏移用前缀和维护，尾部追加/流式增长
+  只需增量更新，顶部插入历史时保持阅读锚点
+
+注：QListView 在非统一行高下每次插入都会对全部行重新调用 sizeHint（1 万行约 40ms），
+Batched 模式又会在重排期间把滚动条夹回已排版区域，因此视图直接继承 QAbstractItemView。
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import accumulate, count
+from pathlib import Path
+from typing import Any, Iterable, Optional
+import math
+import os
+import re
+import time
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPoint,
+    QPointF,
+    QRect,
+    QRectF,
+    QSize,
+    Qt,
+    QTimer,
+)
+from PyQt6.QtGui import (
+    QColor,
+    QFont,
+    QFontMetrics,
+    QImageIOHandler,
+    QImageReader,
+    QLinearGradient,
+    QPainter,
+    QPainterPath,
+    QPen,
+    QPixmap,
+    QRegion,
+    QTextLayout,
+    QTextOption,
+)
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QApplication,
+    QMenu,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+)
+
+from .light_message_bubble import (
+    _BUBBLE_RADIUS,
+    _IMAGE_RADIUS,
+    _SPACING_1,
+    _SPACING_LG,
+    _SPACING_SM,
+    _load_rounded_avatar_pixmap,
+    _load_scaled_pixmap,
+)
+from .material_design_enhanced import MD3_ENHANCED_COLORS, MD3_ENHANCED_TYPOGRAPHY
+from .theme_manager import is_anime_theme
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 自定义数据角色：返回整行 ChatMessageRow
+MessageRowRole = Qt.ItemDataRole.UserRole + 1
+
+ROLE_USER = "user"
+ROLE_ASSISTANT = "assistant"
+ROLE_TYPING = "typing"
+
+PART_TEXT = "text"
+PART_IMAGE = "image"
+PART_STICKER = "sticker"
+_PART_TYPING = "typing"
+
+_STICKER_PATTERN = re.compile(r"\[STICKER:([^\]]+)\]")
+_IMAGE_PATTERN = re.compile(r"\[IMAGE:([^\]]+)\]")
+
+# 几何参数（与 LightMessageBubble / LightImageMessageBubble 的布局保持一致）
+_MARGIN_X = _SPACING_LG
+_MARGIN_Y = _SPACING_SM
+_ROW_SPACING = 8  # 原 messages_layout.setSpacing(8)
+_PART_SPACING = _SPACING_1
+_AVATAR_SIZE = 40
+_AVATAR_GAP = 8
+_BUBBLE_MAX_WIDTH = 520
+_BUBBLE_MIN_WIDTH = 80
+_BUBBLE_PAD_X = 16
+_BUBBLE_PAD_Y = 12
+_BUBBLE_RADIUS_PX = int(str(_BUBBLE_RADIUS).removesuffix("px"))
+_IMAGE_RADIUS_PX = int(str(_IMAGE_RADIUS).removesuffix("px"))
+_IMAGE_FRAME = 5  # padding 4px + border 1px
+_STICKER_MAX_SIZE = 200
+_IMAGE_MAX_SIZE = 400
+_IMAGE_ERROR_TEXT = "❌ 图片加载失败"
+_TYPING_SIZE = QSize(70, 44)
+_TYPING_PERIOD_S = 1.2
+_TYPING_FRAME_MS = 120
+_DEFAULT_COLUMN_WIDTH = 820
+
+# 宽度变化后的增量重测：每帧最多占用的时间（秒），避免长对话 resize 时卡顿
+_REMEASURE_BUDGET_S = 0.004
+_LAYOUT_CACHE_SIZE = max(16, int(os.getenv("MINTCHAT_GUI_VIRTUAL_LAYOUT_CACHE", "256")))
+
+
+def split_message_parts(content: str) -> tuple[tuple[str, str], ...]:
+    """把消息拆分为 (类型, 值) 片段：文本 / 表情包路径 / 图片路径。
+
+    与 LightChatWindow._add_message 的规则一致：图片仅在整条消息为 [IMAGE:...] 时单独显示，
+    表情包可与文字混排。
+    """
+    content = content or ""
+    image_only = _IMAGE_PATTERN.fullmatch(content.strip())
+    if image_only:
+        return ((PART_IMAGE, image_only.group(1)),)
+    parts: list[tuple[str, str]] = []
+    pos = 0
+    for match in _STICKER_PATTERN.finditer(content):
+        text = content[pos : match.start()]
+        if text.strip():
+            parts.append((PART_TEXT, text))
+        parts.append((PART_STICKER, match.group(1)))
+        pos = match.end()
+    if pos == 0:
+        return ((PART_TEXT, content),)
+    tail = content[pos:]
+    if tail.strip():
+        parts.append((PART_TEXT, tail))
+    return tuple(parts)
+
+
+def _format_time(timestamp: Any) -> str:
+    """格式化消息时间（SQLite CURRENT_TIMESTAMP 为 UTC，这里转换为本地时间）。"""
+    if timestamp:
+        try:
+            dt = datetime.fromisoformat(str(timestamp))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.astimezone().strftime("%H:%M")
+        except ValueError:
+            pass
+    return datetime.now().strftime("%H:%M")
+
+
+def _path_mtime_ns(path: str) -> int:
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return -1
+
+
+@lru_cache(maxsize=1024)
+def _scaled_image_size(path: str, max_size: int, mtime_ns: int) -> QSize:
+    """只读取图片头信息计算显示尺寸（不解码像素），供行高测量使用。"""
+    _ = mtime_ns  # 仅用于缓存键，文件变更时自动失效
+    if mtime_ns < 0:
+        return QSize()
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if not size.isValid():
+        return QSize()
+    try:
+        if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+            size = size.transposed()
+    except Exception:
+        pass
+    if size.width() > max_size or size.height() > max_size:
+        size = size.scaled(QSize(max_size, max_size), Qt.AspectRatioMode.KeepAspectRatio)
+    return size
+
+
+def _current_avatar_text(is_user: bool) -> str:
+    from src.auth.user_session import user_session
+
+    if is_user:
+        return user_session.get_user_avatar() if user_session.is_logged_in() else "👤"
+    return user_session.get_ai_avatar() if user_session.is_logged_in() else "🐱"
+
+
+def _make_font(variant: str, weight: QFont.Weight) -> QFont:
+    typo = MD3_ENHANCED_TYPOGRAPHY[variant]
+    font = QFont(str(typo["font"]))
+    font.setPixelSize(int(typo["size"]))
+    font.setWeight(weight)
+    return font
+
+
+@dataclass(eq=False, slots=True)
+class ChatMessageRow:
+    """一条消息的数据行（key 在模型内唯一且稳定，用作缓存键）。"""
+
+    key: int
+    role: str
+    content: str
+    msg_id: Optional[int] = None
+    time_text: str = ""
+    streaming: bool = False
+    revision: int = 0
+    parts: tuple[tuple[str, str], ...] = field(default_factory=tuple)
+
+    @property
+    def is_user(self) -> bool:
+        return self.role == ROLE_USER
+
+
+class ChatMessageListModel(QAbstractListModel):
+    """聊天消息模型：按时间正序保存消息，支持顶部分页插入与流式追加。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[ChatMessageRow] = []
+        self._ids: set[int] = set()
+        self._keys = count(1)
+
+    # ---------- Qt 接口 ----------
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._rows)):
+            return None
+        row = self._rows[index.row()]
+        if role == MessageRowRole:
+            return row
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row.content
+        return None
+
+    # ---------- 查询 ----------
+
+    @property
+    def has_typing(self) -> bool:
+        return bool(self._rows) and self._rows[-1].role == ROLE_TYPING
+
+    def message_at(self, row: int) -> Optional[ChatMessageRow]:
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def row_of_key(self, key: int) -> int:
+        """按 key 查找行号（从尾部查找：流式/新消息通常在末尾）。"""
+        for i in range(len(self._rows) - 1, -1, -1):
+            if self._rows[i].key == key:
+                return i
+        return -1
+
+    def oldest_message_id(self) -> Optional[int]:
+        """已加载的最早消息 id（用于 keyset 向上翻页）。"""
+        for row in self._rows:
+            if row.msg_id is not None:
+                return row.msg_id
+        return None
+
+    # ---------- 修改 ----------
+
+    def _make_row(
+        self,
+        role: str,
+        content: str,
+        *,
+        msg_id: Optional[int] = None,
+        timestamp: Any = None,
+        streaming: bool = False,
+    ) -> ChatMessageRow:
+        return ChatMessageRow(
+            key=next(self._keys),
+            role=role,
+            content=content,
+            msg_id=msg_id,
+            time_text=_format_time(timestamp),
+            streaming=streaming,
+            parts=split_message_parts(content),
+        )
+
+    def _rows_from_history(self, messages: Iterable[dict]) -> list[ChatMessageRow]:
+        rows: list[ChatMessageRow] = []
+        for msg in messages:
+            content = str(msg.get("content") or "")
+            if not content.strip():
+                continue
+            msg_id = msg.get("id")
+            if msg_id is not None:
+                msg_id = int(msg_id)
+                if msg_id in self._ids:
+                    continue
+                self._ids.add(msg_id)
+            role = ROLE_USER if msg.get("role") == ROLE_USER else ROLE_ASSISTANT
+            rows.append(
+                self._make_row(role, content, msg_id=msg_id, timestamp=msg.get("timestamp"))
+            )
+        return rows
+
+    def set_messages(self, messages: Iterable[dict]) -> None:
+        """用一页历史消息（get_chat_history_page 的返回值，旧→新）替换全部内容。"""
+        self.beginResetModel()
+        self._rows = []
+        self._ids = set()
+        self._rows = self._rows_from_history(messages)
+        self.endResetModel()
+
+    def prepend_messages(self, messages: Iterable[dict]) -> int:
+        """在顶部插入更早的一页历史（按 id 去重），返回实际插入的行数。"""
+        rows = self._rows_from_history(messages)
+        if not rows:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self.endInsertRows()
+        return len(rows)
+
+    def append_message(
+        self,
+        role: str,
+        content: str,
+        *,
+        msg_id: Optional[int] = None,
+        timestamp: Any = None,
+        streaming: bool = False,
+    ) -> int:
+        """在末尾（打字指示行之前）追加一条消息，返回行 key。"""
+        if msg_id is not None:
+            msg_id = int(msg_id)
+            self._ids.add(msg_id)
+        row = self._make_row(role, content, msg_id=msg_id, timestamp=timestamp, streaming=streaming)
+        position = len(self._rows) - 1 if self.has_typing else len(self._rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, row)
+        self.endInsertRows()
+        return row.key
+
+    def _update_row(self, key: int, **changes: Any) -> bool:
+        i = self.row_of_key(key)
+        if i < 0:
+            return False
+        row = self._rows[i]
+        for name, value in changes.items():
+            setattr(row, name, value)
+        if "content" in changes:
+            row.parts = split_message_parts(row.content)
+        row.revision += 1
+        index = self.index(i, 0)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def append_text(self, key: int, text: str) -> bool:
+        """流式追加文本。"""
+        i = self.row_of_key(key)
+        if i < 0 or not text:
+            return False
+        return self._update_row(key, content=self._rows[i].content + text)
+
+    def set_text(self, key: int, text: str) -> bool:
+        return self._update_row(key, content=text or "")
+
+    def set_streaming(self, key: int, streaming: bool) -> bool:
+        return self._update_row(key, streaming=bool(streaming))
+
+    def remove_message(self, key: int) -> bool:
+        i = self.row_of_key(key)
+        if i < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), i, i)
+        row = self._rows.pop(i)
+        self.endRemoveRows()
+        if row.msg_id is not None:
+            self._ids.discard(row.msg_id)
+        return True
+
+    def set_typing(self, visible: bool) -> None:
+        """显示/隐藏末尾的打字指示行。"""
+        if bool(visible) == self.has_typing:
+            return
+        n = len(self._rows)
+        if visible:
+            self.beginInsertRows(QModelIndex(), n, n)
+            self._rows.append(self._make_row(ROLE_TYPING, ""))
+            self.endInsertRows()
+        else:
+            self.beginRemoveRows(QModelIndex(), n - 1, n - 1)
+            self._rows.pop()
+            self.endRemoveRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._rows = []
+        self._ids = set()
+        self.endResetModel()
+
+
+@dataclass(slots=True)
+class _PartGeometry:
+    kind: str
+    rect: QRect
+    value: str = ""
+    text_layout: Optional[QTextLayout] = None
+    mtime_ns: int = -1
+
+
+@dataclass(slots=True)
+class _RowGeometry:
+    revision: int
+    height: int
+    parts: list[_PartGeometry]
+    avatar_rect: Optional[QRect] = None
+    time_rect: Optional[QRect] = None
+
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    """按消息行绘制头像、气泡与时间（样式对齐 LightMessageBubble / LightImageMessageBubble）。
+
+    - sizeHint 只在行插入/内容变化/列宽变化时被视图调用，结果按 (消息版本, 气泡宽度) 缓存
+    - 文本排版结果按 (消息, 列宽) 做 LRU 缓存，绘制时直接复用
+    """
+
+    def __init__(self, parent=None, *, layout_cache_size: int = _LAYOUT_CACHE_SIZE):
+        super().__init__(parent)
+        self._layout_cache: OrderedDict[tuple[int, int], _RowGeometry] = OrderedDict()
+        self._layout_cache_size = max(16, int(layout_cache_size))
+        # key -> (revision, bubble_max_width, height)
+        self._heights: dict[int, tuple[int, int, int]] = {}
+        self._avatar_cache: dict[tuple[str, bool, float], QPixmap] = {}
+        self._user_font = _make_font("body_large", QFont.Weight.Medium)
+        self._ai_font = _make_font("body_large", QFont.Weight.Normal)
+        self._time_font = _make_font("label_small", QFont.Weight.Medium)
+        self._time_height = QFontMetrics(self._time_font).height()
+        self._error_size = QFontMetrics(self._ai_font).size(0, _IMAGE_ERROR_TEXT) + QSize(60, 40)
+        self.stats = {"layouts": 0, "paints": 0}
+
+    # ---------- 缓存 ----------
+
+    def forget_rows(self, keys: Iterable[int]) -> None:
+        """释放已移除行的缓存。"""
+        keys = set(keys)
+        if not keys:
+            return
+        for key in keys:
+            self._heights.pop(key, None)
+        for cache_key in [k for k in self._layout_cache if k[0] in keys]:
+            del self._layout_cache[cache_key]
+
+    def clear_cache(self) -> None:
+        self._layout_cache.clear()
+        self._heights.clear()
+        self._avatar_cache.clear()
+
+    def cached_layout_count(self) -> int:
+        return len(self._layout_cache)
+
+    # ---------- 测量 ----------
+
+    @staticmethod
+    def _bubble_max_width(width: int) -> int:
+        content = int(width) - _MARGIN_X * 2 - _AVATAR_SIZE - _AVATAR_GAP
+        return max(_BUBBLE_MIN_WIDTH, min(_BUBBLE_MAX_WIDTH, content))
+
+    def row_height(self, row: ChatMessageRow, width: int) -> int:
+        bubble_max = self._bubble_max_width(width)
+        cached = self._heights.get(row.key)
+        if cached is not None and cached[0] == row.revision and cached[1] == bubble_max:
+            return cached[2]
+        height = self._geometry(row, width).height
+        self._heights[row.key] = (row.revision, bubble_max, height)
+        return height
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        row = index.data(MessageRowRole)
+        width = int(option.rect.width()) or _DEFAULT_COLUMN_WIDTH
+        if not isinstance(row, ChatMessageRow):
+            return QSize(width, 0)
+        return QSize(width, self.row_height(row, width))
+
+    def _geometry(self, row: ChatMessageRow, width: int) -> _RowGeometry:
+        cache_key = (row.key, int(width))
+        geometry = self._layout_cache.get(cache_key)
+        if geometry is not None and geometry.revision == row.revision:
+            self._layout_cache.move_to_end(cache_key)
+            return geometry
+        geometry = self._build_geometry(row, int(width))
+        self._layout_cache[cache_key] = geometry
+        self._layout_cache.move_to_end(cache_key)
+        while len(self._layout_cache) > self._layout_cache_size:
+            self._layout_cache.popitem(last=False)
+        return geometry
+
+    def _layout_text(self, text: str, font: QFont, max_width: int) -> tuple[QTextLayout, int, int]:
+        # QTextLayout 不会在 "\n" 处换行，需要转换为 Unicode 行分隔符
+        layout = QTextLayout(text.replace("\r\n", "\n").replace("\n", "\u2028"), font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        natural = 0.0
+        y = 0.0
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(float(max_width))
+            line.setPosition(QPointF(0.0, y))
+            y += line.height()
+            natural = max(natural, line.naturalTextWidth())
+        layout.endLayout()
+        self.stats["layouts"] += 1
+        return layout, int(math.ceil(natural)), int(math.ceil(y))
+
+    def _image_size(self, path: str, kind: str, mtime_ns: int) -> QSize:
+        max_size = _STICKER_MAX_SIZE if kind == PART_STICKER else _IMAGE_MAX_SIZE
+        size = _scaled_image_size(path, max_size, mtime_ns)
+        if not size.isValid() or size.isEmpty():
+            return QSize(self._error_size)
+        return size + QSize(_IMAGE_FRAME * 2, _IMAGE_FRAME * 2)
+
+    def _build_geometry(self, row: ChatMessageRow, width: int) -> _RowGeometry:
+        if row.role == ROLE_TYPING:
+            bubble = QRect(QPoint(_MARGIN_X, _MARGIN_Y), _TYPING_SIZE)
+            height = _MARGIN_Y * 2 + _TYPING_SIZE.height() + _ROW_SPACING
+            return _RowGeometry(row.revision, height, [_PartGeometry(_PART_TYPING, bubble)])
+
+        is_user = row.is_user
+        bubble_max = self._bubble_max_width(width)
+        if is_user:
+            avatar_x = width - _MARGIN_X - _AVATAR_SIZE
+            column_right = avatar_x - _AVATAR_GAP
+            column_left = column_right - bubble_max
+        else:
+            avatar_x = _MARGIN_X
+            column_left = avatar_x + _AVATAR_SIZE + _AVATAR_GAP
+            column_right = column_left + bubble_max
+
+        font = self._user_font if is_user else self._ai_font
+        parts: list[_PartGeometry] = []
+        y = _MARGIN_Y
+        for kind, value in row.parts:
+            if parts:
+                y += _PART_SPACING
+            layout = None
+            mtime_ns = -1
+            if kind == PART_TEXT:
+                layout, text_w, text_h = self._layout_text(
+                    value, font, bubble_max - _BUBBLE_PAD_X * 2
+                )
+                size = QSize(text_w + _BUBBLE_PAD_X * 2, text_h + _BUBBLE_PAD_Y * 2)
+            else:
+                mtime_ns = _path_mtime_ns(value)
+                size = self._image_size(value, kind, mtime_ns)
+            x = column_right - size.width() if is_user else column_left
+            parts.append(_PartGeometry(kind, QRect(QPoint(x, y), size), value, layout, mtime_ns))
+            y += size.height()
+
+        y += _PART_SPACING
+        time_rect = QRect(column_left, y, column_right - column_left, self._time_height)
+        y += self._time_height
+
+        avatar_rect = QRect(avatar_x, _MARGIN_Y, _AVATAR_SIZE, _AVATAR_SIZE)
+        height = max(y, avatar_rect.bottom() + 1) + _MARGIN_Y + _ROW_SPACING
+        return _RowGeometry(row.revision, height, parts, avatar_rect, time_rect)
+
+    # ---------- 绘制 ----------
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        row = index.data(MessageRowRole)
+        if not isinstance(row, ChatMessageRow):
+            return
+        rect = option.rect
+        geometry = self._geometry(row, rect.width())
+        self.stats["paints"] += 1
+
+        painter.save()
+        try:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+            painter.translate(rect.topLeft())
+            for part in geometry.parts:
+                if part.kind == PART_TEXT:
+                    self._paint_text(painter, part, row.is_user)
+                elif part.kind == _PART_TYPING:
+                    self._paint_typing(painter, part.rect)
+                else:
+                    self._paint_image(painter, part)
+
+            if geometry.avatar_rect is not None:
+                dpr = float(painter.device().devicePixelRatioF() or 1.0)
+                painter.drawPixmap(
+                    geometry.avatar_rect.topLeft(), self._avatar_pixmap(row.is_user, dpr)
+                )
+            if geometry.time_rect is not None:
+                align = Qt.AlignmentFlag.AlignRight if row.is_user else Qt.AlignmentFlag.AlignLeft
+                painter.setFont(self._time_font)
+                painter.setPen(QColor(MD3_ENHANCED_COLORS["on_surface_variant"]))
+                painter.drawText(
+                    geometry.time_rect, int(align | Qt.AlignmentFlag.AlignVCenter), row.time_text
+                )
+        finally:
+            painter.restore()
+
+    @staticmethod
+    def _bubble_background(is_user: bool, rect: QRectF):
+        colors = MD3_ENHANCED_COLORS
+        if not is_anime_theme():
+            key = "primary_container" if is_user else "surface_container_high"
+            return QColor(colors[key])
+        if is_user:
+            gradient = QLinearGradient(rect.topLeft(), rect.bottomRight())
+            gradient.setColorAt(0.0, QColor(colors["primary_container"]))
+            gradient.setColorAt(1.0, QColor(colors["secondary_container"]))
+        else:
+            gradient = QLinearGradient(rect.topLeft(), rect.topRight())
+            gradient.setColorAt(0.0, QColor(colors["surface_container_high"]))
+            gradient.setColorAt(1.0, QColor(colors["surface_container_low"]))
+        return gradient
+
+    def _paint_text(self, painter: QPainter, part: _PartGeometry, is_user: bool) -> None:
+        colors = MD3_ENHANCED_COLORS
+        rect = QRectF(part.rect).adjusted(0.5, 0.5, -0.5, -0.5)
+        radius = min(float(_BUBBLE_RADIUS_PX), rect.height() / 2.0)
+        path = QPainterPath()
+        path.addRoundedRect(rect, radius, radius)
+        painter.fillPath(path, self._bubble_background(is_user, rect))
+        if not is_user or is_anime_theme():
+            painter.strokePath(path, QPen(QColor(colors["outline_variant"]), 1.0))
+
+        if part.text_layout is not None:
+            painter.setPen(QColor(colors["on_primary_container" if is_user else "on_surface"]))
+            part.text_layout.draw(
+                painter, QPointF(part.rect.x() + _BUBBLE_PAD_X, part.rect.y() + _BUBBLE_PAD_Y)
+            )
+
+    def _paint_image(self, painter: QPainter, part: _PartGeometry) -> None:
+        colors = MD3_ENHANCED_COLORS
+        max_size = _STICKER_MAX_SIZE if part.kind == PART_STICKER else _IMAGE_MAX_SIZE
+        pixmap = None
+        if part.mtime_ns >= 0:
+            # 动图（GIF/WEBP）在虚拟列表中只绘制首帧，避免屏幕外动画持续占用 CPU
+            pixmap = _load_scaled_pixmap(part.value, max_size, part.mtime_ns)
+
+        rect = QRectF(part.rect).adjusted(0.5, 0.5, -0.5, -0.5)
+        path = QPainterPath()
+        path.addRoundedRect(rect, float(_IMAGE_RADIUS_PX), float(_IMAGE_RADIUS_PX))
+        if pixmap is None or pixmap.isNull():
+            painter.fillPath(path, QColor(colors["error_container"]))
+            painter.setPen(QColor(colors["on_error_container"]))
+            painter.setFont(self._ai_font)
+            painter.drawText(part.rect, int(Qt.AlignmentFlag.AlignCenter), _IMAGE_ERROR_TEXT)
+            return
+
+        painter.fillPath(path, QColor(colors["surface_bright"]))
+        painter.strokePath(path, QPen(QColor(colors["outline_variant"]), 1.0))
+        inner = part.rect.adjusted(_IMAGE_FRAME, _IMAGE_FRAME, -_IMAGE_FRAME, -_IMAGE_FRAME)
+        target = QSize(pixmap.size()).scaled(inner.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        x = inner.x() + (inner.width() - target.width()) // 2
+        y = inner.y() + (inner.height() - target.height()) // 2
+        painter.drawPixmap(QRect(x, y, target.width(), target.height()), pixmap)
+
+    def _paint_typing(self, painter: QPainter, rect: QRect) -> None:
+        colors = MD3_ENHANCED_COLORS
+        bubble = QRectF(rect).adjusted(1.0, 1.0, -1.0, -1.0)
+        gradient = QLinearGradient(bubble.topLeft(), bubble.bottomLeft())
+        gradient.setColorAt(0.0, QColor(colors["surface_bright"]))
+        gradient.setColorAt(1.0, QColor(colors["surface_container_high"]))
+        path = QPainterPath()
+        path.addRoundedRect(bubble, 18.0, 18.0)
+        painter.fillPath(path, gradient)
+        painter.strokePath(path, QPen(QColor(colors["outline_variant"]), 2.0))
+
+        # 三点波浪：透明度 0.3 ~ 1.0，依次错开相位
+        phase = (time.monotonic() % _TYPING_PERIOD_S) / _TYPING_PERIOD_S * 2.0 * math.pi
+        dot = 7.0
+        gap = 6.0
+        x = bubble.center().x() - (dot * 3 + gap * 2) / 2.0
+        y = bubble.center().y() - dot / 2.0
+        painter.setPen(Qt.PenStyle.NoPen)
+        for i in range(3):
+            color = QColor(colors["on_surface_variant"])
+            color.setAlphaF(0.3 + 0.7 * (0.5 + 0.5 * math.sin(phase - i * 0.9)))
+            painter.setBrush(color)
+            painter.drawEllipse(QRectF(x + i * (dot + gap), y, dot, dot))
+
+    def _avatar_pixmap(self, is_user: bool, dpr: float) -> QPixmap:
+        avatar_text = _current_avatar_text(is_user)
+        key = (avatar_text, bool(is_user), float(dpr))
+        pixmap = self._avatar_cache.get(key)
+        if pixmap is None:
+            if len(self._avatar_cache) >= 16:
+                self._avatar_cache.clear()
+            pixmap = self._render_avatar(avatar_text, is_user, dpr)
+            self._avatar_cache[key] = pixmap
+        return pixmap
+
+    @staticmethod
+    def _render_avatar(avatar_text: str, is_user: bool, dpr: float) -> QPixmap:
+        """渲染圆形头像（渐变底 + emoji 或图片 + 2px 描边，对齐 _get_avatar_qss）。"""
+        colors = MD3_ENHANCED_COLORS
+        size = _AVATAR_SIZE
+        pixmap = QPixmap(int(size * dpr), int(size * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(pixmap)
+        try:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+            circle = QRectF(1.0, 1.0, size - 2.0, size - 2.0)
+            start, end = (
+                ("primary_40", "secondary_40") if is_user else ("tertiary_40", "primary_40")
+            )
+            gradient = QLinearGradient(circle.topLeft(), circle.bottomRight())
+            gradient.setColorAt(0.0, QColor(colors[start]))
+            gradient.setColorAt(1.0, QColor(colors[end]))
+            path = QPainterPath()
+            path.addEllipse(circle)
+            painter.fillPath(path, gradient)
+
+            image = None
+            is_path = bool(avatar_text) and Path(avatar_text).is_file()
+            if is_path:
+                image = _load_rounded_avatar_pixmap(avatar_text, size, _path_mtime_ns(avatar_text))
+            if image is not None and not image.isNull():
+                painter.setClipPath(path)
+                painter.drawPixmap(QRect(0, 0, size, size), image)
+                painter.setClipping(False)
+            else:
+                font = QFont()
+                font.setPixelSize(size // 2)
+                painter.setFont(font)
+                painter.setPen(QColor(colors["on_surface"]))
+                fallback = "👤" if is_user else "🐱"
+                text = avatar_text if avatar_text and not is_path else fallback
+                painter.drawText(circle, int(Qt.AlignmentFlag.AlignCenter), text)
+
+            painter.strokePath(path, QPen(QColor(colors["surface_bright"]), 2.0))
+        finally:
+            painter.end()
+        return pixmap
+
+
+class VirtualMessageListView(QAbstractItemView):
+    """虚拟化消息视图：只为可见行排版与绘制。
+
+    - 行高在插入/内容变化时测量一次并缓存，行偏移为前缀和：尾部追加、流式增长只更新尾部
+    - 顶部插入历史/行高变化时保持阅读锚点；位于底部时保持贴底（流式输出自动跟随）
+    - 消息列居中，最大宽度由 set_column_max_width 控制
+    """
+
+    def __init__(
+        self,
+        parent=None,
+        *,
+        column_max_width: int = _DEFAULT_COLUMN_WIDTH,
+        top_inset: int = 0,
+        bottom_inset: int = 16,
+    ):
+        super().__init__(parent)
+        self._heights: list[int] = []
+        self._offsets: list[int] = [0]
+        self._offsets_valid = 0  # offsets[0.._offsets_valid] 有效
+        self._column_max_width = max(1, int(column_max_width))
+        self._top_inset = max(0, int(top_inset))
+        self._bottom_inset = max(0, int(bottom_inset))
+        self._measured_width = 0
+        self._remeasure_rows: Optional[Any] = None
+        self._pending_remove_anchor: Optional[tuple[int, int]] = None
+
+        self._remeasure_timer = QTimer(self)
+        self._remeasure_timer.setSingleShot(True)
+        self._remeasure_timer.timeout.connect(self._remeasure_step)
+        self._typing_timer = QTimer(self)
+        self._typing_timer.setInterval(_TYPING_FRAME_MS)
+        self._typing_timer.timeout.connect(self._update_typing_row)
+
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setItemDelegate(ChatMessageDelegate(self))
+
+    # ---------- 配置 ----------
+
+    def set_column_max_width(self, width: int) -> None:
+        width = max(1, int(width))
+        if width == self._column_max_width:
+            return
+        self._column_max_width = width
+        self._on_column_width_changed()
+
+    def set_content_insets(self, top: int, bottom: int) -> None:
+        anchor = self._capture_anchor()
+        self._top_inset = max(0, int(top))
+        self._bottom_inset = max(0, int(bottom))
+        self._restore_anchor(anchor)
+        self.viewport().update()
+
+    def setModel(self, model) -> None:
+        old = self.model()
+        if old is not None:
+            try:
+                old.rowsRemoved.disconnect(self._on_rows_removed)
+            except (TypeError, RuntimeError):
+                pass
+        super().setModel(model)
+        if model is not None:
+            model.rowsRemoved.connect(self._on_rows_removed)
+        self._relayout_all(anchor=None)
+
+    # ---------- 行高 / 偏移 ----------
+
+    def _column_width(self) -> int:
+        return max(1, min(self._column_max_width, int(self.viewport().width())))
+
+    def _measure_option(self) -> QStyleOptionViewItem:
+        option = QStyleOptionViewItem()
+        self.initViewItemOption(option)
+        option.rect = QRect(0, 0, self._column_width(), 0)
+        return option
+
+    def _measure(self, row: int, option: QStyleOptionViewItem) -> int:
+        index = self.model().index(row, 0)
+        return max(0, int(self.itemDelegate().sizeHint(option, index).height()))
+
+    def _invalidate_offsets(self, row: int) -> None:
+        self._offsets_valid = min(self._offsets_valid, max(0, int(row)))
+
+    def _ensure_offsets(self) -> None:
+        start = self._offsets_valid
+        n = len(self._heights)
+        if start >= n and len(self._offsets) == n + 1:
+            return
+        base = self._offsets[start] if start < len(self._offsets) else 0
+        del self._offsets[start:]
+        self._offsets.extend(accumulate(self._heights[start:], initial=base))
+        self._offsets_valid = n
+
+    def _content_height(self) -> int:
+        self._ensure_offsets()
+        return self._top_inset + self._offsets[-1] + self._bottom_inset
+
+    def _row_at_content_y(self, y: int) -> int:
+        self._ensure_offsets()
+        n = len(self._heights)
+        if n == 0:
+            return -1
+        row = bisect_right(self._offsets, int(y) - self._top_inset) - 1
+        return max(0, min(n - 1, row))
+
+    def _row_rect(self, row: int) -> QRect:
+        self._ensure_offsets()
+        width = self._column_width()
+        x = max(0, (int(self.viewport().width()) - width) // 2)
+        top = self._top_inset + self._offsets[row] - self.verticalScrollBar().value()
+        return QRect(x, top, width, self._heights[row])
+
+    def _capture_anchor(self) -> Optional[tuple[int, int]]:
+        """记录阅读锚点 (行号, 行内偏移)；位于底部时返回 None（表示保持贴底）。"""
+        bar = self.verticalScrollBar()
+        if not self._heights or bar.value() >= bar.maximum():
+            return None
+        y = int(bar.value())
+        row = self._row_at_content_y(y)
+        return row, y - (self._top_inset + self._offsets[row])
+
+    def _restore_anchor(self, anchor: Optional[tuple[int, int]], row_shift: int = 0) -> None:
+        self.updateGeometries()
+        bar = self.verticalScrollBar()
+        if anchor is None:
+            bar.setValue(bar.maximum())
+            return
+        n = len(self._heights)
+        if n == 0:
+            bar.setValue(0)
+            return
+        row = max(0, min(n - 1, anchor[0] + row_shift))
+        bar.setValue(self._top_inset + self._offsets[row] + anchor[1])
+
+    def _relayout_all(self, anchor: Optional[tuple[int, int]]) -> None:
+        model = self.model()
+        n = model.rowCount() if model is not None else 0
+        self._measured_width = self._column_width()
+        option = self._measure_option()
+        self._heights = [self._measure(r, option) for r in range(n)]
+        self._offsets = [0]
+        self._offsets_valid = 0
+        self._restore_anchor(anchor)
+        self._sync_typing_timer()
+        self.viewport().update()
+
+    def _on_column_width_changed(self) -> None:
+        """列宽变化：先同步重测可见行，其余行分帧重测（保持阅读锚点）。"""
+        width = self._column_width()
+        if width == self._measured_width or not self._heights:
+            self._measured_width = width
+            self.updateGeometries()
+            return
+        self._measured_width = width
+        n = len(self._heights)
+        bar = self.verticalScrollBar()
+        first = max(0, self._row_at_content_y(bar.value()))
+        last = self._row_at_content_y(bar.value() + self.viewport().height())
+        visible = range(first, max(first, last) + 1)
+        self._remeasure_rows = iter([*visible, *range(n - 1, -1, -1)])
+        self._remeasure_step()
+
+    def _remeasure_step(self) -> None:
+        rows = self._remeasure_rows
+        if rows is None or self.model() is None:
+            return
+        anchor = self._capture_anchor()
+        option = self._measure_option()
+        n = len(self._heights)
+        deadline = time.perf_counter() + _REMEASURE_BUDGET_S
+        changed_from: Optional[int] = None
+        for row in rows:
+            if row >= n:
+                continue
+            height = self._measure(row, option)
+            if height != self._heights[row]:
+                self._heights[row] = height
+                changed_from = row if changed_from is None else min(changed_from, row)
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self._remeasure_rows = None
+
+        if changed_from is not None:
+            self._invalidate_offsets(changed_from)
+            self._restore_anchor(anchor)
+            self.viewport().update()
+        if self._remeasure_rows is not None:
+            self._remeasure_timer.start(0)
+
+    def _restart_pending_remeasure(self) -> None:
+        if self._remeasure_rows is not None:
+            self._remeasure_rows = iter(range(len(self._heights) - 1, -1, -1))
+
+    # ---------- 模型变化 ----------
+
+    def rowsInserted(self, parent: QModelIndex, start: int, end: int) -> None:
+        if parent.isValid():
+            return super().rowsInserted(parent, start, end)
+        anchor = self._capture_anchor()
+        option = self._measure_option()
+        self._heights[start:start] = [self._measure(r, option) for r in range(start, end + 1)]
+        self._invalidate_offsets(start)
+        super().rowsInserted(parent, start, end)
+        shift = end - start + 1 if anchor is not None and start <= anchor[0] else 0
+        self._restore_anchor(anchor, shift)
+        self._restart_pending_remeasure()
+        self._sync_typing_timer()
+        self.viewport().update()
+
+    def rowsAboutToBeRemoved(self, parent: QModelIndex, start: int, end: int) -> None:
+        if not parent.isValid():
+            self._pending_remove_anchor = self._capture_anchor()
+            forget = getattr(self.itemDelegate(), "forget_rows", None)
+            model = self.model()
+            if callable(forget) and model is not None:
+                rows = (model.index(r, 0).data(MessageRowRole) for r in range(start, end + 1))
+                forget(row.key for row in rows if isinstance(row, ChatMessageRow))
+        super().rowsAboutToBeRemoved(parent, start, end)
+
+    def _on_rows_removed(self, parent: QModelIndex, start: int, end: int) -> None:
+        if parent.isValid():
+            return
+        anchor = self._pending_remove_anchor
+        self._pending_remove_anchor = None
+        del self._heights[start : end + 1]
+        self._invalidate_offsets(start)
+        if anchor is not None:
+            row, delta = anchor
+            if row > end:
+                anchor = (row - (end - start + 1), delta)
+            elif row >= start:
+                anchor = (start, 0)
+        self._restore_anchor(anchor)
+        self._restart_pending_remeasure()
+        self._sync_typing_timer()
+        self.viewport().update()
+
+    def dataChanged(self, topLeft: QModelIndex, bottomRight: QModelIndex, roles=()) -> None:
+        if not topLeft.isValid() or topLeft.parent().isValid():
+            return super().dataChanged(topLeft, bottomRight, roles)
+        anchor = self._capture_anchor()
+        option = self._measure_option()
+        changed_from: Optional[int] = None
+        last = min(bottomRight.row(), len(self._heights) - 1)
+        for row in range(topLeft.row(), last + 1):
+            height = self._measure(row, option)
+            if height != self._heights[row]:
+                self._heights[row] = height
+                changed_from = row if changed_from is None else min(changed_from, row)
+        if changed_from is not None:
+            self._invalidate_offsets(changed_from)
+            self._restore_anchor(anchor)
+            self.viewport().update()
+            return
+        # 行高未变（例如流式追加未换行）：只重绘这些行
+        region = QRegion()
+        for row in range(topLeft.row(), last + 1):
+            region += self._row_rect(row)
+        self.viewport().update(region)
+
+    def reset(self) -> None:
+        super().reset()
+        clear = getattr(self.itemDelegate(), "clear_cache", None)
+        if callable(clear):
+            clear()
+        self._remeasure_rows = None
+        self._relayout_all(anchor=None)
+
+    def doItemsLayout(self) -> None:
+        self._relayout_all(anchor=self._capture_anchor())
+        super().doItemsLayout()
+
+    # ---------- 几何 / 滚动 ----------
+
+    def updateGeometries(self) -> None:
+        bar = self.verticalScrollBar()
+        viewport_height = int(self.viewport().height())
+        bar.setPageStep(max(1, viewport_height))
+        bar.setRange(0, max(0, self._content_height() - viewport_height))
+        super().updateGeometries()
+
+    def resizeEvent(self, event) -> None:
+        anchor = self._capture_anchor()
+        super().resizeEvent(event)
+        if self._column_width() != self._measured_width:
+            self._on_column_width_changed()
+        self._restore_anchor(anchor)
+
+    def scrollContentsBy(self, dx: int, dy: int) -> None:
+        # 不使用 viewport().scroll()：它会连带移动悬浮在 viewport 上的子控件（如顶部状态岛）
+        self.viewport().update()
+
+    def horizontalOffset(self) -> int:
+        return 0
+
+    def verticalOffset(self) -> int:
+        return int(self.verticalScrollBar().value())
+
+    def visualRect(self, index: QModelIndex) -> QRect:
+        if not index.isValid() or not (0 <= index.row() < len(self._heights)):
+            return QRect()
+        return self._row_rect(index.row())
+
+    def indexAt(self, point: QPoint) -> QModelIndex:
+        model = self.model()
+        if model is None or not self._heights:
+            return QModelIndex()
+        y = int(point.y()) + self.verticalScrollBar().value()
+        row = self._row_at_content_y(y)
+        if row < 0 or not self._row_rect(row).contains(point):
+            return QModelIndex()
+        return model.index(row, 0)
+
+    def scrollTo(self, index: QModelIndex, hint=QAbstractItemView.ScrollHint.EnsureVisible) -> None:
+        if not index.isValid() or not (0 <= index.row() < len(self._heights)):
+            return
+        self._ensure_offsets()
+        bar = self.verticalScrollBar()
+        viewport_height = int(self.viewport().height())
+        top = self._top_inset + self._offsets[index.row()]
+        height = self._heights[index.row()]
+        value = bar.value()
+        hints = QAbstractItemView.ScrollHint
+        if hint == hints.PositionAtTop or (hint == hints.EnsureVisible and top < value):
+            bar.setValue(top)
+        elif hint == hints.PositionAtBottom or (
+            hint == hints.EnsureVisible and top + height > value + viewport_height
+        ):
+            bar.setValue(top + height - viewport_height)
+        elif hint == hints.PositionAtCenter:
+            bar.setValue(top - (viewport_height - height) // 2)
+
+    def moveCursor(self, cursorAction, modifiers) -> QModelIndex:
+        return QModelIndex()
+
+    def isIndexHidden(self, index: QModelIndex) -> bool:
+        return False
+
+    def setSelection(self, rect: QRect, command) -> None:
+        pass
+
+    def visualRegionForSelection(self, selection) -> QRegion:
+        return QRegion()
+
+    def visible_rows(self) -> range:
+        """当前视窗内的行号范围。"""
+        if not self._heights:
+            return range(0)
+        value = self.verticalScrollBar().value()
+        first = self._row_at_content_y(value)
+        last = self._row_at_content_y(value + max(0, int(self.viewport().height()) - 1))
+        return range(first, last + 1)
+
+    # ---------- 绘制 ----------
+
+    def paintEvent(self, event) -> None:
+        model = self.model()
+        if model is None or not self._heights:
+            return
+        painter = QPainter(self.viewport())
+        try:
+            delegate = self.itemDelegate()
+            option = QStyleOptionViewItem()
+            self.initViewItemOption(option)
+            exposed = event.rect()
+            value = self.verticalScrollBar().value()
+            row = self._row_at_content_y(value + exposed.top())
+            bottom = value + exposed.bottom()
+            n = len(self._heights)
+            while 0 <= row < n and self._top_inset + self._offsets[row] <= bottom:
+                option.rect = self._row_rect(row)
+                if option.rect.intersects(exposed):
+                    delegate.paint(painter, option, model.index(row, 0))
+                row += 1
+        finally:
+            painter.end()
+
+    def _sync_typing_timer(self) -> None:
+        model = self.model()
+        if model is not None and getattr(model, "has_typing", False):
+            if not self._typing_timer.isActive():
+                self._typing_timer.start()
+        elif self._typing_timer.isActive():
+            self._typing_timer.stop()
+
+    def _update_typing_row(self) -> None:
+        n = len(self._heights)
+        if n == 0:
+            return
+        rect = self._row_rect(n - 1)
+        if rect.intersects(self.viewport().rect()):
+            self.viewport().update(rect)
+
+    # ---------- 交互 ----------
+
+    def contextMenuEvent(self, event) -> None:
+        index = self.indexAt(event.pos())
+        row = index.data(MessageRowRole) if index.isValid() else None
+        if not isinstance(row, ChatMessageRow) or row.role == ROLE_TYPING:
+            return super().contextMenuEvent(event)
+        menu = QMenu(self)
+        copy_action = menu.addAction("复制")
+        if menu.exec(event.globalPos()) is copy_action:
+            QApplication.clipboard().setText(row.content)
+
+
+class StreamingMessageHandle:
+    """流式消息行句柄：与 LightStreamingMessageBubble 保持相同的接口
+    （append_text / message_text.toPlainText / setPlainText / finish / cleanup），
+    窗口的流式渲染与收尾逻辑可直接复用。"""
+
+    def __init__(self, model: ChatMessageListModel, role: str = ROLE_ASSISTANT):
+        self._model = model
+        self._key = model.append_message(role, "", streaming=True)
+        self._finished = False
+
+    @property
+    def key(self) -> int:
+        return self._key
+
+    @property
+    def message_text(self) -> "StreamingMessageHandle":
+        return self
+
+    def toPlainText(self) -> str:
+        row = self._model.message_at(self._model.row_of_key(self._key))
+        return row.content if row is not None else ""
+
+    def setPlainText(self, text: str) -> None:
+        self._model.set_text(self._key, text)
+
+    def append_text(self, text: str) -> None:
+        self._model.append_text(self._key, text)
+
+    def finish(self) -> None:
+        self._finished = True
+        self._model.set_streaming(self._key, False)
+
+    def cleanup(self) -> None:
+        """未完成的流式行（取消/出错/切换联系人）直接移除。"""
+        if not self._finished:
+            self._finished = True
+            self._model.remove_message(self._key)
+
+
+class TypingRowHandle:
+    """打字指示行句柄：与 LightTypingIndicator 保持相同的 stop_animation 接口。"""
+
+    def __init__(self, model: ChatMessageListModel):
+        self._model = model
+        model.set_typing(True)
+
+    def stop_animation(self) -> None:
+        self._model.set_typing(False)
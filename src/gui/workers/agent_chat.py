@@ -15,6 +15,7 @@ from PyQt6.QtCore import QThread, pyqtSignal
 
 from src.utils.gui_optimizer import track_object
 from src.utils.logger import get_logger
+from src.utils.stream_processor import StreamRetraction, apply_stream_retraction
 
 logger = get_logger(__name__)
 
@@ -69,6 +70,8 @@ class ChatThread(QThread):
     """聊天线程：在后台消费 `agent.chat_stream()`，并批量 emit 文本块。"""
 
     chunk_received = pyqtSignal(str)
+    # 推测流式撤回：丢弃此前已 emit 文本末尾的 N 个字符（尚未 emit 的缓冲直接裁掉）
+    retract_received = pyqtSignal(int)
     error = pyqtSignal(str)
 
     def __init__(
@@ -144,6 +147,14 @@ class ChatThread(QThread):
                         drain_on_exit = True
                         break
 
+                    if isinstance(chunk, StreamRetraction):
+                        emitted_retract = max(0, chunk.chars - buffer_len)
+                        apply_stream_retraction(chunk_buffer, chunk.chars)
+                        buffer_len = sum(len(part) for part in chunk_buffer)
+                        if emitted_retract:
+                            self.retract_received.emit(emitted_retract)
+                        continue
+
                     if not chunk:
                         continue
 
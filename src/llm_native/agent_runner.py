@@ -1,17 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from dataclasses import dataclass, field
 from threading import Event
-from typing import Iterator, Sequence
+import time
+from typing import AsyncIterator, Iterator, Sequence
 
-from .backend import ChatBackend, ChatRequest
+from src.utils.logger import logger
+
+from .backend import AsyncChatBackend, ChatBackend, ChatRequest
 from .events import (
     DoneEvent,
     ErrorEvent,
     StreamEvent,
     TextDeltaEvent,
+    TextRetractEvent,
     ToolCallAccumulator,
     ToolResultEvent,
+    ToolCallState,
 )
 from .messages import Message, ToolCall
 from .pipeline import Pipeline, PipelineAbort, PipelineRequest, PipelineResponse
@@ -25,6 +31,275 @@ class AgentRunnerConfig:
     tool_timeout_s: float = 30.0
     temperature: float | None = None
     max_tokens: int | None = None
+    # Speculative streaming: forward text deltas as soon as the round is known not to be a
+    # tool-call round (enough non-whitespace text arrived before any tool_call.delta).
+    speculative_streaming: bool = False
+    speculative_min_chars: int = 1
+
+
+@dataclass(slots=True)
+class RoundMetrics:
+    """Per-round latency metrics (perf_counter seconds; `None` = milestone not reached)."""
+
+    round_index: int
+    started_at: float
+    first_text_at: float | None = None
+    first_emit_at: float | None = None
+    finished_at: float | None = None
+    speculative: bool = False
+    tool_calls: int = 0
+    retracted_chars: int = 0
+
+    @property
+    def first_token_ms(self) -> float | None:
+        if self.first_text_at is None:
+            return None
+        return (self.first_text_at - self.started_at) * 1000.0
+
+    @property
+    def ttft_ms(self) -> float | None:
+        """Time from round start until the first text delta reached the consumer."""
+        if self.first_emit_at is None:
+            return None
+        return (self.first_emit_at - self.started_at) * 1000.0
+
+    @property
+    def total_ms(self) -> float | None:
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at) * 1000.0
+
+
+def _abort_events(exc: PipelineAbort) -> list[StreamEvent]:
+    return [
+        ErrorEvent(
+            message=str(exc) or repr(exc),
+            exception_type=str(getattr(exc, "exception_type", type(exc).__name__)),
+        ),
+        DoneEvent(finish_reason=str(getattr(exc, "finish_reason", "pipeline_abort"))),
+    ]
+
+
+@dataclass(slots=True)
+class _ToolLoop:
+    """
+    Transport-agnostic tool-loop state machine shared by the sync and async runners.
+
+    The runners only drive I/O (backend stream, tool execution); every step here returns the
+    events to forward. Once `finished` is set the runner must stop after forwarding them.
+    """
+
+    tools: Sequence[ToolSpec]
+    config: AgentRunnerConfig
+    pipeline: Pipeline | None
+    round_metrics: list[RoundMetrics]
+    convo: list[Message]
+    pipeline_runtime: dict[str, object] | None = None
+    finished: bool = False
+    round_idx: int = 0
+    metrics: RoundMetrics | None = None
+    accumulator: ToolCallAccumulator = field(default_factory=ToolCallAccumulator)
+    buffered_text: list[TextDeltaEvent] = field(default_factory=list)
+    # Speculative state: `streamed` holds the events already forwarded in this round.
+    streamed: list[TextDeltaEvent] = field(default_factory=list)
+    finish_reason: str | None = None
+    committed: bool = False
+    saw_tool_call: bool = False
+    visible_chars: int = 0
+
+    def rounds(self) -> range:
+        return range(max(0, int(self.config.max_tool_rounds)) + 1)
+
+    def start_round(self, round_idx: int) -> tuple[ChatRequest | None, list[StreamEvent]]:
+        self.round_idx = round_idx
+        self.accumulator = ToolCallAccumulator()
+        self.buffered_text = []
+        self.streamed = []
+        self.finish_reason = None
+        self.committed = False
+        self.saw_tool_call = False
+        self.visible_chars = 0
+        self.metrics = RoundMetrics(
+            round_index=round_idx,
+            started_at=time.perf_counter(),
+            speculative=bool(self.config.speculative_streaming),
+        )
+        self.round_metrics.append(self.metrics)
+
+        request_messages: Sequence[Message] = self.convo
+        request_tools: Sequence[ToolSpec] = self.tools
+        if self.pipeline is not None:
+            pipeline_request = PipelineRequest(
+                messages=list(self.convo),
+                tools=list(self.tools),
+                runtime=dict(self.pipeline_runtime or {}),
+            )
+            try:
+                pipeline_request = self.pipeline.apply_pre_model(pipeline_request)
+            except PipelineAbort as exc:
+                self.finished = True
+                return None, _abort_events(exc)
+            request_messages = pipeline_request.messages
+            request_tools = pipeline_request.tools
+
+        request = ChatRequest(
+            messages=request_messages,
+            tools=request_tools,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+        )
+        return request, []
+
+    def on_backend_event(self, event: object) -> list[StreamEvent]:
+        metrics = self.metrics
+        assert metrics is not None
+        event_type = getattr(event, "type", "")
+        if event_type == "text.delta":
+            delta = str(getattr(event, "delta", "") or "")
+            if self.pipeline is not None:
+                try:
+                    delta = self.pipeline.apply_stream_filter(delta)
+                except PipelineAbort as exc:
+                    self.finished = True
+                    return _abort_events(exc)
+            if not delta:
+                return []
+            text_event = TextDeltaEvent(delta=delta)
+            self.buffered_text.append(text_event)
+            if metrics.first_text_at is None:
+                metrics.first_text_at = time.perf_counter()
+            if not self.config.speculative_streaming or self.saw_tool_call:
+                return []
+            if not self.committed:
+                self.visible_chars += len(delta.strip())
+                min_visible = max(1, int(self.config.speculative_min_chars))
+                self.committed = self.visible_chars >= min_visible
+            if not self.committed:
+                return []
+            out: list[StreamEvent] = []
+            for pending in self.buffered_text[len(self.streamed) :]:
+                self.streamed.append(pending)
+                if metrics.first_emit_at is None:
+                    metrics.first_emit_at = time.perf_counter()
+                out.append(pending)
+            return out
+        if event_type == "tool_call.delta":
+            self.saw_tool_call = True
+            self.accumulator.apply(event)  # type: ignore[arg-type]
+        elif event_type == "done":
+            self.finish_reason = getattr(event, "finish_reason", None)
+        # Ignore unknown event types for robustness.
+        return []
+
+    def on_backend_error(self, exc: Exception) -> list[StreamEvent]:
+        if self.metrics is not None:
+            self.metrics.finished_at = time.perf_counter()
+        self.finished = True
+        return [
+            ErrorEvent(message=str(exc) or repr(exc), exception_type=type(exc).__name__),
+            DoneEvent(finish_reason="error"),
+        ]
+
+    def end_round(self) -> tuple[list[ToolCallState], list[StreamEvent]]:
+        """Finish the model stream; returns tool calls to execute (empty = round is final)."""
+        metrics = self.metrics
+        assert metrics is not None
+        tool_calls = [c for c in self.accumulator.list() if c.is_complete()]
+        finish_reason = self.finish_reason
+        buffered_text = self.buffered_text
+        if self.pipeline is not None:
+            pipeline_response = PipelineResponse(
+                events=list(buffered_text),
+                tool_calls=list(tool_calls),
+                finish_reason=finish_reason,
+                streamed_events=len(self.streamed),
+            )
+            try:
+                pipeline_response = self.pipeline.apply_post_model(pipeline_response)
+            except PipelineAbort as exc:
+                self.finished = True
+                return [], _abort_events(exc)
+
+            finish_reason = pipeline_response.finish_reason
+            tool_calls = list(pipeline_response.tool_calls)
+            buffered_text = [
+                e
+                for e in pipeline_response.events
+                if isinstance(e, TextDeltaEvent) and bool(getattr(e, "delta", ""))
+            ]
+        metrics.finished_at = time.perf_counter()
+        metrics.tool_calls = len(tool_calls)
+
+        out: list[StreamEvent] = []
+        if tool_calls:
+            if self.streamed:
+                # Text was forwarded before the tool call showed up: tool rounds never keep
+                # their text, so ask the consumer to drop it.
+                retracted = sum(len(e.delta) for e in self.streamed)
+                metrics.retracted_chars = retracted
+                out.append(TextRetractEvent(chars=retracted, reason="tool_calls"))
+            if self.pipeline is not None:
+                try:
+                    tool_calls = self.pipeline.apply_pre_tool_calls(tool_calls)
+                except PipelineAbort as exc:
+                    self.finished = True
+                    return [], out + _abort_events(exc)
+
+            if self.round_idx >= int(self.config.max_tool_rounds):
+                self.finished = True
+                out.append(
+                    ErrorEvent(
+                        message="tool loop exceeded max_tool_rounds",
+                        exception_type="ToolLoopLimitError",
+                    )
+                )
+                out.append(DoneEvent(finish_reason="tool_loop_limit"))
+                return [], out
+
+            assistant_tool_calls = [
+                ToolCall(
+                    id=str(c.tool_call_id),
+                    name=str(c.name),
+                    arguments_json=str(c.arguments_json or ""),
+                )
+                for c in tool_calls
+            ]
+            self.convo.append(
+                Message(role="assistant", content=None, tool_calls=assistant_tool_calls)
+            )
+            return list(tool_calls), out
+
+        # No tool calls: emit whatever has not been streamed yet and finish.
+        for t in _reconcile_streamed(self.streamed, buffered_text, metrics):
+            if isinstance(t, TextDeltaEvent) and metrics.first_emit_at is None:
+                metrics.first_emit_at = time.perf_counter()
+            out.append(t)
+        logger.debug(
+            "native round %d: first_token=%sms ttft=%sms total=%sms speculative=%s",
+            metrics.round_index,
+            _fmt_ms(metrics.first_token_ms),
+            _fmt_ms(metrics.ttft_ms),
+            _fmt_ms(metrics.total_ms),
+            metrics.speculative,
+        )
+        out.append(DoneEvent(finish_reason=finish_reason))
+        self.finished = True
+        return [], out
+
+    def on_tool_messages(self, tool_messages: list[Message]) -> list[StreamEvent]:
+        if self.pipeline is not None:
+            try:
+                tool_messages = self.pipeline.apply_post_tool_messages(tool_messages)
+            except PipelineAbort as exc:
+                self.finished = True
+                return _abort_events(exc)
+        out: list[StreamEvent] = []
+        for msg in tool_messages:
+            self.convo.append(msg)
+            out.append(
+                ToolResultEvent(tool_call_id=str(msg.tool_call_id), content=str(msg.content))
+            )
+        return out
 
 
 @dataclass(slots=True)
@@ -42,6 +317,7 @@ class NativeToolLoopRunner:
     tool_runner: ToolRunner
     config: AgentRunnerConfig = AgentRunnerConfig()
     pipeline: Pipeline | None = None
+    round_metrics: list[RoundMetrics] = field(default_factory=list)
 
     def stream(
         self,
@@ -50,169 +326,162 @@ class NativeToolLoopRunner:
         cancel_event: Event | None = None,
         pipeline_runtime: dict[str, object] | None = None,
     ) -> Iterator[StreamEvent]:
-        convo: list[Message] = list(messages)
+        self.round_metrics.clear()
+        loop = _ToolLoop(
+            tools=self.tools,
+            config=self.config,
+            pipeline=self.pipeline,
+            round_metrics=self.round_metrics,
+            convo=list(messages),
+            pipeline_runtime=pipeline_runtime,
+        )
 
-        for round_idx in range(max(0, int(self.config.max_tool_rounds)) + 1):
+        for round_idx in loop.rounds():
             if cancel_event and cancel_event.is_set():
                 return
 
-            accumulator = ToolCallAccumulator()
-            buffered_text: list[TextDeltaEvent] = []
-            finish_reason: str | None = None
-
-            request_messages: Sequence[Message] = convo
-            request_tools: Sequence[ToolSpec] = self.tools
-            if self.pipeline is not None:
-                pipeline_request = PipelineRequest(
-                    messages=list(convo),
-                    tools=list(self.tools),
-                    runtime=dict(pipeline_runtime or {}),
-                )
-                try:
-                    pipeline_request = self.pipeline.apply_pre_model(pipeline_request)
-                except PipelineAbort as exc:
-                    yield ErrorEvent(
-                        message=str(exc) or repr(exc),
-                        exception_type=str(getattr(exc, "exception_type", type(exc).__name__)),
-                    )
-                    yield DoneEvent(
-                        finish_reason=str(getattr(exc, "finish_reason", "pipeline_abort"))
-                    )
-                    return
-                request_messages = pipeline_request.messages
-                request_tools = pipeline_request.tools
-
-            request = ChatRequest(
-                messages=request_messages,
-                tools=request_tools,
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens,
-            )
+            request, events = loop.start_round(round_idx)
+            yield from events
+            if request is None:
+                return
 
             try:
                 for event in self.backend.stream(request):
                     if cancel_event and cancel_event.is_set():
                         return
-
-                    event_type = getattr(event, "type", "")
-                    if event_type == "text.delta":
-                        delta = str(getattr(event, "delta", "") or "")
-                        if self.pipeline is not None:
-                            try:
-                                delta = self.pipeline.apply_stream_filter(delta)
-                            except PipelineAbort as exc:
-                                yield ErrorEvent(
-                                    message=str(exc) or repr(exc),
-                                    exception_type=str(
-                                        getattr(exc, "exception_type", type(exc).__name__)
-                                    ),
-                                )
-                                yield DoneEvent(
-                                    finish_reason=str(
-                                        getattr(exc, "finish_reason", "pipeline_abort")
-                                    )
-                                )
-                                return
-                        if delta:
-                            buffered_text.append(TextDeltaEvent(delta=delta))
-                    elif event_type == "tool_call.delta":
-                        accumulator.apply(event)  # type: ignore[arg-type]
-                    elif event_type == "done":
-                        finish_reason = getattr(event, "finish_reason", None)
-                    else:
-                        # Ignore unknown event types for robustness.
-                        pass
+                    yield from loop.on_backend_event(event)
+                    if loop.finished:
+                        return
             except Exception as exc:
-                yield ErrorEvent(message=str(exc) or repr(exc), exception_type=type(exc).__name__)
-                yield DoneEvent(finish_reason="error")
+                yield from loop.on_backend_error(exc)
+                return
+
+            tool_calls, events = loop.end_round()
+            yield from events
+            if loop.finished:
+                return
+
+            tool_messages = self.tool_runner.run(
+                tool_calls,
+                cancel_event=cancel_event,
+                timeout_s=float(self.config.tool_timeout_s),
+            )
+            yield from loop.on_tool_messages(tool_messages)
+            if loop.finished:
+                return
+
+
+@dataclass(slots=True)
+class AsyncNativeToolLoopRunner:
+    """
+    asyncio variant of NativeToolLoopRunner (same events, same pipeline semantics).
+
+    Model streaming runs on the caller's event loop via an AsyncChatBackend, so many concurrent
+    conversations share one loop instead of pinning a thread per stream. Blocking steps (tool
+    execution and `pre_model` stages, which may call a selector model) are offloaded with
+    `asyncio.to_thread`.
+    """
+
+    backend: AsyncChatBackend
+    tools: Sequence[ToolSpec]
+    tool_runner: ToolRunner
+    config: AgentRunnerConfig = AgentRunnerConfig()
+    pipeline: Pipeline | None = None
+    round_metrics: list[RoundMetrics] = field(default_factory=list)
+
+    async def stream(
+        self,
+        messages: Sequence[Message],
+        *,
+        cancel_event: Event | None = None,
+        pipeline_runtime: dict[str, object] | None = None,
+    ) -> AsyncIterator[StreamEvent]:
+        self.round_metrics.clear()
+        loop = _ToolLoop(
+            tools=self.tools,
+            config=self.config,
+            pipeline=self.pipeline,
+            round_metrics=self.round_metrics,
+            convo=list(messages),
+            pipeline_runtime=pipeline_runtime,
+        )
+
+        for round_idx in loop.rounds():
+            if cancel_event and cancel_event.is_set():
                 return
 
-            tool_calls = [c for c in accumulator.list() if c.is_complete()]
             if self.pipeline is not None:
-                pipeline_response = PipelineResponse(
-                    events=list(buffered_text),
-                    tool_calls=list(tool_calls),
-                    finish_reason=finish_reason,
-                )
-                try:
-                    pipeline_response = self.pipeline.apply_post_model(pipeline_response)
-                except PipelineAbort as exc:
-                    yield ErrorEvent(
-                        message=str(exc) or repr(exc),
-                        exception_type=str(getattr(exc, "exception_type", type(exc).__name__)),
-                    )
-                    yield DoneEvent(
-                        finish_reason=str(getattr(exc, "finish_reason", "pipeline_abort"))
-                    )
-                    return
-
-                finish_reason = pipeline_response.finish_reason
-                tool_calls = list(pipeline_response.tool_calls)
-                buffered_text = [
-                    e
-                    for e in pipeline_response.events
-                    if isinstance(e, TextDeltaEvent) and bool(getattr(e, "delta", ""))
-                ]
-            if tool_calls:
-                if self.pipeline is not None:
-                    try:
-                        tool_calls = self.pipeline.apply_pre_tool_calls(tool_calls)
-                    except PipelineAbort as exc:
-                        yield ErrorEvent(
-                            message=str(exc) or repr(exc),
-                            exception_type=str(getattr(exc, "exception_type", type(exc).__name__)),
-                        )
-                        yield DoneEvent(
-                            finish_reason=str(getattr(exc, "finish_reason", "pipeline_abort"))
-                        )
+                request, events = await asyncio.to_thread(loop.start_round, round_idx)
+            else:
+                request, events = loop.start_round(round_idx)
+            for out in events:
+                yield out
+            if request is None:
+                return
+
+            stream = self.backend.stream(request)
+            try:
+                async for event in stream:
+                    if cancel_event and cancel_event.is_set():
+                        return
+                    for out in loop.on_backend_event(event):
+                        yield out
+                    if loop.finished:
                         return
+            except Exception as exc:
+                for out in loop.on_backend_error(exc):
+                    yield out
+                return
+            finally:
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    try:
+                        await aclose()
+                    except Exception:
+                        pass
 
-                if round_idx >= int(self.config.max_tool_rounds):
-                    yield ErrorEvent(
-                        message="tool loop exceeded max_tool_rounds",
-                        exception_type="ToolLoopLimitError",
-                    )
-                    yield DoneEvent(finish_reason="tool_loop_limit")
-                    return
-
-                assistant_tool_calls = [
-                    ToolCall(
-                        id=str(c.tool_call_id),
-                        name=str(c.name),
-                        arguments_json=str(c.arguments_json or ""),
-                    )
-                    for c in tool_calls
-                ]
-                convo.append(
-                    Message(role="assistant", content=None, tool_calls=assistant_tool_calls)
-                )
+            tool_calls, events = loop.end_round()
+            for out in events:
+                yield out
+            if loop.finished:
+                return
+
+            tool_messages = await asyncio.to_thread(
+                self.tool_runner.run,
+                tool_calls,
+                cancel_event=cancel_event,
+                timeout_s=float(self.config.tool_timeout_s),
+            )
+            for out in loop.on_tool_messages(tool_messages):
+                yield out
+            if loop.finished:
+                return
+
+
+def _reconcile_streamed(
+    streamed: list[TextDeltaEvent],
+    final: list[TextDeltaEvent],
+    metrics: RoundMetrics,
+) -> list[TextDeltaEvent | TextRetractEvent]:
+    """Diff the speculatively streamed prefix against the post_model output (flush/retract)."""
+    if not streamed:
+        return list(final)
+    if final[: len(streamed)] == streamed:
+        return list(final[len(streamed) :])
+
+    streamed_text = "".join(e.delta for e in streamed)
+    final_text = "".join(e.delta for e in final)
+    if final_text.startswith(streamed_text):
+        rest = final_text[len(streamed_text) :]
+        return [TextDeltaEvent(delta=rest)] if rest else []
+
+    metrics.retracted_chars = len(streamed_text)
+    out: list[TextDeltaEvent | TextRetractEvent] = [
+        TextRetractEvent(chars=len(streamed_text), reason="post_model")
+    ]
+    out.extend(final)
+    return out
 
-                tool_messages = self.tool_runner.run(
-                    tool_calls,
-                    cancel_event=cancel_event,
-                    timeout_s=float(self.config.tool_timeout_s),
-                )
-                if self.pipeline is not None:
-                    try:
-                        tool_messages = self.pipeline.apply_post_tool_messages(tool_messages)
-                    except PipelineAbort as exc:
-                        yield ErrorEvent(
-                            message=str(exc) or repr(exc),
-                            exception_type=str(getattr(exc, "exception_type", type(exc).__name__)),
-                        )
-                        yield DoneEvent(
-                            finish_reason=str(getattr(exc, "finish_reason", "pipeline_abort"))
-                        )
-                        return
-                for msg in tool_messages:
-                    convo.append(msg)
-                    yield ToolResultEvent(
-                        tool_call_id=str(msg.tool_call_id), content=str(msg.content)
-                    )
-                continue
 
-            # No tool calls: emit buffered text and finish.
-            for t in buffered_text:
-                yield t
-            yield DoneEvent(finish_reason=finish_reason)
-            return
+def _fmt_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.0f}"
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Iterator, Protocol, Sequence
+from typing import Any, AsyncIterator, Iterator, Protocol, Sequence
 
 from .events import StreamEvent
 from .messages import Message
@@ -56,3 +56,13 @@ class ChatBackend(Protocol):
 
     def stream(self, request: ChatRequest) -> Iterator[StreamEvent]:
         raise NotImplementedError
+
+
+class AsyncChatBackend(Protocol):
+    """asyncio counterpart of ChatBackend (used by AsyncNativeToolLoopRunner)."""
+
+    async def complete(self, request: ChatRequest) -> ChatResponse:
+        raise NotImplementedError
+
+    def stream(self, request: ChatRequest) -> AsyncIterator[StreamEvent]:
+        raise NotImplementedError
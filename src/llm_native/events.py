@@ -26,6 +26,21 @@ class ToolResultEvent:
     type: Literal["tool.result"] = "tool.result"
 
 
+@dataclass(frozen=True, slots=True)
+class TextRetractEvent:
+    """
+    Retract text already streamed in the current round (speculative streaming).
+
+    `chars` is the number of trailing characters the consumer should discard; `reason` is
+    "tool_calls" when the round turned into a tool-call round, or "post_model" when a pipeline
+    stage rewrote text that had already been emitted (the replacement follows as text deltas).
+    """
+
+    chars: int
+    reason: str = "tool_calls"
+    type: Literal["text.retract"] = "text.retract"
+
+
 @dataclass(frozen=True, slots=True)
 class ErrorEvent:
     message: str
@@ -39,7 +54,14 @@ class DoneEvent:
     type: Literal["done"] = "done"
 
 
-StreamEvent = TextDeltaEvent | ToolCallDeltaEvent | ToolResultEvent | ErrorEvent | DoneEvent
+StreamEvent = (
+    TextDeltaEvent
+    | TextRetractEvent
+    | ToolCallDeltaEvent
+    | ToolResultEvent
+    | ErrorEvent
+    | DoneEvent
+)
 
 
 @dataclass(slots=True)
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Iterator
+from typing import Any, AsyncIterator, Iterator
 from urllib.parse import urlparse
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from .backend import BackendConfig, ChatBackend, ChatRequest, ChatResponse
-from .events import DoneEvent, StreamEvent, TextDeltaEvent, ToolCallDeltaEvent
+from src.utils.http_transport import (
+    get_async_http_client,
+    get_http_client,
+    release_async_http_client,
+)
+
+from .backend import AsyncChatBackend, BackendConfig, ChatBackend, ChatRequest, ChatResponse
+from .events import DoneEvent, StreamEvent
+from .sse_decoder import StreamDeltaDecoder
 
 
 def _normalize_base_url(base_url: str) -> str:
@@ -46,6 +53,37 @@ def _prefer_stream_helper(base_url: str) -> bool:
     return bool(host.endswith("openai.com"))
 
 
+def _client_kwargs(config: BackendConfig) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {
+        "base_url": _normalize_base_url(config.base_url) or None,
+        "timeout": float(config.timeout_s),
+        "max_retries": int(config.max_retries),
+    }
+    api_key = str(config.api_key or "").strip()
+    if api_key:
+        kwargs["api_key"] = api_key
+    return kwargs
+
+
+def _response_from_completion(resp: Any) -> ChatResponse:
+    choice0 = (getattr(resp, "choices", None) or [None])[0]
+    finish_reason = getattr(choice0, "finish_reason", None) if choice0 is not None else None
+    msg = getattr(choice0, "message", None) if choice0 is not None else None
+    content = getattr(msg, "content", None)
+    output_text = "" if content is None else str(content)
+    return ChatResponse(
+        output_text=output_text, finish_reason=str(finish_reason) if finish_reason else None
+    )
+
+
+def _raw_stream_create(client: Any) -> Any:
+    """Return `chat.completions.with_streaming_response.create` when the SDK exposes it."""
+    completions = getattr(getattr(client, "chat", None), "completions", None)
+    raw = getattr(completions, "with_streaming_response", None) if completions else None
+    create = getattr(raw, "create", None) if raw is not None else None
+    return create if callable(create) else None
+
+
 @dataclass(slots=True)
 class OpenAICompatibleBackend(ChatBackend):
     """
@@ -58,20 +96,31 @@ class OpenAICompatibleBackend(ChatBackend):
 
     config: BackendConfig
     _client: Any
+    _shared_transport: bool
 
-    def __init__(self, config: BackendConfig, *, client: Any | None = None) -> None:
+    def __init__(
+        self,
+        config: BackendConfig,
+        *,
+        client: Any | None = None,
+        shared_transport: bool = True,
+    ) -> None:
         self.config = config
-        kwargs: dict[str, Any] = {
-            "base_url": _normalize_base_url(config.base_url) or None,
-            "timeout": float(config.timeout_s),
-            "max_retries": int(config.max_retries),
-        }
-        api_key = str(config.api_key or "").strip()
-        if api_key:
-            kwargs["api_key"] = api_key
-        self._client = client or OpenAI(**kwargs)
+        # The shared httpx pool (keyed by base_url origin) lets every backend pointing at the
+        # same API reuse warm connections instead of paying TLS setup per client.
+        self._shared_transport = client is None and bool(shared_transport)
+        if client is not None:
+            self._client = client
+        else:
+            kwargs = _client_kwargs(config)
+            if self._shared_transport:
+                kwargs["http_client"] = get_http_client(kwargs["base_url"] or "")
+            self._client = OpenAI(**kwargs)
 
     def close(self) -> None:
+        if self._shared_transport:
+            # Closing the SDK client would close the shared pool for every other backend.
+            return
         try:
             self._client.close()
         except Exception:
@@ -83,20 +132,27 @@ class OpenAICompatibleBackend(ChatBackend):
         kwargs.pop("stream", None)
 
         resp = self._client.chat.completions.create(**kwargs)
-        choice0 = (getattr(resp, "choices", None) or [None])[0]
-        finish_reason = getattr(choice0, "finish_reason", None) if choice0 is not None else None
-        msg = getattr(choice0, "message", None) if choice0 is not None else None
-        content = getattr(msg, "content", None)
-        output_text = "" if content is None else str(content)
-        return ChatResponse(
-            output_text=output_text, finish_reason=str(finish_reason) if finish_reason else None
-        )
+        return _response_from_completion(resp)
 
     def stream(self, request: ChatRequest) -> Iterator[StreamEvent]:
         kwargs = request.to_openai_kwargs()
         kwargs["model"] = self.config.model
+        decoder = StreamDeltaDecoder()
+
+        raw_create = _raw_stream_create(self._client)
+        if raw_create is not None:
+            # Decode SSE bytes directly: skips per-chunk SDK model construction and coalesces
+            # the deltas of each network read.
+            kwargs["stream"] = True
+            with raw_create(**kwargs) as response:
+                for data in response.iter_bytes():
+                    yield from decoder.feed(data)
+                    if decoder.done:
+                        break
+                yield from decoder.close()
+            yield DoneEvent(finish_reason=decoder.finish_reason)
+            return
 
-        finish_reason: str | None = None
         completions = getattr(getattr(self._client, "chat", None), "completions", None)
         stream_cm = getattr(completions, "stream", None) if completions is not None else None
         if callable(stream_cm) and _prefer_stream_helper(self.config.base_url):
@@ -112,63 +168,7 @@ class OpenAICompatibleBackend(ChatBackend):
                         if chunk is None:
                             continue
                         emitted_any_chunk = True
-                        emitted_in_chunk = False
-                        for choice in getattr(chunk, "choices", None) or []:
-                            delta = getattr(choice, "delta", None)
-                            if delta is not None:
-                                content = getattr(delta, "content", None)
-                                if content:
-                                    yield TextDeltaEvent(delta=str(content))
-                                    emitted_in_chunk = True
-
-                                tool_calls = getattr(delta, "tool_calls", None) or []
-                                for tool_call in tool_calls:
-                                    function = getattr(tool_call, "function", None)
-                                    yield ToolCallDeltaEvent(
-                                        index=int(getattr(tool_call, "index", 0)),
-                                        tool_call_id=(
-                                            str(getattr(tool_call, "id"))
-                                            if getattr(tool_call, "id", None)
-                                            else None
-                                        ),
-                                        name=(
-                                            str(getattr(function, "name"))
-                                            if function is not None
-                                            and getattr(function, "name", None)
-                                            else None
-                                        ),
-                                        arguments_delta=(
-                                            str(getattr(function, "arguments"))
-                                            if function is not None
-                                            and getattr(function, "arguments", None)
-                                            else None
-                                        ),
-                                    )
-                                    emitted_in_chunk = True
-
-                                function_call = getattr(delta, "function_call", None)
-                                if function_call is not None:
-                                    yield ToolCallDeltaEvent(
-                                        index=0,
-                                        tool_call_id=None,
-                                        name=(
-                                            str(getattr(function_call, "name"))
-                                            if getattr(function_call, "name", None)
-                                            else None
-                                        ),
-                                        arguments_delta=(
-                                            str(getattr(function_call, "arguments"))
-                                            if getattr(function_call, "arguments", None)
-                                            else None
-                                        ),
-                                    )
-                                    emitted_in_chunk = True
-
-                            fr = getattr(choice, "finish_reason", None)
-                            if fr:
-                                finish_reason = str(fr)
-                        if not emitted_in_chunk:
-                            yield TextDeltaEvent(delta="")
+                        yield from decoder.feed_chunk(chunk)
             except AssertionError:
                 # Some OpenAI-compatible gateways emit streaming events that the SDK's
                 # `.stream()` helper doesn't recognize (it may raise AssertionError via
@@ -178,122 +178,126 @@ class OpenAICompatibleBackend(ChatBackend):
                     raise
                 kwargs["stream"] = True
                 for chunk in self._client.chat.completions.create(**kwargs):
-                    emitted_in_chunk = False
-                    for choice in getattr(chunk, "choices", None) or []:
-                        delta = getattr(choice, "delta", None)
-                        if delta is not None:
-                            content = getattr(delta, "content", None)
-                            if content:
-                                yield TextDeltaEvent(delta=str(content))
-                                emitted_in_chunk = True
-
-                            tool_calls = getattr(delta, "tool_calls", None) or []
-                            for tool_call in tool_calls:
-                                function = getattr(tool_call, "function", None)
-                                yield ToolCallDeltaEvent(
-                                    index=int(getattr(tool_call, "index", 0)),
-                                    tool_call_id=(
-                                        str(getattr(tool_call, "id"))
-                                        if getattr(tool_call, "id", None)
-                                        else None
-                                    ),
-                                    name=(
-                                        str(getattr(function, "name"))
-                                        if function is not None and getattr(function, "name", None)
-                                        else None
-                                    ),
-                                    arguments_delta=(
-                                        str(getattr(function, "arguments"))
-                                        if function is not None
-                                        and getattr(function, "arguments", None)
-                                        else None
-                                    ),
-                                )
-                                emitted_in_chunk = True
-
-                            function_call = getattr(delta, "function_call", None)
-                            if function_call is not None:
-                                yield ToolCallDeltaEvent(
-                                    index=0,
-                                    tool_call_id=None,
-                                    name=(
-                                        str(getattr(function_call, "name"))
-                                        if getattr(function_call, "name", None)
-                                        else None
-                                    ),
-                                    arguments_delta=(
-                                        str(getattr(function_call, "arguments"))
-                                        if getattr(function_call, "arguments", None)
-                                        else None
-                                    ),
-                                )
-                                emitted_in_chunk = True
-
-                        fr = getattr(choice, "finish_reason", None)
-                        if fr:
-                            finish_reason = str(fr)
-                    if not emitted_in_chunk:
-                        yield TextDeltaEvent(delta="")
+                    yield from decoder.feed_chunk(chunk)
         else:
             kwargs["stream"] = True
             for chunk in self._client.chat.completions.create(**kwargs):
-                emitted_in_chunk = False
-                for choice in getattr(chunk, "choices", None) or []:
-                    delta = getattr(choice, "delta", None)
-                    if delta is not None:
-                        content = getattr(delta, "content", None)
-                        if content:
-                            yield TextDeltaEvent(delta=str(content))
-                            emitted_in_chunk = True
-
-                        tool_calls = getattr(delta, "tool_calls", None) or []
-                        for tool_call in tool_calls:
-                            function = getattr(tool_call, "function", None)
-                            yield ToolCallDeltaEvent(
-                                index=int(getattr(tool_call, "index", 0)),
-                                tool_call_id=(
-                                    str(getattr(tool_call, "id"))
-                                    if getattr(tool_call, "id", None)
-                                    else None
-                                ),
-                                name=(
-                                    str(getattr(function, "name"))
-                                    if function is not None and getattr(function, "name", None)
-                                    else None
-                                ),
-                                arguments_delta=(
-                                    str(getattr(function, "arguments"))
-                                    if function is not None and getattr(function, "arguments", None)
-                                    else None
-                                ),
-                            )
-                            emitted_in_chunk = True
-
-                        function_call = getattr(delta, "function_call", None)
-                        if function_call is not None:
-                            yield ToolCallDeltaEvent(
-                                index=0,
-                                tool_call_id=None,
-                                name=(
-                                    str(getattr(function_call, "name"))
-                                    if getattr(function_call, "name", None)
-                                    else None
-                                ),
-                                arguments_delta=(
-                                    str(getattr(function_call, "arguments"))
-                                    if getattr(function_call, "arguments", None)
-                                    else None
-                                ),
-                            )
-                            emitted_in_chunk = True
-
-                    fr = getattr(choice, "finish_reason", None)
-                    if fr:
-                        finish_reason = str(fr)
-                if not emitted_in_chunk:
-                    yield TextDeltaEvent(delta="")
-
-        yield DoneEvent(finish_reason=finish_reason)
-
-
-__all__ = ["OpenAICompatibleBackend"]
+                yield from decoder.feed_chunk(chunk)
+
+        yield DoneEvent(finish_reason=decoder.finish_reason)
+
+
+@dataclass(slots=True)
+class AsyncOpenAICompatibleBackend(AsyncChatBackend):
+    """
+    asyncio backend on the SDK's `AsyncOpenAI` client (same event semantics as the sync one).
+
+    A stream only holds a coroutine frame while waiting on the socket, so one event loop can
+    serve many concurrent conversations.
+    """
+
+    config: BackendConfig
+    _client: Any
+    _shared_transport: bool
+    _http_client: Any
+
+    def __init__(
+        self,
+        config: BackendConfig,
+        *,
+        client: Any | None = None,
+        shared_transport: bool = True,
+    ) -> None:
+        self.config = config
+        self._shared_transport = client is None and bool(shared_transport)
+        self._http_client = None
+        if client is not None:
+            self._client = client
+        else:
+            kwargs = _client_kwargs(config)
+            if self._shared_transport:
+                # Must be constructed inside the event loop that will drive the requests.
+                self._http_client = get_async_http_client(kwargs["base_url"] or "")
+                kwargs["http_client"] = self._http_client
+            self._client = AsyncOpenAI(**kwargs)
+
+    async def aclose(self) -> None:
+        """Close the client; a shared pool is only closed once its last holder releases it."""
+        if self._shared_transport:
+            http_client, self._http_client = self._http_client, None
+            if http_client is not None:
+                await release_async_http_client(http_client)
+            return
+        try:
+            await self._client.close()
+        except Exception:
+            pass
+
+    async def complete(self, request: ChatRequest) -> ChatResponse:
+        kwargs = request.to_openai_kwargs()
+        kwargs["model"] = self.config.model
+        kwargs.pop("stream", None)
+
+        resp = await self._client.chat.completions.create(**kwargs)
+        return _response_from_completion(resp)
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[StreamEvent]:
+        kwargs = request.to_openai_kwargs()
+        kwargs["model"] = self.config.model
+        decoder = StreamDeltaDecoder()
+
+        raw_create = _raw_stream_create(self._client)
+        if raw_create is not None:
+            kwargs["stream"] = True
+            async with raw_create(**kwargs) as response:
+                async for data in response.iter_bytes():
+                    for out in decoder.feed(data):
+                        yield out
+                    if decoder.done:
+                        break
+                for out in decoder.close():
+                    yield out
+            yield DoneEvent(finish_reason=decoder.finish_reason)
+            return
+
+        completions = getattr(getattr(self._client, "chat", None), "completions", None)
+        stream_cm = getattr(completions, "stream", None) if completions is not None else None
+        use_create = not (callable(stream_cm) and _prefer_stream_helper(self.config.base_url))
+        if not use_create:
+            emitted_any_chunk = False
+            try:
+                async with stream_cm(**kwargs) as stream:
+                    async for event in stream:
+                        if str(getattr(event, "type", "") or "") != "chunk":
+                            continue
+                        chunk = getattr(event, "chunk", None)
+                        if chunk is None:
+                            continue
+                        emitted_any_chunk = True
+                        for out in decoder.feed_chunk(chunk):
+                            yield out
+            except AssertionError:
+                # Same gateway fallback as the sync backend.
+                if emitted_any_chunk:
+                    raise
+                use_create = True
+
+        if use_create:
+            kwargs["stream"] = True
+            chunks = await self._client.chat.completions.create(**kwargs)
+            try:
+                async for chunk in chunks:
+                    for out in decoder.feed_chunk(chunk):
+                        yield out
+            finally:
+                closer = getattr(chunks, "close", None)
+                if closer is not None:
+                    try:
+                        await closer()
+                    except Exception:
+                        pass
+
+        yield DoneEvent(finish_reason=decoder.finish_reason)
+
+
+__all__ = ["AsyncOpenAICompatibleBackend", "OpenAICompatibleBackend"]
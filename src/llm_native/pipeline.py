@@ -22,12 +22,19 @@ class PipelineRequest:
 
 @dataclass(slots=True)
 class PipelineResponse:
-    """Model output payload passed through pipeline stages."""
+    """
+    Model output payload passed through pipeline stages.
+
+    With speculative streaming the first `streamed_events` entries of `events` have already been
+    emitted to the consumer. Stages may still rewrite them; the runner then retracts the streamed
+    text (`TextRetractEvent`) and re-emits the rewritten events, so prefer appending over editing.
+    """
 
     events: list[StreamEvent] = field(default_factory=list)
     tool_calls: list[ToolCallState] = field(default_factory=list)
     finish_reason: str | None = None
     final_text: str | None = None
+    streamed_events: int = 0
 
 
 class PipelineAbort(RuntimeError):
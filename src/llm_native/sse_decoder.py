@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from .events import StreamEvent, TextDeltaEvent, ToolCallDeltaEvent
+
+# Shared (frozen) heartbeat event: emitted at most once per read that carried only empty deltas
+# (role-only / reasoning chunks) so stream watchdogs stay alive without allocating per chunk.
+HEARTBEAT = TextDeltaEvent(delta="")
+
+
+class SSEStreamError(RuntimeError):
+    """Error object received inside an SSE stream (`data: {"error": ...}`)."""
+
+
+class StreamDeltaDecoder:
+    """
+    Single-pass Chat Completions stream decoder.
+
+    Accepts either raw SSE bytes (`feed`, straight from the HTTP response) or SDK chunk objects
+    (`feed_chunk`, for clients that only expose parsed chunks) and returns compact events:
+
+    - consecutive text deltas within one read are coalesced into a single TextDeltaEvent
+    - SSE comments / keep-alives and empty deltas produce no events; a read that carried only
+      empty deltas yields the shared `HEARTBEAT` once
+    - `finish_reason` and `done` (`data: [DONE]`) are tracked on the decoder
+    """
+
+    __slots__ = ("_buf", "_data_lines", "finish_reason", "done")
+
+    def __init__(self) -> None:
+        self._buf = b""
+        self._data_lines: list[bytes] = []
+        self.finish_reason: str | None = None
+        self.done = False
+
+    def feed(self, data: bytes) -> list[StreamEvent]:
+        """Decode one network read of SSE bytes (partial lines are buffered)."""
+        buf = self._buf + data if self._buf else data
+        cut = buf.rfind(b"\n")
+        if cut < 0:
+            self._buf = buf
+            return []
+        self._buf = buf[cut + 1 :]
+
+        out: list[StreamEvent] = []
+        text: list[str] = []
+        seen_payload = False
+        for line in buf[:cut].split(b"\n"):
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                # Blank line dispatches the pending event (SSE framing).
+                if self._data_lines:
+                    seen_payload = True
+                    self._dispatch(out, text)
+                continue
+            if line.startswith(b"data:"):
+                payload = line[5:]
+                if payload.startswith(b" "):
+                    payload = payload[1:]
+                self._data_lines.append(payload)
+            # `event:`, `id:`, `retry:` and `:` comments carry nothing we need.
+
+        if text:
+            out.append(TextDeltaEvent(delta="".join(text)))
+        if not out and seen_payload and not self.done:
+            out.append(HEARTBEAT)
+        return out
+
+    def close(self) -> list[StreamEvent]:
+        """Flush a trailing event that was not terminated by a blank line."""
+        out: list[StreamEvent] = []
+        if self._buf:
+            tail = self._buf
+            self._buf = b""
+            out = self.feed(tail + b"\n\n")
+        elif self._data_lines:
+            out = self.feed(b"\n")
+        return [e for e in out if e is not HEARTBEAT]
+
+    def feed_chunk(self, chunk: Any) -> list[StreamEvent]:
+        """Decode one SDK `ChatCompletionChunk`-like object."""
+        out: list[StreamEvent] = []
+        text: list[str] = []
+        for choice in getattr(chunk, "choices", None) or ():
+            delta = getattr(choice, "delta", None)
+            if delta is not None:
+                content = getattr(delta, "content", None)
+                if content:
+                    text.append(str(content))
+                tool_calls = getattr(delta, "tool_calls", None)
+                if tool_calls:
+                    _flush_text(out, text)
+                    for tool_call in tool_calls:
+                        function = getattr(tool_call, "function", None)
+                        out.append(
+                            ToolCallDeltaEvent(
+                                index=int(getattr(tool_call, "index", 0) or 0),
+                                tool_call_id=_str_or_none(getattr(tool_call, "id", None)),
+                                name=_str_or_none(getattr(function, "name", None)),
+                                arguments_delta=_str_or_none(getattr(function, "arguments", None)),
+                            )
+                        )
+                function_call = getattr(delta, "function_call", None)
+                if function_call is not None:
+                    _flush_text(out, text)
+                    out.append(
+                        ToolCallDeltaEvent(
+                            index=0,
+                            tool_call_id=None,
+                            name=_str_or_none(getattr(function_call, "name", None)),
+                            arguments_delta=_str_or_none(getattr(function_call, "arguments", None)),
+                        )
+                    )
+            finish_reason = getattr(choice, "finish_reason", None)
+            if finish_reason:
+                self.finish_reason = str(finish_reason)
+        _flush_text(out, text)
+        if not out:
+            out.append(HEARTBEAT)
+        return out
+
+    def _dispatch(self, out: list[StreamEvent], text: list[str]) -> None:
+        payload = (
+            self._data_lines[0] if len(self._data_lines) == 1 else b"\n".join(self._data_lines)
+        )
+        self._data_lines = []
+        if payload == b"[DONE]":
+            self.done = True
+            return
+        try:
+            obj = json.loads(payload)
+        except ValueError:
+            # Non-JSON payloads (gateway banners etc.) are ignored like unknown SDK events.
+            return
+        if not isinstance(obj, dict):
+            return
+        error = obj.get("error")
+        if error:
+            message = error.get("message") if isinstance(error, dict) else error
+            raise SSEStreamError(str(message or error))
+
+        for choice in obj.get("choices") or ():
+            delta = choice.get("delta")
+            if delta:
+                content = delta.get("content")
+                if content:
+                    text.append(content if isinstance(content, str) else str(content))
+                tool_calls = delta.get("tool_calls")
+                if tool_calls:
+                    _flush_text(out, text)
+                    for tool_call in tool_calls:
+                        function = tool_call.get("function") or {}
+                        out.append(
+                            ToolCallDeltaEvent(
+                                index=int(tool_call.get("index") or 0),
+                                tool_call_id=_str_or_none(tool_call.get("id")),
+                                name=_str_or_none(function.get("name")),
+                                arguments_delta=_str_or_none(function.get("arguments")),
+                            )
+                        )
+                function_call = delta.get("function_call")
+                if function_call:
+                    _flush_text(out, text)
+                    out.append(
+                        ToolCallDeltaEvent(
+                            index=0,
+                            tool_call_id=None,
+                            name=_str_or_none(function_call.get("name")),
+                            arguments_delta=_str_or_none(function_call.get("arguments")),
+                        )
+                    )
+            finish_reason = choice.get("finish_reason")
+            if finish_reason:
+                self.finish_reason = str(finish_reason)
+
+
+def _flush_text(out: list[StreamEvent], text: list[str]) -> None:
+    if text:
+        out.append(TextDeltaEvent(delta="".join(text)))
+        text.clear()
+
+
+def _str_or_none(value: Any) -> str | None:
+    return str(value) if value else None
+
+
+__all__ = ["HEARTBEAT", "SSEStreamError", "StreamDeltaDecoder"]
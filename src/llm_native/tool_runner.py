@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import contextvars
 import json
 import time
-from dataclasses import dataclass
-from threading import Event
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from threading import Event, Lock
 from typing import Any, Protocol, Sequence
 
 from src.utils.tool_context import tool_trace_recorder_var
@@ -17,6 +19,10 @@ class ToolExecutor(Protocol):
         raise NotImplementedError
 
 
+# Upper bound for a single wait() while polling cancel_event / the round deadline.
+_WAIT_POLL_S = 0.05
+
+
 def _parse_tool_arguments(arguments_json: str) -> dict[str, Any]:
     raw = str(arguments_json or "").strip()
     if not raw:
@@ -39,10 +45,21 @@ class ToolRunner:
     - Best-effort JSON argument parsing (invalid args become tool error outputs).
     - Cancellation between tool calls.
     - Per-tool timeout passed through to the executor.
+    - Optional concurrent mode (`max_parallel > 1`): independent calls of a round run on a bounded
+      thread pool; results keep call order. Tools reported as non-parallel-safe by the executor
+      (`is_parallel_safe(name) -> False`) act as barriers and run alone.
+    - Optional shared round deadline (`round_timeout_s`): every call gets at most the remaining
+      round budget; calls still pending at the deadline become timeout tool messages. Queued calls
+      are cancelled; calls already running are abandoned and their late results are dropped from
+      the tool trace.
     """
 
     tool_executor: ToolExecutor
     default_timeout_s: float = 30.0
+    max_parallel: int = 1
+    round_timeout_s: float | None = None
+    _pool: ThreadPoolExecutor | None = field(default=None, init=False, repr=False)
+    _pool_lock: Lock = field(default_factory=Lock, init=False, repr=False)
 
     def run(
         self,
@@ -51,52 +68,194 @@ class ToolRunner:
         cancel_event: Event | None = None,
         timeout_s: float | None = None,
     ) -> list[Message]:
-        results: list[Message] = []
         effective_timeout = (
             float(timeout_s) if timeout_s is not None else float(self.default_timeout_s)
         )
+        deadline: float | None = None
+        if self.round_timeout_s is not None and float(self.round_timeout_s) > 0:
+            deadline = time.perf_counter() + float(self.round_timeout_s)
+
+        if int(self.max_parallel) <= 1 or len(calls) <= 1:
+            return self._run_sequential(calls, cancel_event, effective_timeout, deadline)
 
         for call in calls:
+            _ensure_complete(call)
+
+        results: list[Message] = []
+        batch: list[ToolCallState] = []
+        for call in calls:
+            if self._is_parallel_safe(str(call.name)):
+                batch.append(call)
+                continue
+            if batch:
+                done = self._run_batch(batch, cancel_event, effective_timeout, deadline)
+                results.extend(done)
+                if len(done) < len(batch):
+                    return results
+                batch = []
+            done = self._run_sequential([call], cancel_event, effective_timeout, deadline)
+            results.extend(done)
+            if not done:
+                return results
+        if batch:
+            results.extend(self._run_batch(batch, cancel_event, effective_timeout, deadline))
+        return results
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _is_parallel_safe(self, name: str) -> bool:
+        checker = getattr(self.tool_executor, "is_parallel_safe", None)
+        if checker is None:
+            return True
+        try:
+            return bool(checker(name))
+        except Exception:
+            return False
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        pool = self._pool
+        if pool is not None:
+            return pool
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(1, int(self.max_parallel)),
+                    thread_name_prefix="mintchat-native-tool",
+                )
+            return self._pool
+
+    def _run_sequential(
+        self,
+        calls: Sequence[ToolCallState],
+        cancel_event: Event | None,
+        timeout_s: float,
+        deadline: float | None,
+    ) -> list[Message]:
+        results: list[Message] = []
+        for call in calls:
+            if cancel_event and cancel_event.is_set():
+                break
+            _ensure_complete(call)
+            call_timeout = _clamp_timeout(timeout_s, deadline)
+            if call_timeout is None:
+                results.append(self._deadline_message(call))
+            else:
+                results.append(self._run_one(call, call_timeout))
+        return results
+
+    def _run_batch(
+        self,
+        calls: Sequence[ToolCallState],
+        cancel_event: Event | None,
+        timeout_s: float,
+        deadline: float | None,
+    ) -> list[Message]:
+        """Run one batch concurrently; returns the in-order prefix completed before cancel."""
+        pool = self._get_pool()
+        slots: list[Message | None] = [None] * len(calls)
+        futures: dict[Future[Message], int] = {}
+        abandoned = Event()
+        for idx, call in enumerate(calls):
+            call_timeout = _clamp_timeout(timeout_s, deadline)
+            if call_timeout is None:
+                slots[idx] = self._deadline_message(call)
+                continue
+            # contextvars do not cross threads: copy so recorder/timeout vars reach the worker.
+            ctx = contextvars.copy_context()
+            futures[pool.submit(ctx.run, self._run_one, call, call_timeout, abandoned)] = idx
+
+        pending = set(futures)
+        while pending:
             if cancel_event and cancel_event.is_set():
+                abandoned.set()
+                for fut in pending:
+                    fut.cancel()
                 break
+            wait_s = _WAIT_POLL_S
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    abandoned.set()
+                    for fut in pending:
+                        idx = futures[fut]
+                        if fut.done() and not fut.cancelled():
+                            slots[idx] = _future_message(fut, calls[idx])
+                            continue
+                        fut.cancel()
+                        slots[idx] = self._deadline_message(calls[idx])
+                    pending = set()
+                    break
+                wait_s = min(wait_s, remaining)
+            done, pending = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = futures[fut]
+                slots[idx] = _future_message(fut, calls[idx])
 
-            if not call.tool_call_id or not call.name:
-                # Without tool_call_id we cannot construct a tool message. Fail fast.
-                raise ValueError(
-                    "incomplete tool call: "
-                    f"index={call.index} id={call.tool_call_id} name={call.name}"
+        results: list[Message] = []
+        for msg in slots:
+            if msg is None:
+                break
+            results.append(msg)
+        return results
+
+    def _deadline_message(self, call: ToolCallState) -> Message:
+        error = (
+            f"工具执行超时: 已超过本轮工具调用截止时间（{float(self.round_timeout_s or 0):g}秒）"
+        )
+        recorder = tool_trace_recorder_var.get(None)
+        if recorder is not None:
+            try:
+                started_at = float(time.perf_counter())
+                recorder.mark_start()
+                recorder.record_end(
+                    str(call.name), {}, started_at=started_at, output="", error=error
                 )
+            except Exception:
+                pass
+        return _tool_message(call, error)
 
-            recorder = tool_trace_recorder_var.get(None)
-            started_at = None
-            if recorder is not None:
-                try:
-                    started_at = float(time.perf_counter())
-                    recorder.mark_start()
-                except Exception:
-                    recorder = None
-                    started_at = None
+    def _run_one(
+        self, call: ToolCallState, timeout_s: float, abandoned: Event | None = None
+    ) -> Message:
+        recorder = tool_trace_recorder_var.get(None)
+        started_at = None
+        if recorder is not None:
+            try:
+                started_at = float(time.perf_counter())
+                recorder.mark_start()
+            except Exception:
+                recorder = None
+                started_at = None
 
-            trace_args: dict[str, Any] = {}
-            tool_error = ""
-            output = ""
+        trace_args: dict[str, Any] = {}
+        tool_error = ""
+        output = ""
+        try:
             try:
-                try:
-                    kwargs = _parse_tool_arguments(call.arguments_json)
-                    trace_args = dict(kwargs or {})
-                except Exception as exc:
-                    tool_error = f"工具参数解析失败: {type(exc).__name__}: {exc}"
-                    output = tool_error
-                else:
-                    output = self.tool_executor.execute_tool(
-                        call.name, timeout=effective_timeout, **kwargs
-                    )
+                kwargs = _parse_tool_arguments(call.arguments_json)
+                trace_args = dict(kwargs or {})
             except Exception as exc:
-                tool_error = f"工具执行失败: {type(exc).__name__}: {exc}"
+                tool_error = f"工具参数解析失败: {type(exc).__name__}: {exc}"
                 output = tool_error
-            finally:
-                if recorder is not None and started_at is not None:
-                    try:
+            else:
+                output = self.tool_executor.execute_tool(
+                    str(call.name), timeout=timeout_s, **kwargs
+                )
+        except Exception as exc:
+            tool_error = f"工具执行失败: {type(exc).__name__}: {exc}"
+            output = tool_error
+        finally:
+            if recorder is not None and started_at is not None:
+                try:
+                    if abandoned is not None and abandoned.is_set():
+                        # 已按截止/取消放弃：超时轨迹已记录，迟到结果不再写入
+                        recorder.discard_start()
+                    else:
                         recorder.record_end(
                             str(call.name),
                             trace_args,
@@ -104,16 +263,41 @@ class ToolRunner:
                             output=str(output) if not tool_error else "",
                             error=str(tool_error),
                         )
-                    except Exception:
-                        pass
-
-            results.append(
-                Message(
-                    role="tool",
-                    content=str(output),
-                    tool_call_id=str(call.tool_call_id),
-                    name=str(call.name),
-                )
-            )
+                except Exception:
+                    pass
 
-        return results
+        return _tool_message(call, str(output))
+
+
+def _ensure_complete(call: ToolCallState) -> None:
+    if not call.tool_call_id or not call.name:
+        # Without tool_call_id we cannot construct a tool message. Fail fast.
+        raise ValueError(
+            "incomplete tool call: " f"index={call.index} id={call.tool_call_id} name={call.name}"
+        )
+
+
+def _clamp_timeout(timeout_s: float, deadline: float | None) -> float | None:
+    """Per-call timeout bounded by the round deadline (`None` = deadline already passed)."""
+    if deadline is None:
+        return timeout_s
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        return None
+    return min(timeout_s, remaining)
+
+
+def _future_message(fut: Future[Message], call: ToolCallState) -> Message:
+    try:
+        return fut.result()
+    except Exception as exc:
+        return _tool_message(call, f"工具执行失败: {type(exc).__name__}: {exc}")
+
+
+def _tool_message(call: ToolCallState, content: str) -> Message:
+    return Message(
+        role="tool",
+        content=str(content),
+        tool_call_id=str(call.tool_call_id),
+        name=str(call.name),
+    )
@@ -22,11 +22,15 @@ def tool(
     *,
     name: str | None = None,
     description: str | None = None,
+    parallel_safe: bool = True,
 ) -> Callable[..., Any]:
     """Lightweight tool decorator for native tool registry.
 
     This decorator does not depend on external agent frameworks. It attaches optional metadata
     (`name`/`description`) to the wrapped callable and returns the callable.
+
+    `parallel_safe=False` marks tools with side effects (file writes, notes, ...) so that
+    ToolRunner never runs them concurrently with other calls of the same round.
     """
 
     def decorator(inner: Callable[..., Any]) -> Callable[..., Any]:
@@ -34,6 +38,8 @@ def tool(
             setattr(inner, "name", str(name))
         if description:
             setattr(inner, "description", str(description))
+        if not parallel_safe:
+            setattr(inner, "parallel_safe", False)
         return inner
 
     if func is None:
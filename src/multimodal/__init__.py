@@ -27,6 +27,8 @@ __all__ = [
     "get_tts_manager",
     "AudioPlayer",
     "get_audio_player",
+    "StreamingTTSPipeline",
+    "TTSWarmer",
     "init_tts",
     "get_tts_manager_instance",
     "get_tts_config_instance",
@@ -75,6 +77,16 @@ def __getattr__(name: str) -> Any:  # pragma: no cover - 仅用于 import 懒加
 
         return AudioPlayer if name == "AudioPlayer" else get_audio_player
 
+    if name == "StreamingTTSPipeline":
+        from .tts_pipeline import StreamingTTSPipeline
+
+        return StreamingTTSPipeline
+
+    if name == "TTSWarmer":
+        from .tts_warmer import TTSWarmer
+
+        return TTSWarmer
+
     if name in {
         "init_tts",
         "get_tts_manager_instance",
@@ -12,7 +12,7 @@ import threading
 import time
 from collections import deque
 from pathlib import Path
-from typing import Callable, Optional, Deque, Tuple
+from typing import Callable, Optional, Deque, Tuple, Union
 
 # 使用 sounddevice 作为播放器
 try:
@@ -25,9 +25,112 @@ except Exception as e:
     _has_sounddevice = False
     _sounddevice_error = e
 
+from src.multimodal.pcm_stream import SAMPLE_WIDTH, IncrementalEnvelope, PcmChunk, PcmRingBuffer
 from src.utils.logger import logger
 
 
+class AudioStreamWriter:
+    """
+    流式播放句柄（由 ``AudioPlayer.open_stream`` 返回）
+
+    写入方（网络协程）调用 ``write`` 推入 PCM，``close`` 表示写完，``abort`` 放弃播放。
+    采样率可在首个 ``PcmChunk`` 到达时再确定；播放线程在缓冲达到 pre-roll 后才打开输出流。
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[int],
+        channels: int,
+        volume: float,
+        preroll_ms: float,
+        on_envelope: Callable[["AudioStreamWriter"], None],
+    ) -> None:
+        self.sample_rate: Optional[int] = None
+        self.channels = max(1, int(channels))
+        self.volume = float(volume)
+        self.preroll_ms = max(0.0, float(preroll_ms))
+        self.underruns = 0
+        self.started_at: Optional[float] = None
+        self.buffer = PcmRingBuffer(1 << 16)
+        self.done = threading.Event()
+        self._preroll_bytes = 0
+        self._envelope: Optional[IncrementalEnvelope] = None
+        self._env_values: list[float] = []
+        self._env_lock = threading.Lock()
+        self._on_envelope = on_envelope
+        if sample_rate:
+            self._set_format(int(sample_rate), self.channels)
+
+    @property
+    def frame_bytes(self) -> int:
+        return SAMPLE_WIDTH * self.channels
+
+    def _set_format(self, sample_rate: int, channels: int) -> None:
+        self.sample_rate = sample_rate
+        self.channels = max(1, int(channels))
+        self._preroll_bytes = max(
+            self.frame_bytes, int(sample_rate * self.preroll_ms / 1000.0) * self.frame_bytes
+        )
+        self._envelope = IncrementalEnvelope(sample_rate, self.channels, fps=60)
+
+    def write(self, pcm: Union[PcmChunk, bytes]) -> None:
+        """推入一段 int16 PCM（``PcmChunk`` 或与打开时格式一致的 bytes）。"""
+        if isinstance(pcm, PcmChunk):
+            if self.sample_rate is None:
+                self._set_format(pcm.sample_rate, pcm.channels)
+            data = pcm.data
+        else:
+            if self.sample_rate is None:
+                raise ValueError("未指定采样率时只能写入 PcmChunk")
+            data = bytes(pcm)
+        if not data or self.buffer.closed:
+            return
+
+        # 口型包络按块增量计算：播放开始后每块到达都会刷新一次观察者
+        try:
+            values, _ = self._envelope.push(data)  # type: ignore[union-attr]
+        except Exception:
+            values = []
+        if values:
+            with self._env_lock:
+                self._env_values.extend(values)
+        self.buffer.write(data)
+        if values and self.started_at is not None:
+            self._on_envelope(self)
+
+    def close(self) -> None:
+        """写入结束：缓冲中的音频播放完毕后输出流自动关闭。"""
+        self.buffer.close()
+
+    def abort(self) -> None:
+        """放弃剩余音频（未开始的流直接跳过）。"""
+        self.buffer.abort()
+        self.done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待播放结束（或被放弃）。"""
+        return self.done.wait(timeout)
+
+    def envelope(self) -> Tuple[list[float], float]:
+        step_s = self._envelope.step_s if self._envelope is not None else 1.0 / 60.0
+        with self._env_lock:
+            return list(self._env_values), step_s
+
+    def wait_ready(self, timeout: float) -> bool:
+        """等待缓冲达到 pre-roll（或写入结束）；超时/被放弃返回 False。"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            target = self._preroll_bytes if self.sample_rate else 1
+            ready = self.buffer.wait_for(target, remaining)
+            if self.buffer.closed:
+                return ready
+            if self.sample_rate and self.buffer.available >= self._preroll_bytes:
+                return True
+
+
 class AudioPlayer:
     """
     音频播放器
@@ -39,6 +142,8 @@ class AudioPlayer:
         self,
         default_volume: float = 0.8,
         max_queue_size: int = 0,
+        stream_preroll_ms: float = 120.0,
+        stream_start_timeout: float = 30.0,
     ) -> None:
         """
         初始化音频播放器
@@ -46,18 +151,23 @@ class AudioPlayer:
         Args:
             default_volume: 默认音量（0.0-1.0）
             max_queue_size: 播放队列上限，0 表示不限制
+            stream_preroll_ms: 流式播放开始前至少缓冲的音频时长（毫秒）
+            stream_start_timeout: 流式播放等待 pre-roll 的最长时间（秒），超时则跳过该段
         """
         self._volume: float = max(0.0, min(1.0, float(default_volume)))
         self._is_playing: bool = False
         # 播放队列：避免在 UI/调用线程做 WAV 解码，统一在 worker 线程解码/播放
-        # item = (wav_bytes, volume_snapshot)
-        self._queue: Deque[Tuple[bytes, float]] = deque()
+        # item = (wav_bytes | AudioStreamWriter, volume_snapshot)
+        self._queue: Deque[Tuple[Union[bytes, AudioStreamWriter], float]] = deque()
         self._queue_lock = threading.Lock()
         self._queue_event = threading.Event()
         self._stop_event = threading.Event()
         self._worker: Optional[threading.Thread] = None
         self._max_queue_size = max(0, int(max_queue_size))
         self._on_playback_start: list[Callable[[list[float], float, float], None]] = []
+        self._stream_preroll_ms = max(0.0, float(stream_preroll_ms))
+        self._stream_start_timeout = max(0.1, float(stream_start_timeout))
+        self._current_stream: Optional[AudioStreamWriter] = None
 
         if not _has_sounddevice:
             logger.warning("sounddevice 未安装，音频播放功能不可用")
@@ -87,6 +197,10 @@ class AudioPlayer:
                         break
                     audio_bytes, volume_snapshot = self._queue.popleft()
 
+                if isinstance(audio_bytes, AudioStreamWriter):
+                    self._play_stream(audio_bytes)
+                    continue
+
                 try:
                     # 解码 WAV（在 worker 线程，避免阻塞 UI）
                     try:
@@ -132,6 +246,99 @@ class AudioPlayer:
         except Exception:
             pass
 
+    def _play_stream(self, writer: AudioStreamWriter) -> None:
+        """播放一个流式句柄：等待 pre-roll 后由 OutputStream 回调从环形缓冲取数。"""
+        try:
+            if not writer.wait_ready(self._stream_start_timeout):
+                if not writer.buffer.aborted:
+                    logger.warning("流式音频等待 pre-roll 超时，跳过该段")
+                writer.abort()
+                return
+
+            import numpy as np  # type: ignore[import-not-found]
+
+            channels = writer.channels
+            frame_bytes = writer.frame_bytes
+            finished = threading.Event()
+
+            def _callback(outdata, frames, _time_info, _status) -> None:  # noqa: ANN001
+                pcm = writer.buffer.read(frames * frame_bytes)
+                n = len(pcm) // frame_bytes
+                if n:
+                    block = np.frombuffer(pcm, dtype="<i2").reshape(n, channels)
+                    outdata[:n] = block.astype(np.float32) * (writer.volume / 32768.0)
+                if n < frames:
+                    outdata[n:] = 0
+                    if writer.buffer.closed:
+                        raise sd.CallbackStop()
+                    # 数据未跟上（网络/合成慢于实时），以静音填充
+                    writer.underruns += 1
+
+            self._current_stream = writer
+            stream = sd.OutputStream(
+                samplerate=writer.sample_rate,
+                channels=channels,
+                dtype="float32",
+                callback=_callback,
+                finished_callback=finished.set,
+            )
+            with stream:
+                writer.started_at = time.monotonic()
+                self._is_playing = True
+                self._emit_stream_envelope(writer)
+                while not finished.wait(0.05):
+                    if self._stop_event.is_set() or writer.buffer.aborted:
+                        stream.abort()
+                        break
+            if writer.underruns:
+                logger.debug("流式播放欠载 %d 次", writer.underruns)
+        except Exception as e:
+            logger.error(f"流式播放音频失败: {e}", exc_info=True)
+            writer.abort()
+        finally:
+            self._current_stream = None
+            self._is_playing = False
+            writer.done.set()
+
+    def _emit_stream_envelope(self, writer: AudioStreamWriter) -> None:
+        # 每次都发送从流开始累计的包络（起点不变），观察者直接替换即可连续驱动口型
+        if writer.started_at is None:
+            return
+        envelope, step_s = writer.envelope()
+        if envelope:
+            self._emit_playback_start(envelope, step_s, writer.started_at)
+
+    def open_stream(
+        self,
+        sample_rate: Optional[int] = None,
+        channels: int = 1,
+        *,
+        preroll_ms: Optional[float] = None,
+    ) -> Optional[AudioStreamWriter]:
+        """
+        打开一个流式播放句柄，并按顺序排入播放队列（与 ``play_audio`` 的 WAV 段共享顺序）
+
+        Args:
+            sample_rate: 采样率；为 None 时以首个写入的 ``PcmChunk`` 为准
+            channels: 声道数
+            preroll_ms: 开始播放前的缓冲时长（默认使用构造参数）
+
+        Returns:
+            AudioStreamWriter: 写入句柄；sounddevice 不可用时返回 None
+        """
+        if not _has_sounddevice:
+            return None
+        writer = AudioStreamWriter(
+            sample_rate,
+            channels,
+            float(self._volume),
+            self._stream_preroll_ms if preroll_ms is None else preroll_ms,
+            self._emit_stream_envelope,
+        )
+        queue_len = self._enqueue_audio(writer, writer.volume)
+        logger.debug("流式音频加入播放队列: 队列长度=%d", queue_len)
+        return writer
+
     def register_playback_start_observer(
         self, callback: Callable[[list[float], float, float], None]
     ) -> None:
@@ -219,14 +426,16 @@ class AudioPlayer:
         except Exception:
             return ([], step_s)
 
-    def _enqueue_audio(self, audio_bytes: bytes, volume_snapshot: float) -> int:
-        """将 WAV bytes 推入播放队列（worker 线程内解码/播放）。"""
+    def _enqueue_audio(
+        self, audio_bytes: Union[bytes, AudioStreamWriter], volume_snapshot: float
+    ) -> int:
+        """将 WAV bytes / 流式句柄推入播放队列（worker 线程内解码/播放）。"""
         with self._queue_lock:
             self._queue.append((audio_bytes, float(volume_snapshot)))
             if self._max_queue_size and len(self._queue) > self._max_queue_size:
                 overflow = len(self._queue) - self._max_queue_size
                 for _ in range(overflow):
-                    self._queue.popleft()
+                    self._discard_locked(self._queue.popleft()[0])
                 logger.debug("音频队列达到上限，丢弃最旧的 %d 段音频以保持顺序", overflow)
             self._queue_event.set()
             return len(self._queue)
@@ -238,15 +447,23 @@ class AudioPlayer:
             if self._max_queue_size and len(self._queue) > self._max_queue_size:
                 overflow = len(self._queue) - self._max_queue_size
                 for _ in range(overflow):
-                    self._queue.popleft()
+                    self._discard_locked(self._queue.popleft()[0])
                 logger.debug("调整音频队列上限，立即丢弃最旧的 %d 段音频", overflow)
 
     def clear_queue(self) -> None:
         """清空待播放队列。"""
         with self._queue_lock:
+            for item, _ in self._queue:
+                self._discard_locked(item)
             self._queue.clear()
             self._queue_event.clear()
 
+    @staticmethod
+    def _discard_locked(item: Union[bytes, AudioStreamWriter]) -> None:
+        # 被丢弃的流式句柄需要通知写入方，避免其继续缓冲
+        if isinstance(item, AudioStreamWriter):
+            item.abort()
+
     def _play_with_sounddevice(self, audio_data: bytes) -> bool:
         """
         使用 sounddevice 播放音频数据
@@ -313,6 +530,9 @@ class AudioPlayer:
     def stop(self) -> None:
         """停止播放"""
         if _has_sounddevice:
+            stream = self._current_stream
+            if stream is not None:
+                stream.abort()
             try:
                 sd.stop()
                 self._is_playing = False
@@ -11,13 +11,18 @@ GPT-SoVITS TTS 客户端模块
 import asyncio
 import threading
 import time
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
 
 import httpx
 
+from src.multimodal.pcm_stream import PcmChunk, WavStreamDecoder
 from src.utils.logger import logger
 
 
+class StreamInterruptedError(RuntimeError):
+    """流式合成在已产出部分音频后中断（音频不完整，调用方不应缓存）。"""
+
+
 class GPTSoVITSClient:
     """
     GPT-SoVITS TTS API 客户端
@@ -463,6 +468,140 @@ class GPTSoVITSClient:
         )
         return None
 
+    async def synthesize_stream(
+        self,
+        text: str,
+        ref_audio_path: str,
+        ref_text: str,
+        text_lang: str = "zh",
+        prompt_lang: str = "zh",
+        top_k: int = 5,
+        top_p: float = 1.0,
+        temperature: float = 1.0,
+        speed_factor: float = 1.0,
+        **kwargs: Any,
+    ) -> AsyncIterator[PcmChunk]:
+        """
+        流式语音合成：边接收边产出 PCM 块（GPT-SoVITS ``streaming_mode``）
+
+        与 ``synthesize`` 共用熔断器、统计与连接池。仅在尚未产出任何数据前重试；
+        一旦开始产出，中途失败不再重试（已播放的部分无法撤回），而是抛出
+        ``StreamInterruptedError`` 告知调用方音频不完整。
+
+        Args:
+            与 ``synthesize`` 相同；``media_type`` 默认 ``wav``（``raw`` 需同时传入
+            ``sample_rate``，单位 Hz）
+
+        Yields:
+            PcmChunk: int16 PCM（按帧对齐）
+        """
+        if not text or not text.strip():
+            logger.debug("TTS 流式合成跳过：文本为空")
+            return
+        text = text.strip()
+
+        with self._stats_lock:
+            self._stats["total_requests"] += 1
+            self._stats["stream_requests"] = self._stats.get("stream_requests", 0) + 1
+        start_time = time.time()
+
+        if await self._is_circuit_open():
+            with self._stats_lock:
+                self._stats["failed_requests"] += 1
+                self._stats["circuit_short_circuits"] += 1
+            logger.warning("TTS 客户端熔断中，跳过流式文本: %s", text[:30])
+            return
+
+        raw_sample_rate = kwargs.pop("sample_rate", None)
+        data: Dict[str, Any] = {
+            "text": text,
+            "text_lang": text_lang,
+            "ref_audio_path": ref_audio_path,
+            "prompt_text": ref_text,
+            "prompt_lang": prompt_lang,
+            "top_k": top_k,
+            "top_p": top_p,
+            "temperature": temperature,
+            "speed_factor": speed_factor,
+            "media_type": "wav",
+        }
+        data.update(kwargs)
+        data["streaming_mode"] = True
+        if data["media_type"] == "raw" and not raw_sample_rate:
+            raise ValueError("media_type=raw 时需要提供 sample_rate")
+
+        failure_reason: Optional[str] = None
+        last_error: Optional[BaseException] = None
+        yielded = False
+        for attempt in range(self.max_retries):
+            decoder = WavStreamDecoder(
+                raw_sample_rate=int(raw_sample_rate) if data["media_type"] == "raw" else None
+            )
+            try:
+                client = await self._get_client()
+                async with client.stream(
+                    "POST", self.api_url, json=data, timeout=self._timeout
+                ) as response:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        failure_reason = f"HTTP {response.status_code}"
+                        if body:
+                            logger.debug("TTS 流式响应: %s", body[:200])
+                        if response.status_code < 500:
+                            break
+                        raise httpx.HTTPStatusError(
+                            failure_reason, request=response.request, response=response
+                        )
+
+                    async for raw in response.aiter_bytes():
+                        chunk = decoder.feed(raw)
+                        if chunk is None:
+                            continue
+                        if not yielded:
+                            first_ms = (time.time() - start_time) * 1000.0
+                            with self._stats_lock:
+                                self._stats["last_first_chunk_ms"] = first_ms
+                        yielded = True
+                        yield chunk
+
+                if not yielded:
+                    failure_reason = "empty-response"
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(2**attempt)
+                    continue
+
+                elapsed_ms = (time.time() - start_time) * 1000.0
+                with self._stats_lock:
+                    self._stats["successful_requests"] += 1
+                    self._stats["last_latency_ms"] = elapsed_ms
+                    self._stats["total_latency_ms"] += elapsed_ms
+                await self._record_success()
+                return
+
+            except (httpx.HTTPError, ValueError) as e:
+                failure_reason = f"{type(e).__name__}: {str(e)[:100]}"
+                last_error = e
+                if isinstance(e, (httpx.ConnectError, httpx.WriteError)):
+                    await self._safe_close_client()
+                if yielded:
+                    # 已经开始播放：不重试，避免重复朗读
+                    break
+                with self._stats_lock:
+                    self._stats["total_retries"] += 1
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(2**attempt)
+
+        with self._stats_lock:
+            self._stats["failed_requests"] += 1
+        await self._record_failure()
+        logger.error(
+            "TTS 流式合成失败%s: %s",
+            "（已输出部分音频）" if yielded else f"（已重试 {self.max_retries} 次）",
+            failure_reason or "未知错误",
+        )
+        if yielded:
+            raise StreamInterruptedError(failure_reason or "stream interrupted") from last_error
+
     async def check_health(self) -> bool:
         """
         检查 GPT-SoVITS 服务是否可用
@@ -0,0 +1,242 @@
+"""
+流式 PCM 音频工具
+
+GPT-SoVITS 流式模式（``streaming_mode=true``）先返回一个 WAV 头（长度字段通常无效），
+随后持续推送 int16 PCM 块。本模块提供：
+- ``WavStreamDecoder``：增量解析 WAV 头，输出按帧对齐的 ``PcmChunk``
+- ``PcmRingBuffer``：写入方（网络协程）与 sounddevice 回调之间的环形缓冲
+- ``IncrementalEnvelope``：按块增量计算口型包络（无需等待整段音频）
+"""
+
+from __future__ import annotations
+
+import struct
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+SAMPLE_WIDTH = 2  # int16
+
+
+@dataclass(frozen=True, slots=True)
+class PcmChunk:
+    """一段 int16 小端 PCM（按帧对齐）。"""
+
+    data: bytes
+    sample_rate: int
+    channels: int = 1
+
+    @property
+    def frames(self) -> int:
+        return len(self.data) // (SAMPLE_WIDTH * self.channels)
+
+    @property
+    def duration_s(self) -> float:
+        return self.frames / float(self.sample_rate) if self.sample_rate > 0 else 0.0
+
+
+class WavStreamDecoder:
+    """
+    增量 WAV 解码（仅支持 16-bit PCM）
+
+    ``feed()`` 可接收任意切分的字节块；头部未收齐前不输出，之后输出按帧对齐的 PCM，
+    不足一帧的尾字节留到下一次。``raw_sample_rate`` 非空时按裸 PCM（无 WAV 头）处理。
+    """
+
+    def __init__(self, *, raw_sample_rate: Optional[int] = None, raw_channels: int = 1) -> None:
+        self._buffer = bytearray()
+        self.sample_rate: Optional[int] = raw_sample_rate
+        self.channels: int = raw_channels
+        self._in_data = raw_sample_rate is not None
+
+    @property
+    def header_parsed(self) -> bool:
+        return self._in_data
+
+    def feed(self, data: bytes) -> Optional[PcmChunk]:
+        if data:
+            self._buffer.extend(data)
+        if not self._in_data and not self._parse_header():
+            return None
+        frame_bytes = SAMPLE_WIDTH * self.channels
+        usable = len(self._buffer) - (len(self._buffer) % frame_bytes)
+        if usable <= 0:
+            return None
+        pcm = bytes(self._buffer[:usable])
+        del self._buffer[:usable]
+        return PcmChunk(pcm, int(self.sample_rate or 0), self.channels)
+
+    def _parse_header(self) -> bool:
+        buf = self._buffer
+        if len(buf) < 12:
+            return False
+        if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+            raise ValueError("不是 WAV 数据（缺少 RIFF/WAVE 头）")
+        pos = 12
+        while len(buf) >= pos + 8:
+            chunk_id = bytes(buf[pos : pos + 4])
+            (size,) = struct.unpack("<I", buf[pos + 4 : pos + 8])
+            body = pos + 8
+            if chunk_id == b"data":
+                # 流式响应的 data 长度字段不可信：其后全部视为 PCM
+                if self.sample_rate is None:
+                    raise ValueError("WAV 头缺少 fmt 块")
+                del buf[:body]
+                self._in_data = True
+                return True
+            if len(buf) < body + size:
+                return False
+            if chunk_id == b"fmt ":
+                fmt_tag, channels, rate, _, _, bits = struct.unpack(
+                    "<HHIIHH", buf[body : body + 16]
+                )
+                if fmt_tag not in (1, 0xFFFE) or bits != 16:
+                    raise ValueError(f"仅支持 16-bit PCM WAV（format={fmt_tag}, bits={bits}）")
+                self.sample_rate = int(rate)
+                self.channels = max(1, int(channels))
+            pos = body + size + (size & 1)
+        return False
+
+
+class PcmRingBuffer:
+    """
+    单生产者 / 单消费者 PCM 环形缓冲（线程安全）
+
+    写入方不会阻塞：容量不足时扩容（一句话的音频远小于默认容量，扩容只是兜底）。
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._buf = bytearray(max(1024, int(capacity)))
+        self._read = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._aborted = False
+        self._data_event = threading.Condition(self._lock)
+
+    @property
+    def available(self) -> int:
+        with self._lock:
+            return self._size
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        with self._lock:
+            if self._closed or self._aborted:
+                return
+            needed = self._size + len(data)
+            if needed > len(self._buf):
+                self._grow_locked(max(needed, len(self._buf) * 2))
+            cap = len(self._buf)
+            start = (self._read + self._size) % cap
+            first = min(len(data), cap - start)
+            self._buf[start : start + first] = data[:first]
+            if first < len(data):
+                self._buf[: len(data) - first] = data[first:]
+            self._size += len(data)
+            self._data_event.notify_all()
+
+    def read(self, size: int) -> bytes:
+        """读取至多 size 字节（不阻塞；数据不足时返回较短结果）。"""
+        with self._lock:
+            n = min(int(size), self._size)
+            if n <= 0:
+                return b""
+            cap = len(self._buf)
+            first = min(n, cap - self._read)
+            out = bytes(self._buf[self._read : self._read + first])
+            if first < n:
+                out += bytes(self._buf[: n - first])
+            self._read = (self._read + n) % cap
+            self._size -= n
+            return out
+
+    def close(self) -> None:
+        """写入结束（已缓冲的数据仍可读完）。"""
+        with self._lock:
+            self._closed = True
+            self._data_event.notify_all()
+
+    def abort(self) -> None:
+        """丢弃剩余数据并结束。"""
+        with self._lock:
+            self._aborted = True
+            self._closed = True
+            self._size = 0
+            self._data_event.notify_all()
+
+    def wait_for(self, size: int, timeout: Optional[float] = None) -> bool:
+        """等待缓冲达到 size 字节或写入结束；返回是否有数据可播。"""
+        with self._lock:
+            self._data_event.wait_for(lambda: self._size >= size or self._closed, timeout)
+            return self._size > 0 and not self._aborted
+
+    def _grow_locked(self, capacity: int) -> None:
+        data = bytearray(capacity)
+        cap = len(self._buf)
+        first = min(self._size, cap - self._read)
+        data[:first] = self._buf[self._read : self._read + first]
+        if first < self._size:
+            data[first : self._size] = self._buf[: self._size - first]
+        self._buf = data
+        self._read = 0
+
+
+class IncrementalEnvelope:
+    """
+    按块增量计算 RMS 口型包络（0-1）
+
+    与整段计算的区别：归一化使用缓慢衰减的峰值，而不是整段的 95 分位数，
+    因此每个网络块到达即可输出对应的包络值。
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, *, fps: int = 60) -> None:
+        self.sample_rate = max(1, int(sample_rate))
+        self.channels = max(1, int(channels))
+        self.step = max(1, int(self.sample_rate / float(max(1, int(fps)))))
+        self.step_s = self.step / float(self.sample_rate)
+        self._pending = None
+        self._emitted_frames = 0
+        self._peak = 0.05
+        self._decay = 0.995
+
+    def push(self, pcm: bytes) -> Tuple[List[float], int]:
+        """
+        喂入 PCM，返回 (新包络值, 这些值覆盖的起始帧偏移)
+
+        起始帧偏移相对于本对象收到的第一帧，用于换算播放时间。
+        """
+        import numpy as np
+
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        if self._pending is not None and self._pending.size:
+            samples = np.concatenate([self._pending, samples])
+        offset = self._emitted_frames
+        blocks = samples.size // self.step
+        if blocks <= 0:
+            self._pending = samples
+            return [], offset
+        frames = samples[: blocks * self.step].reshape(blocks, self.step)
+        self._pending = samples[blocks * self.step :]
+        rms = np.sqrt(np.mean(np.square(frames), axis=1))
+
+        values: List[float] = []
+        for level in rms.tolist():
+            self._peak = max(level, self._peak * self._decay, 0.02)
+            values.append(float(min(1.0, level / self._peak) ** 0.65))
+        self._emitted_frames = offset + blocks * self.step
+        return values, offset
+
+
+__all__ = ["IncrementalEnvelope", "PcmChunk", "PcmRingBuffer", "WavStreamDecoder"]
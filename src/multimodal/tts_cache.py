@@ -21,7 +21,7 @@ import threading
 import time
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, Iterable, Optional
 
 from src.utils.logger import logger
 
@@ -38,6 +38,7 @@ class CacheEntry:
     compressed: bool = True
     disk_size: int = 0
     expires_at: Optional[float] = None
+    pinned: bool = False
 
 
 class PersistentTTSAudioCache:
@@ -122,6 +123,7 @@ class PersistentTTSAudioCache:
                     compressed=payload.get("compressed", True),
                     disk_size=disk_size,
                     expires_at=expires_at,
+                    pinned=bool(payload.get("pinned", False)),
                 )
                 if self._is_expired(entry):
                     self._remove_entry(file_path, entry)
@@ -231,12 +233,14 @@ class PersistentTTSAudioCache:
             self._stats["hits"] += 1
             return data
 
-    def set(self, key: str, audio_data: bytes) -> None:
-        """写入缓存"""
+    def set(self, key: str, audio_data: bytes, *, pinned: bool = False) -> None:
+        """写入缓存（pinned=True 的条目不参与 LRU 淘汰）"""
         if not audio_data:
             return
 
         with self._lock:
+            previous = self._entries.get(key)
+            pinned = pinned or bool(previous and previous.pinned)
             self._evict_if_needed()
 
             filename = f"{key}.bin"
@@ -270,12 +274,37 @@ class PersistentTTSAudioCache:
                 compressed=self.compress,
                 disk_size=disk_size,
                 expires_at=self._compute_expiry(),
+                pinned=pinned,
             )
+            if previous is not None:
+                self._disk_usage = max(0, self._disk_usage - previous.disk_size)
             self._entries[key] = entry
             self._disk_usage += disk_size
             # 立即保存索引，避免数据丢失
             self._save_index()
 
+    def pin(self, key: str, pinned: bool = True) -> bool:
+        """设置/取消常驻标记；条目不存在时返回 False。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                return False
+            if entry.pinned != pinned:
+                entry.pinned = pinned
+                self._save_index()
+            return True
+
+    def unpin_except(self, keep: Iterable[str]) -> int:
+        """取消 ``keep`` 之外所有条目的常驻标记，返回取消的条数。"""
+        keep_keys = set(keep)
+        with self._lock:
+            stale = [e for k, e in self._entries.items() if e.pinned and k not in keep_keys]
+            for entry in stale:
+                entry.pinned = False
+            if stale:
+                self._save_index()
+            return len(stale)
+
     def clear(self) -> None:
         """清空缓存"""
         with self._lock:
@@ -303,6 +332,7 @@ class PersistentTTSAudioCache:
                 "disk_usage": total_size,
                 "disk_usage_bytes": self._disk_usage,
                 "compress": self.compress,
+                "pinned": sum(1 for entry in self._entries.values() if entry.pinned),
                 **self._stats,
             }
 
@@ -320,7 +350,10 @@ class PersistentTTSAudioCache:
     def _cull(self, remove_count: int) -> None:
         if remove_count <= 0:
             return
-        sorted_entries = sorted(self._entries.values(), key=lambda item: item.timestamp)
+        sorted_entries = sorted(
+            (entry for entry in self._entries.values() if not entry.pinned),
+            key=lambda item: item.timestamp,
+        )
         for entry in sorted_entries[:remove_count]:
             file_path = self.audio_dir / entry.filename
             self._remove_entry(file_path, entry)
@@ -331,7 +364,10 @@ class PersistentTTSAudioCache:
     def _cull_bytes(self, excess_bytes: int) -> None:
         if excess_bytes <= 0:
             return
-        sorted_entries = sorted(self._entries.values(), key=lambda item: item.timestamp)
+        sorted_entries = sorted(
+            (entry for entry in self._entries.values() if not entry.pinned),
+            key=lambda item: item.timestamp,
+        )
         removed = 0
         for entry in sorted_entries:
             if removed >= excess_bytes:
@@ -362,4 +398,27 @@ class PersistentTTSAudioCache:
         return self._now() + self.ttl_seconds
 
 
-__all__ = ["PersistentTTSAudioCache", "CacheEntry"]
+def create_tts_disk_cache(
+    root_dir: Path | str,
+    *,
+    backend: str = "segment",
+    codec: Optional[str] = None,
+    **kwargs: object,
+):
+    """
+    按后端名称创建磁盘缓存
+
+    Args:
+        root_dir: 缓存目录
+        backend: ``segment``（SQLite 索引 + 段文件，默认）/ ``json``（旧版 JSON 索引 + 单文件）
+        codec: 仅 segment 后端：raw/gzip/flac/opus，None 时按 compress 选择 gzip/raw
+        **kwargs: 透传给缓存构造函数（max_entries、max_disk_usage_bytes、compress、ttl_seconds 等）
+    """
+    if backend == "json":
+        return PersistentTTSAudioCache(root_dir, **kwargs)  # type: ignore[arg-type]
+    from src.multimodal.tts_segment_cache import SegmentedTTSAudioCache
+
+    return SegmentedTTSAudioCache(root_dir, codec=codec, **kwargs)  # type: ignore[arg-type]
+
+
+__all__ = ["PersistentTTSAudioCache", "CacheEntry", "create_tts_disk_cache"]
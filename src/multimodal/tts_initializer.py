@@ -122,8 +122,16 @@ def init_tts() -> bool:
             disk_cache_compress=settings.tts.disk_cache_compress,
             disk_cache_max_bytes=settings.tts.disk_cache_max_bytes,
             disk_cache_ttl_seconds=settings.tts.disk_cache_ttl_seconds,
+            disk_cache_backend=settings.tts.disk_cache_backend,
+            disk_cache_codec=settings.tts.disk_cache_codec,
             max_parallel_requests=settings.tts.max_parallel_requests,
             paragraph_min_sentence_length=settings.tts.paragraph_min_sentence_length,
+            stream_lookahead=settings.tts.stream_lookahead,
+            stream_audio_enabled=settings.tts.stream_audio_enabled,
+            stream_preroll_ms=settings.tts.stream_preroll_ms,
+            warm_cache_enabled=settings.tts.warm_cache_enabled,
+            warm_cache_max_phrases=settings.tts.warm_cache_max_phrases,
+            warm_cache_idle_s=settings.tts.warm_cache_idle_s,
             client_max_retries=settings.tts.client_max_retries,
             request_timeout=settings.tts.request_timeout,
             connect_timeout=settings.tts.connect_timeout,
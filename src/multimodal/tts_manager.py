@@ -12,15 +12,20 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import io
 import json
 import re
 import threading
+import time
+import wave
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Sequence
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
-from src.multimodal.gpt_sovits_client import GPTSoVITSClient
-from src.multimodal.tts_cache import PersistentTTSAudioCache
+from src.multimodal.gpt_sovits_client import GPTSoVITSClient, StreamInterruptedError
+from src.multimodal.pcm_stream import PcmChunk, WavStreamDecoder
+from src.multimodal.tts_cache import create_tts_disk_cache
 from src.utils.stream_processor import StreamProcessor
 from src.utils.logger import logger
 
@@ -49,8 +54,16 @@ class TTSConfig:
     disk_cache_max_bytes: int = 0
     disk_cache_compress: bool = True
     disk_cache_ttl_seconds: float = 0.0
+    disk_cache_backend: str = "segment"  # segment（SQLite 索引 + 段文件）/ json（旧版）
+    disk_cache_codec: str = "auto"  # auto（按 disk_cache_compress）/ raw / gzip / flac / opus
     max_parallel_requests: int = 2
     paragraph_min_sentence_length: int = 8
+    stream_lookahead: int = 2  # 流式合成预取句数（StreamingTTSPipeline）
+    stream_audio_enabled: bool = False  # 流式接收 PCM 并边收边播（需 GPT-SoVITS streaming_mode）
+    stream_preroll_ms: int = 120  # 流式播放开始前的缓冲时长
+    warm_cache_enabled: bool = True  # 空闲时预合成高频句并常驻缓存（TTSWarmer）
+    warm_cache_max_phrases: int = 48
+    warm_cache_idle_s: float = 3.0
     client_max_retries: int = 3
     request_timeout: float = 30.0
     connect_timeout: float = 10.0
@@ -122,11 +135,14 @@ class TTSManager:
         self._cache_max_size: int = config.cache_max_size
 
         # 磁盘缓存
-        self._disk_cache: Optional[PersistentTTSAudioCache] = None
+        self._disk_cache: Optional[Any] = None
         if config.disk_cache_enabled:
             cache_dir = Path(config.disk_cache_dir).expanduser()
-            self._disk_cache = PersistentTTSAudioCache(
-                root_dir=cache_dir,
+            codec = getattr(config, "disk_cache_codec", "auto")
+            self._disk_cache = create_tts_disk_cache(
+                cache_dir,
+                backend=getattr(config, "disk_cache_backend", "segment"),
+                codec=None if codec == "auto" else codec,
                 max_entries=config.disk_cache_max_items,
                 max_disk_usage_bytes=(config.disk_cache_max_bytes or None),
                 compress=config.disk_cache_compress,
@@ -152,6 +168,12 @@ class TTSManager:
         self._cache_thread_lock = threading.Lock()  # 内存缓存线程安全锁（同步）
         self._parallel_semaphore = asyncio.Semaphore(max(1, int(config.max_parallel_requests)))
 
+        # 本次运行中实际朗读过的句子（供 TTSWarmer 挑选高频句预热）与服务空闲判断
+        self._spoken: Counter[str] = Counter()
+        self._spoken_lock = threading.Lock()
+        self._active_requests = 0
+        self._last_request_at = 0.0
+
         logger.info(f"初始化 TTS 管理器: {config.api_url}")
         if self._cache_enabled:
             logger.info(f"TTS 缓存已启用 (最大 {self._cache_max_size} 条)")
@@ -338,29 +360,15 @@ class TTSManager:
         if profile.persona:
             params.setdefault("voice_name", profile.persona)
 
-    async def synthesize_text(
+    def _prepare_request(
         self,
         text: str,
-        ref_audio_path: Optional[str] = None,
-        ref_text: Optional[str] = None,
-        agent_profile: Optional[AgentSpeechProfile] = None,
-        **kwargs: Any,
-    ) -> Optional[bytes]:
-        """
-        合成单个文本（支持缓存）
-
-        Args:
-            text: 要合成的文本
-            ref_audio_path: 参考音频路径（可选，默认使用配置中的）
-            ref_text: 参考音频文本（可选，默认使用配置中的）
-            agent_profile: 智能体语音风格 / 情绪配置
-            **kwargs: 其他参数
-
-        Returns:
-            bytes: 合成的音频数据，失败返回 None
-        """
-        self._stats["total_synthesize"] += 1
-
+        ref_audio_path: Optional[str],
+        ref_text: Optional[str],
+        agent_profile: Optional[AgentSpeechProfile],
+        overrides: Dict[str, Any],
+    ) -> Optional[Tuple[str, str, str, Dict[str, Any], str]]:
+        """预处理文本并构建请求参数，返回 (文本, 参考音频, 参考文本, 参数, 缓存键)。"""
         # 预处理文本
         processed_text = self.preprocess_text(text)
 
@@ -386,7 +394,7 @@ class TTSManager:
             # 明确告知 GPT-SoVITS 不再二次切句，避免丢失文本
             "text_split_method": getattr(self.config, "text_split_method", "cut0"),
         }
-        params.update(kwargs)
+        params.update(overrides)
         self._apply_agent_profile(params, agent_profile)
 
         # 生成缓存键
@@ -396,6 +404,36 @@ class TTSManager:
             ref_text,
             **params,
         )
+        return processed_text, ref_audio_path, ref_text, params, cache_key
+
+    async def synthesize_text(
+        self,
+        text: str,
+        ref_audio_path: Optional[str] = None,
+        ref_text: Optional[str] = None,
+        agent_profile: Optional[AgentSpeechProfile] = None,
+        **kwargs: Any,
+    ) -> Optional[bytes]:
+        """
+        合成单个文本（支持缓存）
+
+        Args:
+            text: 要合成的文本
+            ref_audio_path: 参考音频路径（可选，默认使用配置中的）
+            ref_text: 参考音频文本（可选，默认使用配置中的）
+            agent_profile: 智能体语音风格 / 情绪配置
+            **kwargs: 其他参数
+
+        Returns:
+            bytes: 合成的音频数据，失败返回 None
+        """
+        self._stats["total_synthesize"] += 1
+
+        request = self._prepare_request(text, ref_audio_path, ref_text, agent_profile, kwargs)
+        if request is None:
+            return None
+        processed_text, ref_audio_path, ref_text, params, cache_key = request
+        self._record_spoken(processed_text)
 
         # 尝试从缓存获取
         cached_audio = await self._get_from_cache(cache_key)
@@ -410,6 +448,65 @@ class TTSManager:
             params=params,
         )
 
+    async def stream_text(
+        self,
+        text: str,
+        ref_audio_path: Optional[str] = None,
+        ref_text: Optional[str] = None,
+        agent_profile: Optional[AgentSpeechProfile] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[PcmChunk]:
+        """
+        流式合成单个文本：边接收边产出 PCM 块
+
+        缓存命中时一次性产出整段；完整接收后拼成 WAV 写入缓存（与 ``synthesize_text`` 共用缓存键）。
+        服务端中途断开时已产出的部分照常返回，但不写入缓存。
+        """
+        self._stats["total_synthesize"] += 1
+        request = self._prepare_request(text, ref_audio_path, ref_text, agent_profile, kwargs)
+        if request is None:
+            return
+        processed_text, ref_audio_path, ref_text, params, cache_key = request
+        self._record_spoken(processed_text)
+
+        cached_audio = await self._get_from_cache(cache_key)
+        if cached_audio is not None:
+            chunk = WavStreamDecoder().feed(cached_audio)
+            if chunk is not None:
+                yield chunk
+            return
+
+        parts: List[bytes] = []
+        sample_rate = 0
+        channels = 1
+        complete = True
+        self._begin_request()
+        try:
+            async for chunk in self.client.synthesize_stream(
+                text=processed_text,
+                ref_audio_path=ref_audio_path,
+                ref_text=ref_text,
+                **params,
+            ):
+                sample_rate, channels = chunk.sample_rate, chunk.channels
+                parts.append(chunk.data)
+                yield chunk
+        except StreamInterruptedError as exc:
+            # 已输出的部分照常播放，但截断的音频不写入缓存
+            complete = False
+            logger.debug("流式 TTS 中途断开，不缓存: %s", exc)
+        finally:
+            self._end_request()
+
+        if complete and parts and sample_rate:
+            buf = io.BytesIO()
+            with wave.open(buf, "wb") as wav:
+                wav.setnchannels(channels)
+                wav.setsampwidth(2)
+                wav.setframerate(sample_rate)
+                wav.writeframes(b"".join(parts))
+            await self._add_to_cache(cache_key, buf.getvalue())
+
     async def synthesize_sentences(
         self,
         sentences: Sequence[str],
@@ -517,6 +614,105 @@ class TTSManager:
                 logger.debug(f"清空磁盘缓存失败: {e}")
         logger.info("TTS 缓存已清空")
 
+    async def warm_text(
+        self,
+        text: str,
+        agent_profile: Optional[AgentSpeechProfile] = None,
+        *,
+        pin: bool = True,
+    ) -> str:
+        """
+        预热单句：已在磁盘缓存中则只标记常驻，否则合成后写入缓存并标记常驻
+
+        与 ``synthesize_text`` 使用相同的缓存键（相同文本 + 语音参数即可命中），
+        但不计入朗读统计。
+
+        Returns:
+            str: ``cached`` / ``synthesized`` / ``failed`` / ``skipped``
+        """
+        request = self._prepare_request(text, None, None, agent_profile, {})
+        if request is None:
+            return "skipped"
+        processed_text, ref_audio_path, ref_text, params, cache_key = request
+
+        loop = asyncio.get_running_loop()
+        pin_entry = getattr(self._disk_cache, "pin", None) if pin else None
+        if callable(pin_entry) and await loop.run_in_executor(None, pin_entry, cache_key):
+            return "cached"
+
+        audio = await self._get_from_cache(cache_key)
+        status = "cached"
+        if audio is None:
+            audio = await self._synthesize_with_dedup(
+                cache_key=cache_key,
+                text=processed_text,
+                ref_audio_path=ref_audio_path,
+                ref_text=ref_text,
+                params=params,
+                background=True,
+            )
+            status = "synthesized"
+        if audio is None:
+            return "failed"
+        if callable(pin_entry):
+            # 内存命中但磁盘已淘汰时补写磁盘
+            if not await loop.run_in_executor(None, pin_entry, cache_key):
+                await self._add_to_cache(cache_key, audio)
+                await loop.run_in_executor(None, pin_entry, cache_key)
+        return status
+
+    async def retain_pinned(
+        self, texts: Sequence[str], agent_profile: Optional[AgentSpeechProfile] = None
+    ) -> int:
+        """
+        只保留 ``texts``（本轮预热计划）的常驻标记
+
+        上一轮计划中已不再出现的句子恢复参与 LRU 淘汰，避免常驻条目随预热次数无限累积。
+
+        Returns:
+            int: 取消常驻的条目数
+        """
+        unpin_except = getattr(self._disk_cache, "unpin_except", None)
+        if not callable(unpin_except):
+            return 0
+        keep: List[str] = []
+        for text in texts:
+            request = self._prepare_request(text, None, None, agent_profile, {})
+            if request is not None:
+                keep.append(request[4])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, unpin_except, keep)
+
+    def frequent_phrases(self, limit: int = 50, min_count: int = 2) -> List[Tuple[str, int]]:
+        """本次运行中朗读次数最多的句子（预处理后的文本）。"""
+        with self._spoken_lock:
+            return [
+                (text, count)
+                for text, count in self._spoken.most_common(max(0, int(limit)))
+                if count >= min_count
+            ]
+
+    def is_idle(self, grace_s: float = 3.0) -> bool:
+        """没有进行中的合成请求，且距上次请求结束已超过 grace_s 秒。"""
+        if self._active_requests > 0:
+            return False
+        return time.monotonic() - self._last_request_at >= max(0.0, float(grace_s))
+
+    def _record_spoken(self, text: str) -> None:
+        with self._spoken_lock:
+            self._spoken[text] += 1
+            if len(self._spoken) > 2048:
+                # 只保留高频部分，避免长时间运行无限增长
+                self._spoken = Counter(dict(self._spoken.most_common(1024)))
+
+    def _begin_request(self) -> None:
+        self._active_requests += 1
+        self._last_request_at = time.monotonic()
+
+    def _end_request(self) -> None:
+        self._active_requests = max(0, self._active_requests - 1)
+        self._last_request_at = time.monotonic()
+
     def get_stats(self) -> Dict[str, Any]:
         """
         获取统计信息（并发安全，支持同步和异步调用）
@@ -565,6 +761,7 @@ class TTSManager:
         ref_audio_path: str,
         ref_text: str,
         params: Dict[str, Any],
+        background: bool = False,
     ) -> Optional[bytes]:
         future, is_owner = await self._get_or_create_inflight(cache_key)
         if not is_owner:
@@ -575,6 +772,9 @@ class TTSManager:
                 # 如果其他请求失败，返回None，不抛出异常
                 return None
 
+        if not background:
+            # 预热请求不计入忙闲状态，否则每句预热都会推迟下一句
+            self._begin_request()
         try:
             audio_data = await self.client.synthesize(
                 text=text,
@@ -600,6 +800,8 @@ class TTSManager:
             # 客户端已经记录了错误日志，这里不需要重复记录
             return None
         finally:
+            if not background:
+                self._end_request()
             await self._release_inflight(cache_key, future)
 
     async def _get_or_create_inflight(self, cache_key: str) -> tuple[asyncio.Future, bool]:
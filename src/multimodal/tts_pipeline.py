@@ -0,0 +1,458 @@
+"""
+流式 TTS 流水线
+
+LLM 仍在输出时就开始合成：文本增量经 ``StreamProcessor.process_chunk`` 增量切句，
+每句一旦完整立即提交给 TTSManager（GPT-SoVITS），最多 ``lookahead`` 句并发合成；
+合成结果严格按句序交给 AudioPlayer。首段音频延迟约为"一句话"的生成 + 合成时间，而不是整段回复。
+
+指标（``stats()``）：
+- ``first_sentence_ms``：流水线开始 → 切出第一句
+- ``time_to_first_audio_ms``：流水线开始 → 第一段音频交给播放器
+- ``gaps_ms``：相邻两段之间的播放空档估计（上一段按 WAV 时长播完时，下一段仍未就绪的等待时间）
+
+流式音频模式（``TTSConfig.stream_audio_enabled``）：每句开始合成时即在播放器中按句序打开一个
+流式句柄（``AudioPlayer.open_stream``），``TTSManager.stream_text`` 收到的 PCM 块直接写入，
+播放器缓冲满 pre-roll 即开始出声；此时 ``time_to_first_audio_ms`` 记为首个 PCM 块到达的时间。
+
+用法::
+
+    pipeline = StreamingTTSPipeline(tts_manager, get_audio_player())
+    for chunk in pipeline.tee(agent.chat_stream(message)):
+        render(chunk)
+"""
+
+from __future__ import annotations
+
+import io
+import threading
+import time
+import wave
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from src.multimodal.tts_runtime import get_tts_runtime
+from src.utils.logger import logger
+from src.utils.stream_processor import StreamProcessor, StreamRetraction
+
+
+@dataclass(slots=True)
+class _Segment:
+    index: int
+    text: str
+    created: float
+    started: float = 0.0
+    audio: Optional[bytes] = None
+    done: bool = False
+    future: Optional[Future] = None
+    writer: Any = None
+    first_chunk_at: Optional[float] = None
+    end_offset: int = 0
+    dropped: bool = False
+
+
+def wav_duration_s(audio: bytes) -> float:
+    """读取 WAV 时长（秒）；非 WAV 或解析失败返回 0。"""
+    try:
+        with wave.open(io.BytesIO(audio), "rb") as wav:
+            rate = wav.getframerate()
+            return wav.getnframes() / float(rate) if rate > 0 else 0.0
+    except Exception:
+        return 0.0
+
+
+class StreamingTTSPipeline:
+    """
+    边生成边合成的 TTS 流水线（线程安全：feed/finish 可在任意线程调用）
+
+    合成协程统一提交到 TTS 后台 loop（``get_tts_runtime()``），
+    完成回调在 loop 线程内按句序把音频推入播放器队列（``play_audio`` 只入队，不阻塞）。
+    """
+
+    def __init__(
+        self,
+        tts_manager: Any,
+        player: Any,
+        *,
+        lookahead: Optional[int] = None,
+        min_sentence_length: int = 3,
+        max_buffer_size: int = 500,
+        text_filter: Optional[Callable[[str], str]] = None,
+        agent_profile: Any = None,
+        runtime: Any = None,
+        stream_audio: Optional[bool] = None,
+    ) -> None:
+        """
+        Args:
+            tts_manager: TTSManager（需提供 ``synthesize_text`` 协程）
+            player: AudioPlayer（或接收 WAV bytes 的可调用对象）
+            lookahead: 同时合成/待播放的最大句数（默认读取 TTSConfig.stream_lookahead）
+            min_sentence_length: 分句最小长度
+            max_buffer_size: 分句缓冲区上限
+            text_filter: 句子送入 TTS 前的过滤（如去除动作描写/工具信息），返回空串则跳过
+            agent_profile: 情绪语音参数（AgentSpeechProfile）
+            runtime: 执行合成协程的 AsyncLoopThread（默认 TTS 后台 loop）
+            stream_audio: 是否边收边播（默认读取 TTSConfig.stream_audio_enabled；
+                播放器需提供 ``open_stream``，管理器需提供 ``stream_text``）
+        """
+        config = getattr(tts_manager, "config", None)
+        if lookahead is None:
+            lookahead = int(getattr(config, "stream_lookahead", 2) or 2)
+        if stream_audio is None:
+            stream_audio = bool(getattr(config, "stream_audio_enabled", False))
+        open_stream = getattr(player, "open_stream", None)
+        if not (callable(open_stream) and callable(getattr(tts_manager, "stream_text", None))):
+            stream_audio = False
+        self._open_stream: Optional[Callable[..., Any]] = open_stream if stream_audio else None
+        self._preroll_ms = float(getattr(config, "stream_preroll_ms", 120) or 120)
+        self._manager = tts_manager
+        self._play: Callable[[bytes], Any] = getattr(player, "play_audio", player)
+        self._lookahead = max(1, int(lookahead))
+        self._text_filter = text_filter
+        self._profile = agent_profile
+        self._runtime = runtime or get_tts_runtime()
+        self._processor = StreamProcessor(
+            min_sentence_length=min_sentence_length, max_buffer_size=max_buffer_size
+        )
+        # 已喂入的全部文本与已切句部分的末尾位置（撤回时据此判断哪些句子作废）
+        self._text = ""
+        self._consumed = 0
+        self._delivered_end = 0
+
+        self._lock = threading.Lock()
+        self._segments: Dict[int, _Segment] = {}
+        self._waiting: Deque[_Segment] = deque()
+        self._next_index = 0
+        self._next_deliver = 0
+        self._inflight = 0
+        self._finished = False
+        self._cancelled = False
+        self._idle = threading.Event()
+
+        # 指标
+        self._started = time.monotonic()
+        self._first_sentence_at: Optional[float] = None
+        self._first_audio_at: Optional[float] = None
+        self._playback_end: Optional[float] = None
+        self._gaps_ms: List[float] = []
+        self._synth_ms: List[float] = []
+        self._delivered = 0
+        self._streamed = 0
+        self._failed = 0
+
+    # ----------------------------- 输入 -----------------------------
+
+    def feed(self, delta: str) -> None:
+        """喂入一段 LLM 文本增量；切出的完整句子立即开始合成。"""
+        if not delta:
+            return
+        with self._lock:
+            if self._finished or self._cancelled:
+                return
+            self._text += delta
+            sentences = list(self._processor.process_chunk(delta))
+            to_start = self._enqueue_locked(sentences)
+        self._start(to_start)
+
+    def retract(self, chars: int) -> None:
+        """
+        撤回最近喂入的 ``chars`` 个字符（推测流式中转为工具轮的前导文本）。
+
+        尚未交给播放器的相关句子会被取消，剩余的未切句文本重新切句；已交给播放器的句子无法撤回。
+        """
+        chars = max(0, int(chars))
+        if chars <= 0:
+            return
+        with self._lock:
+            if self._finished or self._cancelled:
+                return
+            cut = max(0, len(self._text) - chars)
+            # 句子按序切出，end_offset 单调递增：作废的一定是队尾的若干句
+            dropped = sorted(
+                (seg for seg in self._segments.values() if seg.end_offset > cut),
+                key=lambda seg: seg.index,
+            )
+            for seg in dropped:
+                seg.dropped = True
+                del self._segments[seg.index]
+                if seg.started:
+                    self._inflight -= 1
+            if dropped:
+                self._waiting = deque(seg for seg in self._waiting if not seg.dropped)
+                self._next_index = dropped[0].index
+            if cut < self._consumed:
+                kept = [seg.end_offset for seg in self._segments.values()]
+                self._consumed = max([self._delivered_end, *kept])
+            self._consumed = min(self._consumed, cut)
+            tail = self._text[self._consumed : cut]
+            self._text = self._text[:cut]
+            self._processor.reset()
+            sentences = list(self._processor.process_chunk(tail)) if tail else []
+            to_start = self._enqueue_locked(sentences)
+        for seg in dropped:
+            if seg.future is not None:
+                seg.future.cancel()
+            if seg.writer is not None:
+                seg.writer.abort()
+        self._start(to_start)
+
+    def finish(self) -> None:
+        """输入结束：合成缓冲区剩余文本（幂等）。"""
+        with self._lock:
+            if self._finished or self._cancelled:
+                return
+            remaining = self._processor.flush()
+            to_start = self._enqueue_locked([remaining] if remaining else [])
+            self._finished = True
+            self._check_idle_locked()
+        self._start(to_start)
+
+    def cancel(self) -> None:
+        """放弃尚未播放的句子（用户打断/切换会话）。已入播放队列的音频不受影响。"""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self._waiting.clear()
+            segments = list(self._segments.values())
+            pending = [seg.future for seg in segments if seg.future is not None]
+            writers = [seg.writer for seg in segments if seg.writer is not None]
+            self._segments.clear()
+            self._idle.set()
+        for future in pending:
+            future.cancel()
+        for writer in writers:
+            writer.abort()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待所有句子合成并交给播放器（finish/cancel 之后才会返回 True）。"""
+        return self._idle.wait(timeout)
+
+    def tee(self, chunks: Iterable[str]) -> Iterator[str]:
+        """透传同步文本流（如 ``chat_stream``），同时喂给流水线；流正常结束时 finish。"""
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, StreamRetraction):
+                    self.retract(chunk.chars)
+                else:
+                    self.feed(chunk)
+                yield chunk
+        except BaseException:
+            self.cancel()
+            raise
+        self.finish()
+
+    async def atee(self, chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+        """透传异步文本流（如 ``chat_stream_async``），同时喂给流水线。"""
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk, StreamRetraction):
+                    self.retract(chunk.chars)
+                else:
+                    self.feed(chunk)
+                yield chunk
+        except BaseException:
+            self.cancel()
+            raise
+        self.finish()
+
+    # ----------------------------- 指标 -----------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        def _since_start(at: Optional[float]) -> Optional[float]:
+            return round((at - self._started) * 1000.0, 1) if at is not None else None
+
+        with self._lock:
+            gaps = list(self._gaps_ms)
+            synth = list(self._synth_ms)
+            return {
+                "sentences": self._next_index,
+                "delivered": self._delivered,
+                "streamed": self._streamed,
+                "failed": self._failed,
+                "inflight": self._inflight,
+                "lookahead": self._lookahead,
+                "first_sentence_ms": _since_start(self._first_sentence_at),
+                "time_to_first_audio_ms": _since_start(self._first_audio_at),
+                "gaps_ms": [round(g, 1) for g in gaps],
+                "max_gap_ms": round(max(gaps), 1) if gaps else 0.0,
+                "total_gap_ms": round(sum(gaps), 1),
+                "avg_synth_ms": round(sum(synth) / len(synth), 1) if synth else 0.0,
+                "finished": self._finished,
+                "cancelled": self._cancelled,
+            }
+
+    # ----------------------------- 内部方法 -----------------------------
+
+    def _enqueue_locked(self, sentences: List[str]) -> List[_Segment]:
+        now = time.monotonic()
+        for sentence in sentences:
+            pos = self._text.find(sentence, self._consumed) if sentence else -1
+            self._consumed = pos + len(sentence) if pos >= 0 else len(self._text)
+            text = sentence
+            if self._text_filter is not None and text:
+                try:
+                    text = self._text_filter(text)
+                except Exception as exc:
+                    logger.debug("流式 TTS 文本过滤失败，使用原句: %s", exc)
+                    text = sentence
+            if not text or not text.strip():
+                continue
+            if self._first_sentence_at is None:
+                self._first_sentence_at = now
+            segment = _Segment(
+                index=self._next_index,
+                text=text.strip(),
+                created=now,
+                end_offset=self._consumed,
+            )
+            self._next_index += 1
+            self._segments[segment.index] = segment
+            self._waiting.append(segment)
+        return self._take_startable_locked()
+
+    def _take_startable_locked(self) -> List[_Segment]:
+        # inflight 统计"已开始合成但尚未交给播放器"的句子：慢句会阻塞后续交付，同时限制预取深度
+        startable: List[_Segment] = []
+        while self._waiting and self._inflight < self._lookahead:
+            segment = self._waiting.popleft()
+            segment.started = time.monotonic()
+            self._inflight += 1
+            if self._open_stream is not None:
+                # 在锁内按句序打开流式句柄，保证播放顺序与句序一致
+                try:
+                    segment.writer = self._open_stream(preroll_ms=self._preroll_ms)
+                except Exception as exc:
+                    logger.debug("打开流式播放失败，回退整段合成: %s", exc)
+            startable.append(segment)
+        return startable
+
+    def _start(self, segments: List[_Segment]) -> None:
+        # 在锁外提交：若 future 已完成，add_done_callback 会在当前线程立即回调
+        for segment in segments:
+            if segment.writer is not None:
+                coro = self._stream(segment)
+            else:
+                coro = self._synthesize(segment.text)
+            try:
+                future = self._runtime.submit(coro)
+            except Exception as exc:
+                coro.close()
+                logger.debug("提交流式 TTS 合成失败: %s", exc)
+                self._on_done(segment, None)
+                continue
+            segment.future = future
+            future.add_done_callback(lambda f, seg=segment: self._on_done(seg, f))
+
+    async def _synthesize(self, text: str) -> Optional[bytes]:
+        return await self._manager.synthesize_text(text, agent_profile=self._profile)
+
+    async def _stream(self, segment: _Segment) -> Optional[bytes]:
+        writer = segment.writer
+        received = False
+        async for chunk in self._manager.stream_text(segment.text, agent_profile=self._profile):
+            if not received:
+                segment.first_chunk_at = time.monotonic()
+                received = True
+                with self._lock:
+                    if self._first_audio_at is None and segment.index == self._next_deliver:
+                        self._first_audio_at = segment.first_chunk_at
+            writer.write(chunk)
+        # 流式段的音频已写入播放器，这里只返回非空标记
+        return b"streamed" if received else None
+
+    def _on_done(self, segment: _Segment, future: Optional[Future]) -> None:
+        audio: Optional[bytes] = None
+        if future is not None and not future.cancelled():
+            try:
+                audio = future.result()
+            except Exception as exc:
+                logger.debug("流式 TTS 合成失败（第 %d 句）: %s", segment.index, exc)
+        if segment.dropped:
+            # 已被 retract() 撤回：句柄已中止，结果直接丢弃
+            return
+        if segment.writer is not None:
+            if audio:
+                segment.writer.close()
+            else:
+                segment.writer.abort()
+
+        with self._lock:
+            if self._cancelled or segment.dropped:
+                return
+            segment.audio = audio or None
+            segment.done = True
+            self._synth_ms.append((time.monotonic() - segment.started) * 1000.0)
+            # 按句序交付：前面的句子未完成时，后面的结果先暂存
+            while True:
+                head = self._segments.get(self._next_deliver)
+                if head is None or not head.done:
+                    break
+                del self._segments[self._next_deliver]
+                self._next_deliver += 1
+                self._inflight -= 1
+                self._delivered_end = max(self._delivered_end, head.end_offset)
+                self._deliver_locked(head)
+            to_start = self._take_startable_locked()
+            self._check_idle_locked()
+        self._start(to_start)
+
+    def _deliver_locked(self, segment: _Segment) -> None:
+        audio = segment.audio
+        segment.audio = None
+        if not audio:
+            self._failed += 1
+            return
+        if segment.writer is not None:
+            self._delivered += 1
+            self._streamed += 1
+            if self._first_audio_at is None:
+                self._first_audio_at = segment.first_chunk_at
+            # 流式段的真实播放时长未知，不参与空档估计
+            self._playback_end = None
+            return
+        now = time.monotonic()
+        try:
+            self._play(audio)
+        except Exception as exc:
+            logger.warning("流式 TTS 播放入队失败: %s", exc)
+            self._failed += 1
+            return
+
+        self._delivered += 1
+        if self._first_audio_at is None:
+            self._first_audio_at = now
+        if self._playback_end is not None:
+            self._gaps_ms.append(max(0.0, now - self._playback_end) * 1000.0)
+        start = max(now, self._playback_end or now)
+        self._playback_end = start + wav_duration_s(audio)
+
+    def _check_idle_locked(self) -> None:
+        if self._idle.is_set() or not self._finished:
+            return
+        if self._next_deliver < self._next_index:
+            return
+        self._idle.set()
+        if self._next_index and self._first_audio_at is not None:
+            logger.info(
+                "流式 TTS 完成: %d 句（失败 %d），首段音频 %.0fms，最大空档 %.0fms",
+                self._next_index,
+                self._failed,
+                (self._first_audio_at - self._started) * 1000.0,
+                max(self._gaps_ms) if self._gaps_ms else 0.0,
+            )
+
+
+__all__ = ["StreamingTTSPipeline", "wav_duration_s"]
@@ -0,0 +1,644 @@
+"""
+TTS 分段文件磁盘缓存（SQLite 索引 + 追加写段文件）
+
+``PersistentTTSAudioCache`` 每次写入都整体重写 JSON 索引、每条音频一个文件，启动时还要逐个 stat；
+条目达到数千后启动与 ``set()`` 都明显变慢。本后端：
+- 索引放在 SQLite 表中，``set`` / 淘汰只做单行 upsert/delete（O(1)）；启动只需一次 SELECT
+- 音频追加写入少量段文件（``segments/seg-000001.dat``），行内记录 (段号, 偏移, 长度, CRC32)
+- 被淘汰/覆盖的条目在段内留下空洞；某段存活比例过低时把存活条目搬到活动段并删除旧段（压缩）
+- 编码可选 ``raw`` / ``gzip`` / ``flac`` / ``opus``（后两者需 soundfile，读取时还原为 WAV）
+- LRU 访问记录（时间戳/命中数）先在内存累积，批量写回，命中路径不写盘
+- 常驻条目（``pin``，如预热的问候语）不参与 LRU 淘汰，仍受 TTL 约束
+
+对外接口（``get`` / ``set`` / ``clear`` / ``stats``）与 LRU/TTL 语义与 ``PersistentTTSAudioCache`` 一致；
+首次打开旧目录时自动迁移 ``cache_index.json`` + ``audio/*.bin``。
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+try:
+    import soundfile as sf  # type: ignore[import-untyped]
+
+    _has_soundfile = True
+except Exception:  # pragma: no cover - 可选依赖
+    sf = None  # type: ignore[assignment]
+    _has_soundfile = False
+
+logger = get_logger(__name__)
+
+SCHEMA_VERSION = 1
+CODECS = ("raw", "gzip", "flac", "opus")
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL,
+    pinned INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+@dataclass(slots=True)
+class SegmentEntry:
+    """段文件中的一条缓存记录"""
+
+    key: str
+    segment: int
+    offset: int
+    length: int
+    crc: int
+    size: int
+    codec: str
+    timestamp: float
+    hits: int = 0
+    expires_at: Optional[float] = None
+    pinned: bool = False
+
+
+def codec_available(codec: str) -> bool:
+    if codec in ("raw", "gzip"):
+        return True
+    if codec not in CODECS or not _has_soundfile:
+        return False
+    fmt, subtype = ("FLAC", "PCM_16") if codec == "flac" else ("OGG", "OPUS")
+    try:
+        return bool(sf.check_format(fmt, subtype))
+    except Exception:
+        return False
+
+
+def encode_audio(codec: str, audio: bytes) -> bytes:
+    """按编码压缩音频；flac/opus 需要输入为 soundfile 可解析的音频（WAV）。"""
+    if codec == "raw":
+        return audio
+    if codec == "gzip":
+        return gzip.compress(audio, compresslevel=6)
+    data, samplerate = sf.read(io.BytesIO(audio), dtype="int16", always_2d=False)
+    out = io.BytesIO()
+    if codec == "flac":
+        sf.write(out, data, samplerate, format="FLAC", subtype="PCM_16")
+    else:
+        sf.write(out, data, samplerate, format="OGG", subtype="OPUS")
+    return out.getvalue()
+
+
+def decode_audio(codec: str, payload: bytes) -> bytes:
+    """还原为可直接播放的音频字节（flac/opus 解码为 16-bit WAV）。"""
+    if codec == "raw":
+        return payload
+    if codec == "gzip":
+        return gzip.decompress(payload)
+    data, samplerate = sf.read(io.BytesIO(payload), dtype="int16", always_2d=False)
+    out = io.BytesIO()
+    sf.write(out, data, samplerate, format="WAV", subtype="PCM_16")
+    return out.getvalue()
+
+
+class SegmentedTTSAudioCache:
+    """
+    分段文件 + SQLite 索引的 LRU 磁盘缓存（线程安全；单连接 + 互斥锁）
+
+    段文件只在 ``set`` / 压缩时由持锁线程追加写；``get`` 在锁外读取与解码，
+    读取后校验条目位置未变（期间被压缩搬迁则按未命中处理）。
+    """
+
+    def __init__(
+        self,
+        root_dir: Path | str,
+        max_entries: int = 400,
+        max_disk_usage_bytes: int | None = None,
+        compress: bool = True,
+        ttl_seconds: float | None = None,
+        time_provider: Optional[Callable[[], float]] = None,
+        *,
+        codec: Optional[str] = None,
+        segment_max_bytes: int = 32 * 1024 * 1024,
+        compact_live_ratio: float = 0.5,
+        touch_flush_interval: float = 30.0,
+    ) -> None:
+        self.root_dir = Path(root_dir)
+        self.segment_dir = self.root_dir / "segments"
+        self.index_path = self.root_dir / "cache_index.sqlite3"
+        self.max_entries = max(1, int(max_entries))
+        self.max_disk_usage_bytes = (
+            max(1, int(max_disk_usage_bytes)) if max_disk_usage_bytes else None
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.segment_max_bytes = max(64 * 1024, int(segment_max_bytes))
+        self.compact_live_ratio = min(0.95, max(0.0, float(compact_live_ratio)))
+        self._touch_flush_interval = max(0.0, float(touch_flush_interval))
+        self._time = time_provider or time.time
+
+        codec = (codec or ("gzip" if compress else "raw")).lower()
+        if not codec_available(codec):
+            logger.warning("TTS 缓存编码 %s 不可用（需要 soundfile/libsndfile），改用 gzip", codec)
+            codec = "gzip"
+        self.codec = codec
+        self.compress = codec != "raw"
+
+        self._lock = threading.Lock()
+        # key -> entry，按最近访问排序（队首最久未用）
+        self._entries: "OrderedDict[str, SegmentEntry]" = OrderedDict()
+        self._segment_bytes: Dict[int, int] = {}  # 段文件总长度
+        self._segment_live: Dict[int, int] = {}  # 段内存活条目字节数
+        self._active_segment = 0
+        self._disk_usage = 0
+        self._touched: Dict[str, SegmentEntry] = {}
+        self._last_touch_flush = time.monotonic()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "compactions": 0,
+        }
+
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.index_path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute("PRAGMA synchronous = NORMAL;")
+        self._conn.execute("PRAGMA busy_timeout = 5000;")
+        with self._conn:
+            self._conn.executescript(_SCHEMA_SQL)
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            ).fetchone()
+            if row is None or row[0] != str(SCHEMA_VERSION):
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION),),
+                )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+            if "pinned" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE entries ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0"
+                )
+
+        with self._lock:
+            self._load_index()
+            self._migrate_legacy_locked()
+
+    # --------------------------------------------------------------------- #
+    # 公开接口
+    # --------------------------------------------------------------------- #
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if self._is_expired(entry):
+                self._drop_locked([entry])
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            location = (entry.segment, entry.offset, entry.length, entry.crc, entry.codec)
+
+        segment, offset, length, crc, codec = location
+        try:
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(offset)
+                payload = f.read(length)
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                raise ValueError("校验失败")
+            data = decode_audio(codec, payload)
+        except Exception as exc:
+            with self._lock:
+                current = self._entries.get(key)
+                moved = current is None or (current.segment, current.offset) != (segment, offset)
+                if not moved:
+                    logger.warning("TTS 缓存条目损坏，已移除: %s", exc)
+                    self._drop_locked([current])
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or (current.segment, current.offset) != (segment, offset):
+                self._stats["misses"] += 1
+                return None
+            current.timestamp = self._now()
+            current.hits += 1
+            self._entries.move_to_end(key)
+            self._touched[key] = current
+            self._stats["hits"] += 1
+            if time.monotonic() - self._last_touch_flush >= self._touch_flush_interval:
+                self._flush_touches_locked()
+            return data
+
+    def set(self, key: str, audio_data: bytes, *, pinned: bool = False) -> None:
+        """写入缓存（pinned=True 的条目不参与 LRU 淘汰；覆盖写入保留原有常驻标记）"""
+        if not audio_data:
+            return
+
+        codec = self.codec
+        try:
+            payload = encode_audio(codec, audio_data)
+        except Exception as exc:
+            logger.debug("TTS 缓存 %s 编码失败，改用 gzip: %s", codec, exc)
+            codec = "gzip"
+            payload = encode_audio(codec, audio_data)
+
+        with self._lock:
+            try:
+                segment, offset = self._append_locked(payload)
+            except OSError as exc:
+                logger.warning("写入 TTS 磁盘缓存失败: %s", exc)
+                return
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._release_locked(previous)
+                pinned = pinned or previous.pinned
+            entry = SegmentEntry(
+                key=key,
+                segment=segment,
+                offset=offset,
+                length=len(payload),
+                crc=zlib.crc32(payload),
+                size=len(audio_data),
+                codec=codec,
+                timestamp=self._now(),
+                expires_at=self._compute_expiry(),
+                pinned=bool(pinned),
+            )
+            self._entries[key] = entry
+            self._touched.pop(key, None)
+            self._segment_live[segment] = self._segment_live.get(segment, 0) + entry.length
+            self._disk_usage += entry.length
+            try:
+                with self._conn:
+                    self._upsert(entry)
+                    self._flush_touches_locked(commit=False)
+                    self._evict_locked()
+            except sqlite3.Error as exc:
+                logger.warning("写入 TTS 缓存索引失败: %s", exc)
+            self._compact_locked()
+
+    def pin(self, key: str, pinned: bool = True) -> bool:
+        """设置/取消常驻标记；条目不存在或已过期时返回 False。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                return False
+            if entry.pinned != pinned:
+                entry.pinned = pinned
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            "UPDATE entries SET pinned = ? WHERE key = ?", (int(pinned), key)
+                        )
+                except sqlite3.Error as exc:
+                    logger.debug("更新 TTS 缓存常驻标记失败: %s", exc)
+            return True
+
+    def unpin_except(self, keep: Iterable[str]) -> int:
+        """取消 ``keep`` 之外所有条目的常驻标记，返回取消的条数。"""
+        keep_keys = set(keep)
+        with self._lock:
+            stale = [e for k, e in self._entries.items() if e.pinned and k not in keep_keys]
+            if not stale:
+                return 0
+            for entry in stale:
+                entry.pinned = False
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE entries SET pinned = 0 WHERE key = ?", [(e.key,) for e in stale]
+                    )
+            except sqlite3.Error as exc:
+                logger.debug("更新 TTS 缓存常驻标记失败: %s", exc)
+            return len(stale)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM entries")
+            for segment in list(self._segment_bytes):
+                self._segment_path(segment).unlink(missing_ok=True)
+            self._entries.clear()
+            self._touched.clear()
+            self._segment_bytes.clear()
+            self._segment_live.clear()
+            self._active_segment = 0
+            self._disk_usage = 0
+            self._stats = {k: 0 for k in self._stats}
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存统计数据"""
+        with self._lock:
+            total_size = sum(entry.size for entry in self._entries.values())
+            segment_bytes = sum(self._segment_bytes.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_usage": total_size,
+                "disk_usage_bytes": self._disk_usage,
+                "compress": self.compress,
+                "codec": self.codec,
+                "pinned": sum(1 for entry in self._entries.values() if entry.pinned),
+                "segments": len(self._segment_bytes),
+                "segment_bytes": segment_bytes,
+                "dead_bytes": segment_bytes - self._disk_usage,
+                **self._stats,
+            }
+
+    def flush(self) -> None:
+        """把内存中累积的 LRU 访问记录写回索引。"""
+        with self._lock:
+            self._flush_touches_locked()
+
+    def compact(self, live_ratio: float = 1.0) -> int:
+        """压缩存活比例低于 live_ratio 的非活动段，返回被重写的段数。"""
+        with self._lock:
+            return self._compact_locked(live_ratio)
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush_touches_locked()
+            finally:
+                self._conn.close()
+
+    # --------------------------------------------------------------------- #
+    # 索引
+    # --------------------------------------------------------------------- #
+    def _now(self) -> float:
+        return float(self._time())
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.segment_dir / f"seg-{segment:06d}.dat"
+
+    def _load_index(self) -> None:
+        for path in self.segment_dir.glob("seg-*.dat"):
+            try:
+                segment = int(path.stem.split("-", 1)[1])
+                self._segment_bytes[segment] = path.stat().st_size
+            except (ValueError, OSError):
+                continue
+        self._active_segment = max(self._segment_bytes, default=0)
+
+        rows = self._conn.execute(
+            "SELECT key, segment, offset, length, crc, size, codec, timestamp, hits, expires_at, "
+            "pinned FROM entries ORDER BY timestamp"
+        ).fetchall()
+        stale: List[str] = []
+        for row in rows:
+            entry = SegmentEntry(*row[:-1], pinned=bool(row[-1]))
+            if entry.offset + entry.length > self._segment_bytes.get(entry.segment, -1):
+                stale.append(entry.key)
+                continue
+            if self._is_expired(entry):
+                stale.append(entry.key)
+                self._stats["expired"] += 1
+                continue
+            self._entries[entry.key] = entry
+            self._segment_live[entry.segment] = (
+                self._segment_live.get(entry.segment, 0) + entry.length
+            )
+            self._disk_usage += entry.length
+        if stale:
+            with self._conn:
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in stale])
+
+    def _upsert(self, entry: SegmentEntry) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(key, segment, offset, length, crc, size, codec, timestamp, hits, expires_at, pinned) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.key,
+                entry.segment,
+                entry.offset,
+                entry.length,
+                entry.crc,
+                entry.size,
+                entry.codec,
+                entry.timestamp,
+                entry.hits,
+                entry.expires_at,
+                int(entry.pinned),
+            ),
+        )
+
+    def _flush_touches_locked(self, *, commit: bool = True) -> None:
+        self._last_touch_flush = time.monotonic()
+        if not self._touched:
+            return
+        rows = [(e.timestamp, e.hits, e.key) for e in self._touched.values()]
+        self._touched.clear()
+        sql = "UPDATE entries SET timestamp = ?, hits = ? WHERE key = ?"
+        try:
+            if commit:
+                with self._conn:
+                    self._conn.executemany(sql, rows)
+            else:
+                self._conn.executemany(sql, rows)
+        except sqlite3.Error as exc:
+            logger.debug("写回 TTS 缓存访问记录失败: %s", exc)
+
+    # --------------------------------------------------------------------- #
+    # 段文件
+    # --------------------------------------------------------------------- #
+    def _append_locked(self, payload: bytes) -> Tuple[int, int]:
+        segment = self._active_segment
+        size = self._segment_bytes.get(segment, 0)
+        if segment == 0 or (size and size + len(payload) > self.segment_max_bytes):
+            segment = self._active_segment = segment + 1
+            size = 0
+        with open(self._segment_path(segment), "ab") as f:
+            f.write(payload)
+        self._segment_bytes[segment] = size + len(payload)
+        return segment, size
+
+    def _release_locked(self, entry: SegmentEntry) -> None:
+        self._touched.pop(entry.key, None)
+        self._disk_usage = max(0, self._disk_usage - entry.length)
+        live = self._segment_live.get(entry.segment, 0) - entry.length
+        self._segment_live[entry.segment] = max(0, live)
+
+    def _drop_locked(self, entries: List[SegmentEntry]) -> None:
+        for entry in entries:
+            self._entries.pop(entry.key, None)
+            self._release_locked(entry)
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM entries WHERE key = ?", [(e.key,) for e in entries]
+                )
+        except sqlite3.Error as exc:
+            logger.debug("删除 TTS 缓存索引失败: %s", exc)
+
+    def _over_limit_locked(self) -> bool:
+        if len(self._entries) > self.max_entries:
+            return True
+        return self.max_disk_usage_bytes is not None and (
+            self._disk_usage > self.max_disk_usage_bytes
+        )
+
+    def _evict_locked(self) -> None:
+        """
+        调用方已开启事务：按 LRU 淘汰超出条目数/磁盘上限的条目
+
+        跳过常驻条目与最新写入的一条；只剩这些条目时允许暂时超出上限。
+        """
+        if not self._over_limit_locked():
+            return
+        newest = next(reversed(self._entries))
+        victims: List[SegmentEntry] = []
+        for key in list(self._entries):
+            if not self._over_limit_locked():
+                break
+            entry = self._entries[key]
+            if entry.pinned or key == newest:
+                continue
+            del self._entries[key]
+            self._release_locked(entry)
+            victims.append(entry)
+        if victims:
+            self._stats["evictions"] += len(victims)
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(e.key,) for e in victims])
+
+    def _compact_locked(self, live_ratio: Optional[float] = None) -> int:
+        threshold = self.compact_live_ratio if live_ratio is None else live_ratio
+        candidates = [
+            segment
+            for segment, total in self._segment_bytes.items()
+            if segment != self._active_segment
+            and total > 0
+            and self._segment_live.get(segment, 0) < total * threshold
+        ]
+        for segment in candidates:
+            moved = [e for e in self._entries.values() if e.segment == segment]
+            path = self._segment_path(segment)
+            try:
+                if moved:
+                    with open(path, "rb") as f:
+                        blobs = []
+                        for entry in moved:
+                            f.seek(entry.offset)
+                            blobs.append(f.read(entry.length))
+                    with self._conn:
+                        for entry, blob in zip(moved, blobs):
+                            new_segment, new_offset = self._append_locked(blob)
+                            self._segment_live[new_segment] = (
+                                self._segment_live.get(new_segment, 0) + entry.length
+                            )
+                            entry.segment, entry.offset = new_segment, new_offset
+                            self._upsert(entry)
+                path.unlink(missing_ok=True)
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("压缩 TTS 缓存段 %d 失败: %s", segment, exc)
+                continue
+            self._segment_bytes.pop(segment, None)
+            self._segment_live.pop(segment, None)
+            self._stats["compactions"] += 1
+        return len(candidates)
+
+    # --------------------------------------------------------------------- #
+    # 旧格式迁移
+    # --------------------------------------------------------------------- #
+    def _migrate_legacy_locked(self) -> None:
+        legacy_index = self.root_dir / "cache_index.json"
+        legacy_audio = self.root_dir / "audio"
+        if not legacy_index.exists():
+            return
+        migrated = 0
+        try:
+            payload = json.loads(legacy_index.read_text(encoding="utf-8"))
+            items = sorted(
+                payload.get("entries", {}).items(),
+                key=lambda kv: float(kv[1].get("timestamp") or 0.0),
+            )
+            with self._conn:
+                for key, meta in items:
+                    if key in self._entries:
+                        continue
+                    expires_at = meta.get("expires_at")
+                    if expires_at is not None and self._now() >= float(expires_at):
+                        continue
+                    try:
+                        data = (legacy_audio / str(meta.get("filename"))).read_bytes()
+                        if meta.get("compressed", True):
+                            data = gzip.decompress(data)
+                    except Exception:
+                        continue
+                    blob = encode_audio("gzip" if self.codec != "raw" else "raw", data)
+                    segment, offset = self._append_locked(blob)
+                    entry = SegmentEntry(
+                        key=key,
+                        segment=segment,
+                        offset=offset,
+                        length=len(blob),
+                        crc=zlib.crc32(blob),
+                        size=len(data),
+                        codec="gzip" if self.codec != "raw" else "raw",
+                        timestamp=float(meta.get("timestamp") or self._now()),
+                        hits=int(meta.get("hits") or 0),
+                        expires_at=expires_at,
+                    )
+                    self._entries[key] = entry
+                    self._segment_live[segment] = self._segment_live.get(segment, 0) + entry.length
+                    self._disk_usage += entry.length
+                    self._upsert(entry)
+                    migrated += 1
+                self._evict_locked()
+        except Exception as exc:
+            logger.warning("迁移旧版 TTS 磁盘缓存失败，将忽略旧数据: %s", exc)
+        legacy_index.unlink(missing_ok=True)
+        shutil.rmtree(legacy_audio, ignore_errors=True)
+        if migrated:
+            logger.info("已迁移旧版 TTS 磁盘缓存: %d 条", migrated)
+
+    # --------------------------------------------------------------------- #
+    # 内部工具
+    # --------------------------------------------------------------------- #
+    def _is_expired(self, entry: SegmentEntry) -> bool:
+        if entry.expires_at is None:
+            return False
+        return self._now() >= entry.expires_at
+
+    def _compute_expiry(self) -> Optional[float]:
+        if not self.ttl_seconds:
+            return None
+        return self._now() + self.ttl_seconds
+
+
+__all__ = [
+    "CODECS",
+    "SegmentEntry",
+    "SegmentedTTSAudioCache",
+    "codec_available",
+    "decode_audio",
+    "encode_audio",
+]
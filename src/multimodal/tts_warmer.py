@@ -0,0 +1,320 @@
+"""
+TTS 预热缓存（空闲时预合成高频句）
+
+问候/告别语与角色最常说的短句每次缓存冷启动或被淘汰后都要重新合成。``TTSWarmer`` 在
+GPT-SoVITS 空闲时按低优先级逐句预合成，并把结果标记为常驻（``pin``），不参与 LRU 淘汰；
+每轮预热开始时取消上一轮计划外句子的常驻标记，常驻条目数不超过当前计划：
+- 固定句：问候语、告别语及调用方传入的短句
+- 历史高频句：``user_data.db`` 中当前用户 ``chat_history`` 的助手回复，按流式朗读相同的方式切句后计数
+- 本次运行的朗读统计：``TTSManager.frequent_phrases()``
+
+句子切分与过滤与 ``StreamingTTSPipeline`` 一致，语音参数使用当前的 ``agent_profile``，
+因此预热结果与实际朗读共用同一缓存键。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.multimodal.tts_runtime import get_tts_runtime
+from src.multimodal.tts_text import strip_stage_directions
+from src.utils.logger import logger
+from src.utils.stream_processor import StreamProcessor
+
+TextFilter = Callable[[str], str]
+
+
+def split_spoken_sentences(
+    text: str,
+    *,
+    min_sentence_length: int = 3,
+    text_filter: Optional[TextFilter] = strip_stage_directions,
+) -> List[str]:
+    """按流式朗读的方式切句并过滤（返回实际会送入 TTS 的句子）。"""
+    if not text or not text.strip():
+        return []
+    processor = StreamProcessor(min_sentence_length=min_sentence_length, max_buffer_size=500)
+    sentences = list(processor.process_chunk(text))
+    remaining = processor.flush()
+    if remaining:
+        sentences.append(remaining)
+
+    spoken: List[str] = []
+    for sentence in sentences:
+        if text_filter is not None:
+            try:
+                sentence = text_filter(sentence)
+            except Exception:
+                pass
+        sentence = (sentence or "").strip()
+        if sentence:
+            spoken.append(sentence)
+    return spoken
+
+
+def mine_chat_history_phrases(
+    db_path: Path | str,
+    user_id: int,
+    *,
+    scan_limit: int = 5000,
+    max_chars: int = 40,
+    min_count: int = 2,
+    limit: int = 50,
+    text_filter: Optional[TextFilter] = strip_stage_directions,
+) -> List[Tuple[str, int]]:
+    """
+    统计用户 ``user_id`` 最近 ``scan_limit`` 条助手回复中出现最多的句子（只读打开数据库）
+
+    Returns:
+        List[Tuple[str, int]]: (句子, 次数)，按次数降序
+    """
+    path = Path(db_path)
+    if not path.exists():
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True, timeout=5.0)
+    except sqlite3.Error as exc:
+        logger.debug("打开聊天记录失败，跳过 TTS 预热挖掘: %s", exc)
+        return []
+    try:
+        # 完全相同的回复（如固定开场白）先在 SQL 中合并，减少切句次数
+        rows = conn.execute(
+            """
+            SELECT content, COUNT(*) FROM (
+                SELECT content FROM chat_history
+                WHERE user_id = ? AND role = 'assistant'
+                ORDER BY id DESC
+                LIMIT ?
+            )
+            GROUP BY content
+            """,
+            (int(user_id), max(1, int(scan_limit))),
+        ).fetchall()
+    except sqlite3.Error as exc:
+        logger.debug("读取聊天记录失败，跳过 TTS 预热挖掘: %s", exc)
+        return []
+    finally:
+        conn.close()
+
+    counts: Counter[str] = Counter()
+    for content, repeat in rows:
+        for sentence in split_spoken_sentences(str(content or ""), text_filter=text_filter):
+            if len(sentence) <= max_chars:
+                counts[sentence] += int(repeat)
+    return [(s, c) for s, c in counts.most_common(max(0, int(limit))) if c >= min_count]
+
+
+class TTSWarmer:
+    """
+    空闲时逐句预合成并常驻缓存（单个协程顺序执行，不与实时朗读争抢并发）
+
+    每句开始前等待 ``TTSManager.is_idle(idle_grace_s)``：有实时合成请求时暂停，
+    请求结束 ``idle_grace_s`` 秒后再继续。
+    """
+
+    def __init__(
+        self,
+        tts_manager: Any,
+        *,
+        agent_profile: Any = None,
+        text_filter: Optional[TextFilter] = strip_stage_directions,
+        max_phrases: int = 48,
+        max_chars: int = 40,
+        idle_grace_s: float = 3.0,
+        poll_interval_s: float = 0.5,
+        runtime: Any = None,
+    ) -> None:
+        self._manager = tts_manager
+        self._profile = agent_profile
+        self._text_filter = text_filter
+        self._max_phrases = max(0, int(max_phrases))
+        self._max_chars = max(1, int(max_chars))
+        self._idle_grace_s = max(0.0, float(idle_grace_s))
+        self._poll_interval_s = max(0.01, float(poll_interval_s))
+        self._runtime = runtime or get_tts_runtime()
+        self._stop = threading.Event()
+        self._future: Optional[Future] = None
+        self._stats: Dict[str, Any] = {
+            "planned": 0,
+            "cached": 0,
+            "synthesized": 0,
+            "failed": 0,
+            "skipped": 0,
+            "unpinned": 0,
+            "idle_wait_ms": 0.0,
+            "done": False,
+        }
+
+    def collect_phrases(
+        self,
+        fixed: Iterable[str] = (),
+        *,
+        db_path: Path | str | None = None,
+        user_id: Optional[int] = None,
+        history_min_count: int = 2,
+    ) -> List[str]:
+        """
+        合并固定句、聊天记录高频句与本次运行的朗读统计，去重后截取前 ``max_phrases`` 句
+
+        聊天记录只挖掘 ``user_id`` 的对话；未登录（``user_id`` 为 None）时跳过。
+        """
+        ordered: List[str] = []
+        seen = set()
+
+        def _add(sentence: str) -> None:
+            key = self._normalize(sentence)
+            if key and key not in seen and len(sentence) <= self._max_chars:
+                seen.add(key)
+                ordered.append(sentence)
+
+        for text in fixed:
+            for sentence in split_spoken_sentences(text, text_filter=self._text_filter):
+                _add(sentence)
+
+        counts: Counter[str] = Counter()
+        if db_path is not None and user_id is not None:
+            for sentence, count in mine_chat_history_phrases(
+                db_path,
+                user_id,
+                max_chars=self._max_chars,
+                min_count=history_min_count,
+                limit=self._max_phrases * 2,
+                text_filter=self._text_filter,
+            ):
+                counts[sentence] += count
+        frequent = getattr(self._manager, "frequent_phrases", None)
+        if callable(frequent):
+            for sentence, count in frequent(limit=self._max_phrases * 2, min_count=2):
+                counts[sentence] += count
+        for sentence, _ in counts.most_common():
+            _add(sentence)
+        return ordered[: self._max_phrases]
+
+    def start(
+        self,
+        phrases: Optional[Sequence[str]] = None,
+        *,
+        fixed: Iterable[str] = (),
+        db_path: Path | str | None = None,
+        user_id: Optional[int] = None,
+    ) -> Future:
+        """
+        在 TTS 后台 loop 中开始预热（重复调用返回同一个 Future）
+
+        未给出 ``phrases`` 时在线程池中调用 ``collect_phrases(fixed, db_path=..., user_id=...)``，
+        不阻塞调用线程（如 GUI 线程）。
+        """
+        if self._future is not None and not self._future.done():
+            return self._future
+        self._stop.clear()
+        self._stats["done"] = False
+        planned = list(phrases) if phrases is not None else None
+        self._future = self._runtime.submit(self._run(planned, list(fixed), db_path, user_id))
+        return self._future
+
+    def stop(self) -> None:
+        """停止预热（正在合成的一句会完成后退出）。"""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    async def _run(
+        self,
+        phrases: Optional[List[str]],
+        fixed: List[str],
+        db_path: Path | str | None,
+        user_id: Optional[int],
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
+        if phrases is None:
+            loop = asyncio.get_running_loop()
+            phrases = await loop.run_in_executor(
+                None,
+                functools.partial(self.collect_phrases, fixed, db_path=db_path, user_id=user_id),
+            )
+        self._stats["planned"] = len(phrases)
+        retain = getattr(self._manager, "retain_pinned", None)
+        if callable(retain):
+            try:
+                self._stats["unpinned"] = await retain(phrases, agent_profile=self._profile)
+            except Exception as exc:
+                logger.debug("释放过期的 TTS 常驻缓存失败: %s", exc)
+        for phrase in phrases:
+            if not await self._wait_idle():
+                break
+            try:
+                status = await self._manager.warm_text(phrase, agent_profile=self._profile)
+            except Exception as exc:
+                logger.debug("TTS 预热失败: %s", exc)
+                status = "failed"
+            self._stats[status] = self._stats.get(status, 0) + 1
+        self._stats["done"] = True
+        logger.info(
+            "TTS 预热完成: 新合成 %d 句，已缓存 %d 句，失败 %d 句（%.1fs）",
+            self._stats["synthesized"],
+            self._stats["cached"],
+            self._stats["failed"],
+            time.monotonic() - started,
+        )
+        return self.stats()
+
+    async def _wait_idle(self) -> bool:
+        waited = time.monotonic()
+        while not self._stop.is_set():
+            if self._manager.is_idle(self._idle_grace_s):
+                self._stats["idle_wait_ms"] += (time.monotonic() - waited) * 1000.0
+                return True
+            await asyncio.sleep(self._poll_interval_s)
+        return False
+
+    def _normalize(self, sentence: str) -> str:
+        preprocess = getattr(self._manager, "preprocess_text", None)
+        return preprocess(sentence) if callable(preprocess) else sentence.strip()
+
+
+def start_tts_warmer(
+    tts_manager: Any,
+    *,
+    fixed: Iterable[str] = (),
+    agent_profile: Any = None,
+    text_filter: Optional[TextFilter] = strip_stage_directions,
+    db_path: Path | str | None = None,
+    user_id: Optional[int] = None,
+) -> Optional[TTSWarmer]:
+    """
+    按 TTSConfig（warm_cache_*）创建并启动预热；未启用或上限为 0 时返回 None
+
+    ``db_path`` 默认为 ``{data_dir}/user_data.db``；只挖掘 ``user_id`` 的聊天记录。
+    """
+    config = getattr(tts_manager, "config", None)
+    if not getattr(config, "warm_cache_enabled", False):
+        return None
+    max_phrases = int(getattr(config, "warm_cache_max_phrases", 48) or 0)
+    if max_phrases <= 0:
+        return None
+    if db_path is None:
+        from src.config.settings import settings
+
+        db_path = Path(settings.data_dir) / "user_data.db"
+
+    warmer = TTSWarmer(
+        tts_manager,
+        agent_profile=agent_profile,
+        text_filter=text_filter,
+        max_phrases=max_phrases,
+        idle_grace_s=float(getattr(config, "warm_cache_idle_s", 3.0)),
+    )
+    warmer.start(fixed=fixed, db_path=db_path, user_id=user_id)
+    return warmer
+
+
+__all__ = ["TTSWarmer", "mine_chat_history_phrases", "split_spoken_sentences", "start_tts_warmer"]
@@ -7,6 +7,7 @@ ChromaDB 辅助工具模块 (v2.30.27)
 - 支持本地 sentence-transformers 模型
 - 支持 embedding 缓存
 - 自动选择最优 embedding 方案
+- 跨线程 embedding 请求合并（见 embedding_dispatcher）
 - 历史：移除第三方 wrapper 依赖，直连 chromadb + OpenAI-compatible embeddings
 
 作者: MintChat Team
@@ -24,6 +25,7 @@ from typing import Any, Optional, Protocol
 from uuid import uuid4
 
 from src.config.settings import settings
+from src.utils.embedding_dispatcher import BatchedEmbeddings
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -48,11 +50,18 @@ except Exception as exc:  # pragma: no cover - 环境依赖差异
 
 # 尝试导入本地 embedding 支持
 try:
-    from src.utils.local_embeddings import LocalEmbeddings, SENTENCE_TRANSFORMERS_AVAILABLE
+    from src.utils.local_embeddings import (
+        LocalEmbeddings,
+        SENTENCE_TRANSFORMERS_AVAILABLE,
+        local_embedding_available,
+    )
 except ImportError:  # pragma: no cover - 可选依赖
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     logger.debug("本地 embedding 模块未找到，将使用 API embedding")
 
+    def local_embedding_available(backend: Optional[str] = None) -> bool:
+        return False
+
 
 class EmbeddingFunction(Protocol):
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
@@ -107,6 +116,14 @@ class OpenAIEmbeddingClient:
         client_kwargs.setdefault("timeout", timeout_s)
         client_kwargs.setdefault("max_retries", max_retries)
 
+        try:
+            from src.utils.http_transport import get_http_client
+
+            # 与 LLM 后端共享同一 API 地址的连接池（复用 TLS 连接）
+            client_kwargs["http_client"] = get_http_client(base_url or "")
+        except Exception:
+            pass
+
         self._client = OpenAI(**client_kwargs)
         self._model = model
         self._enable_cache = bool(enable_cache)
@@ -191,9 +208,9 @@ class ChromaVectorStore:
         texts: list[str],
         metadatas: list[dict[str, Any]],
         ids: list[str] | None = None,
-    ) -> None:
+    ) -> list[str]:
         if not texts:
-            return
+            return []
         if len(texts) != len(metadatas):
             raise ValueError("texts 与 metadatas 长度不一致")
 
@@ -210,6 +227,15 @@ class ChromaVectorStore:
                 metadatas=[dict(x or {}) for x in metadatas],
                 embeddings=embeddings,
             )
+        return [str(x) for x in ids]
+
+    def embed_query(self, query: str) -> list[float]:
+        """计算查询向量（失败返回空列表）。"""
+        try:
+            return list(self._embedding_function.embed_query(query) or [])
+        except Exception as exc:  # pragma: no cover - 依赖/网络差异
+            logger.debug("embedding query 失败，将跳过相似度检索: %s", exc)
+            return []
 
     def similarity_search_with_score(
         self,
@@ -220,13 +246,18 @@ class ChromaVectorStore:
     ) -> list[tuple[Document, float]]:
         if k <= 0:
             return []
+        return self.similarity_search_by_vector_with_score(
+            self.embed_query(query), k=k, filter=filter
+        )
 
-        try:
-            query_embedding = self._embedding_function.embed_query(query)
-        except Exception as exc:  # pragma: no cover - 依赖/网络差异
-            logger.debug("embedding query 失败，将跳过相似度检索: %s", exc)
-            return []
-        if not query_embedding:
+    def similarity_search_by_vector_with_score(
+        self,
+        query_embedding: list[float],
+        *,
+        k: int = 5,
+        filter: dict[str, Any] | None = None,  # noqa: A002 - keep compat with old call-sites
+    ) -> list[tuple[Document, float]]:
+        if k <= 0 or not query_embedding:
             return []
 
         try:
@@ -273,13 +304,21 @@ def _resolve_local_model(model: str) -> str:
     return _LOCAL_MODEL_MAP.get(model, _DEFAULT_LOCAL_MODEL)
 
 
+def _local_embedding_ready() -> bool:
+    """本地 embedding 依赖是否就绪（onnx 后端无需 sentence-transformers/torch）。"""
+    backend = str(getattr(settings.agent, "local_embedding_backend", "torch")).lower()
+    if backend == "onnx":
+        return local_embedding_available("onnx")
+    return SENTENCE_TRANSFORMERS_AVAILABLE
+
+
 @lru_cache(maxsize=8)
 def _get_local_embedding_function(model_name: str, enable_cache: bool) -> "LocalEmbeddings":
     """
     复用本地 embedding 模型实例，避免为每个 collection 重复加载 SentenceTransformer。
     """
-    if not SENTENCE_TRANSFORMERS_AVAILABLE:
-        raise ImportError("sentence-transformers 未安装，无法使用本地 embedding")
+    if not _local_embedding_ready():
+        raise ImportError("本地 embedding 依赖未安装（sentence-transformers 或 onnxruntime）")
     return LocalEmbeddings(
         model_name=model_name,
         cache_dir=_EMBEDDING_CACHE_DIR,
@@ -309,6 +348,22 @@ def _get_openai_embedding_function(
     return OpenAIEmbeddingClient(model=model, api_key=api_key, enable_cache=bool(enable_cache))
 
 
+@lru_cache(maxsize=16)
+def _get_batched_embedding_function(embedding_function: EmbeddingFunction) -> EmbeddingFunction:
+    """为共享的 embedding 实例挂上跨线程请求合并（同一实例只包装一次，所有集合共用）。"""
+    wait_ms = float(getattr(settings.agent, "embedding_batch_wait_ms", 2.0))
+    max_batch = int(getattr(settings.agent, "embedding_batch_max", 32))
+    max_inflight = int(getattr(settings.agent, "embedding_batch_max_inflight", 4))
+    if wait_ms <= 0 or max_batch <= 1:
+        return embedding_function
+    return BatchedEmbeddings(
+        embedding_function,
+        max_wait_ms=wait_ms,
+        max_batch=max_batch,
+        max_inflight=max_inflight,
+    )
+
+
 def create_chroma_vectorstore(
     collection_name: str,
     persist_directory: str,
@@ -351,7 +406,7 @@ def create_chroma_vectorstore(
 
         # 选择 embedding 方案
         embedding_function: EmbeddingFunction
-        if use_local_embedding and SENTENCE_TRANSFORMERS_AVAILABLE:
+        if use_local_embedding and _local_embedding_ready():
             # 使用本地 embedding 模型
             logger.info("使用本地 embedding 模型: %s", model)
             local_model = _resolve_local_model(model)
@@ -373,6 +428,7 @@ def create_chroma_vectorstore(
             embedding_function = _get_openai_embedding_function(
                 model, api_base, key, bool(enable_cache)
             )
+        embedding_function = _get_batched_embedding_function(embedding_function)
 
         # 禁用 ChromaDB telemetry（避免版本兼容性问题）
         chroma_settings = ChromaSettings(
@@ -387,9 +443,7 @@ def create_chroma_vectorstore(
             client_settings=chroma_settings,
         )
 
-        embedding_type = (
-            "本地" if use_local_embedding and SENTENCE_TRANSFORMERS_AVAILABLE else "API"
-        )
+        embedding_type = "本地" if use_local_embedding and _local_embedding_ready() else "API"
         logger.info(
             "ChromaDB向量存储初始化成功: %s (路径: %s, 模型: %s, 类型: %s)",
             collection_name,
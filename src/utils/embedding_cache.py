@@ -3,6 +3,11 @@ Embedding 缓存模块 (v2.30.27)
 
 提供 embedding 结果缓存，减少 API 调用，提升性能。
 
+持久化后端:
+- ``segment``（LocalEmbeddings 默认）：定长 float32 向量追加写入单个内存映射段文件，配合紧凑的
+  hash→offset 二进制索引，批量读写无需逐文件系统调用
+- ``pickle``（旧版）：每条向量一个 ``{md5}.pkl`` 文件 + ``index.json``
+
 作者: MintChat Team
 日期: 2025-11-16
 """
@@ -11,27 +16,307 @@ from __future__ import annotations
 
 import hashlib
 import json
+import os
 import pickle
 import time
 from collections import OrderedDict
-from threading import Lock
+from threading import Lock, RLock
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - 环境依赖差异
+    np = None  # type: ignore[assignment]
+    NUMPY_AVAILABLE = False
+
+
+class SegmentEmbeddingStore:
+    """
+    追加写入的二进制 embedding 段存储
+
+    布局:
+    - ``embeddings-{dim}.f32``：同一维度的 float32 向量按行紧密排列（内存映射读取）
+    - ``embeddings.idx``：定长索引记录 ``(md5 digest, dim, row, timestamp)`` 的追加日志
+
+    同一 key 多次写入时以最后一条索引记录为准；失效/过期的行在 ``compact()`` 时回收。
+    """
+
+    INDEX_FILE = "embeddings.idx"
+    SEGMENT_PATTERN = "embeddings-{dim}.f32"
+
+    def __init__(self, directory: Path, *, min_timestamp: float = 0.0):
+        """
+        初始化段存储
+
+        Args:
+            directory: 存储目录
+            min_timestamp: 早于该 unix 时间戳的记录视为过期（用于启动时决定是否压缩）
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy 未安装，无法使用 segment embedding 存储")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.directory / self.INDEX_FILE
+
+        self._dtype = np.dtype([("key", "S16"), ("dim", "<u4"), ("row", "<u8"), ("ts", "<f8")])
+        self._lock = RLock()
+        # key -> (dim, row, timestamp)
+        self._index: Dict[bytes, Tuple[int, int, float]] = {}
+        self._rows: Dict[int, int] = {}
+        self._maps: Dict[int, Tuple["np.memmap", int]] = {}
+        self._record_count = 0
+
+        self._load()
+
+        dead = self._record_count - self._count_live(min_timestamp)
+        if dead > max(1024, len(self._index)):
+            self.compact(min_timestamp=min_timestamp)
+
+    def _segment_path(self, dim: int) -> Path:
+        return self.directory / self.SEGMENT_PATTERN.format(dim=dim)
+
+    def _load(self) -> None:
+        """加载索引日志（截断崩溃导致的半条记录，丢弃越界行）"""
+        for path in self.directory.glob("embeddings-*.f32"):
+            try:
+                dim = int(path.stem.split("-", 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if dim > 0:
+                self._rows[dim] = path.stat().st_size // (4 * dim)
+
+        if not self.index_file.exists():
+            return
+
+        try:
+            size = self.index_file.stat().st_size
+            usable = size - size % self._dtype.itemsize
+            if usable != size:
+                logger.warning("embedding 索引尾部不完整，已截断 %d 字节", size - usable)
+                with open(self.index_file, "r+b") as f:
+                    f.truncate(usable)
+            records = np.fromfile(self.index_file, dtype=self._dtype)
+        except Exception as e:
+            logger.warning("加载 embedding 段索引失败: %s", e)
+            return
+
+        self._record_count = int(records.shape[0])
+        for key, dim, row, ts in zip(
+            records["key"].tolist(),
+            records["dim"].tolist(),
+            records["row"].tolist(),
+            records["ts"].tolist(),
+        ):
+            if row < self._rows.get(dim, 0):
+                # "S16" 会去掉尾部 \x00，这里补齐为完整 digest
+                self._index[key.ljust(16, b"\x00")] = (dim, row, ts)
+
+    def _count_live(self, min_timestamp: float) -> int:
+        if min_timestamp <= 0:
+            return len(self._index)
+        return sum(1 for _, _, ts in self._index.values() if ts >= min_timestamp)
+
+    def _get_map(self, dim: int, row: int) -> Optional["np.memmap"]:
+        """获取覆盖 `row` 的内存映射（段文件追加后按需重新映射）"""
+        cached = self._maps.get(dim)
+        if cached is not None and row < cached[1]:
+            return cached[0]
+        rows = self._rows.get(dim, 0)
+        if row >= rows:
+            return None
+        mm = np.memmap(self._segment_path(dim), dtype="<f4", mode="r", shape=(rows, dim))
+        self._maps[dim] = (mm, rows)
+        return mm
+
+    def _release_maps(self) -> None:
+        # np.memmap 无显式 close：释放引用后由 GC 解除映射（Windows 下替换/删除文件前必须执行）
+        self._maps.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def get_many(
+        self, keys: Sequence[bytes], min_timestamp: float = 0.0
+    ) -> List[Optional[Tuple[List[float], float]]]:
+        """
+        批量读取向量（按维度分组，一次 fancy-index 读取）
+
+        Args:
+            keys: 16 字节 md5 digest 列表
+            min_timestamp: 早于该 unix 时间戳的记录视为未命中
+
+        Returns:
+            与 keys 等长的列表，命中为 ``(embedding, timestamp)``，否则为 None
+        """
+        results: List[Optional[Tuple[List[float], float]]] = [None] * len(keys)
+        groups: Dict[int, List[Tuple[int, int, float]]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._index.get(key)
+                if entry is None:
+                    continue
+                dim, row, ts = entry
+                if ts < min_timestamp:
+                    continue
+                groups.setdefault(dim, []).append((i, row, ts))
+
+            for dim, items in groups.items():
+                max_row = max(row for _, row, _ in items)
+                mm = self._get_map(dim, max_row)
+                if mm is None:
+                    continue
+                rows = mm[[row for _, row, _ in items]].tolist()
+                for (i, _, ts), vector in zip(items, rows):
+                    results[i] = (vector, ts)
+
+        return results
+
+    def set_many(self, items: Iterable[Tuple[bytes, Sequence[float], float]]) -> int:
+        """
+        批量追加向量（每个维度一次段文件写入 + 一次索引写入）
+
+        Args:
+            items: ``(key, embedding, timestamp)`` 序列
+
+        Returns:
+            int: 写入条数
+        """
+        groups: Dict[int, List[Tuple[bytes, Sequence[float], float]]] = {}
+        for key, embedding, ts in items:
+            dim = len(embedding)
+            if dim <= 0 or len(key) != 16:
+                continue
+            groups.setdefault(dim, []).append((key, embedding, ts))
+        if not groups:
+            return 0
+
+        written = 0
+        with self._lock:
+            for dim, group in groups.items():
+                vectors = np.asarray([emb for _, emb, _ in group], dtype="<f4")
+                start = self._rows.get(dim, 0)
+                records = np.empty(len(group), dtype=self._dtype)
+                records["key"] = [key for key, _, _ in group]
+                records["dim"] = dim
+                records["row"] = np.arange(start, start + len(group), dtype="<u8")
+                records["ts"] = [ts for _, _, ts in group]
+
+                # 先写向量再写索引：崩溃时索引最多缺少尾部记录，不会指向不存在的行
+                with open(self._segment_path(dim), "ab") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() != start * 4 * dim:
+                        # 段文件被外部截断/追加：以实际行边界为准
+                        start = f.tell() // (4 * dim)
+                        f.truncate(start * 4 * dim)
+                        records["row"] = np.arange(start, start + len(group), dtype="<u8")
+                    f.write(vectors.tobytes())
+                with open(self.index_file, "ab") as f:
+                    f.write(records.tobytes())
+
+                self._rows[dim] = start + len(group)
+                for offset, (key, _, ts) in enumerate(group):
+                    self._index[key] = (dim, start + offset, ts)
+                self._record_count += len(group)
+                written += len(group)
+
+        return written
+
+    def compact(self, *, min_timestamp: float = 0.0) -> int:
+        """
+        压缩存储：只保留每个 key 的最新且未过期的向量，重写段文件与索引
+
+        Args:
+            min_timestamp: 早于该 unix 时间戳的记录将被丢弃
+
+        Returns:
+            int: 压缩后的记录数
+        """
+        with self._lock:
+            live: Dict[int, List[Tuple[bytes, int, float]]] = {}
+            for key, (dim, row, ts) in self._index.items():
+                if ts >= min_timestamp:
+                    live.setdefault(dim, []).append((key, row, ts))
+
+            new_index: Dict[bytes, Tuple[int, int, float]] = {}
+            new_rows: Dict[int, int] = {}
+            tmp_index = self.index_file.with_suffix(".idx.tmp")
+            with open(tmp_index, "wb") as idx_out:
+                for dim, entries in live.items():
+                    entries.sort(key=lambda item: item[1])
+                    mm = self._get_map(dim, entries[-1][1])
+                    if mm is None:
+                        continue
+                    vectors = np.ascontiguousarray(mm[[row for _, row, _ in entries]])
+                    records = np.empty(len(entries), dtype=self._dtype)
+                    records["key"] = [key for key, _, _ in entries]
+                    records["dim"] = dim
+                    records["row"] = np.arange(len(entries), dtype="<u8")
+                    records["ts"] = [ts for _, _, ts in entries]
+
+                    tmp_segment = self._segment_path(dim).with_suffix(".f32.tmp")
+                    with open(tmp_segment, "wb") as seg_out:
+                        seg_out.write(vectors.astype("<f4", copy=False).tobytes())
+                    idx_out.write(records.tobytes())
+
+                    new_rows[dim] = len(entries)
+                    for row, (key, _, ts) in enumerate(entries):
+                        new_index[key] = (dim, row, ts)
+
+            self._release_maps()
+            for dim in list(self._rows):
+                if dim not in new_rows:
+                    self._segment_path(dim).unlink(missing_ok=True)
+            for dim in new_rows:
+                self._segment_path(dim).with_suffix(".f32.tmp").replace(self._segment_path(dim))
+            tmp_index.replace(self.index_file)
+
+            removed = self._record_count - len(new_index)
+            self._index = new_index
+            self._rows = new_rows
+            self._record_count = len(new_index)
+
+        logger.info("embedding 段存储压缩完成 (保留: %d, 回收: %d)", len(new_index), removed)
+        return len(new_index)
+
+    def clear(self) -> None:
+        """删除全部段文件与索引"""
+        with self._lock:
+            self._release_maps()
+            for dim in list(self._rows):
+                self._segment_path(dim).unlink(missing_ok=True)
+            self.index_file.unlink(missing_ok=True)
+            self._index.clear()
+            self._rows.clear()
+            self._record_count = 0
+
+    def close(self) -> None:
+        """释放内存映射"""
+        with self._lock:
+            self._release_maps()
+
 
 class EmbeddingCache:
     """Embedding 缓存管理器"""
 
+    BACKENDS = ("pickle", "segment")
+
     def __init__(
         self,
         cache_dir: str = "data/cache/embeddings",
         max_cache_size: int = 10000,
         cache_ttl_days: int = 30,
+        backend: str = "pickle",
     ):
         """
         初始化缓存管理器
@@ -40,6 +325,7 @@ class EmbeddingCache:
             cache_dir: 缓存目录
             max_cache_size: 最大缓存数量
             cache_ttl_days: 缓存过期天数
+            backend: 持久化后端（pickle/segment）；segment 首次启用时自动迁移旧 .pkl 缓存
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -58,17 +344,37 @@ class EmbeddingCache:
         self._dirty_count = 0
         self._last_index_save = time.monotonic()
 
+        backend = str(backend or "pickle").strip().lower()
+        if backend not in self.BACKENDS:
+            raise ValueError(f"未知的 embedding 缓存后端: {backend}")
+        if backend == "segment" and not NUMPY_AVAILABLE:
+            logger.warning("numpy 未安装，embedding 缓存回退到 pickle 后端")
+            backend = "pickle"
+        self.backend = backend
+
         # 加载持久化缓存索引
         self.index_file = self.cache_dir / "index.json"
-        self.cache_index = self._load_index()
+        self._store: Optional[SegmentEmbeddingStore] = None
+        if backend == "segment":
+            self.cache_index: Dict[str, Dict] = {}
+            self._store = SegmentEmbeddingStore(self.cache_dir, min_timestamp=self._min_timestamp())
+            if len(self._store) == 0 and any(self.cache_dir.glob("*.pkl")):
+                self.migrate_pickle_cache(remove_source=True)
+        else:
+            self.cache_index = self._load_index()
 
         logger.info(
-            "Embedding 缓存初始化完成 (目录: %s, 最大缓存: %d, TTL: %d天)",
+            "Embedding 缓存初始化完成 (目录: %s, 后端: %s, 最大缓存: %d, TTL: %d天)",
             cache_dir,
+            backend,
             max_cache_size,
             cache_ttl_days,
         )
 
+    def _min_timestamp(self) -> float:
+        """当前 TTL 下仍有效的最早 unix 时间戳"""
+        return (datetime.now() - self.cache_ttl).timestamp()
+
     def _load_index(self) -> Dict[str, Dict]:
         """加载缓存索引"""
         if self.index_file.exists():
@@ -119,6 +425,80 @@ class EmbeddingCache:
         content = f"{model}:{text}"
         return hashlib.md5(content.encode("utf-8")).hexdigest()
 
+    def _load_pickle(
+        self, cache_key: str, model: str, now: datetime
+    ) -> Optional[Tuple[List[float], datetime]]:
+        """读取单个 .pkl 缓存文件（pickle 后端）"""
+        cache_file = self.cache_dir / f"{cache_key}.pkl"
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "rb") as f:
+                data = pickle.load(f)
+
+            embedding = data.get("embedding")
+            timestamp_str = data.get("timestamp")
+            if not isinstance(embedding, list) or not timestamp_str:
+                raise ValueError("缓存文件格式不正确")
+
+            timestamp = datetime.fromisoformat(timestamp_str)
+            # 检查是否过期
+            if now - timestamp < self.cache_ttl:
+                with self._lock:
+                    self.cache_index.setdefault(
+                        cache_key, {"timestamp": timestamp_str, "model": model}
+                    )
+                return embedding, timestamp
+
+            # 过期：删除文件 + 索引（索引为 best-effort）
+            try:
+                cache_file.unlink()
+            except Exception:
+                pass
+            with self._lock:
+                if cache_key in self.cache_index:
+                    del self.cache_index[cache_key]
+                    self._index_dirty = True
+                    self._dirty_count += 1
+            self._maybe_save_index()
+        except Exception as e:
+            logger.warning("加载缓存失败 (%s): %s", cache_key, e)
+        return None
+
+    def _save_pickle(
+        self, cache_key: str, text: str, model: str, embedding: List[float], timestamp: datetime
+    ) -> None:
+        """写入单个 .pkl 缓存文件（pickle 后端）"""
+        try:
+            cache_file = self.cache_dir / f"{cache_key}.pkl"
+            with open(cache_file, "wb") as f:
+                pickle.dump(
+                    {
+                        "embedding": embedding,
+                        "timestamp": timestamp.isoformat(),
+                        "text": text[:100],  # 保存前100个字符用于调试
+                        "model": model,
+                    },
+                    f,
+                )
+
+            # 更新索引
+            with self._lock:
+                self.cache_index[cache_key] = {
+                    "timestamp": timestamp.isoformat(),
+                    "model": model,
+                }
+                self._index_dirty = True
+                self._dirty_count += 1
+
+        except Exception as e:
+            logger.error("保存缓存失败 (%s): %s", cache_key, e)
+
+    def _trim_memory_cache_locked(self) -> None:
+        if self.max_cache_size > 0:
+            while len(self.memory_cache) > self.max_cache_size:
+                self.memory_cache.popitem(last=False)
+
     def get(self, text: str, model: str) -> Optional[List[float]]:
         """
         获取缓存的 embedding
@@ -130,62 +510,71 @@ class EmbeddingCache:
         Returns:
             Optional[List[float]]: embedding 向量，未找到返回 None
         """
-        cache_key = self._get_cache_key(text, model)
+        return self.get_many([text], model)[0]
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """
+        批量获取缓存的 embedding（内存缓存一次加锁，持久化缓存一次查找）
+
+        Args:
+            texts: 文本列表
+            model: 模型名称
+
+        Returns:
+            List[Optional[List[float]]]: 与 texts 等长，未命中的位置为 None
+        """
+        keys = [self._get_cache_key(text, model) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        pending: List[int] = []
         now = datetime.now()
 
         # 1. 检查内存缓存
         with self._lock:
-            cached = self.memory_cache.get(cache_key)
-            if cached is not None:
-                embedding, timestamp = cached
-                if now - timestamp < self.cache_ttl:
-                    self.cache_hits += 1
-                    self.memory_cache.move_to_end(cache_key)
-                    return embedding
-                # 过期：移除
-                self.memory_cache.pop(cache_key, None)
-
-        # 2. 检查持久化缓存
-        cache_file = self.cache_dir / f"{cache_key}.pkl"
-        if cache_file.exists():
-            try:
-                with open(cache_file, "rb") as f:
-                    data = pickle.load(f)
-
-                embedding = data.get("embedding")
-                timestamp_str = data.get("timestamp")
-                if not isinstance(embedding, list) or not timestamp_str:
-                    raise ValueError("缓存文件格式不正确")
-
-                timestamp = datetime.fromisoformat(timestamp_str)
-                # 检查是否过期
-                if now - timestamp < self.cache_ttl:
-                    with self._lock:
-                        self.memory_cache[cache_key] = (embedding, timestamp)
+            for i, cache_key in enumerate(keys):
+                cached = self.memory_cache.get(cache_key)
+                if cached is not None:
+                    embedding, timestamp = cached
+                    if now - timestamp < self.cache_ttl:
                         self.memory_cache.move_to_end(cache_key)
-                        self.cache_index.setdefault(
-                            cache_key, {"timestamp": timestamp_str, "model": model}
-                        )
-                        self.cache_hits += 1
-                    return embedding
+                        results[i] = embedding
+                        continue
+                    # 过期：移除
+                    self.memory_cache.pop(cache_key, None)
+                pending.append(i)
 
-                # 过期：删除文件 + 索引（索引为 best-effort）
+        # 2. 检查持久化缓存
+        if pending:
+            loaded: List[Optional[Tuple[List[float], datetime]]]
+            if self._store is not None:
                 try:
-                    cache_file.unlink()
-                except Exception:
-                    pass
-                with self._lock:
-                    if cache_key in self.cache_index:
-                        del self.cache_index[cache_key]
-                        self._index_dirty = True
-                        self._dirty_count += 1
-                self._maybe_save_index()
-            except Exception as e:
-                logger.warning("加载缓存失败 (%s): %s", cache_key, e)
+                    found = self._store.get_many(
+                        [bytes.fromhex(keys[i]) for i in pending],
+                        min_timestamp=(now - self.cache_ttl).timestamp(),
+                    )
+                except Exception as e:
+                    logger.warning("批量加载 embedding 段缓存失败: %s", e)
+                    found = [None] * len(pending)
+                loaded = [
+                    (item[0], datetime.fromtimestamp(item[1])) if item is not None else None
+                    for item in found
+                ]
+            else:
+                loaded = [self._load_pickle(keys[i], model, now) for i in pending]
 
+            with self._lock:
+                for i, item in zip(pending, loaded):
+                    if item is None:
+                        continue
+                    self.memory_cache[keys[i]] = item
+                    self.memory_cache.move_to_end(keys[i])
+                    results[i] = item[0]
+                self._trim_memory_cache_locked()
+
+        hits = sum(1 for item in results if item is not None)
         with self._lock:
-            self.cache_misses += 1
-        return None
+            self.cache_hits += hits
+            self.cache_misses += len(results) - hits
+        return results
 
     def set(self, text: str, model: str, embedding: List[float]):
         """
@@ -196,48 +585,101 @@ class EmbeddingCache:
             model: 模型名称
             embedding: embedding 向量
         """
-        cache_key = self._get_cache_key(text, model)
+        self.set_many([text], model, [embedding])
+
+    def set_many(self, texts: Sequence[str], model: str, embeddings: Sequence[List[float]]) -> None:
+        """
+        批量设置缓存（segment 后端为一次追加写入）
+
+        Args:
+            texts: 文本列表
+            model: 模型名称
+            embeddings: 与 texts 等长的 embedding 向量列表
+        """
+        if len(texts) != len(embeddings):
+            raise ValueError("texts 与 embeddings 数量不一致")
+        if not texts:
+            return
+
+        keys = [self._get_cache_key(text, model) for text in texts]
         timestamp = datetime.now()
 
         # 1. 保存到内存缓存
         with self._lock:
-            self.memory_cache[cache_key] = (embedding, timestamp)
-            self.memory_cache.move_to_end(cache_key)
+            for cache_key, embedding in zip(keys, embeddings):
+                self.memory_cache[cache_key] = (embedding, timestamp)
+                self.memory_cache.move_to_end(cache_key)
 
         # 2. 保存到持久化缓存
-        try:
-            cache_file = self.cache_dir / f"{cache_key}.pkl"
-            with open(cache_file, "wb") as f:
-                pickle.dump(
-                    {
-                        "embedding": embedding,
-                        "timestamp": timestamp.isoformat(),
-                        "text": text[:100],  # 保存前100个字符用于调试
-                        "model": model,
-                    },
-                    f,
+        if self._store is not None:
+            ts = timestamp.timestamp()
+            try:
+                self._store.set_many(
+                    (bytes.fromhex(cache_key), embedding, ts)
+                    for cache_key, embedding in zip(keys, embeddings)
                 )
-
-            # 更新索引
-            with self._lock:
-                self.cache_index[cache_key] = {
-                    "timestamp": timestamp.isoformat(),
-                    "model": model,
-                }
-                self._index_dirty = True
-                self._dirty_count += 1
-
-        except Exception as e:
-            logger.error("保存缓存失败 (%s): %s", cache_key, e)
+            except Exception as e:
+                logger.error("批量保存 embedding 段缓存失败: %s", e)
+        else:
+            for cache_key, text, embedding in zip(keys, texts, embeddings):
+                self._save_pickle(cache_key, text, model, embedding, timestamp)
 
         # 3. 清理过大的内存缓存
         with self._lock:
-            if self.max_cache_size > 0:
-                while len(self.memory_cache) > self.max_cache_size:
-                    self.memory_cache.popitem(last=False)
+            self._trim_memory_cache_locked()
 
         self._maybe_save_index()
 
+    def migrate_pickle_cache(self, *, remove_source: bool = False, batch_size: int = 1000) -> int:
+        """
+        将旧版 ``{md5}.pkl`` 缓存目录迁移到 segment 后端
+
+        Args:
+            remove_source: 迁移成功后是否删除 .pkl 文件与 index.json
+            batch_size: 每批追加写入的条数
+
+        Returns:
+            int: 迁移的向量数量
+        """
+        if self._store is None:
+            raise RuntimeError("仅 segment 后端支持迁移旧版 pickle 缓存")
+
+        min_ts = self._min_timestamp()
+        migrated = 0
+        batch: List[Tuple[bytes, List[float], float]] = []
+        migrated_files: List[Path] = []
+
+        for cache_file in self.cache_dir.glob("*.pkl"):
+            try:
+                key = bytes.fromhex(cache_file.stem)
+                with open(cache_file, "rb") as f:
+                    data = pickle.load(f)
+                embedding = data.get("embedding")
+                ts = datetime.fromisoformat(data.get("timestamp")).timestamp()
+            except Exception as e:
+                logger.debug("跳过无法迁移的缓存文件 %s: %s", cache_file.name, e)
+                continue
+            migrated_files.append(cache_file)
+            if len(key) != 16 or not isinstance(embedding, list) or ts < min_ts:
+                continue
+            batch.append((key, embedding, ts))
+            if len(batch) >= batch_size:
+                migrated += self._store.set_many(batch)
+                batch = []
+        if batch:
+            migrated += self._store.set_many(batch)
+
+        if remove_source:
+            for cache_file in migrated_files:
+                try:
+                    cache_file.unlink()
+                except Exception:
+                    pass
+            self.index_file.unlink(missing_ok=True)
+
+        logger.info("已迁移 %d 条 pickle embedding 缓存到 segment 后端", migrated)
+        return migrated
+
     def get_stats(self) -> Dict:
         """获取缓存统计"""
         with self._lock:
@@ -245,6 +687,8 @@ class EmbeddingCache:
             misses = self.cache_misses
             memory_size = len(self.memory_cache)
             disk_size = len(self.cache_index)
+        if self._store is not None:
+            disk_size = len(self._store)
 
         total_requests = hits + misses
         hit_rate = hits / total_requests * 100 if total_requests > 0 else 0
@@ -255,6 +699,7 @@ class EmbeddingCache:
             "hit_rate": f"{hit_rate:.1f}%",
             "memory_cache_size": memory_size,
             "disk_cache_size": disk_size,
+            "backend": self.backend,
         }
 
     def clear(self):
@@ -262,12 +707,24 @@ class EmbeddingCache:
         with self._lock:
             self.memory_cache.clear()
             self.cache_index.clear()
-            self._index_dirty = True
-            self._dirty_count += 1
-        self._maybe_save_index(force=True)
+            if self._store is None:
+                self._index_dirty = True
+                self._dirty_count += 1
+
+        if self._store is not None:
+            # 段存储自带索引，不再写出旧版 index.json
+            self._store.clear()
+        else:
+            self._maybe_save_index(force=True)
 
         # 删除所有缓存文件
         for cache_file in self.cache_dir.glob("*.pkl"):
             cache_file.unlink()
 
         logger.info("已清空所有缓存")
+
+    def close(self) -> None:
+        """落盘索引并释放内存映射"""
+        self._maybe_save_index(force=self.backend == "pickle" and self._index_dirty)
+        if self._store is not None:
+            self._store.close()
@@ -0,0 +1,320 @@
+"""
+跨线程 embedding 请求合并（micro-batching dispatcher）
+
+记忆检索、长期记忆批量写入、核心记忆检索、表情包描述等路径各自调用
+``embed_query`` / ``embed_documents``；并发会话下这些单条请求会逐个触发模型前向或 API 往返。
+
+``EmbeddingDispatcher`` 在数毫秒窗口内收集各线程提交的请求（凑满 ``max_batch`` 条立即出发），
+去重后合并为一次批量调用，再把结果按请求分发到各自的 Future；最多 ``max_inflight`` 个批次同时计算，
+大批量写入（归档导入、flush_batch）不会挡住聊天路径上的查询：
+- 本地模型：多条查询共享一次前向，GPU/CPU 利用率更高
+- API embedding：多次 HTTP 往返合并为一次，降低单请求开销与限流风险
+
+``BatchedEmbeddings`` 把任意 embedding 函数（LocalEmbeddings / OpenAIEmbeddingClient）包装为
+同一接口，由 ``create_chroma_vectorstore`` 统一使用。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Sequence
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+EncodeBatch = Callable[[List[str]], List[List[float]]]
+
+
+@dataclass(slots=True)
+class _Request:
+    texts: List[str]
+    future: "Future[List[List[float]]]"
+    enqueued: float
+
+
+@dataclass(slots=True)
+class _DispatchStats:
+    requests: int = 0
+    texts: int = 0
+    batches: int = 0
+    encoded: int = 0
+    deduplicated: int = 0
+    max_batch: int = 0
+    wait_ms: float = 0.0
+    sizes: Dict[int, int] = field(default_factory=dict)
+
+
+class EmbeddingDispatcher:
+    """
+    跨线程合并 embedding 请求（后台工作线程按需启动，最多 ``max_inflight`` 个）
+
+    首个请求到达后最多等待 ``max_wait_ms`` 收集同伴；排队文本数达到 ``max_batch`` 时立即出发。
+    同一时刻只有一个线程在收集批次，取走后在锁外计算，其余空闲线程继续收集下一批。
+    单个请求不会被拆分（超过 ``max_batch`` 的批量写入单独成批）。
+    合并批次失败时退回逐请求计算，异常只传给文本导致失败的那个调用方。
+    """
+
+    def __init__(
+        self,
+        encode_batch: EncodeBatch,
+        *,
+        max_wait_ms: float = 2.0,
+        max_batch: int = 32,
+        max_inflight: int = 4,
+        name: str = "embedding-dispatcher",
+    ) -> None:
+        self._encode_batch = encode_batch
+        self._max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._max_batch = max(1, int(max_batch))
+        self._max_inflight = max(1, int(max_inflight))
+        self._name = name
+        self._cond = threading.Condition()
+        self._queue: Deque[_Request] = deque()
+        self._queued_texts = 0
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+        self._collecting = False
+        self._closed = False
+        self._stats = _DispatchStats()
+
+    # ----------------------------- 提交接口 -----------------------------
+
+    def submit(self, texts: Sequence[str]) -> "Future[List[List[float]]]":
+        """提交一组文本，返回按输入顺序给出向量列表的 Future。"""
+        future: "Future[List[List[float]]]" = Future()
+        batch = [str(t) for t in texts]
+        if not batch:
+            future.set_result([])
+            return future
+
+        with self._cond:
+            if not self._closed:
+                self._queue.append(_Request(batch, future, time.monotonic()))
+                self._queued_texts += len(batch)
+                self._stats.requests += 1
+                self._stats.texts += len(batch)
+                self._ensure_worker_locked()
+                self._cond.notify_all()
+                return future
+
+        # 已关闭（进程退出阶段）：在调用线程内直接计算
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(self._encode_batch(batch))
+        except BaseException as exc:  # noqa: BLE001 - 交给调用方
+            future.set_exception(exc)
+        return future
+
+    def submit_query(self, text: str) -> "Future[List[float]]":
+        """提交单条查询，返回向量的 Future。"""
+        outer: "Future[List[float]]" = Future()
+
+        def _unwrap(inner: "Future[List[List[float]]]") -> None:
+            exc = inner.exception()
+            if exc is not None:
+                outer.set_exception(exc)
+            else:
+                outer.set_result(inner.result()[0])
+
+        self.submit([text]).add_done_callback(_unwrap)
+        return outer
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return self.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text]).result()[0]
+
+    # ----------------------------- 生命周期 -----------------------------
+
+    def close(self, timeout: float = 5.0) -> None:
+        """停止后台线程（已排队的请求会先处理完）。"""
+        with self._cond:
+            self._closed = True
+            threads = list(self._threads)
+            self._cond.notify_all()
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = self._stats
+            batches = stats.batches
+            return {
+                "requests": stats.requests,
+                "texts": stats.texts,
+                "batches": batches,
+                "avg_batch": round(stats.encoded / batches, 2) if batches else 0.0,
+                "max_batch": stats.max_batch,
+                "deduplicated": stats.deduplicated,
+                "avg_wait_ms": round(stats.wait_ms / batches, 3) if batches else 0.0,
+                "batch_sizes": dict(sorted(stats.sizes.items())),
+                "max_wait_ms": round(self._max_wait_s * 1000.0, 3),
+                "max_batch_limit": self._max_batch,
+                "workers": len(self._threads),
+                "max_inflight": self._max_inflight,
+            }
+
+    # ----------------------------- 内部方法 -----------------------------
+
+    def _ensure_worker_locked(self) -> None:
+        # 有空闲线程就交给它；全部忙于计算时再加一个，直到 max_inflight
+        self._threads = [t for t in self._threads if t.is_alive()]
+        if self._idle > 0 or len(self._threads) >= self._max_inflight:
+            return
+        thread = threading.Thread(
+            target=self._run, name=f"{self._name}-{len(self._threads)}", daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _take_batch_locked(self) -> List[_Request]:
+        """调用方持有条件锁：等待窗口结束或凑满 max_batch，取出一批请求。"""
+        deadline = self._queue[0].enqueued + self._max_wait_s
+        while self._queued_texts < self._max_batch and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        batch: List[_Request] = []
+        size = 0
+        while self._queue:
+            head = self._queue[0]
+            if batch and size + len(head.texts) > self._max_batch:
+                break
+            self._queue.popleft()
+            self._queued_texts -= len(head.texts)
+            size += len(head.texts)
+            if head.future.set_running_or_notify_cancel():
+                batch.append(head)
+        if batch:
+            self._stats.wait_ms += (time.monotonic() - batch[0].enqueued) * 1000.0
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                # 同一时刻只有一个线程收集窗口，避免多个空闲线程把同一窗口拆成碎批
+                self._idle += 1
+                while self._collecting or (not self._queue and not self._closed):
+                    self._cond.wait()
+                self._idle -= 1
+                if not self._queue:
+                    return
+                self._collecting = True
+                try:
+                    batch = self._take_batch_locked()
+                finally:
+                    self._collecting = False
+                    self._cond.notify_all()
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        # 去重：同一窗口内的重复文本只计算一次
+        positions: Dict[str, int] = {}
+        unique: List[str] = []
+        total = 0
+        for request in batch:
+            total += len(request.texts)
+            for text in request.texts:
+                if text not in positions:
+                    positions[text] = len(unique)
+                    unique.append(text)
+
+        with self._cond:
+            stats = self._stats
+            stats.batches += 1
+            stats.encoded += len(unique)
+            stats.deduplicated += total - len(unique)
+            stats.max_batch = max(stats.max_batch, len(unique))
+            stats.sizes[len(unique)] = stats.sizes.get(len(unique), 0) + 1
+
+        try:
+            vectors = self._encode_checked(unique)
+        except BaseException as exc:  # noqa: BLE001 - 交给调用方
+            if len(batch) == 1 or not isinstance(exc, Exception):
+                for request in batch:
+                    request.future.set_exception(exc)
+                return
+            # 某个调用方的文本拖垮了整批：逐请求重算，只让出问题的请求收到异常
+            logger.debug("embedding 合并请求失败（%d 条），逐请求重试: %s", len(unique), exc)
+            for request in batch:
+                self._dispatch_single(request)
+            return
+
+        for request in batch:
+            request.future.set_result([vectors[positions[text]] for text in request.texts])
+
+    def _dispatch_single(self, request: _Request) -> None:
+        try:
+            request.future.set_result(self._encode_checked(request.texts))
+        except BaseException as exc:  # noqa: BLE001 - 交给调用方
+            request.future.set_exception(exc)
+
+    def _encode_checked(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._encode_batch(texts)
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"embedding 返回数量异常: expected={len(texts)} got={len(vectors)}")
+        return vectors
+
+
+class BatchedEmbeddings:
+    """
+    为 embedding 函数加上跨线程合并（接口与被包装对象一致）
+
+    查询与文档写入共用同一个 dispatcher（最多 ``max_inflight`` 个批次并行）；
+    其它属性（如 ``get_stats``、``model_name``）透传给被包装对象。
+    """
+
+    def __init__(
+        self,
+        embedding_function: Any,
+        *,
+        max_wait_ms: float = 2.0,
+        max_batch: int = 32,
+        max_inflight: int = 4,
+    ) -> None:
+        self.embedding_function = embedding_function
+        self.dispatcher = EmbeddingDispatcher(
+            embedding_function.embed_documents,
+            max_wait_ms=max_wait_ms,
+            max_batch=max_batch,
+            max_inflight=max_inflight,
+            name=f"embedding-dispatcher-{type(embedding_function).__name__}",
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.dispatcher.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.dispatcher.embed_query(text)
+
+    def submit_query(self, text: str) -> "Future[List[float]]":
+        return self.dispatcher.submit_query(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        inner = getattr(self.embedding_function, "get_stats", None)
+        stats: Dict[str, Any] = dict(inner()) if callable(inner) else {}
+        stats["dispatch"] = self.dispatcher.stats()
+        return stats
+
+    def close(self) -> None:
+        self.dispatcher.close()
+
+    def __getattr__(self, name: str) -> Any:
+        inner = self.__dict__.get("embedding_function")
+        if inner is None:
+            raise AttributeError(name)
+        return getattr(inner, name)
+
+
+__all__ = ["BatchedEmbeddings", "EmbeddingDispatcher"]
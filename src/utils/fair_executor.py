@@ -0,0 +1,293 @@
+"""
+按用户公平调度的共享线程池
+
+多个会话共用一组工作线程时，普通 ``ThreadPoolExecutor`` 按提交顺序 FIFO 执行：
+某个用户一次提交大量任务（批量导入、长时间流式输出）会把其他用户的请求压在队尾。
+
+``FairShareExecutor`` 为每个用户维护独立队列，工作线程按轮转（round-robin）在有待执行任务的
+用户之间取任务，并限制每个用户同时占用的线程数（``per_user_limit``）：
+- 空闲用户不占线程；线程按需创建，空闲超过 ``idle_timeout_s`` 后退出
+- ``for_user(key)`` 返回 ``concurrent.futures.Executor`` 兼容视图，可直接替换原先的私有线程池；
+  视图的 ``shutdown`` 只取消/等待该视图提交的任务，不影响共享线程
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class _WorkItem:
+    future: Future
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    enqueued: float
+
+
+class FairShareExecutor:
+    """
+    共享线程池：按用户轮转取任务，并限制单用户并发
+
+    Args:
+        max_workers: 工作线程上限（所有用户共享）
+        per_user_limit: 单个用户同时运行的任务数上限
+        thread_name_prefix: 工作线程名前缀
+        idle_timeout_s: 工作线程空闲多久后退出
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        per_user_limit: int = 2,
+        thread_name_prefix: str = "mintchat-fair",
+        idle_timeout_s: float = 60.0,
+    ) -> None:
+        self._max_workers = max(1, int(max_workers))
+        self._per_user_limit = max(1, int(per_user_limit))
+        self._thread_name_prefix = thread_name_prefix
+        self._idle_timeout_s = max(0.1, float(idle_timeout_s))
+        self._cond = threading.Condition()
+        self._queues: Dict[Hashable, Deque[_WorkItem]] = {}
+        self._running: Dict[Hashable, int] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._ready_set: Set[Hashable] = set()
+        self._threads: Set[threading.Thread] = set()
+        self._idle_workers = 0
+        self._thread_seq = 0
+        self._shutdown = False
+        self._stats = {"submitted": 0, "completed": 0, "cancelled": 0, "max_queue_wait_ms": 0.0}
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    @property
+    def per_user_limit(self) -> int:
+        return self._per_user_limit
+
+    # ----------------------------- 提交接口 -----------------------------
+
+    def submit_for(
+        self, key: Hashable, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> Future:
+        """以用户 ``key`` 的名义提交任务。"""
+        future: Future = Future()
+        item = _WorkItem(future, fn, args, kwargs, time.monotonic())
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queues.setdefault(key, deque()).append(item)
+            self._running.setdefault(key, 0)
+            self._mark_ready_locked(key)
+            self._stats["submitted"] += 1
+            if self._idle_workers > 0:
+                self._cond.notify()
+            elif len(self._threads) < self._max_workers:
+                self._spawn_worker_locked()
+        return future
+
+    def for_user(self, key: Hashable) -> "UserExecutor":
+        """返回绑定到用户 ``key`` 的 Executor 视图。"""
+        return UserExecutor(self, key)
+
+    def cancel_pending(self, key: Hashable, futures: Optional[Set[Future]] = None) -> int:
+        """取消用户尚未开始的任务（``futures`` 给出时只取消其中的任务）。返回取消数量。"""
+        with self._cond:
+            queue = self._queues.get(key)
+            if not queue:
+                return 0
+            kept: Deque[_WorkItem] = deque()
+            dropped = []
+            for item in queue:
+                if futures is None or item.future in futures:
+                    dropped.append(item)
+                else:
+                    kept.append(item)
+            self._queues[key] = kept
+            self._cleanup_key_locked(key)
+            self._stats["cancelled"] += len(dropped)
+        for item in dropped:
+            item.future.cancel()
+        return len(dropped)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """停止接收任务；``cancel_futures`` 时取消所有排队任务。"""
+        with self._cond:
+            self._shutdown = True
+            dropped = []
+            if cancel_futures:
+                for queue in self._queues.values():
+                    dropped.extend(queue)
+                    queue.clear()
+                self._ready.clear()
+                self._ready_set.clear()
+            threads = list(self._threads)
+            self._cond.notify_all()
+        for item in dropped:
+            item.future.cancel()
+        if wait:
+            current = threading.current_thread()
+            for thread in threads:
+                if thread is not current:
+                    thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            users = {
+                str(key): {"queued": len(self._queues.get(key) or ()), "running": running}
+                for key, running in self._running.items()
+            }
+            return {
+                **self._stats,
+                "threads": len(self._threads),
+                "idle_threads": self._idle_workers,
+                "max_workers": self._max_workers,
+                "per_user_limit": self._per_user_limit,
+                "users": users,
+            }
+
+    # ----------------------------- 调度 -----------------------------
+
+    def _mark_ready_locked(self, key: Hashable) -> None:
+        if key in self._ready_set:
+            return
+        if self._queues.get(key) and self._running.get(key, 0) < self._per_user_limit:
+            self._ready.append(key)
+            self._ready_set.add(key)
+
+    def _cleanup_key_locked(self, key: Hashable) -> None:
+        # 用户无排队且无运行任务时移除状态，空闲会话不在调度器中留痕
+        if not self._queues.get(key) and not self._running.get(key, 0):
+            self._queues.pop(key, None)
+            self._running.pop(key, None)
+            if key in self._ready_set:
+                self._ready_set.discard(key)
+                try:
+                    self._ready.remove(key)
+                except ValueError:
+                    pass
+
+    def _spawn_worker_locked(self) -> None:
+        self._thread_seq += 1
+        thread = threading.Thread(
+            target=self._worker,
+            name=f"{self._thread_name_prefix}_{self._thread_seq}",
+            daemon=True,
+        )
+        self._threads.add(thread)
+        thread.start()
+
+    def _take_locked(self) -> Optional[tuple[Hashable, _WorkItem]]:
+        while self._ready:
+            key = self._ready.popleft()
+            self._ready_set.discard(key)
+            queue = self._queues.get(key)
+            if not queue or self._running.get(key, 0) >= self._per_user_limit:
+                continue
+            item = queue.popleft()
+            self._running[key] = self._running.get(key, 0) + 1
+            # 仍有任务且未达上限：排到轮转队尾，让其他用户先取
+            self._mark_ready_locked(key)
+            return key, item
+        return None
+
+    def _worker(self) -> None:
+        current = threading.current_thread()
+        while True:
+            with self._cond:
+                taken = self._take_locked()
+                while taken is None:
+                    if self._shutdown and not self._ready:
+                        self._threads.discard(current)
+                        return
+                    self._idle_workers += 1
+                    notified = self._cond.wait(timeout=self._idle_timeout_s)
+                    self._idle_workers -= 1
+                    taken = self._take_locked()
+                    if taken is None and not notified:
+                        self._threads.discard(current)
+                        return
+            key, item = taken
+            self._run_item(item)
+            with self._cond:
+                self._running[key] = max(0, self._running.get(key, 0) - 1)
+                self._stats["completed"] += 1
+                self._mark_ready_locked(key)
+                self._cleanup_key_locked(key)
+                if self._ready and self._idle_workers > 0:
+                    self._cond.notify()
+
+    def _run_item(self, item: _WorkItem) -> None:
+        future = item.future
+        if not future.set_running_or_notify_cancel():
+            return
+        wait_ms = (time.monotonic() - item.enqueued) * 1000.0
+        if wait_ms > self._stats["max_queue_wait_ms"]:
+            self._stats["max_queue_wait_ms"] = wait_ms
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+
+class UserExecutor(Executor):
+    """
+    ``FairShareExecutor`` 上某个用户的 Executor 视图
+
+    ``shutdown`` 只作用于本视图提交的任务：取消排队中的任务（``cancel_futures``）、
+    等待运行中的任务（``wait``），之后拒绝新任务；共享线程继续为其他用户服务。
+    """
+
+    def __init__(self, pool: FairShareExecutor, key: Hashable) -> None:
+        self._pool = pool
+        self._key = key
+        self._lock = threading.Lock()
+        self._pending: Set[Future] = set()
+        self._shutdown = False
+
+    @property
+    def key(self) -> Hashable:
+        return self._key
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future = self._pool.submit_for(self._key, fn, *args, **kwargs)
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            pending = set(self._pending)
+        if cancel_futures and pending:
+            self._pool.cancel_pending(self._key, pending)
+        if wait and pending:
+            wait_futures(pending)
+
+    def _discard(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+
+__all__ = ["FairShareExecutor", "UserExecutor"]
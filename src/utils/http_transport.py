@@ -0,0 +1,377 @@
+"""
+进程级 HTTP 传输注册表
+
+按 base_url 的 origin（scheme://host:port）复用同一个 httpx 连接池：
+- 主 LLM、视觉 LLM、工具选择器、API embedding 等客户端共享连接，避免各自重复 TLS 握手
+- 可用时启用 HTTP/2（需要可选依赖 `h2`，未安装时自动回退 HTTP/1.1 keep-alive）
+- 支持后台预热（Agent 初始化时提前建立连接，首个请求无需再握手）
+- 通过 httpcore trace 扩展统计新建连接数、复用率与握手耗时
+
+注意：
+- 共享的 httpx.Client 不应由使用方关闭；进程退出时统一调用 `close_transport_registry()`
+- httpx.AsyncClient 绑定在创建它的事件循环上，因此异步客户端按 (origin, loop) 缓存
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:  # h2 随 httpx[http2] 安装；精简环境缺失时回退 HTTP/1.1
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - 取决于运行环境
+    HTTP2_AVAILABLE = False
+
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_MAX_KEEPALIVE = 16
+DEFAULT_KEEPALIVE_EXPIRY_S = 90.0
+DEFAULT_WARMUP_TIMEOUT_S = 5.0
+
+
+def normalize_origin(base_url: str) -> str:
+    """将 base_url 归一化为连接池键（scheme://host:port），无法解析时原样返回。"""
+    raw = str(base_url or "").strip()
+    if not raw:
+        return "https://api.openai.com:443"
+    try:
+        parsed = urlparse(raw)
+    except Exception:
+        return raw
+    if not parsed.scheme or not parsed.hostname:
+        return raw
+    scheme = parsed.scheme.lower()
+    port = parsed.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{parsed.hostname.lower()}:{port}"
+
+
+@dataclass(slots=True)
+class TransportStats:
+    """单个 origin 的连接池统计（跨线程读写，使用内部锁保护）"""
+
+    origin: str
+    http2: bool
+    requests: int = 0
+    new_connections: int = 0
+    handshakes: int = 0
+    handshake_total_ms: float = 0.0
+    handshake_max_ms: float = 0.0
+    warmup_ms: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def on_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def on_connect(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    def on_handshake(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.handshakes += 1
+            self.handshake_total_ms += elapsed_ms
+            self.handshake_max_ms = max(self.handshake_max_ms, elapsed_ms)
+
+    def snapshot(self, open_connections: int) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.requests
+            new_connections = self.new_connections
+            handshakes = self.handshakes
+            handshake_total_ms = self.handshake_total_ms
+            handshake_max_ms = self.handshake_max_ms
+        reuse_ratio = 0.0
+        if requests > 0:
+            reuse_ratio = max(0.0, 1.0 - new_connections / requests)
+        return {
+            "http2": self.http2,
+            "requests": requests,
+            "new_connections": new_connections,
+            "open_connections": open_connections,
+            "reuse_ratio": round(reuse_ratio, 4),
+            "handshake_avg_ms": round(handshake_total_ms / handshakes, 2) if handshakes else 0.0,
+            "handshake_max_ms": round(handshake_max_ms, 2),
+            "warmup_ms": None if self.warmup_ms is None else round(self.warmup_ms, 2),
+        }
+
+
+class _HandshakeTimer:
+    """单次请求的 httpcore trace 回调：记录新建连接及 TCP+TLS 握手耗时。"""
+
+    __slots__ = ("_stats", "_connect_started")
+
+    def __init__(self, stats: TransportStats) -> None:
+        self._stats = stats
+        self._connect_started: Optional[float] = None
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = time.perf_counter()
+            self._stats.on_connect()
+            return
+        started = self._connect_started
+        if started is None:
+            return
+        # TLS 完成即握手结束；明文 HTTP 则以首个 http11/http2 事件为界
+        if event_name == "connection.start_tls.complete" or not event_name.startswith(
+            "connection."
+        ):
+            self._connect_started = None
+            self._stats.on_handshake((time.perf_counter() - started) * 1000.0)
+
+
+class _AsyncHandshakeTimer(_HandshakeTimer):
+    __slots__ = ()
+
+    async def __call__(  # type: ignore[override]
+        self, event_name: str, info: Dict[str, Any]
+    ) -> None:
+        _HandshakeTimer.__call__(self, event_name, info)
+
+
+class HttpTransportRegistry:
+    """按 origin 复用 httpx 客户端的注册表（线程安全）。"""
+
+    def __init__(
+        self,
+        *,
+        http2: Optional[bool] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+        keepalive_expiry_s: float = DEFAULT_KEEPALIVE_EXPIRY_S,
+    ) -> None:
+        want_http2 = True if http2 is None else bool(http2)
+        if want_http2 and not HTTP2_AVAILABLE:
+            logger.info("未安装 h2，共享 HTTP 连接池使用 HTTP/1.1 keep-alive")
+        self._http2 = want_http2 and HTTP2_AVAILABLE
+        self._limits = httpx.Limits(
+            max_connections=max(1, int(max_connections)),
+            max_keepalive_connections=max(1, int(max_keepalive_connections)),
+            keepalive_expiry=max(1.0, float(keepalive_expiry_s)),
+        )
+        self._lock = threading.Lock()
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[Tuple[str, int], Tuple[Any, httpx.AsyncClient]] = {}
+        self._async_refs: Dict[int, int] = {}
+        self._stats: Dict[str, TransportStats] = {}
+
+    def _get_stats(self, origin: str) -> TransportStats:
+        stats = self._stats.get(origin)
+        if stats is None:
+            stats = TransportStats(origin=origin, http2=self._http2)
+            self._stats[origin] = stats
+        return stats
+
+    def get_client(self, base_url: str) -> httpx.Client:
+        """
+        获取 base_url 对应的共享同步客户端
+
+        Args:
+            base_url: API 地址（仅 origin 参与复用）
+
+        Returns:
+            httpx.Client: 共享客户端（调用方不要关闭）
+        """
+        origin = normalize_origin(base_url)
+        client = self._clients.get(origin)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(origin)
+            if client is None:
+                stats = self._get_stats(origin)
+
+                def _on_request(request: httpx.Request) -> None:
+                    stats.on_request()
+                    request.extensions["trace"] = _HandshakeTimer(stats)
+
+                client = httpx.Client(
+                    http2=self._http2,
+                    limits=self._limits,
+                    event_hooks={"request": [_on_request]},
+                )
+                self._clients[origin] = client
+            return client
+
+    def get_async_client(self, base_url: str) -> httpx.AsyncClient:
+        """
+        获取 base_url 对应、绑定当前事件循环的共享异步客户端
+
+        Args:
+            base_url: API 地址（仅 origin 参与复用）
+
+        Returns:
+            httpx.AsyncClient: 共享客户端（调用方不要关闭，用完通过 release_async_client 归还）
+        """
+        origin = normalize_origin(base_url)
+        loop = asyncio.get_running_loop()
+        key = (origin, id(loop))
+        with self._lock:
+            cached = self._async_clients.get(key)
+            if cached is not None and cached[0] is loop:
+                self._async_refs[id(cached[1])] = self._async_refs.get(id(cached[1]), 0) + 1
+                return cached[1]
+            # 丢弃已关闭事件循环上的客户端（其连接已随事件循环失效）
+            for stale in [k for k, (lp, _) in self._async_clients.items() if lp.is_closed()]:
+                self._async_refs.pop(id(self._async_clients.pop(stale)[1]), None)
+            stats = self._get_stats(origin)
+
+            async def _on_request(request: httpx.Request) -> None:
+                stats.on_request()
+                request.extensions["trace"] = _AsyncHandshakeTimer(stats)
+
+            client = httpx.AsyncClient(
+                http2=self._http2,
+                limits=self._limits,
+                event_hooks={"request": [_on_request]},
+            )
+            self._async_clients[key] = (loop, client)
+            self._async_refs[id(client)] = 1
+            return client
+
+    async def release_async_client(self, client: httpx.AsyncClient) -> None:
+        """
+        归还 get_async_client 取得的客户端；最后一个持有者归还时关闭其连接池
+
+        需在客户端所绑定的事件循环上调用。
+        """
+        with self._lock:
+            refs = self._async_refs.get(id(client), 0) - 1
+            if refs > 0:
+                self._async_refs[id(client)] = refs
+                return
+            self._async_refs.pop(id(client), None)
+            for key in [k for k, (_, c) in self._async_clients.items() if c is client]:
+                del self._async_clients[key]
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+    def warmup(self, base_url: str, *, timeout_s: float = DEFAULT_WARMUP_TIMEOUT_S) -> None:
+        """
+        后台预热：对 base_url 发起一次轻量请求以提前完成 TCP/TLS 握手
+
+        任何 HTTP 状态码都视为成功（连接会留在池中复用）；网络错误仅记录 debug 日志。
+        """
+        raw = str(base_url or "").strip()
+        if not raw:
+            return
+        origin = normalize_origin(raw)
+        client = self.get_client(raw)
+
+        def _run() -> None:
+            started = time.perf_counter()
+            try:
+                client.head(raw, timeout=max(0.5, float(timeout_s)))
+            except Exception as exc:
+                logger.debug("HTTP 连接预热失败（可忽略）: %s %s", origin, exc)
+                return
+            self._get_stats(origin).warmup_ms = (time.perf_counter() - started) * 1000.0
+
+        threading.Thread(target=_run, name="mintchat-http-warmup", daemon=True).start()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回各 origin 的连接池统计（open_connections 为同步+异步客户端的连接数合计）。"""
+        with self._lock:
+            clients = dict(self._clients)
+            async_clients = [(key[0], client) for key, (_, client) in self._async_clients.items()]
+            stats = dict(self._stats)
+        open_counts: Dict[str, int] = {}
+        for origin, client in list(clients.items()) + async_clients:
+            open_counts[origin] = open_counts.get(origin, 0) + _open_connections(client)
+        return {origin: item.snapshot(open_counts.get(origin, 0)) for origin, item in stats.items()}
+
+    def close_all(self) -> None:
+        """关闭全部同步客户端；异步客户端由其事件循环回收，这里只释放引用。"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+            self._async_refs.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+def _open_connections(client: Any) -> int:
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    try:
+        return sum(1 for conn in getattr(pool, "connections", []) if not conn.is_closed())
+    except Exception:
+        return 0
+
+
+_registry: Optional[HttpTransportRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_transport_registry() -> HttpTransportRegistry:
+    """获取进程级传输注册表（首次调用时按 settings.agent 配置创建）。"""
+    global _registry
+    if _registry is not None:
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            try:
+                from src.config.settings import settings
+
+                agent_cfg = settings.agent
+                _registry = HttpTransportRegistry(
+                    http2=bool(getattr(agent_cfg, "llm_http2_enabled", True)),
+                    max_connections=int(
+                        getattr(agent_cfg, "llm_http_max_connections", DEFAULT_MAX_CONNECTIONS)
+                    ),
+                    keepalive_expiry_s=float(
+                        getattr(agent_cfg, "llm_http_keepalive_s", DEFAULT_KEEPALIVE_EXPIRY_S)
+                    ),
+                )
+            except Exception:
+                _registry = HttpTransportRegistry()
+    return _registry
+
+
+def close_transport_registry() -> None:
+    """关闭并丢弃进程级注册表（程序退出时调用；未创建过注册表时为空操作）。"""
+    global _registry
+    with _registry_lock:
+        registry = _registry
+        _registry = None
+    if registry is not None:
+        registry.close_all()
+
+
+def get_http_client(base_url: str) -> httpx.Client:
+    """获取 base_url 对应的共享 httpx.Client（便捷函数）。"""
+    return get_transport_registry().get_client(base_url)
+
+
+def get_async_http_client(base_url: str) -> httpx.AsyncClient:
+    """获取 base_url 对应、绑定当前事件循环的共享 httpx.AsyncClient（便捷函数）。"""
+    return get_transport_registry().get_async_client(base_url)
+
+
+async def release_async_http_client(client: httpx.AsyncClient) -> None:
+    """归还 get_async_http_client 取得的共享异步客户端（便捷函数）。"""
+    await get_transport_registry().release_async_client(client)
+
+
+def get_transport_stats() -> Dict[str, Dict[str, Any]]:
+    """获取全部 origin 的连接池统计（未创建注册表时返回空字典）。"""
+    registry = _registry
+    if registry is None:
+        return {}
+    return registry.stats()
@@ -4,41 +4,77 @@
 支持本地 sentence-transformers 模型，避免 API 调用延迟。
 支持GPU加速，自动检测CUDA可用性。
 
+后端:
+- ``torch``（默认）：SentenceTransformer（PyTorch，可用 GPU）
+- ``onnx``：ONNX Runtime + int8 量化权重（纯 CPU，不导入 torch，启动与单条查询更快）
+
+跨线程的请求合并见 ``src/utils/embedding_dispatcher.py``（由 create_chroma_vectorstore 统一包装）。
+
 作者: MintChat Team
 日期: 2025-11-18
 """
 
 from contextlib import nullcontext
-from typing import List, Optional
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Any, List, Optional
+import threading
 import time
 
+import numpy as np
+
 from src.utils.logger import get_logger
 from src.utils.embedding_cache import EmbeddingCache
+from src.utils.onnx_embeddings import ONNX_RUNTIME_AVAILABLE, OnnxSentenceEncoder, resolve_model_dir
 from src.utils.torch_optim import apply_torch_optimizations
 
 logger = get_logger(__name__)
 
-# 尝试导入 sentence-transformers
-try:
-    from sentence_transformers import SentenceTransformer
-
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+# sentence-transformers / torch 只探测不导入：onnx 后端启动时无需加载 PyTorch
+SENTENCE_TRANSFORMERS_AVAILABLE = find_spec("sentence_transformers") is not None
+if not SENTENCE_TRANSFORMERS_AVAILABLE:
     logger.warning(
         "sentence-transformers 未安装，本地 embedding 功能不可用。"
         "安装方法: uv sync --locked --no-install-project"
     )
 
-# 尝试导入 torch 用于 GPU 检测
-try:
-    import torch
-
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
+TORCH_AVAILABLE = find_spec("torch") is not None
+if not TORCH_AVAILABLE:
     logger.debug("PyTorch 未安装，无法检测 GPU")
 
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+@lru_cache(maxsize=1)
+def _torch() -> Any:
+    """按需导入 torch（不可用时返回 None）。"""
+    if not TORCH_AVAILABLE:
+        return None
+    try:
+        import torch
+
+        return torch
+    except Exception as exc:  # pragma: no cover - 环境依赖差异
+        logger.debug("PyTorch 导入失败: %s", exc)
+        return None
+
+
+def _agent_option(name: str, default: Any) -> Any:
+    try:
+        from src.config.settings import settings
+
+        return getattr(getattr(settings, "agent", object()), name, default)
+    except Exception:
+        return default
+
+
+def local_embedding_available(backend: Optional[str] = None) -> bool:
+    """当前配置的本地 embedding 后端依赖是否就绪。"""
+    backend = str(backend or _agent_option("local_embedding_backend", "torch")).lower()
+    if backend == "onnx":
+        return ONNX_RUNTIME_AVAILABLE
+    return SENTENCE_TRANSFORMERS_AVAILABLE
+
 
 def get_optimal_device() -> str:
     """
@@ -47,7 +83,8 @@ def get_optimal_device() -> str:
     Returns:
         设备名称（cuda/cpu）
     """
-    if not TORCH_AVAILABLE:
+    torch = _torch()
+    if torch is None:
         return "cpu"
 
     if torch.cuda.is_available():
@@ -70,7 +107,8 @@ def _suggest_batch_size(device: str) -> int:
     """
     if device != "cuda":
         return 16
-    if not TORCH_AVAILABLE:
+    torch = _torch()
+    if torch is None:
         return 32
     try:
         if not torch.cuda.is_available():
@@ -91,7 +129,7 @@ def _suggest_batch_size(device: str) -> int:
 
 
 class LocalEmbeddings:
-    """本地 Embedding 模型包装器（支持GPU加速）"""
+    """本地 Embedding 模型包装器（支持GPU加速 / ONNX CPU 推理）"""
 
     def __init__(
         self,
@@ -100,18 +138,37 @@ class LocalEmbeddings:
         device: Optional[str] = None,
         enable_cache: bool = True,
         auto_gpu: bool = True,
+        cache_backend: str = "segment",
+        backend: Optional[str] = None,
+        quantized: Optional[bool] = None,
     ):
         """
         初始化本地 embedding 模型
 
         Args:
-            model_name: 模型名称（HuggingFace 模型 ID）
+            model_name: 模型名称（HuggingFace 模型 ID 或本地目录）
             cache_dir: 缓存目录
-            device: 设备（cpu/cuda），None时自动检测
+            device: 设备（cpu/cuda），None时自动检测（onnx 后端固定 cpu）
             enable_cache: 是否启用缓存
             auto_gpu: 是否自动启用GPU（默认True）
+            cache_backend: embedding 缓存持久化后端（segment/pickle，默认 segment）
+            backend: 推理后端（torch/onnx），None 时读取 Agent.local_embedding_backend
+            quantized: onnx 后端是否优先 int8 量化权重，None 时读取 Agent.local_embedding_quantized
         """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        backend = str(backend or _agent_option("local_embedding_backend", "torch")).lower()
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"未知的本地 embedding 后端: {backend}（可选: torch/onnx）")
+        if quantized is None:
+            quantized = bool(_agent_option("local_embedding_quantized", True))
+
+        if backend == "onnx":
+            if not ONNX_RUNTIME_AVAILABLE:
+                raise ImportError(
+                    "onnxruntime/tokenizers 未安装，无法使用 ONNX embedding 后端。"
+                    "安装方法: uv sync --locked --no-install-project"
+                )
+            device = "cpu"
+        elif not SENTENCE_TRANSFORMERS_AVAILABLE:
             raise ImportError(
                 "sentence-transformers 未安装，无法使用本地 embedding 功能。"
                 "安装方法: uv sync --locked --no-install-project"
@@ -125,40 +182,85 @@ class LocalEmbeddings:
 
         self.model_name = model_name
         self.device = device
+        self.backend = backend
         self.enable_cache = enable_cache
 
         # 初始化缓存
         if enable_cache:
-            self.cache = EmbeddingCache(cache_dir=cache_dir)
+            self.cache = EmbeddingCache(cache_dir=cache_dir, backend=cache_backend)
         else:
             self.cache = None
 
         # 加载模型
-        logger.info(f"正在加载本地 embedding 模型: {model_name} (设备: {device})")
+        logger.info(f"正在加载本地 embedding 模型: {model_name} (后端: {backend}, 设备: {device})")
         start_time = time.perf_counter()
 
         try:
-            if device == "cuda":
-                apply_torch_optimizations(verbose=True)
-            self.model = SentenceTransformer(model_name, device=device)
-            load_time = (time.perf_counter() - start_time) * 1000
+            if backend == "onnx":
+                onnx_dir = str(_agent_option("local_embedding_onnx_dir", "") or "").strip()
+                self.model = OnnxSentenceEncoder(
+                    resolve_model_dir(onnx_dir or model_name, quantized=bool(quantized)),
+                    quantized=bool(quantized),
+                )
+            else:
+                if device == "cuda":
+                    apply_torch_optimizations(verbose=True)
+                from sentence_transformers import SentenceTransformer
+
+                self.model = SentenceTransformer(model_name, device=device)
+            self.load_time_ms = (time.perf_counter() - start_time) * 1000
 
             # 显示GPU信息
             gpu_info = ""
-            if device == "cuda" and TORCH_AVAILABLE and torch.cuda.is_available():
+            torch = _torch() if device == "cuda" else None
+            if torch is not None and torch.cuda.is_available():
                 gpu_info = f", GPU: {torch.cuda.get_device_name(0)}"
 
             logger.info(
                 f"本地 embedding 模型加载成功: {model_name} "
-                f"(耗时: {load_time:.2f}ms, 设备: {device}{gpu_info})"
+                f"(耗时: {self.load_time_ms:.2f}ms, 后端: {backend}, 设备: {device}{gpu_info})"
             )
         except Exception as e:
             logger.error(f"加载本地 embedding 模型失败: {e}")
             raise
 
+        # 缓存键区分后端：量化/ONNX 向量与 PyTorch 向量存在细微差异，不能混用
+        self.cache_model_key = model_name
+        if backend == "onnx":
+            suffix = "onnx-int8" if getattr(self.model, "quantized", False) else "onnx"
+            self.cache_model_key = f"{model_name}#{suffix}"
+
         # 性能统计
         self.total_embeddings = 0
         self.total_time_ms = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        torch = _torch() if self.backend == "torch" else None
+        ctx = (
+            torch.inference_mode()
+            if torch is not None and hasattr(torch, "inference_mode")
+            else nullcontext()
+        )
+        with ctx:
+            return self.model.encode(
+                texts,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                batch_size=batch_size,  # GPU加速批量处理
+                normalize_embeddings=True,  # 归一化提升检索精度
+            )
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        start_time = time.perf_counter()
+        embeddings = self._encode(texts, batch_size=max(len(texts), 1))
+        self._record(len(texts), (time.perf_counter() - start_time) * 1000)
+        return [emb.tolist() for emb in embeddings]
+
+    def _record(self, count: int, elapsed_ms: float) -> None:
+        with self._stats_lock:
+            self.total_embeddings += count
+            self.total_time_ms += elapsed_ms
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
@@ -177,10 +279,10 @@ class LocalEmbeddings:
         uncached_texts = []
         uncached_indices = []
 
-        # 1. 检查缓存
+        # 1. 检查缓存（批量查找：一次加锁 + 一次持久化查找）
         if self.enable_cache and self.cache:
-            for i, text in enumerate(texts):
-                cached_embedding = self.cache.get(text, self.model_name)
+            cached_embeddings = self.cache.get_many(texts, self.cache_model_key)
+            for i, (text, cached_embedding) in enumerate(zip(texts, cached_embeddings)):
                 if cached_embedding is not None:
                     results[i] = cached_embedding
                 else:
@@ -197,26 +299,12 @@ class LocalEmbeddings:
             try:
                 # GPU加速优化：使用批量处理
                 batch_size = _suggest_batch_size(self.device)
-
-                ctx = (
-                    torch.inference_mode()
-                    if TORCH_AVAILABLE and hasattr(torch, "inference_mode")
-                    else nullcontext()
-                )
-                with ctx:
-                    embeddings = self.model.encode(
-                        uncached_texts,
-                        convert_to_numpy=True,
-                        show_progress_bar=False,
-                        batch_size=batch_size,  # GPU加速批量处理
-                        normalize_embeddings=True,  # 归一化提升检索精度
-                    )
+                embeddings = self._encode(uncached_texts, batch_size)
                 embeddings_list = [emb.tolist() for emb in embeddings]
 
                 # 保存到缓存
                 if self.enable_cache and self.cache:
-                    for text, embedding in zip(uncached_texts, embeddings_list):
-                        self.cache.set(text, self.model_name, embedding)
+                    self.cache.set_many(uncached_texts, self.cache_model_key, embeddings_list)
 
                 # 回填到结果中（O(n)，避免 list.insert 的 O(n^2)）
                 for idx, embedding in zip(uncached_indices, embeddings_list):
@@ -224,11 +312,10 @@ class LocalEmbeddings:
 
                 # 性能统计
                 elapsed_ms = (time.perf_counter() - start_time) * 1000
-                self.total_embeddings += len(uncached_texts)
-                self.total_time_ms += elapsed_ms
+                self._record(len(uncached_texts), elapsed_ms)
 
                 # 显示GPU加速信息
-                device_info = "GPU加速" if self.device == "cuda" else "CPU"
+                device_info = "GPU加速" if self.device == "cuda" else f"CPU/{self.backend}"
                 logger.debug(
                     f"生成 {len(uncached_texts)} 个 embeddings ({device_info}): {elapsed_ms:.2f}ms "
                     f"({elapsed_ms / len(uncached_texts):.2f}ms/个, batch_size={batch_size})"
@@ -254,7 +341,7 @@ class LocalEmbeddings:
         """
         # 1. 检查缓存
         if self.enable_cache and self.cache:
-            cached_embedding = self.cache.get(text, self.model_name)
+            cached_embedding = self.cache.get(text, self.cache_model_key)
             if cached_embedding is not None:
                 return cached_embedding
 
@@ -262,31 +349,15 @@ class LocalEmbeddings:
         start_time = time.perf_counter()
 
         try:
-            ctx = (
-                torch.inference_mode()
-                if TORCH_AVAILABLE and hasattr(torch, "inference_mode")
-                else nullcontext()
-            )
-            with ctx:
-                embedding = self.model.encode(
-                    text,
-                    convert_to_numpy=True,
-                    show_progress_bar=False,
-                    normalize_embeddings=True,  # 归一化提升检索精度
-                )
-            embedding_list = embedding.tolist()
+            embedding_list = self._encode_batch([text])[0]
 
             # 保存到缓存
             if self.enable_cache and self.cache:
-                self.cache.set(text, self.model_name, embedding_list)
-
-            # 性能统计
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            self.total_embeddings += 1
-            self.total_time_ms += elapsed_ms
+                self.cache.set(text, self.cache_model_key, embedding_list)
 
             # 显示GPU加速信息
-            device_info = "GPU加速" if self.device == "cuda" else "CPU"
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            device_info = "GPU加速" if self.device == "cuda" else f"CPU/{self.backend}"
             logger.debug(f"生成 1 个 embedding ({device_info}): {elapsed_ms:.2f}ms")
 
             return embedding_list
@@ -300,6 +371,8 @@ class LocalEmbeddings:
         avg_time = self.total_time_ms / self.total_embeddings if self.total_embeddings > 0 else 0
 
         stats = {
+            "backend": self.backend,
+            "load_time_ms": f"{self.load_time_ms:.2f}",
             "total_embeddings": self.total_embeddings,
             "total_time_ms": f"{self.total_time_ms:.2f}",
             "avg_time_ms": f"{avg_time:.2f}",
@@ -0,0 +1,251 @@
+"""
+ONNX Runtime 本地 embedding 推理（纯 CPU，无需 PyTorch）
+
+加载 sentence-transformers 模型仓库中导出的 ONNX 权重（优先 int8 动态量化版本），
+用 `tokenizers` 分词、ONNX Runtime 前向、按 `1_Pooling/config.json` 池化并归一化：
+- 启动只需加载 onnxruntime + tokenizer（不导入 torch），CPU 单条查询延迟显著低于 PyTorch 路径
+- `encode()` 与 `SentenceTransformer.encode()` 的常用参数保持一致，可直接替换 LocalEmbeddings 的模型
+
+依赖（均已随 chromadb / sentence-transformers 锁定在 uv.lock 中）：onnxruntime、tokenizers；
+按模型 ID 下载时还需要 huggingface-hub。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+
+    ONNX_RUNTIME_AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    ort = None  # type: ignore[assignment]
+    Tokenizer = None  # type: ignore[assignment]
+    ONNX_RUNTIME_AVAILABLE = False
+
+# 量化权重优先级：按 CPU 指令集从快到慢；均不存在时回退 fp32 model.onnx
+_QUANTIZED_CANDIDATES = (
+    "onnx/model_qint8_avx512_vnni.onnx",
+    "onnx/model_qint8_avx512.onnx",
+    "onnx/model_qint8_avx2.onnx",
+    "onnx/model_quint8_avx2.onnx",
+    "onnx/model_quantized.onnx",
+    "model_quantized.onnx",
+)
+_FP32_CANDIDATES = ("onnx/model.onnx", "model.onnx")
+# 权重文件之外的推理所需文件；权重只下载选中的那一个（仓库里常有十余个变体，各数百 MB）
+_DOWNLOAD_PATTERNS = (
+    "tokenizer.json",
+    "tokenizer_config.json",
+    "special_tokens_map.json",
+    "config.json",
+    "sentence_bert_config.json",
+    "1_Pooling/config.json",
+)
+
+
+def _onnx_candidates(quantized: bool) -> tuple[str, ...]:
+    return (_QUANTIZED_CANDIDATES if quantized else ()) + _FP32_CANDIDATES
+
+
+def resolve_model_dir(
+    model_name: str, cache_dir: Optional[str] = None, *, quantized: bool = True
+) -> Path:
+    """本地目录直接使用；否则从 HuggingFace 仅下载将被加载的 ONNX 权重及分词/池化配置。"""
+    local = Path(model_name)
+    if local.is_dir():
+        return local
+    from huggingface_hub import list_repo_files, snapshot_download
+
+    candidates = _onnx_candidates(quantized)
+    try:
+        repo_files = set(list_repo_files(model_name))
+        weights = [next(name for name in candidates if name in repo_files)]
+    except StopIteration:
+        raise FileNotFoundError(
+            f"{model_name} 中未找到 ONNX 权重（需要 onnx/model.onnx 或量化版本）"
+        ) from None
+    except Exception as exc:
+        # 离线等无法列出仓库文件时：只按候选文件名匹配（命中本地缓存即可），仍不下载其他变体
+        logger.debug("列出模型仓库文件失败，按候选权重文件名下载: %s", exc)
+        weights = list(candidates)
+
+    return Path(
+        snapshot_download(
+            repo_id=model_name,
+            cache_dir=cache_dir,
+            allow_patterns=weights + list(_DOWNLOAD_PATTERNS),
+        )
+    )
+
+
+def select_onnx_file(model_dir: Path, *, quantized: bool = True) -> Path:
+    """选择 ONNX 权重文件（quantized=True 时优先 int8 动态量化版本）。"""
+    for name in _onnx_candidates(quantized):
+        path = model_dir / name
+        if path.is_file():
+            return path
+    raise FileNotFoundError(
+        f"{model_dir} 中未找到 ONNX 权重（需要 onnx/model.onnx 或量化版本），"
+        "可使用 sentence-transformers 的 export_optimized_onnx_model / "
+        "export_dynamic_quantized_onnx_model 导出"
+    )
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+class OnnxSentenceEncoder:
+    """sentence-transformers 模型的 ONNX Runtime 推理封装（线程安全：session.run 可并发调用）。"""
+
+    def __init__(
+        self,
+        model_dir: Union[str, Path],
+        *,
+        quantized: bool = True,
+        max_seq_length: Optional[int] = None,
+        intra_op_threads: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            model_dir: 模型目录（含 tokenizer.json 与 onnx 权重）
+            quantized: 是否优先使用 int8 量化权重
+            max_seq_length: 最大序列长度（默认读取 sentence_bert_config.json，缺省 256）
+            intra_op_threads: ONNX Runtime 算子内线程数（默认按 CPU 核数）
+        """
+        if not ONNX_RUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime/tokenizers 未安装，无法使用 ONNX embedding 后端")
+
+        self.model_dir = Path(model_dir)
+        self.model_path = select_onnx_file(self.model_dir, quantized=quantized)
+        self.quantized = "int8" in self.model_path.name or "quant" in self.model_path.name
+
+        st_config = _read_json(self.model_dir / "sentence_bert_config.json")
+        self.max_seq_length = int(max_seq_length or st_config.get("max_seq_length") or 256)
+        self.do_lower_case = bool(st_config.get("do_lower_case", False))
+
+        pooling = _read_json(self.model_dir / "1_Pooling" / "config.json")
+        if pooling.get("pooling_mode_cls_token"):
+            self.pooling = "cls"
+        elif pooling.get("pooling_mode_max_tokens"):
+            self.pooling = "max"
+        else:
+            self.pooling = "mean"
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_token, pad_id = self._pad_token()
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(intra_op_threads or max(1, (os.cpu_count() or 2) // 2))
+        self.session = ort.InferenceSession(
+            str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension: Optional[int] = None
+        logger.info(
+            "ONNX embedding 模型就绪: %s（pooling=%s, max_seq_length=%d）",
+            self.model_path.name,
+            self.pooling,
+            self.max_seq_length,
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode(["dimension probe"]).shape[1])
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        *,
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        """
+        编码文本（参数与 SentenceTransformer.encode 对齐；单个字符串返回一维向量）
+
+        按长度排序后分批，减少 padding 浪费；结果按输入顺序返回。
+        """
+        del convert_to_numpy, show_progress_bar  # 始终返回 numpy；无进度条
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else [str(s) for s in sentences]
+        if not texts:
+            return np.zeros((0, self._dimension or 0), dtype=np.float32)
+        if self.do_lower_case:
+            texts = [t.lower() for t in texts]
+
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        step = max(1, int(batch_size))
+        chunks: List[np.ndarray] = []
+        for start in range(0, len(texts), step):
+            batch = [texts[i] for i in order[start : start + step]]
+            chunks.append(self._forward(batch))
+        embeddings = np.concatenate(chunks, axis=0)
+
+        result = np.empty_like(embeddings)
+        result[order] = embeddings
+        if normalize_embeddings:
+            norms = np.linalg.norm(result, axis=1, keepdims=True)
+            result = result / np.maximum(norms, 1e-12)
+        if self._dimension is None:
+            self._dimension = int(result.shape[1])
+        return result[0] if single else result
+
+    # ----------------------------- 内部方法 -----------------------------
+
+    def _pad_token(self) -> tuple[str, int]:
+        special = _read_json(self.model_dir / "special_tokens_map.json").get("pad_token")
+        if isinstance(special, dict):
+            special = special.get("content")
+        for token in (special, "[PAD]", "<pad>"):
+            if isinstance(token, str):
+                token_id = self.tokenizer.token_to_id(token)
+                if token_id is not None:
+                    return token, int(token_id)
+        return "[PAD]", 0
+
+    def _forward(self, batch: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(batch)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+
+        output = np.asarray(self.session.run(None, feeds)[0], dtype=np.float32)
+        if output.ndim == 2:
+            return output  # 已导出池化层（sentence_embedding）
+        if self.pooling == "cls":
+            return output[:, 0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if self.pooling == "max":
+            return np.where(mask > 0, output, -1e9).max(axis=1)
+        return (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+__all__ = [
+    "ONNX_RUNTIME_AVAILABLE",
+    "OnnxSentenceEncoder",
+    "resolve_model_dir",
+    "select_onnx_file",
+]
@@ -0,0 +1,170 @@
+"""
+读写锁与锁等待直方图
+
+用于“读多写少”的共享资源（如长期记忆向量库）：
+- 读锁可并发持有；写锁独占
+- 写优先：有写者排队时新读者等待，避免持续检索把写入饿死；
+  长耗时扫描（导出/清理）按页获取读锁，写者最多等待一页
+- 分别统计读/写锁的等待耗时直方图，便于观察锁竞争
+
+注意：读锁不可重入（写者排队时同一线程再次获取读锁会死锁），持锁期间不要嵌套获取。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+# 等待耗时分桶上界（毫秒），最后一个桶为“超过最大上界”
+WAIT_BUCKETS_MS: Tuple[float, ...] = (0.1, 1.0, 5.0, 10.0, 50.0, 100.0, 500.0, 1000.0)
+
+
+class LockWaitHistogram:
+    """锁等待耗时直方图（线程安全，记录开销为一次加锁 + 线性分桶）。"""
+
+    __slots__ = ("_lock", "_buckets", "_count", "_total_ms", "_max_ms")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._count = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+
+    def record(self, wait_ms: float) -> None:
+        slot = len(WAIT_BUCKETS_MS)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                slot = i
+                break
+        with self._lock:
+            self._buckets[slot] += 1
+            self._count += 1
+            self._total_ms += wait_ms
+            if wait_ms > self._max_ms:
+                self._max_ms = wait_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回统计快照
+
+        分位数按桶上界估算（落在最后一个桶时取观测到的最大值）。
+        """
+        with self._lock:
+            buckets = list(self._buckets)
+            count = self._count
+            total_ms = self._total_ms
+            max_ms = self._max_ms
+
+        def _quantile(q: float) -> float:
+            if count <= 0:
+                return 0.0
+            target = q * count
+            seen = 0
+            for i, n in enumerate(buckets):
+                seen += n
+                if seen >= target:
+                    return WAIT_BUCKETS_MS[i] if i < len(WAIT_BUCKETS_MS) else round(max_ms, 3)
+            return round(max_ms, 3)
+
+        labels = [f"<={bound:g}ms" for bound in WAIT_BUCKETS_MS]
+        labels.append(f">{WAIT_BUCKETS_MS[-1]:g}ms")
+        return {
+            "count": count,
+            "avg_ms": round(total_ms / count, 3) if count else 0.0,
+            "max_ms": round(max_ms, 3),
+            "p50_ms": _quantile(0.5),
+            "p99_ms": _quantile(0.99),
+            "buckets": dict(zip(labels, buckets)),
+        }
+
+
+class ReadWriteLock:
+    """
+    写优先读写锁
+
+    - `with lock.read():` 共享读；`with lock.write():` 独占写
+    - 直接 `with lock:` 等价于写锁（兼容原先的互斥锁用法）
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self.read_wait = LockWaitHistogram()
+        self.write_wait = LockWaitHistogram()
+
+    def acquire_read(self) -> None:
+        started = time.perf_counter()
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self.read_wait.record((time.perf_counter() - started) * 1000.0)
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        started = time.perf_counter()
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        self.write_wait.record((time.perf_counter() - started) * 1000.0)
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def __enter__(self) -> "ReadWriteLock":
+        self.acquire_write()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:  # noqa: ANN001
+        self.release_write()
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """读/写等待直方图与当前持有情况。"""
+        with self._cond:
+            readers = self._readers
+            writer = self._writer
+            writers_waiting = self._writers_waiting
+        return {
+            "readers": readers,
+            "writer": writer,
+            "writers_waiting": writers_waiting,
+            "read_wait": self.read_wait.snapshot(),
+            "write_wait": self.write_wait.snapshot(),
+        }
+
+
+__all__ = ["LockWaitHistogram", "ReadWriteLock", "WAIT_BUCKETS_MS"]
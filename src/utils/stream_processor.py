@@ -22,6 +22,39 @@ from src.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+class StreamRetraction(str):
+    """
+    文本流中的撤回标记：丢弃此前已输出文本末尾的 ``chars`` 个字符
+
+    推测流式（native_speculative_streaming）下，某轮的前导文本可能先于工具调用输出，
+    该轮转为工具轮时由 ``chat_stream`` / ``chat_stream_async`` 发出此标记。
+    它本身是空字符串：不识别它的消费者直接拼接也不会多出内容。
+    """
+
+    chars: int
+
+    def __new__(cls, chars: int) -> "StreamRetraction":
+        marker = super().__new__(cls, "")
+        marker.chars = max(0, int(chars))
+        return marker
+
+    def __repr__(self) -> str:
+        return f"StreamRetraction(chars={self.chars})"
+
+
+def apply_stream_retraction(parts: list[str], chars: int) -> None:
+    """从已收集的文本片段末尾原地移除 ``chars`` 个字符。"""
+    remaining = max(0, int(chars))
+    while remaining > 0 and parts:
+        last = parts[-1]
+        if len(last) <= remaining:
+            remaining -= len(last)
+            parts.pop()
+        else:
+            parts[-1] = last[: len(last) - remaining]
+            remaining = 0
+
+
 class StreamProcessor:
     """流处理器 - 实时文本流处理"""
 
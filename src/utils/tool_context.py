@@ -106,6 +106,12 @@ class ToolTraceRecorder:
             if self.max_traces > 0 and len(self.traces) > self.max_traces:
                 self.traces = self.traces[-self.max_traces :]
 
+    def discard_start(self) -> None:
+        """撤销一次 mark_start：调用已被放弃（如超过本轮截止时间），迟到的结果不再记录。"""
+        with self._lock:
+            if self.in_flight > 0:
+                self.in_flight -= 1
+
     def snapshot(self) -> List[ToolCallTrace]:
         with self._lock:
             return list(self.traces)
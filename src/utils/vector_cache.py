@@ -9,13 +9,17 @@
 - 🔄 LRU淘汰策略 - 自动管理缓存大小
 - ⏰ TTL过期机制 - 自动清理过期缓存
 - 📊 性能统计 - 监控缓存命中率
+- 🧭 语义查询缓存 - 按查询向量余弦相似度复用检索结果（措辞不同的同义查询也能命中）
 """
 
 import hashlib
+import threading
 import time
 from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
 
 from src.utils.logger import get_logger
 
@@ -339,6 +343,173 @@ class EmbeddingCache:
         }
 
 
+class SemanticQueryCache:
+    """
+    语义查询缓存
+
+    以检索时已算出的查询向量为键：在一个小型内存矩阵中保存最近查询的单位向量，
+    新查询与某条缓存的余弦相似度达到阈值、且检索范围（scope）与写入版本一致时直接返回缓存结果。
+    - 写入版本前进时整体失效（旧结果可能缺少新记忆）
+    - 容量满时淘汰最久未访问（优先淘汰已过期）的条目
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: float = 600.0,
+    ):
+        """
+        初始化语义查询缓存
+
+        Args:
+            max_size: 最大缓存条目数（矩阵行数）
+            similarity_threshold: 命中所需的最低余弦相似度
+            ttl_seconds: 缓存过期时间（秒）
+        """
+        self.max_size = max(1, int(max_size))
+        self.similarity_threshold = float(similarity_threshold)
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: List[Optional[Hashable]] = [None] * self.max_size
+        self._values: List[Any] = [None] * self.max_size
+        self._expires = np.zeros(self.max_size, dtype=np.float64)
+        self._last_access = np.zeros(self.max_size, dtype=np.float64)
+        self._size = 0
+        self._version: Optional[int] = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if vector.size == 0 or not np.isfinite(norm) or norm <= 0.0:
+            return None
+        return vector / norm
+
+    def _sync_version(self, version: int) -> bool:
+        """对齐写入版本（需持锁）；返回 False 表示调用方持有的是过期版本。"""
+        if self._version is None or version > self._version:
+            if self._size:
+                self._stats["invalidations"] += self._size
+            self._size = 0
+            self._scopes = [None] * self.max_size
+            self._values = [None] * self.max_size
+            self._version = int(version)
+            return True
+        return version == self._version
+
+    def get(
+        self,
+        embedding: Sequence[float],
+        *,
+        scope: Hashable,
+        version: int,
+    ) -> Optional[Any]:
+        """
+        查找语义相近的缓存结果
+
+        Args:
+            embedding: 查询向量（检索时已计算）
+            scope: 检索范围（如 k、过滤条件），必须完全一致才可复用
+            version: 数据写入版本
+
+        Returns:
+            Optional[Any]: 缓存结果，未命中返回 None
+        """
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if query is None or not self._sync_version(int(version)) or self._size == 0:
+                self._stats["misses"] += 1
+                return None
+            vectors = self._vectors
+            if vectors is None or vectors.shape[1] != query.shape[0]:
+                self._stats["misses"] += 1
+                return None
+            sims = vectors[: self._size] @ query
+            for i in np.argsort(-sims).tolist():
+                if sims[i] < self.similarity_threshold:
+                    break
+                if self._scopes[i] != scope:
+                    continue
+                if self._expires[i] <= now:
+                    self._stats["expirations"] += 1
+                    self._expires[i] = 0.0
+                    continue
+                self._last_access[i] = now
+                self._stats["hits"] += 1
+                return self._values[i]
+            self._stats["misses"] += 1
+            return None
+
+    def put(
+        self,
+        embedding: Sequence[float],
+        value: Any,
+        *,
+        scope: Hashable,
+        version: int,
+    ) -> None:
+        """写入缓存（version 落后于当前版本时忽略，避免旧结果回填）。"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not self._sync_version(int(version)):
+                return
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._size = 0
+            slot = -1
+            if self._size:
+                # 几乎相同的查询：覆盖原条目，避免矩阵被同一查询占满
+                sims = self._vectors[: self._size] @ vector
+                for i in np.flatnonzero(sims >= 0.999).tolist():
+                    if self._scopes[i] == scope:
+                        slot = i
+                        break
+            if slot < 0:
+                if self._size < self.max_size:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    expired = self._expires <= now
+                    slot = int(np.argmin(np.where(expired, -np.inf, self._last_access)))
+                    self._stats["evictions"] += 1
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._values[slot] = value
+            self._expires[slot] = now + self.ttl_seconds
+            self._last_access[slot] = now
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._size = 0
+            self._scopes = [None] * self.max_size
+            self._values = [None] * self.max_size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["cache_size"] = self._size
+        total = stats["hits"] + stats["misses"]
+        stats["max_size"] = self.max_size
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        return stats
+
+
 # 全局缓存实例
 _vector_search_cache: Optional[VectorSearchCache] = None
 _embedding_cache: Optional[EmbeddingCache] = None
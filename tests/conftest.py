@@ -93,3 +93,12 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "slow: 标记慢速测试")
     config.addinivalue_line("markers", "integration: 标记集成测试")
     config.addinivalue_line("markers", "unit: 标记单元测试")
+
+
+@pytest.fixture
+def fake_gpt_sovits():
+    """本地假 GPT-SoVITS 服务 fixture（支持 streaming_mode 分块输出）"""
+    from tests.fake_gpt_sovits import FakeGPTSoVITSServer
+
+    with FakeGPTSoVITSServer() as server:
+        yield server
@@ -0,0 +1,156 @@
+"""
+本地假 GPT-SoVITS HTTP 服务（测试用）
+
+模拟 ``POST /tts``：
+- 普通模式：返回完整 WAV（Content-Length）
+- ``streaming_mode=true``：分块传输，先发 WAV 头（长度字段为 0xFFFFFFFF），再按块推送 PCM
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+def sine_pcm(duration_s: float, sample_rate: int, freq: float = 220.0) -> bytes:
+    frames = int(duration_s * sample_rate)
+    return b"".join(
+        struct.pack("<h", int(12000 * math.sin(2 * math.pi * freq * i / sample_rate)))
+        for i in range(frames)
+    )
+
+
+def wav_header(sample_rate: int, channels: int = 1, data_size: int = 0xFFFFFFFF) -> bytes:
+    byte_rate = sample_rate * channels * 2
+    riff_size = 0xFFFFFFFF if data_size == 0xFFFFFFFF else 36 + data_size
+    return (
+        b"RIFF"
+        + struct.pack("<I", riff_size)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+class FakeGPTSoVITSServer:
+    """
+    在后台线程运行的假服务
+
+    Args:
+        sample_rate: 输出采样率
+        seconds_per_char: 每个字符对应的音频时长
+        chunk_ms: 流式模式每块 PCM 的时长
+        chunk_delay_s: 流式模式每块之间的发送间隔（模拟边合成边推送）
+        fail_first: 前 N 个请求返回 503
+        drop_after_chunks: 流式模式推送 N 块 PCM 后直接断开连接（模拟服务端中途崩溃；0 表示不断开）
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_rate: int = 16000,
+        seconds_per_char: float = 0.05,
+        chunk_ms: int = 40,
+        chunk_delay_s: float = 0.0,
+        fail_first: int = 0,
+        drop_after_chunks: int = 0,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.chunk_ms = chunk_ms
+        self.chunk_delay_s = chunk_delay_s
+        self.fail_first = fail_first
+        self.drop_after_chunks = drop_after_chunks
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/tts"
+
+    def pcm_for(self, text: str) -> bytes:
+        return sine_pcm(max(1, len(text)) * self.seconds_per_char, self.sample_rate)
+
+    def start(self) -> "FakeGPTSoVITSServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=2.0)
+
+    def __enter__(self) -> "FakeGPTSoVITSServer":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def _make_handler(self):  # noqa: ANN202
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: object) -> None:  # 静默
+                return
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests.append(payload)
+                    fail = len(fake.requests) <= fake.fail_first
+                if fail:
+                    body = b"busy"
+                    self.send_response(503)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                pcm = fake.pcm_for(str(payload.get("text", "")))
+                if not payload.get("streaming_mode"):
+                    body = wav_header(fake.sample_rate, data_size=len(pcm)) + pcm
+                    self.send_response(200)
+                    self.send_header("Content-Type", "audio/wav")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                step = max(2, int(fake.sample_rate * fake.chunk_ms / 1000) * 2)
+                self._chunk(wav_header(fake.sample_rate))
+                for sent, pos in enumerate(range(0, len(pcm), step)):
+                    if fake.drop_after_chunks and sent >= fake.drop_after_chunks:
+                        # 不发送结束块直接断开：客户端收到不完整的响应体
+                        self.close_connection = True
+                        return
+                    if fake.chunk_delay_s:
+                        time.sleep(fake.chunk_delay_s)
+                    self._chunk(pcm[pos : pos + step])
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+__all__ = ["FakeGPTSoVITSServer", "sine_pcm", "wav_header"]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.agent.memory_optimizer import get_character_scorer
+from src.agent.memory_retriever import ConcurrentMemoryRetriever
+from src.agent.runtime import AgentRuntime
+from src.utils.fair_executor import FairShareExecutor
+
+
+def test_fair_share_round_robins_between_users() -> None:
+    pool = FairShareExecutor(1, per_user_limit=1, thread_name_prefix="test-fair")
+    gate = threading.Event()
+    order: list[str] = []
+    try:
+        blocker = pool.submit_for("a", gate.wait, 5.0)
+        futures = [pool.submit_for("a", order.append, f"a{i}") for i in range(3)]
+        futures += [pool.submit_for("b", order.append, f"b{i}") for i in range(2)]
+        gate.set()
+        for future in [blocker, *futures]:
+            future.result(timeout=5)
+    finally:
+        pool.shutdown(wait=True)
+
+    # a 先提交了一批任务，b 仍按轮转交替获得线程
+    assert order == ["b0", "a0", "b1", "a1", "a2"]
+    assert pool.stats()["users"] == {}
+
+
+def test_per_user_limit_caps_concurrency_without_blocking_others() -> None:
+    pool = FairShareExecutor(4, per_user_limit=2, thread_name_prefix="test-fair")
+    lock = threading.Lock()
+    running = {"a": 0}
+    peak = {"a": 0}
+    release = threading.Event()
+
+    def busy() -> None:
+        with lock:
+            running["a"] += 1
+            peak["a"] = max(peak["a"], running["a"])
+        release.wait(5.0)
+        with lock:
+            running["a"] -= 1
+
+    try:
+        busy_futures = [pool.submit_for("a", busy) for _ in range(5)]
+        started = time.monotonic()
+        assert pool.submit_for("b", lambda: "ok").result(timeout=2) == "ok"
+        assert time.monotonic() - started < 1.0
+        deadline = time.monotonic() + 2.0
+        while pool.stats()["users"]["a"]["running"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()["users"]["a"] == {"queued": 3, "running": 2}
+        release.set()
+        for future in busy_futures:
+            future.result(timeout=5)
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+    assert peak["a"] == 2
+
+
+def test_session_close_only_cancels_own_work() -> None:
+    runtime = AgentRuntime(pool_workers={"llm": 1}, per_user_limits={"llm": 1})
+    alice, bob = runtime.session(1), runtime.session(2)
+    gate = threading.Event()
+    try:
+        first = alice.llm.submit(gate.wait, 5.0)
+        queued = alice.llm.submit(lambda: "alice")
+        other = bob.llm.submit(lambda: "bob")
+        sleeping = alice.loop.submit(asyncio.sleep(10))
+
+        alice.close()
+        gate.set()
+        assert first.result(timeout=5) is True
+        assert queued.cancelled() and other.result(timeout=5) == "bob"
+        with pytest.raises(RuntimeError):
+            alice.llm.submit(lambda: None)
+        time.sleep(0.05)
+        assert sleeping.cancelled()
+
+        # 会话关闭后共享 loop 仍可为其他会话服务
+        assert bob.loop.run(asyncio.sleep(0, result=7), timeout=5) == 7
+        assert runtime.memory_scorer is runtime.memory_scorer
+        assert get_character_scorer() is get_character_scorer()
+        assert runtime.stats()["sessions"] == 2
+    finally:
+        gate.set()
+        runtime.close()
+
+
+def test_memory_retriever_keeps_shared_executor_open() -> None:
+    runtime = AgentRuntime()
+    session = runtime.session(3)
+    retriever = ConcurrentMemoryRetriever(
+        long_term_memory=None, core_memory=None, executor=session.memory
+    )
+    try:
+        retriever.close()
+        assert retriever.executor is None
+        assert session.memory.submit(lambda: 1).result(timeout=5) == 1
+    finally:
+        runtime.close()
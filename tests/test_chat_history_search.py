@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.auth.user_data_manager import UserDataManager
+
+
+def _fts_available() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+pytestmark = pytest.mark.skipif(not _fts_available(), reason="SQLite 不支持 FTS5 trigram")
+
+
+def test_search_ranks_filters_and_paginates(temp_dir: Path) -> None:
+    manager = UserDataManager(db_path=str(temp_dir / "user_data.db"))
+    manager.add_message(1, "Mint", "user", "今天想吃草莓蛋糕")
+    manager.add_message(1, "Mint", "assistant", "草莓蛋糕草莓蛋糕！主人最爱草莓蛋糕了喵")
+    manager.add_message(1, "Luna", "user", "草莓蛋糕好吃吗")
+    manager.add_message(2, "Mint", "user", "草莓蛋糕是别人的")
+    manager.add_message(1, "Mint", "user", "晚安")
+
+    hits = manager.search_chat_history(1, "草莓蛋糕")
+    assert len(hits) == 3 and {h["contact_name"] for h in hits} == {"Mint", "Luna"}
+    assert hits[0]["role"] == "assistant"
+    assert hits[0]["rank"] < 0 and "[草莓蛋糕]" in hits[0]["snippet"]
+
+    mint = manager.search_chat_history(1, "草莓蛋糕", "Mint")
+    assert [h["contact_name"] for h in mint] == ["Mint", "Mint"]
+
+    pages, cursor = [], {}
+    while True:
+        page = manager.search_chat_history(1, "草莓蛋糕", limit=1, **cursor)
+        if not page:
+            break
+        pages.append(page[0]["id"])
+        cursor = {"after_rank": page[-1]["rank"], "before_id": page[-1]["id"]}
+    assert pages == [h["id"] for h in hits]
+
+    # 多个检索词为“同时包含”；不足 3 字符的检索词回退 LIKE
+    assert [h["contact_name"] for h in manager.search_chat_history(1, "草莓 好吃")] == ["Luna"]
+    short = manager.search_chat_history(1, "晚安", highlight=("<b>", "</b>"))
+    assert short[0]["snippet"] == "<b>晚安</b>" and short[0]["rank"] == 0.0
+
+    # 触发器同步删除
+    assert manager.clear_chat_history(1, "Luna")
+    assert len(manager.search_chat_history(1, "草莓蛋糕")) == 2
+    manager.close()
+
+
+def test_backfill_indexes_existing_history_in_chunks(temp_dir: Path) -> None:
+    db_path = temp_dir / "user_data.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            contact_name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    conn.executemany(
+        "INSERT INTO chat_history (user_id, contact_name, role, content) VALUES (1, 'Mint', ?, ?)",
+        [("user", f"旧消息 {i} 关于月光花园") for i in range(10)],
+    )
+    conn.commit()
+    conn.close()
+
+    manager = UserDataManager(db_path=str(db_path), search_backfill=False)
+    status = manager.get_search_index_status()
+    assert status["enabled"] and not status["done"] and status["backfill_target"] == 10
+
+    # 回填前：已索引的新消息按相关度在前，未索引区间由 LIKE 补齐
+    manager.add_message(1, "Mint", "assistant", "新的月光花园")
+    hits = manager.search_chat_history(1, "月光花园")
+    assert len(hits) == 11 and hits[0]["content"] == "新的月光花园"
+    assert all(h["rank"] == 0.0 for h in hits[1:])
+
+    assert manager.backfill_search_index(chunk_size=4, max_chunks=1) is False
+    assert manager.get_search_index_status()["backfill_pos"] == 4
+    assert len(manager.search_chat_history(1, "月光花园")) == 11
+
+    thread = manager.start_search_backfill(chunk_size=4, pause_s=0.0)
+    assert thread is not None
+    thread.join(timeout=10)
+    assert manager.get_search_index_status()["done"]
+    hits = manager.search_chat_history(1, "月光花园")
+    assert len(hits) == 11 and all(h["rank"] < 0 for h in hits)
+    assert manager.start_search_backfill() is None
+    manager.close()
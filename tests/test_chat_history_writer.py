@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.auth.user_data_manager import UserDataManager
+
+
+def test_concurrent_messages_are_group_committed(temp_dir: Path) -> None:
+    manager = UserDataManager(db_path=str(temp_dir / "user_data.db"), write_delay_ms=20.0)
+    barrier = threading.Barrier(4)
+
+    def session(user_id: int) -> None:
+        barrier.wait()
+        for i in range(10):
+            assert manager.add_message(user_id, "Mint", "user", f"u{user_id}-{i}")
+
+    threads = [threading.Thread(target=session, args=(uid,)) for uid in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 读取前自动 flush：不需要显式等待也能读到刚写入的消息
+    for uid in range(1, 5):
+        page = manager.get_chat_history_page(uid, "Mint", limit=50)
+        assert [m["content"] for m in page] == [f"u{uid}-{i}" for i in range(10)]
+
+    stats = manager.get_write_stats()
+    assert stats["rows"] == 40 and stats["errors"] == 0 and stats["pending"] == 0
+    assert stats["batches"] < 40 and stats["max_batch_size"] > 1
+    assert stats["avg_write_latency_ms"] > 0
+    manager.close()
+
+
+def test_async_add_returns_row_id_and_respects_batch_limit(temp_dir: Path) -> None:
+    manager = UserDataManager(
+        db_path=str(temp_dir / "user_data.db"), write_batch_max=3, write_delay_ms=50.0
+    )
+    futures = [manager.add_message_async(1, "Mint", "assistant", f"m{i}") for i in range(7)]
+    ids = [future.result(timeout=5) for future in futures]
+
+    assert ids == sorted(ids) and len(set(ids)) == 7
+    page = manager.get_chat_history_page(1, "Mint", limit=10)
+    assert [m["id"] for m in page] == ids
+    assert manager.get_write_stats()["max_batch_size"] == 3
+    manager.close()
+
+
+def test_close_flushes_queue_and_falls_back_to_sync_writes(temp_dir: Path) -> None:
+    db_path = str(temp_dir / "user_data.db")
+    manager = UserDataManager(db_path=db_path, write_delay_ms=60_000.0)
+    for i in range(5):
+        manager.add_message(1, "Mint", "user", f"m{i}")
+    manager.close()
+
+    reader = UserDataManager(db_path=db_path, write_behind=False)
+    assert reader.get_chat_history_count(1, "Mint") == 5
+
+    # 关闭后仍可写入（同步路径）
+    assert manager.add_message(1, "Mint", "user", "late")
+    assert reader.get_chat_history_count(1, "Mint") == 6
+
+
+def test_clear_waits_for_queued_messages(temp_dir: Path) -> None:
+    manager = UserDataManager(db_path=str(temp_dir / "user_data.db"), write_delay_ms=60_000.0)
+    manager.add_message(1, "Mint", "user", "hello")
+    assert manager.clear_chat_history(1, "Mint")
+    assert manager.get_chat_history_count(1, "Mint") == 0
+    manager.close()
+
+
+def test_failed_row_does_not_fail_its_batch(temp_dir: Path) -> None:
+    manager = UserDataManager(db_path=str(temp_dir / "user_data.db"), write_delay_ms=100.0)
+    futures = [
+        manager.add_message_async(1, "Mint", "user", "m0"),
+        manager.add_message_async(1, "Mint", "user", None),  # type: ignore[arg-type]
+        manager.add_message_async(1, "Mint", "assistant", "m2"),
+    ]
+
+    # 同批提交失败后逐条重试：只有违反 NOT NULL 的那条收到异常
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(timeout=5)
+    assert futures[0].result(timeout=5) < futures[2].result(timeout=5)
+    page = manager.get_chat_history_page(1, "Mint", limit=10)
+    assert [m["content"] for m in page] == ["m0", "m2"]
+    stats = manager.get_write_stats()
+    assert stats["rows"] == 2 and stats["errors"] == 1 and stats["pending"] == 0
+    manager.close()
@@ -20,3 +20,68 @@ def test_embedding_cache_disk_fallback_without_index(temp_dir):
     # 新实例：即使 index.json 尚未落盘，也应能通过 .pkl 文件命中
     cache2 = EmbeddingCache(cache_dir=str(cache_dir), max_cache_size=10, cache_ttl_days=30)
     assert cache2.get("persist-me", "test-model") == embedding
+
+
+def test_embedding_cache_segment_batch_roundtrip(temp_dir):
+    cache_dir = temp_dir / "emb_cache"
+    cache = EmbeddingCache(cache_dir=str(cache_dir), max_cache_size=10, backend="segment")
+
+    texts = [f"text-{i}" for i in range(20)]
+    embeddings = [[float(i), float(i) + 0.5, -1.0] for i in range(20)]
+    cache.set_many(texts, "test-model", embeddings)
+    cache.set("other-dim", "test-model", [0.25, 0.75])
+    cache.close()
+
+    # 新实例只能从段文件命中（内存缓存为空）
+    cache2 = EmbeddingCache(cache_dir=str(cache_dir), max_cache_size=10, backend="segment")
+    found = cache2.get_many(texts + ["missing"], "test-model")
+    assert found[:-1] == embeddings
+    assert found[-1] is None
+    assert cache2.get("other-dim", "test-model") == [0.25, 0.75]
+    assert cache2.get("text-0", "another-model") is None
+
+    stats = cache2.get_stats()
+    assert stats["disk_cache_size"] == 21
+    assert not list(cache_dir.glob("*.pkl"))
+
+
+def test_embedding_cache_segment_overwrite_and_compact(temp_dir):
+    from src.utils.embedding_cache import SegmentEmbeddingStore
+
+    cache_dir = temp_dir / "emb_cache"
+    cache = EmbeddingCache(cache_dir=str(cache_dir), backend="segment")
+    cache.set("same", "m", [1.0, 2.0])
+    cache.set("same", "m", [3.0, 4.0])
+    cache.close()
+
+    store = SegmentEmbeddingStore(cache_dir)
+    assert len(store) == 1
+    assert store.compact() == 1
+    store.close()
+
+    cache2 = EmbeddingCache(cache_dir=str(cache_dir), backend="segment")
+    assert cache2.get("same", "m") == [3.0, 4.0]
+
+
+def test_embedding_cache_segment_migrates_pickle_dir(temp_dir):
+    cache_dir = temp_dir / "emb_cache"
+    legacy = EmbeddingCache(cache_dir=str(cache_dir), backend="pickle")
+    legacy.set_many(["a", "b"], "test-model", [[0.5, 0.25], [0.125, 1.0]])
+    legacy.close()
+    assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+    cache = EmbeddingCache(cache_dir=str(cache_dir), backend="segment")
+    assert not list(cache_dir.glob("*.pkl"))
+    assert cache.get_many(["a", "b"], "test-model") == [[0.5, 0.25], [0.125, 1.0]]
+
+
+def test_embedding_cache_segment_clear_skips_legacy_index(temp_dir):
+    cache_dir = temp_dir / "emb_cache"
+    cache = EmbeddingCache(cache_dir=str(cache_dir), backend="segment")
+    cache.set("x", "m", [1.0, 2.0])
+    cache.clear()
+
+    assert not (cache_dir / "index.json").exists()
+    assert cache.get("x", "m") is None
+    cache.close()
+    assert EmbeddingCache(cache_dir=str(cache_dir), backend="segment").get("x", "m") is None
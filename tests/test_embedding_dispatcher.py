@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import src.utils.chroma_helper as chroma_helper
+from src.utils.embedding_dispatcher import BatchedEmbeddings, EmbeddingDispatcher
+
+
+class _RecordingEmbeddings:
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.calls: list[list[str]] = []
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        if self.fail_on in texts:
+            raise RuntimeError("encode failed")
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def get_stats(self) -> dict:
+        return {"calls": len(self.calls)}
+
+
+def test_concurrent_requests_share_one_batch_and_fan_out() -> None:
+    backend = _RecordingEmbeddings()
+    dispatcher = EmbeddingDispatcher(backend.embed_documents, max_wait_ms=200.0, max_batch=8)
+    gate = threading.Barrier(6, timeout=2.0)
+    results: dict[int, object] = {}
+
+    def query(i: int) -> None:
+        gate.wait()
+        results[i] = dispatcher.embed_query("x" * (i % 3 + 1))
+
+    def write() -> None:
+        gate.wait()
+        results[99] = dispatcher.embed_documents(["aa", "bbbb"])
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(5)]
+    threads.append(threading.Thread(target=write))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=2.0)
+
+    # 5 条查询 + 2 条写入 = 7 条文本，去重后一次调用
+    assert len(backend.calls) == 1
+    assert sorted(backend.calls[0]) == ["aa", "bbbb", "x", "xx", "xxx"]
+    assert all(results[i] == [float(i % 3 + 1)] for i in range(5))
+    assert results[99] == [[2.0], [4.0]]
+
+    stats = dispatcher.stats()
+    assert stats["requests"] == 6 and stats["batches"] == 1
+    assert stats["texts"] == 7 and stats["deduplicated"] == 2
+    dispatcher.close()
+
+
+def test_max_batch_splits_requests_and_errors_reach_every_caller() -> None:
+    backend = _RecordingEmbeddings(fail_on="boom")
+    dispatcher = EmbeddingDispatcher(backend.embed_documents, max_wait_ms=0.0, max_batch=2)
+
+    # 超过 max_batch 的单个请求不拆分
+    assert dispatcher.embed_documents(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert backend.calls == [["a", "bb", "ccc"]]
+
+    future = dispatcher.submit_query("boom")
+    with pytest.raises(RuntimeError, match="encode failed"):
+        future.result(timeout=2.0)
+    assert dispatcher.submit_query("ok").result(timeout=2.0) == [2.0]
+
+    dispatcher.close()
+    # 关闭后在调用线程内直接计算
+    assert dispatcher.embed_query("late") == [4.0]
+    assert dispatcher.stats()["batches"] == 3
+
+
+def test_failed_merged_batch_falls_back_to_each_caller() -> None:
+    backend = _RecordingEmbeddings(fail_on="boom")
+    dispatcher = EmbeddingDispatcher(backend.embed_documents, max_wait_ms=200.0, max_batch=8)
+
+    good = dispatcher.submit(["a", "bb"])
+    bad = dispatcher.submit_query("boom")
+    other = dispatcher.submit_query("ccc")
+
+    assert good.result(timeout=2.0) == [[1.0], [2.0]]
+    assert other.result(timeout=2.0) == [3.0]
+    with pytest.raises(RuntimeError, match="encode failed"):
+        bad.result(timeout=2.0)
+    # 一次合并调用失败后，每个请求单独重算一次
+    assert backend.calls == [["a", "bb", "boom", "ccc"], ["a", "bb"], ["boom"], ["ccc"]]
+    dispatcher.close()
+
+
+def test_query_is_not_blocked_by_slow_document_batch() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    def encode(texts: list[str]) -> list[list[float]]:
+        if len(texts) > 1:
+            # 大批量写入（如归档导入）：远端 API 很慢
+            started.set()
+            assert release.wait(5.0)
+        return [[float(len(t))] for t in texts]
+
+    dispatcher = EmbeddingDispatcher(encode, max_wait_ms=1.0, max_batch=4, max_inflight=2)
+    documents = dispatcher.submit([f"doc-{i}" for i in range(16)])
+    assert started.wait(2.0)
+
+    # 文档批次仍在计算：查询由另一个工作线程处理，不排在它后面
+    assert dispatcher.submit_query("hey").result(timeout=2.0) == [3.0]
+    assert not documents.done()
+
+    release.set()
+    assert len(documents.result(timeout=2.0)) == 16
+    assert dispatcher.stats()["workers"] == 2
+    dispatcher.close()
+
+
+def test_vectorstore_embedding_is_wrapped_once(monkeypatch) -> None:
+    backend = _RecordingEmbeddings()
+    chroma_helper._get_batched_embedding_function.cache_clear()
+    wrapped = chroma_helper._get_batched_embedding_function(backend)
+    assert isinstance(wrapped, BatchedEmbeddings)
+    assert chroma_helper._get_batched_embedding_function(backend) is wrapped
+
+    assert wrapped.embed_query("abc") == [3.0]
+    stats = wrapped.get_stats()
+    assert stats["calls"] == 1 and stats["dispatch"]["requests"] == 1
+    assert wrapped.fail_on is None  # 其它属性透传
+    wrapped.close()
+
+    chroma_helper._get_batched_embedding_function.cache_clear()
+    monkeypatch.setattr(chroma_helper.settings.agent, "embedding_batch_wait_ms", 0.0)
+    assert chroma_helper._get_batched_embedding_function(backend) is backend
+    chroma_helper._get_batched_embedding_function.cache_clear()
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import src.multimodal.audio_player as audio_player_module
+from src.multimodal.gpt_sovits_client import GPTSoVITSClient, StreamInterruptedError
+from src.multimodal.pcm_stream import PcmChunk, PcmRingBuffer, WavStreamDecoder
+from src.multimodal.tts_manager import TTSConfig, TTSManager
+from tests.fake_gpt_sovits import sine_pcm, wav_header
+
+
+def test_wav_decoder_handles_arbitrary_splits() -> None:
+    pcm = sine_pcm(0.01, 8000)
+    # 额外的 LIST 块 + 流式长度字段，逐字节喂入
+    extra = b"LIST" + (4).to_bytes(4, "little") + b"INFO"
+    header = wav_header(8000)
+    stream = header[:36] + extra + header[36:] + pcm + b"\x01"
+
+    decoder = WavStreamDecoder()
+    out = bytearray()
+    for i in range(len(stream)):
+        chunk = decoder.feed(stream[i : i + 1])
+        if chunk is not None:
+            assert chunk.sample_rate == 8000 and len(chunk.data) % 2 == 0
+            out.extend(chunk.data)
+    assert bytes(out) == pcm  # 尾部半帧留在缓冲中
+
+    with pytest.raises(ValueError):
+        WavStreamDecoder().feed(b"ID3" + b"\x00" * 20)
+
+
+def test_ring_buffer_wraps_and_grows() -> None:
+    ring = PcmRingBuffer(1024)
+    ring.write(b"a" * 1000)
+    assert ring.read(900) == b"a" * 900
+    ring.write(b"b" * 500)  # 跨越尾部回绕
+    ring.write(b"c" * 2000)  # 超出容量时扩容
+    assert ring.available == 2600
+    assert ring.read(3000) == b"a" * 100 + b"b" * 500 + b"c" * 2000
+
+    ring.write(b"d" * 10)
+    ring.close()
+    assert ring.wait_for(10_000, timeout=0.1)  # 已关闭：不再等待
+    assert ring.read(100) == b"d" * 10
+
+
+def test_synthesize_stream_yields_before_body_completes(fake_gpt_sovits) -> None:
+    fake_gpt_sovits.chunk_delay_s = 0.03
+    fake_gpt_sovits.fail_first = 1
+    client = GPTSoVITSClient(api_url=fake_gpt_sovits.url, max_retries=2)
+    text = "流式合成测试"
+
+    async def run() -> tuple[list[PcmChunk], float, float]:
+        chunks: list[PcmChunk] = []
+        first_at = 0.0
+        async for chunk in client.synthesize_stream(text, "ref.wav", "参考"):
+            if not chunks:
+                first_at = time.monotonic()
+            chunks.append(chunk)
+        done_at = time.monotonic()
+        await client.close()
+        return chunks, first_at, done_at
+
+    chunks, first_at, done_at = asyncio.run(run())
+
+    assert len(chunks) > 3
+    assert b"".join(c.data for c in chunks) == fake_gpt_sovits.pcm_for(text)
+    assert done_at - first_at > 0.05  # 首块早于响应结束到达
+    # 第一次 503 后重试；请求带 streaming_mode
+    assert len(fake_gpt_sovits.requests) == 2
+    assert fake_gpt_sovits.requests[-1]["streaming_mode"] is True
+    stats = client.get_stats()
+    assert stats["successful_requests"] == 1 and stats["total_retries"] == 1
+    assert stats["last_first_chunk_ms"] < stats["last_latency_ms"]
+
+
+def test_stream_text_fills_cache_for_whole_wav_path(fake_gpt_sovits) -> None:
+    manager = TTSManager(TTSConfig(api_url=fake_gpt_sovits.url, disk_cache_enabled=False))
+
+    async def run() -> tuple[bytes, bytes | None, bytes]:
+        streamed = b"".join([c.data async for c in manager.stream_text("缓存一下")])
+        wav = await manager.synthesize_text("缓存一下")
+        replay = b"".join([c.data async for c in manager.stream_text("缓存一下")])
+        await manager.client.close()
+        return streamed, wav, replay
+
+    streamed, wav, replay = asyncio.run(run())
+    assert streamed == fake_gpt_sovits.pcm_for("缓存一下")
+    assert wav is not None and wav.endswith(streamed)
+    assert replay == streamed
+    assert len(fake_gpt_sovits.requests) == 1
+
+
+def test_stream_dropped_mid_body_is_reported_and_not_cached(fake_gpt_sovits) -> None:
+    fake_gpt_sovits.drop_after_chunks = 2
+    text = "服务端中途断开"
+    client = GPTSoVITSClient(api_url=fake_gpt_sovits.url, max_retries=2)
+    manager = TTSManager(TTSConfig(api_url=fake_gpt_sovits.url, disk_cache_enabled=False))
+
+    async def run() -> tuple[list[PcmChunk], bytes, bytes]:
+        chunks: list[PcmChunk] = []
+        with pytest.raises(StreamInterruptedError):
+            async for chunk in client.synthesize_stream(text, "ref.wav", "参考"):
+                chunks.append(chunk)
+        await client.close()
+
+        # 管理器照常产出已收到的部分，但不缓存截断的音频：服务恢复后重新请求得到完整音频
+        partial = b"".join([c.data async for c in manager.stream_text(text)])
+        fake_gpt_sovits.drop_after_chunks = 0
+        replay = b"".join([c.data async for c in manager.stream_text(text)])
+        await manager.client.close()
+        return chunks, partial, replay
+
+    chunks, partial, replay = asyncio.run(run())
+    full = fake_gpt_sovits.pcm_for(text)
+    assert chunks and len(b"".join(c.data for c in chunks)) < len(full)
+    assert 0 < len(partial) < len(full) and full.startswith(partial)
+    assert replay == full
+    # 已输出部分音频后不重试；截断的音频未命中缓存
+    assert len(fake_gpt_sovits.requests) == 3
+    assert client.get_stats()["failed_requests"] == 1
+
+
+class _FakeOutputStream:
+    """以实时速度在线程中驱动 callback 的 OutputStream 替身。"""
+
+    blocksize = 160
+    played: list = []
+
+    def __init__(self, samplerate, channels, dtype, callback, finished_callback):  # noqa: ANN001
+        self.samplerate = samplerate
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self._aborted = False
+
+    def __enter__(self):  # noqa: ANN204
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:  # noqa: ANN002
+        self._thread.join(timeout=2.0)
+
+    def abort(self) -> None:
+        self._aborted = True
+
+    def _run(self) -> None:
+        import numpy as np
+
+        while not self._aborted:
+            out = np.zeros((self.blocksize, 1), dtype=np.float32)
+            try:
+                self.callback(out, self.blocksize, None, None)
+            except _CallbackStop:
+                _FakeOutputStream.played.append(out.copy())
+                break
+            _FakeOutputStream.played.append(out.copy())
+            time.sleep(self.blocksize / self.samplerate)
+        self.finished_callback()
+
+
+class _CallbackStop(Exception):
+    pass
+
+
+def test_audio_player_stream_plays_after_preroll(monkeypatch) -> None:
+    np = pytest.importorskip("numpy")
+    fake_sd = types.SimpleNamespace(
+        OutputStream=_FakeOutputStream,
+        CallbackStop=_CallbackStop,
+        stop=lambda: None,
+    )
+    monkeypatch.setattr(audio_player_module, "sd", fake_sd, raising=False)
+    monkeypatch.setattr(audio_player_module, "_has_sounddevice", True)
+    _FakeOutputStream.played = []
+
+    player = audio_player_module.AudioPlayer(default_volume=1.0, stream_preroll_ms=50)
+    envelopes: list[tuple[int, float]] = []
+    player.register_playback_start_observer(
+        lambda env, step_s, start_t: envelopes.append((len(env), start_t))
+    )
+
+    writer = player.open_stream(preroll_ms=50)
+    assert writer is not None
+    pcm = sine_pcm(0.3, 8000)
+    step = 160  # 10ms
+    writer.write(PcmChunk(pcm[:step], 8000))
+    time.sleep(0.05)
+    assert writer.started_at is None  # 未达到 pre-roll，不出声
+    for pos in range(step, len(pcm), step):
+        writer.write(PcmChunk(pcm[pos : pos + step], 8000))
+        time.sleep(0.002)
+    writer.close()
+    assert writer.wait(3.0)
+
+    played = np.concatenate(_FakeOutputStream.played)[:, 0]
+    expected = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    assert np.allclose(played[: expected.size], expected, atol=1e-4)
+    # 包络按块增量发送：同一起点、长度递增
+    assert len(envelopes) >= 2
+    assert len({start for _, start in envelopes}) == 1
+    assert [n for n, _ in envelopes] == sorted(n for n, _ in envelopes)
+    assert envelopes[-1][0] >= int(0.3 * 60) - 1
+
+    aborted = player.open_stream(8000)
+    aborted.abort()
+    assert aborted.wait(1.0)
+    player._stop_event.set()
+    player._queue_event.set()
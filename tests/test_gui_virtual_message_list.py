@@ -0,0 +1,136 @@
+import pytest
+
+
+def _get_qapp():
+    pytest.importorskip("PyQt6")
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance()
+    if app is not None:
+        return app
+    try:
+        return QApplication([])
+    except Exception as exc:
+        pytest.skip(f"Qt QApplication not available: {exc!r}")
+
+
+def _history(start: int, stop: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "role": ("user", "assistant")[i % 2],
+            "content": f"消息 {i} " + "喵" * (i % 60) + ("\n第二行" if i % 3 == 0 else ""),
+            "timestamp": "2026-01-01 10:00:00",
+        }
+        for i in range(start, stop)
+    ]
+
+
+def _make_view(app, rows: list[dict]):
+    from src.gui.virtual_message_list import ChatMessageListModel, VirtualMessageListView
+
+    model = ChatMessageListModel()
+    view = VirtualMessageListView(top_inset=60)
+    view.setModel(model)
+    view.resize(900, 600)
+    view.show()
+    app.processEvents()
+    model.set_messages(rows)
+    app.processEvents()
+    return model, view
+
+
+def test_model_pages_dedupes_and_keeps_typing_row_last():
+    _get_qapp()
+    from src.gui.virtual_message_list import (
+        PART_STICKER,
+        PART_TEXT,
+        ChatMessageListModel,
+        StreamingMessageHandle,
+        split_message_parts,
+    )
+
+    model = ChatMessageListModel()
+    model.set_messages(_history(10, 20))
+    assert model.rowCount() == 10 and model.oldest_message_id() == 10
+
+    # 上一页与当前页有重叠时按 id 去重
+    assert model.prepend_messages(_history(5, 12)) == 5
+    assert model.oldest_message_id() == 5
+
+    model.set_typing(True)
+    stream = StreamingMessageHandle(model)
+    stream.append_text("你好")
+    stream.append_text("呀")
+    assert model.has_typing and model.message_at(model.rowCount() - 2).content == "你好呀"
+    assert stream.message_text.toPlainText() == "你好呀"
+    model.set_typing(False)
+
+    # 未完成的流式行在 cleanup 时移除；finish 后保留
+    stream.cleanup()
+    assert model.rowCount() == 15
+    kept = StreamingMessageHandle(model)
+    kept.setPlainText("完成")
+    kept.finish()
+    kept.cleanup()
+    assert model.message_at(model.rowCount() - 1).content == "完成"
+
+    assert split_message_parts("嗨 [STICKER:a.png] 嗯") == (
+        (PART_TEXT, "嗨 "),
+        (PART_STICKER, "a.png"),
+        (PART_TEXT, " 嗯"),
+    )
+
+
+def test_view_only_lays_out_and_paints_visible_rows():
+    app = _get_qapp()
+    model, view = _make_view(app, _history(0, 10_000))
+    delegate = view.itemDelegate()
+
+    bar = view.verticalScrollBar()
+    assert bar.value() == bar.maximum() > 0
+    # 排版缓存有上限：1 万行不会保留 1 万份 QTextLayout
+    assert delegate.cached_layout_count() <= 256
+
+    for value in (0, bar.maximum() // 3, bar.maximum() // 2):
+        bar.setValue(value)
+        delegate.stats["paints"] = 0
+        view.viewport().repaint()
+        visible = view.visible_rows()
+        assert 0 < len(visible) < 30
+        assert delegate.stats["paints"] <= len(visible)
+
+    # 同一宽度下重复绘制直接复用缓存的排版结果
+    layouts = delegate.stats["layouts"]
+    view.viewport().repaint()
+    assert delegate.stats["layouts"] == layouts
+
+
+def test_view_keeps_anchor_on_prepend_and_follows_stream_at_bottom():
+    app = _get_qapp()
+    from src.gui.virtual_message_list import StreamingMessageHandle
+
+    model, view = _make_view(app, _history(1000, 1200))
+    bar = view.verticalScrollBar()
+
+    bar.setValue(bar.maximum() // 2)
+    center = view.viewport().rect().center()
+    row_before = view.indexAt(center).row()
+    key_before = model.message_at(row_before).key
+    model.prepend_messages(_history(900, 1000))
+    assert model.message_at(view.indexAt(center).row()).key == key_before
+
+    bar.setValue(bar.maximum())
+    stream = StreamingMessageHandle(model)
+    for _ in range(40):
+        stream.append_text("流式输出的一段文字，")
+    assert bar.value() == bar.maximum()
+
+    # 列宽变化后分帧重测，完成后仍贴底
+    view.set_column_max_width(520)
+    for _ in range(1000):
+        app.processEvents()
+        if view._remeasure_rows is None:
+            break
+    assert view._remeasure_rows is None
+    assert bar.value() == bar.maximum()
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.llm_native.backend import BackendConfig
+from src.llm_native.openai_backend import AsyncOpenAICompatibleBackend, OpenAICompatibleBackend
+from src.utils.http_transport import HttpTransportRegistry, normalize_origin
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _ok(self) -> None:
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = _ok
+    do_HEAD = _ok
+
+    def log_message(self, *_args) -> None:  # noqa: ANN002 - silence test server
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_normalize_origin_ignores_path_and_default_ports():
+    assert normalize_origin("https://API.example.com/v1") == "https://api.example.com:443"
+    assert normalize_origin("https://api.example.com:443/other") == "https://api.example.com:443"
+    assert normalize_origin("http://localhost:8000/v1") == "http://localhost:8000"
+
+
+def test_registry_shares_client_per_origin_and_tracks_reuse(local_server):
+    registry = HttpTransportRegistry(http2=False)
+    try:
+        client = registry.get_client(f"{local_server}/v1")
+        assert registry.get_client(f"{local_server}/v2/other") is client
+
+        for _ in range(3):
+            assert client.get(f"{local_server}/v1/models").status_code == 200
+
+        stats = registry.stats()[normalize_origin(local_server)]
+        assert stats["requests"] == 3
+        assert stats["new_connections"] == 1
+        assert stats["open_connections"] == 1
+        assert stats["reuse_ratio"] == pytest.approx(2 / 3, abs=1e-3)
+        assert stats["handshake_avg_ms"] > 0
+    finally:
+        registry.close_all()
+
+
+def test_openai_backends_share_transport_and_close_keeps_pool_open(monkeypatch, local_server):
+    import src.llm_native.openai_backend as openai_backend
+
+    registry = HttpTransportRegistry(http2=False)
+    monkeypatch.setattr(openai_backend, "get_http_client", registry.get_client)
+    try:
+        main = OpenAICompatibleBackend(BackendConfig(base_url=local_server, api_key="k", model="a"))
+        selector = OpenAICompatibleBackend(
+            BackendConfig(base_url=f"{local_server}/v1", api_key="k", model="b")
+        )
+        shared = registry.get_client(local_server)
+        assert main._client._client is shared
+        assert selector._client._client is shared
+
+        selector.close()
+        assert not shared.is_closed
+    finally:
+        registry.close_all()
+
+
+def _patch_async_registry(monkeypatch, registry: HttpTransportRegistry) -> None:
+    import src.llm_native.openai_backend as openai_backend
+
+    monkeypatch.setattr(openai_backend, "get_async_http_client", registry.get_async_client)
+    monkeypatch.setattr(openai_backend, "release_async_http_client", registry.release_async_client)
+
+
+def test_async_backends_release_shared_pool_with_last_holder(monkeypatch, local_server):
+    registry = HttpTransportRegistry(http2=False)
+    _patch_async_registry(monkeypatch, registry)
+    config = BackendConfig(base_url=local_server, api_key="k", model="a")
+
+    async def _run() -> None:
+        first = AsyncOpenAICompatibleBackend(config)
+        second = AsyncOpenAICompatibleBackend(config)
+        shared = first._http_client
+        assert second._http_client is shared
+
+        await first.aclose()
+        assert not shared.is_closed
+        await second.aclose()
+        assert shared.is_closed
+        assert registry.stats()[normalize_origin(local_server)]["open_connections"] == 0
+
+    asyncio.run(_run())
+
+
+class _SlowSSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for piece in ("喵", "~"):
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(0.2)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, *_args) -> None:  # noqa: ANN002 - silence test server
+        pass
+
+
+def test_agent_keeps_one_async_backend_per_loop_for_concurrent_streams(monkeypatch):
+    from src.agent.core import MintChatAgent
+    from src.llm_native.backend import ChatRequest
+    from src.llm_native.events import TextDeltaEvent
+    from src.llm_native.messages import Message
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowSSEHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    registry = HttpTransportRegistry(http2=False)
+    _patch_async_registry(monkeypatch, registry)
+    config = BackendConfig(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="k", model="a"
+    )
+    agent = MintChatAgent.__new__(MintChatAgent)
+    agent._native_async_backends = weakref.WeakKeyDictionary()  # type: ignore[attr-defined]
+    agent._native_async_backends_lock = threading.Lock()  # type: ignore[attr-defined]
+    agent._get_native_backend = lambda: OpenAICompatibleBackend(  # type: ignore[assignment]
+        config, shared_transport=False
+    )
+    both_streaming = threading.Barrier(2, timeout=5)
+    results: dict[str, str] = {}
+    backends: dict[str, object] = {}
+
+    async def _stream(name: str) -> None:
+        backend = agent._get_native_async_backend()
+        backends[name] = backend
+        request = ChatRequest(messages=[Message(role="user", content="hi")])
+        text = ""
+        async for event in backend.stream(request):
+            if isinstance(event, TextDeltaEvent):
+                if not text:
+                    # 两个事件循环都已拿到 backend 且正在流式读取
+                    await asyncio.to_thread(both_streaming.wait)
+                text += event.delta
+        results[name] = text
+
+    threads = [
+        threading.Thread(target=lambda n=name: asyncio.run(_stream(n))) for name in ("a", "b")
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        assert results == {"a": "喵~", "b": "喵~"}
+        assert backends["a"] is not backends["b"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_close_transport_registry_closes_pools_and_resets(monkeypatch, local_server):
+    import src.utils.http_transport as http_transport
+
+    registry = HttpTransportRegistry(http2=False)
+    monkeypatch.setattr(http_transport, "_registry", registry)
+    client = http_transport.get_http_client(local_server)
+
+    http_transport.close_transport_registry()
+
+    assert client.is_closed
+    assert http_transport._registry is None
+    http_transport.close_transport_registry()
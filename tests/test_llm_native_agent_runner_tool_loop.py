@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
 from dataclasses import dataclass
 from typing import Any, Iterator
 
+import pytest
+
 from src.llm_native.agent_runner import AgentRunnerConfig, NativeToolLoopRunner
 from src.llm_native.backend import ChatBackend, ChatRequest, ChatResponse
 from src.llm_native.events import (
@@ -153,3 +158,315 @@ def test_tool_runner_records_tool_traces_when_recorder_present():
     assert traces[0].name == "calculator"
     assert traces[0].args == {"expression": "1+1"}
     assert traces[0].error == ""
+
+
+@dataclass(slots=True)
+class ScriptedBackend(ChatBackend):
+    rounds: list[list[Any]]
+    progress: list[str]
+
+    def complete(self, request: ChatRequest) -> ChatResponse:  # pragma: no cover
+        raise NotImplementedError
+
+    def stream(self, request: ChatRequest) -> Iterator[Any]:
+        events = self.rounds.pop(0)
+        for event in events:
+            self.progress.append(getattr(event, "type", ""))
+            yield event
+        self.progress.append("end")
+
+
+def _speculative_runner(backend: ChatBackend, **kwargs: Any) -> NativeToolLoopRunner:
+    return NativeToolLoopRunner(
+        backend=backend,
+        tools=[],
+        tool_runner=ToolRunner(tool_executor=FakeToolExecutor()),
+        config=AgentRunnerConfig(tool_timeout_s=1.0, speculative_streaming=True),
+        **kwargs,
+    )
+
+
+def test_speculative_streaming_forwards_text_before_round_finishes():
+    progress: list[str] = []
+    backend = ScriptedBackend(
+        rounds=[
+            [
+                TextDeltaEvent(delta="  "),
+                TextDeltaEvent(delta="Hi"),
+                TextDeltaEvent(delta=" there"),
+                DoneEvent(finish_reason="stop"),
+            ]
+        ],
+        progress=progress,
+    )
+    runner = _speculative_runner(backend)
+
+    stream = runner.stream([Message(role="user", content="hi")])
+    first = next(stream)
+    # 首个非空白文本到达即转发（此时后端尚未结束）
+    assert isinstance(first, TextDeltaEvent) and first.delta == "  "
+    assert "end" not in progress
+
+    rest = list(stream)
+    assert "".join(e.delta for e in [first, *rest] if isinstance(e, TextDeltaEvent)) == "  Hi there"
+    assert isinstance(rest[-1], DoneEvent)
+
+    assert len(runner.round_metrics) == 1
+    metrics = runner.round_metrics[0]
+    assert metrics.ttft_ms is not None and metrics.total_ms is not None
+    assert metrics.ttft_ms <= metrics.total_ms
+
+
+def test_speculative_streaming_retracts_text_when_tool_call_follows():
+    from src.llm_native.events import TextRetractEvent
+
+    backend = ScriptedBackend(
+        rounds=[
+            [
+                TextDeltaEvent(delta="let me check"),
+                ToolCallDeltaEvent(
+                    index=0, tool_call_id="call_1", name="calculator", arguments_delta="{}"
+                ),
+                DoneEvent(finish_reason="tool_calls"),
+            ],
+            [TextDeltaEvent(delta="OK"), DoneEvent(finish_reason="stop")],
+        ],
+        progress=[],
+    )
+    runner = _speculative_runner(backend)
+
+    events = list(runner.stream([Message(role="user", content="1+1?")]))
+    retracts = [e for e in events if isinstance(e, TextRetractEvent)]
+    assert len(retracts) == 1
+    assert retracts[0].chars == len("let me check")
+    assert retracts[0].reason == "tool_calls"
+    assert events.index(retracts[0]) < next(
+        i for i, e in enumerate(events) if isinstance(e, ToolResultEvent)
+    )
+    assert [e.delta for e in events if isinstance(e, TextDeltaEvent)] == ["let me check", "OK"]
+    assert runner.round_metrics[0].retracted_chars == len("let me check")
+
+
+def test_speculative_streaming_retracts_when_post_model_rewrites_text():
+    from src.llm_native.events import TextRetractEvent
+    from src.llm_native.pipeline import Pipeline, PipelineResponse, PipelineStage
+
+    class _Rewrite(PipelineStage):
+        def post_model(self, response: PipelineResponse) -> PipelineResponse:
+            assert response.streamed_events == 2
+            response.events = [TextDeltaEvent(delta="rewritten")]
+            return response
+
+    backend = ScriptedBackend(
+        rounds=[
+            [TextDeltaEvent(delta="a"), TextDeltaEvent(delta="b"), DoneEvent(finish_reason="stop")]
+        ],
+        progress=[],
+    )
+    runner = _speculative_runner(backend, pipeline=Pipeline(stages=[_Rewrite()]))
+
+    events = list(runner.stream([Message(role="user", content="x")]))
+    kinds = [type(e).__name__ for e in events]
+    assert kinds == [
+        "TextDeltaEvent",
+        "TextDeltaEvent",
+        "TextRetractEvent",
+        "TextDeltaEvent",
+        "DoneEvent",
+    ]
+    retract = events[2]
+    assert isinstance(retract, TextRetractEvent) and retract.chars == 2
+    assert events[3].delta == "rewritten"
+
+
+class SlowToolExecutor:
+    def __init__(self, delays: dict[str, float], unsafe: set[str] | None = None) -> None:
+        self.delays = delays
+        self.unsafe = set(unsafe or ())
+        self.events: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def is_parallel_safe(self, name: str) -> bool:
+        return name not in self.unsafe
+
+    def execute_tool(self, name: str, timeout: float, **kwargs: Any) -> str:
+        with self._lock:
+            self.events.append(("start", name))
+        time.sleep(self.delays.get(name, 0.0))
+        with self._lock:
+            self.events.append(("end", name))
+        return f"{name}:done"
+
+
+def _calls(*names: str) -> list[ToolCallState]:
+    return [
+        ToolCallState(index=i, tool_call_id=f"call_{i}", name=name, arguments_json="{}")
+        for i, name in enumerate(names)
+    ]
+
+
+def test_tool_runner_parallel_preserves_order_and_overlaps_calls():
+    executor = SlowToolExecutor({"slow": 0.3, "fast": 0.05, "mid": 0.15})
+    runner = ToolRunner(tool_executor=executor, max_parallel=4)
+    recorder = ToolTraceRecorder()
+    token = tool_trace_recorder_var.set(recorder)
+    try:
+        started = time.perf_counter()
+        msgs = runner.run(_calls("slow", "fast", "mid"), timeout_s=5.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        tool_trace_recorder_var.reset(token)
+        runner.close()
+
+    assert [m.tool_call_id for m in msgs] == ["call_0", "call_1", "call_2"]
+    assert [m.content for m in msgs] == ["slow:done", "fast:done", "mid:done"]
+    assert elapsed < 0.45
+    assert sorted(t.name for t in recorder.traces) == ["fast", "mid", "slow"]
+    assert recorder.in_flight == 0
+
+
+def test_tool_runner_runs_non_parallel_safe_tools_alone():
+    executor = SlowToolExecutor(
+        {"read_a": 0.05, "write_file": 0.05, "read_b": 0.05}, unsafe={"write_file"}
+    )
+    runner = ToolRunner(tool_executor=executor, max_parallel=4)
+    try:
+        msgs = runner.run(_calls("read_a", "write_file", "read_b"), timeout_s=5.0)
+    finally:
+        runner.close()
+
+    assert [m.name for m in msgs] == ["read_a", "write_file", "read_b"]
+    idx = executor.events.index(("start", "write_file"))
+    assert executor.events[idx - 1] == ("end", "read_a")
+    assert executor.events[idx + 1] == ("end", "write_file")
+
+
+def test_tool_runner_round_deadline_times_out_pending_calls():
+    executor = SlowToolExecutor({"quick": 0.01, "stuck": 2.0})
+    runner = ToolRunner(tool_executor=executor, max_parallel=2, round_timeout_s=0.2)
+    try:
+        started = time.perf_counter()
+        msgs = runner.run(_calls("quick", "stuck"), timeout_s=5.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        runner.close()
+
+    assert elapsed < 1.0
+    assert msgs[0].content == "quick:done"
+    assert msgs[1].tool_call_id == "call_1"
+    assert "超时" in str(msgs[1].content)
+
+
+def test_tool_runner_round_deadline_cancels_queued_and_drops_late_traces():
+    executor = SlowToolExecutor({"stuck": 0.4, "slow": 0.4, "queued": 0.01})
+    runner = ToolRunner(tool_executor=executor, max_parallel=2, round_timeout_s=0.1)
+    recorder = ToolTraceRecorder()
+    token = tool_trace_recorder_var.set(recorder)
+    try:
+        msgs = runner.run(_calls("stuck", "slow", "queued"), timeout_s=5.0)
+        time.sleep(0.6)
+    finally:
+        tool_trace_recorder_var.reset(token)
+        runner.close()
+
+    assert all("超时" in str(m.content) for m in msgs)
+    # 排队中的调用被取消，运行中的调用迟到结果不进入轨迹
+    assert ("start", "queued") not in executor.events
+    assert ("end", "stuck") in executor.events
+    assert sorted(t.name for t in recorder.traces) == ["queued", "slow", "stuck"]
+    assert all("超时" in t.error for t in recorder.traces)
+    assert recorder.in_flight == 0
+
+
+def test_tool_runner_parallel_respects_cancel_event():
+    executor = SlowToolExecutor({"a": 0.5, "b": 0.5})
+    runner = ToolRunner(tool_executor=executor, max_parallel=2)
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    try:
+        started = time.perf_counter()
+        msgs = runner.run(_calls("a", "b"), cancel_event=cancel, timeout_s=5.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        runner.close()
+
+    assert msgs == []
+    assert elapsed < 0.4
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # AsyncNativeToolLoopRunner offloads blocking work with asyncio.to_thread.
+    return "asyncio"
+
+
+class FakeAsyncBackend:
+    """Async twin of FakeBackend: one tool-call round, then a text round."""
+
+    def __init__(self, *, delay_s: float = 0.0) -> None:
+        self.calls = 0
+        self.delay_s = delay_s
+
+    async def complete(self, request: ChatRequest) -> ChatResponse:  # pragma: no cover
+        raise NotImplementedError
+
+    async def stream(self, request: ChatRequest):  # noqa: ANN201 - async generator
+        self.calls += 1
+        if self.delay_s:
+            await asyncio.sleep(self.delay_s)
+        if request.messages[-1].role != "tool":
+            yield ToolCallDeltaEvent(
+                index=0,
+                tool_call_id="call_1",
+                name="calculator",
+                arguments_delta='{"expression":"1+1"}',
+            )
+            yield DoneEvent(finish_reason="tool_calls")
+            return
+        assert request.messages[-1].tool_call_id == "call_1"
+        yield TextDeltaEvent(delta="OK")
+        yield DoneEvent(finish_reason="stop")
+
+
+def _async_runner(backend: FakeAsyncBackend, executor: FakeToolExecutor) -> Any:
+    from src.llm_native.agent_runner import AsyncNativeToolLoopRunner
+
+    return AsyncNativeToolLoopRunner(
+        backend=backend,
+        tools=[ToolSpec(name="calculator", description="calc", parameters={"type": "object"})],
+        tool_runner=ToolRunner(tool_executor=executor),
+        config=AgentRunnerConfig(max_tool_rounds=3, tool_timeout_s=1.0),
+    )
+
+
+@pytest.mark.anyio
+async def test_async_native_tool_loop_runner_executes_tool_and_continues():
+    backend = FakeAsyncBackend()
+    executor = FakeToolExecutor()
+    runner = _async_runner(backend, executor)
+
+    events = [e async for e in runner.stream([Message(role="user", content="1+1?")])]
+
+    assert backend.calls == 2
+    assert executor.calls == [("calculator", 1.0, {"expression": "1+1"})]
+    assert any(isinstance(e, ToolResultEvent) for e in events)
+    assert [e.delta for e in events if isinstance(e, TextDeltaEvent)] == ["OK"]
+    assert isinstance(events[-1], DoneEvent)
+    assert events[-1].finish_reason == "stop"
+    assert len(runner.round_metrics) == 2
+
+
+@pytest.mark.anyio
+async def test_async_native_tool_loop_runner_serves_concurrent_streams_on_one_loop():
+    async def consume() -> list[Any]:
+        runner = _async_runner(FakeAsyncBackend(delay_s=0.2), FakeToolExecutor())
+        return [e async for e in runner.stream([Message(role="user", content="hi")])]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(consume() for _ in range(5)))
+    elapsed = time.perf_counter() - started
+
+    # 5 conversations x 2 rounds x 0.2s each would take 2s if streams were serialized.
+    assert elapsed < 1.2
+    for events in results:
+        assert isinstance(events[-1], DoneEvent) and events[-1].finish_reason == "stop"
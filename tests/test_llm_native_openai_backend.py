@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from types import SimpleNamespace
 
+import pytest
+
 from src.llm_native.backend import BackendConfig, ChatRequest
 from src.llm_native.events import DoneEvent, TextDeltaEvent, ToolCallDeltaEvent
 from src.llm_native.messages import Message
@@ -238,3 +240,89 @@ def test_openai_backend_stream_falls_back_to_create_on_stream_assertion_error():
     assert any(isinstance(e, TextDeltaEvent) and e.delta == "!" for e in events)
     assert isinstance(events[-1], DoneEvent)
     assert events[-1].finish_reason == "stop"
+
+
+class DummyAsyncChunks:
+    def __init__(self, chunks) -> None:  # noqa: ANN001 - test stub
+        self._chunks = list(chunks or [])
+        self.closed = False
+
+    def __aiter__(self):  # noqa: ANN204 - test stub
+        return self._iter()
+
+    async def _iter(self):  # noqa: ANN202 - test stub
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class DummyAsyncChatCompletions:
+    def __init__(self, *, complete_response=None, stream_chunks=None) -> None:
+        self._complete_response = complete_response
+        self.last_chunks: DummyAsyncChunks | None = None
+        self._stream_chunks = list(stream_chunks or [])
+        self.stream = None  # exercise the `.create(stream=True)` path
+
+    async def create(self, **kwargs):  # noqa: ANN003 - test stub
+        if kwargs.get("stream"):
+            self.last_chunks = DummyAsyncChunks(self._stream_chunks)
+            return self.last_chunks
+        return self._complete_response
+
+
+@pytest.mark.anyio
+async def test_async_openai_backend_stream_matches_sync_events():
+    from src.llm_native.openai_backend import AsyncOpenAICompatibleBackend
+
+    chunks = [
+        SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(role="assistant"), finish_reason=None)]
+        ),
+        SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content="hel"), finish_reason=None)]
+        ),
+        SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content="lo"), finish_reason="stop")]
+        ),
+    ]
+    completions = DummyAsyncChatCompletions(stream_chunks=chunks)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    backend = AsyncOpenAICompatibleBackend(
+        BackendConfig(base_url="https://gateway.example.com/v1", api_key="k", model="m"),
+        client=client,
+    )
+
+    request = ChatRequest(messages=[Message(role="user", content="hi")])
+    events = [e async for e in backend.stream(request)]
+
+    assert [e.delta for e in events if isinstance(e, TextDeltaEvent)] == ["", "hel", "lo"]
+    assert isinstance(events[-1], DoneEvent)
+    assert events[-1].finish_reason == "stop"
+    assert completions.last_chunks is not None and completions.last_chunks.closed
+
+    sync_backend = OpenAICompatibleBackend(
+        BackendConfig(base_url="https://gateway.example.com/v1", api_key="k", model="m"),
+        client=DummyClient(stream_chunks=chunks),
+    )
+    assert list(sync_backend.stream(request)) == events
+
+
+@pytest.mark.anyio
+async def test_async_openai_backend_complete_returns_text():
+    from src.llm_native.openai_backend import AsyncOpenAICompatibleBackend
+
+    resp = SimpleNamespace(
+        choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content="hey"))]
+    )
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=DummyAsyncChatCompletions(complete_response=resp))
+    )
+    backend = AsyncOpenAICompatibleBackend(
+        BackendConfig(base_url="", api_key="k", model="m"), client=client
+    )
+
+    out = await backend.complete(ChatRequest(messages=[Message(role="user", content="hi")]))
+    assert out.output_text == "hey"
+    assert out.finish_reason == "stop"
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.llm_native.backend import BackendConfig, ChatRequest
+from src.llm_native.events import DoneEvent, TextDeltaEvent, ToolCallDeltaEvent
+from src.llm_native.messages import Message
+from src.llm_native.openai_backend import OpenAICompatibleBackend
+from src.llm_native.sse_decoder import HEARTBEAT, SSEStreamError, StreamDeltaDecoder
+
+
+def _sse(delta: dict, finish_reason: str | None = None) -> bytes:
+    chunk = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 1,
+        "model": "m",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+RECORDED_STREAM = b"".join(
+    [
+        _sse({"role": "assistant", "content": ""}),
+        b": keep-alive\n\n",
+        _sse({"content": "你好"}),
+        _sse({"content": "，主人"}),
+        _sse(
+            {
+                "tool_calls": [
+                    {
+                        "index": 0,
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {"name": "get_weather", "arguments": ""},
+                    }
+                ]
+            }
+        ),
+        _sse({"tool_calls": [{"index": 0, "function": {"arguments": '{"city": '}}]}),
+        _sse({"tool_calls": [{"index": 0, "function": {"arguments": '"上海"}'}}]}),
+        _sse({}, "tool_calls"),
+        b"data: [DONE]\n\n",
+    ]
+)
+
+
+def _decode_in_reads(body: bytes, size: int) -> tuple[StreamDeltaDecoder, list]:
+    decoder = StreamDeltaDecoder()
+    events: list = []
+    for pos in range(0, len(body), size):
+        events.extend(decoder.feed(body[pos : pos + size]))
+    events.extend(decoder.close())
+    return decoder, events
+
+
+def _semantic(events: list) -> tuple[str, str, list]:
+    text = "".join(e.delta for e in events if isinstance(e, TextDeltaEvent))
+    tool_events = [e for e in events if isinstance(e, ToolCallDeltaEvent)]
+    args = "".join(e.arguments_delta or "" for e in tool_events)
+    names = [e.name for e in tool_events if e.name]
+    return text, args, names
+
+
+def test_decoder_coalesces_text_within_one_read_and_flushes_before_tool_calls():
+    decoder, events = _decode_in_reads(RECORDED_STREAM, len(RECORDED_STREAM))
+
+    assert decoder.done is True
+    assert decoder.finish_reason == "tool_calls"
+    assert isinstance(events[0], TextDeltaEvent)
+    assert events[0].delta == "你好，主人"
+    assert [type(e) for e in events[1:]] == [ToolCallDeltaEvent] * 3
+    assert events[1].tool_call_id == "call_1"
+    assert events[1].name == "get_weather"
+    assert events[1].arguments_delta is None
+    assert "".join(e.arguments_delta or "" for e in events[1:]) == '{"city": "上海"}'
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_decoder_is_split_invariant_across_partial_reads(size: int):
+    decoder, events = _decode_in_reads(RECORDED_STREAM, size)
+
+    assert decoder.done is True
+    assert decoder.finish_reason == "tool_calls"
+    assert _semantic(events) == ("你好，主人", '{"city": "上海"}', ["get_weather"])
+
+
+def test_decoder_drops_comments_and_emits_single_heartbeat_for_empty_payloads():
+    decoder = StreamDeltaDecoder()
+
+    assert decoder.feed(b": keep-alive\n\n: ping\n\n") == []
+    events = decoder.feed(_sse({"role": "assistant"}) + _sse({"reasoning_content": "..."}))
+    assert events == [HEARTBEAT]
+    assert events[0] is HEARTBEAT
+
+
+def test_decoder_handles_crlf_and_multiline_data_fields():
+    decoder = StreamDeltaDecoder()
+    payload = json.dumps({"choices": [{"delta": {"content": "hi"}, "finish_reason": "stop"}]})
+    head, tail = payload[:10], payload[10:]
+
+    events = decoder.feed(f"data: {head}\r\ndata: {tail}\r\n\r\n".encode())
+
+    # Multi-line data is joined with "\n", which is insignificant JSON whitespace here.
+    assert events == [TextDeltaEvent(delta="hi")]
+    assert decoder.finish_reason == "stop"
+
+
+def test_decoder_raises_on_error_payload():
+    decoder = StreamDeltaDecoder()
+    with pytest.raises(SSEStreamError, match="rate limited"):
+        decoder.feed(b'data: {"error": {"message": "rate limited"}}\n\n')
+
+
+def test_decoder_close_flushes_unterminated_trailing_event():
+    decoder = StreamDeltaDecoder()
+    assert decoder.feed(b'data: {"choices": [{"delta": {"content": "tail"}}]}') == []
+
+    assert decoder.close() == [TextDeltaEvent(delta="tail")]
+    assert decoder.close() == []
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    body = RECORDED_STREAM
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length") or 0)
+        requests: list = self.server.requests  # type: ignore[attr-defined]
+        requests.append(json.loads(self.rfile.read(length)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        # Write in small pieces so the client sees lines split across reads.
+        for pos in range(0, len(self.body), 37):
+            self.wfile.write(self.body[pos : pos + 37])
+            self.wfile.flush()
+
+    def log_message(self, format, *args):  # noqa: A002, ANN001 - silence test server
+        return
+
+
+@pytest.fixture
+def sse_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SSEHandler)
+    server.requests = []  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_openai_backend_stream_decodes_raw_sse_from_http_response(sse_server):
+    host, port = sse_server.server_address
+    backend = OpenAICompatibleBackend(
+        BackendConfig(base_url=f"http://{host}:{port}/v1", api_key="k", model="m"),
+        shared_transport=False,
+    )
+    try:
+        events = list(backend.stream(ChatRequest(messages=[Message(role="user", content="hi")])))
+    finally:
+        backend.close()
+
+    assert sse_server.requests[0]["stream"] is True
+    assert _semantic(events) == ("你好，主人", '{"city": "上海"}', ["get_weather"])
+    assert isinstance(events[-1], DoneEvent)
+    assert events[-1].finish_reason == "tool_calls"
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.utils.local_embeddings as local_mod
+from src.utils.local_embeddings import LocalEmbeddings
+from src.utils.onnx_embeddings import resolve_model_dir, select_onnx_file
+
+
+def test_select_onnx_file_prefers_quantized_weights(temp_dir: Path) -> None:
+    (temp_dir / "onnx").mkdir()
+    (temp_dir / "onnx" / "model.onnx").write_bytes(b"")
+    assert select_onnx_file(temp_dir).name == "model.onnx"
+
+    (temp_dir / "onnx" / "model_qint8_avx2.onnx").write_bytes(b"")
+    assert select_onnx_file(temp_dir).name == "model_qint8_avx2.onnx"
+    assert select_onnx_file(temp_dir, quantized=False).name == "model.onnx"
+
+    with pytest.raises(FileNotFoundError):
+        select_onnx_file(temp_dir / "missing")
+
+
+def test_resolve_model_dir_downloads_only_selected_weights(monkeypatch, temp_dir: Path) -> None:
+    import sys
+    import types
+
+    repo_files = [
+        "onnx/model.onnx",
+        "onnx/model_O4.onnx",
+        "onnx/model_qint8_avx2.onnx",
+        "onnx/model_quint8_avx2.onnx",
+        "tokenizer.json",
+    ]
+    calls: list[list[str]] = []
+
+    def fake_snapshot_download(*, repo_id, cache_dir, allow_patterns):  # noqa: ANN001
+        calls.append(list(allow_patterns))
+        return str(temp_dir)
+
+    fake_hub = types.ModuleType("huggingface_hub")
+    fake_hub.list_repo_files = lambda repo_id: list(repo_files)  # type: ignore[attr-defined]
+    fake_hub.snapshot_download = fake_snapshot_download  # type: ignore[attr-defined]
+    monkeypatch.setitem(sys.modules, "huggingface_hub", fake_hub)
+
+    assert resolve_model_dir("org/model") == temp_dir
+    assert resolve_model_dir("org/model", quantized=False) == temp_dir
+    weights = [[p for p in patterns if p.endswith(".onnx") or "*" in p] for patterns in calls]
+    assert weights == [["onnx/model_qint8_avx2.onnx"], ["onnx/model.onnx"]]
+
+    # 本地目录直接返回，不触发下载
+    assert resolve_model_dir(str(temp_dir)) == temp_dir
+    assert len(calls) == 2
+
+
+class _FakeOnnxEncoder:
+    instances = 0
+
+    def __init__(self, model_dir, *, quantized=True):  # noqa: ANN001
+        _FakeOnnxEncoder.instances += 1
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.batches: list[int] = []
+
+    def encode(self, texts, **kwargs):  # noqa: ANN001, ANN003
+        self.batches.append(len(texts))
+        return np.asarray([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_onnx_backend_skips_torch_and_separates_cache_keys(monkeypatch, temp_dir: Path) -> None:
+    monkeypatch.setattr(local_mod, "ONNX_RUNTIME_AVAILABLE", True)
+    monkeypatch.setattr(local_mod, "OnnxSentenceEncoder", _FakeOnnxEncoder)
+    monkeypatch.setattr(local_mod, "resolve_model_dir", lambda name, **_k: Path(name))
+    monkeypatch.setattr(local_mod, "get_optimal_device", lambda: pytest.fail("不应探测 GPU"))
+
+    emb = LocalEmbeddings(
+        model_name="org/model",
+        cache_dir=str(temp_dir / "cache"),
+        backend="onnx",
+    )
+    assert emb.device == "cpu" and emb.backend == "onnx"
+    assert emb.cache_model_key == "org/model#onnx-int8"
+
+    assert emb.embed_query("你好") == [2.0, 1.0]
+    assert emb.embed_documents(["a", "bbb"]) == [[1.0, 1.0], [3.0, 1.0]]
+    # 命中缓存：不再前向
+    assert emb.embed_query("你好") == [2.0, 1.0]
+    assert emb.model.batches == [1, 2]
+    assert emb.cache.get("你好", "org/model") is None
+
+    stats = emb.get_stats()
+    assert stats["backend"] == "onnx" and stats["total_embeddings"] == 3
+
+    with pytest.raises(ValueError):
+        LocalEmbeddings(model_name="org/model", enable_cache=False, backend="tensorrt")
+
+
+def _write_tiny_onnx_model(model_dir: Path) -> np.ndarray:
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    tokenizers = pytest.importorskip("tokenizers")
+    from onnx import TensorProto, helper, numpy_helper
+
+    vocab = {"[PAD]": 0, "[UNK]": 1, "猫": 2, "狗": 3, "鱼": 4}
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(str(model_dir / "tokenizer.json"))
+
+    table = np.arange(15, dtype=np.float32).reshape(5, 3) + 1.0
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "tiny",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["B", "T"]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["B", "T"]),
+        ],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["B", "T", 3])],
+        [numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    (model_dir / "onnx").mkdir()
+    onnx.save(model, str(model_dir / "onnx" / "model.onnx"))
+    return table
+
+
+def test_onnx_encoder_mean_pools_with_attention_mask(temp_dir: Path) -> None:
+    table = _write_tiny_onnx_model(temp_dir)
+    from src.utils.onnx_embeddings import OnnxSentenceEncoder
+
+    encoder = OnnxSentenceEncoder(temp_dir, quantized=True)
+    assert encoder.model_path.name == "model.onnx" and not encoder.quantized
+
+    # 长短不一：padding 位置不参与平均；结果按输入顺序返回
+    raw = encoder.encode(["猫", "狗 鱼 猫"], normalize_embeddings=False)
+    np.testing.assert_allclose(raw[0], table[2])
+    np.testing.assert_allclose(raw[1], table[[3, 4, 2]].mean(axis=0))
+
+    single = encoder.encode("狗 鱼 猫")
+    assert single.shape == (3,)
+    np.testing.assert_allclose(np.linalg.norm(single), 1.0, rtol=1e-6)
+    assert encoder.get_sentence_embedding_dimension() == 3
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
 import time
-from threading import Lock
-
 from src.agent.memory import LongTermMemory
+from src.utils.rw_lock import ReadWriteLock
 
 
 def test_get_memories_time_range_does_not_include_ids() -> None:
@@ -29,7 +28,7 @@ def test_get_memories_time_range_does_not_include_ids() -> None:
 
     lt = LongTermMemory.__new__(LongTermMemory)
     lt.vectorstore = DummyVectorStore()  # type: ignore[assignment]
-    lt._vectorstore_lock = Lock()  # type: ignore[assignment]
+    lt._vectorstore_lock = ReadWriteLock()
 
     results = lt.get_memories_time_range(
         start_unix=now - 60,
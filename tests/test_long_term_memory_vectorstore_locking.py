@@ -22,6 +22,13 @@ class _RecordingLock:
         self.held = False
         return False
 
+    # ReadWriteLock 接口：读/写模式都记录为持锁（本测试只校验访问发生在锁内）
+    def read(self):  # noqa: ANN201
+        return self
+
+    def write(self):  # noqa: ANN201
+        return self
+
 
 class _AssertingCollection:
     def __init__(self) -> None:
@@ -148,3 +155,36 @@ def test_memory_manager_stats_uses_long_term_get_memory_count(monkeypatch, temp_
     assert stats["long_term_count"] == 1
     assert lt.vectorstore._collection.count_calls == 1  # type: ignore[union-attr]
     assert lock.enter_count == 1
+
+
+@pytest.mark.parametrize("recreate_fails", [False, True])
+def test_clear_invalidates_indexes_inside_write_lock(
+    monkeypatch, temp_dir: Path, recreate_fails: bool
+) -> None:
+    lt, lock = _make_long_term(monkeypatch, temp_dir)
+    lt.add_memory("one", metadata={"type": "conversation"}, batch=False)
+    version_before = lt.write_version
+    resets: list[str] = []
+
+    class _Index:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def reset(self, *_args) -> None:  # noqa: ANN002
+            assert lock.held, "index reset must happen before the write lock is released"
+            resets.append(self.name)
+
+    lt._read_index = _Index("faiss")  # type: ignore[assignment]
+    lt._time_index = _Index("time")  # type: ignore[assignment]
+    if recreate_fails:
+
+        def failing_factory(**_kwargs):  # noqa: ANN001,ANN202
+            raise RuntimeError("chroma unavailable")
+
+        monkeypatch.setattr(memory_mod, "create_chroma_vectorstore", failing_factory)
+
+    lt.clear()
+
+    assert lt.write_version == version_before + 1
+    assert resets == ["faiss", "time"]
+    assert (lt.vectorstore is None) is recreate_fails
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+import src.agent.memory as memory_mod  # noqa: E402
+from src.agent.memory_index import FaissMemoryIndex  # noqa: E402
+
+DIM = 16
+
+
+class _Store:
+    def __init__(self, n: int, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.ids = [f"m{i}" for i in range(n)]
+        self.embeddings = rng.normal(size=(n, DIM)).astype(np.float32)
+        self.documents = [f"doc {i}" for i in range(n)]
+        self.metadatas = [{"category": "odd" if i % 2 else "even"} for i in range(n)]
+        self.loads = 0
+
+    def load(self, offset: int, limit: int) -> dict:
+        self.loads += 1
+        end = offset + limit
+        return {
+            "ids": self.ids[offset:end],
+            "embeddings": self.embeddings[offset:end],
+            "documents": self.documents[offset:end],
+            "metadatas": self.metadatas[offset:end],
+        }
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def list_ids(self) -> list[str]:
+        return list(self.ids)
+
+    def brute_force(self, query: np.ndarray, k: int) -> list[str]:
+        dist = ((self.embeddings - query) ** 2).sum(axis=1)
+        return [self.ids[i] for i in np.argsort(dist)[:k]]
+
+
+def _wait_ready(index: FaissMemoryIndex, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not index.ready and time.monotonic() < deadline:
+        if index.stats()["state"] == "dormant":
+            return
+        time.sleep(0.01)
+
+
+def _make_index(store: _Store, path: Path, **kwargs) -> FaissMemoryIndex:
+    kwargs.setdefault("min_count", 10)
+    kwargs.setdefault("ef_search", 128)
+    return FaissMemoryIndex(
+        path, loader=store.load, counter=store.count, id_lister=store.list_ids, **kwargs
+    )
+
+
+def test_index_stays_dormant_below_min_count(temp_dir: Path):
+    store = _Store(50)
+    index = _make_index(store, temp_dir / "faiss", min_count=100)
+    index.ensure_started(1)
+    _wait_ready(index)
+    assert not index.ready
+    assert index.stats()["state"] == "dormant"
+    assert index.search(store.embeddings[0], 3) is None
+
+
+def test_index_search_matches_brute_force(temp_dir: Path):
+    store = _Store(500)
+    index = _make_index(store, temp_dir / "faiss")
+    index.ensure_started(7)
+    _wait_ready(index)
+    assert index.ready and index.version == 7
+
+    for i in (0, 123, 499):
+        results = index.search(store.embeddings[i], 5)
+        assert results is not None
+        got = [doc.page_content for doc, _ in results]
+        expected = [f"doc {store.ids.index(x)}" for x in store.brute_force(store.embeddings[i], 5)]
+        assert got[0] == f"doc {i}"
+        assert len(set(got) & set(expected)) >= 4
+        distances = [score for _, score in results]
+        assert distances == sorted(distances)
+
+
+def test_index_delta_add_remove_and_where_filter(temp_dir: Path):
+    store = _Store(200)
+    index = _make_index(store, temp_dir / "faiss")
+    index.ensure_started(1)
+    _wait_ready(index)
+
+    new_vec = np.full((1, DIM), 9.0, dtype=np.float32)
+    index.add(["new"], new_vec, ["fresh memory"], [{"category": "even"}], version=2)
+    assert index.version == 2
+    assert index.stats()["delta"] == 1
+    results = index.search(new_vec[0], 1)
+    assert results is not None and results[0][0].page_content == "fresh memory"
+
+    index.remove(["new"], version=3)
+    assert index.version == 3
+    results = index.search(new_vec[0], 1)
+    assert results is not None and results[0][0].page_content != "fresh memory"
+
+    filtered = index.search(store.embeddings[1], 5, {"category": "even"})
+    assert filtered is not None and len(filtered) == 5
+    assert all(doc.metadata["category"] == "even" for doc, _ in filtered)
+    odd = index.search(store.embeddings[1], 5, {"category": {"$eq": "odd"}})
+    assert odd is not None and odd[0][0].page_content == "doc 1"
+    # 非等值条件交回 Chroma
+    assert index.search(store.embeddings[1], 5, {"$or": [{"category": "odd"}]}) is None
+
+
+def test_index_persists_and_reloads_without_rebuild(temp_dir: Path):
+    store = _Store(300)
+    index = _make_index(store, temp_dir / "faiss")
+    index.ensure_started(1)
+    _wait_ready(index)
+    index.close()
+    assert (temp_dir / "faiss" / "index.faiss").exists()
+
+    loads = store.loads
+    reloaded = _make_index(store, temp_dir / "faiss")
+    reloaded.ensure_started(1)
+    _wait_ready(reloaded)
+    assert reloaded.ready
+    assert store.loads == loads
+    results = reloaded.search(store.embeddings[42], 1)
+    assert results is not None and results[0][0].page_content == "doc 42"
+
+    # 条数不一致：持久化索引作废，回到 Chroma 重建
+    store.ids.append("extra")
+    store.embeddings = np.vstack([store.embeddings, np.zeros((1, DIM), dtype=np.float32)])
+    store.documents.append("extra doc")
+    store.metadatas.append({"category": "even"})
+    rebuilt = _make_index(store, temp_dir / "faiss")
+    rebuilt.ensure_started(2)
+    _wait_ready(rebuilt)
+    assert rebuilt.ready and store.loads > loads
+    assert rebuilt.stats()["count"] == 301
+    reloaded.close()
+    rebuilt.close()
+
+
+def test_index_rebuilds_when_same_count_ids_differ(temp_dir: Path):
+    store = _Store(300)
+    index = _make_index(store, temp_dir / "faiss")
+    index.ensure_started(1)
+    _wait_ready(index)
+    index.close()
+
+    # 进程外删一条、加一条：条数不变，但持久化镜像里残留已删除记录
+    store.ids[10] = "replaced"
+    store.embeddings[10] = np.zeros(DIM, dtype=np.float32)
+    store.documents[10] = "replaced doc"
+    loads = store.loads
+    reloaded = _make_index(store, temp_dir / "faiss")
+    reloaded.ensure_started(2)
+    _wait_ready(reloaded)
+    assert reloaded.ready and store.loads > loads
+    results = reloaded.search(np.zeros(DIM, dtype=np.float32), 1)
+    assert results is not None and results[0][0].page_content == "replaced doc"
+    reloaded.close()
+
+    # 重建后已重新持久化：再次启动直接从磁盘加载
+    loads = store.loads
+    again = _make_index(store, temp_dir / "faiss")
+    again.ensure_started(3)
+    _wait_ready(again)
+    assert again.ready and store.loads == loads
+    again.close()
+
+
+class _DummyDoc:
+    def __init__(self, page_content: str, metadata: dict) -> None:
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class _EmbeddingCollection:
+    def __init__(self) -> None:
+        self.items: list[tuple[str, str, dict, list[float]]] = []
+
+    def count(self) -> int:
+        return len(self.items)
+
+    def get(self, *, ids=None, include=None, limit=None, offset=None):  # noqa: ANN001
+        if ids is not None:
+            wanted = set(ids)
+            subset = [item for item in self.items if item[0] in wanted]
+        else:
+            start = int(offset or 0)
+            subset = self.items[start : start + int(limit or len(self.items))]
+        return {
+            "ids": [item[0] for item in subset],
+            "documents": [item[1] for item in subset],
+            "metadatas": [item[2] for item in subset],
+            "embeddings": [item[3] for item in subset],
+        }
+
+
+class _EmbeddingVectorStore:
+    def __init__(self) -> None:
+        self._collection = _EmbeddingCollection()
+        self.chroma_searches = 0
+
+    @staticmethod
+    def _embed(text: str) -> list[float]:
+        rng = np.random.default_rng(abs(hash(text)) % (2**32))
+        return rng.normal(size=DIM).astype(np.float32).tolist()
+
+    def embed_query(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    def add_texts(self, *, texts, metadatas, ids=None):  # noqa: ANN001
+        start = len(self._collection.items)
+        ids = ids or [f"auto-{start + i}" for i in range(len(texts))]
+        for doc_id, text, meta in zip(ids, texts, metadatas):
+            self._collection.items.append((str(doc_id), text, dict(meta or {}), self._embed(text)))
+        return list(ids)
+
+    def get(self, *, ids, include=None):  # noqa: ANN001
+        return self._collection.get(ids=ids, include=include)
+
+    def similarity_search_with_score(self, *, query, k, filter=None):  # noqa: ANN001
+        return self.similarity_search_by_vector_with_score(self._embed(query), k=k, filter=filter)
+
+    def similarity_search_by_vector_with_score(
+        self, query_embedding, *, k, filter=None
+    ):  # noqa: ANN001
+        self.chroma_searches += 1
+        q = np.asarray(query_embedding, dtype=np.float32)
+        scored = []
+        for _, text, meta, emb in self._collection.items:
+            if filter and any(meta.get(key) != value for key, value in filter.items()):
+                continue
+            scored.append((float(((np.asarray(emb) - q) ** 2).sum()), text, meta))
+        scored.sort(key=lambda item: item[0])
+        return [(_DummyDoc(text, dict(meta)), score) for score, text, meta in scored[:k]]
+
+    def delete_collection(self) -> None:
+        self._collection.items.clear()
+
+
+def test_long_term_memory_serves_search_from_index(monkeypatch, temp_dir: Path):
+    stores: list[_EmbeddingVectorStore] = []
+
+    def factory(**_kwargs):  # noqa: ANN001
+        stores.append(_EmbeddingVectorStore())
+        return stores[-1]
+
+    monkeypatch.setattr(memory_mod, "create_chroma_vectorstore", factory)
+    monkeypatch.setattr(memory_mod, "get_collection_count", lambda vs: vs._collection.count())
+    monkeypatch.setattr(memory_mod.settings.agent, "long_term_faiss_min_count", 5, raising=False)
+
+    ltm = memory_mod.LongTermMemory(persist_directory=str(temp_dir / "ltm"), user_id=1)
+    store = stores[-1]
+    assert ltm._read_index is not None
+    for i in range(20):
+        assert ltm.add_memory(f"memory {i}", metadata={"importance": 0.5})
+
+    ltm.search_memories("memory 3", k=3)
+    _wait_ready(ltm._read_index)
+    assert ltm._read_index.ready
+    assert ltm._read_index.version == ltm.write_version
+
+    # 就绪后的写入在锁内增量镜像，检索不再经过 Chroma
+    assert ltm.add_memory("brand new memory", metadata={"importance": 0.5})
+    assert ltm._read_index.version == ltm.write_version
+    searches = store.chroma_searches
+    results = ltm.search_memories("brand new memory", k=1)
+    assert store.chroma_searches == searches
+    assert results and results[0]["content"] == "brand new memory"
+
+    # 版本落后（未镜像的写入）：本次回退 Chroma，并在后台重建
+    ltm._write_version += 1
+    ltm.search_memories("memory 3", k=3)
+    assert store.chroma_searches == searches + 1
+    _wait_ready(ltm._read_index)
+    assert ltm._read_index.version == ltm.write_version
+
+    ltm.close()
+    assert (temp_dir / "ltm_faiss" / "index.faiss").exists()
+
+
+def test_index_readd_after_remove_hides_stale_vector(temp_dir: Path):
+    store = _Store(200)
+    index = _make_index(store, temp_dir / "faiss", merge_threshold=1)
+    index.ensure_started(1)
+    _wait_ready(index)
+
+    old_vec = np.full((1, DIM), 9.0, dtype=np.float32)
+    new_vec = np.full((1, DIM), -9.0, dtype=np.float32)
+    index.add(["x"], old_vec, ["old text"], [{}], version=2)
+    deadline = time.monotonic() + 5.0
+    while index.stats()["delta"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.stats()["delta"] == 0  # 旧行已合并进 HNSW
+
+    index.remove(["x"], version=3)
+    index.add(["x"], new_vec, ["new text"], [{}], version=4)
+    index.add(["x"], new_vec, ["newest text"], [{}], version=5)
+
+    near_old = index.search(old_vec[0], 3)
+    assert near_old is not None
+    assert all(doc.page_content not in ("old text", "new text") for doc, _ in near_old)
+    near_new = index.search(new_vec[0], 3)
+    assert near_new is not None
+    contents = [doc.page_content for doc, _ in near_new]
+    assert contents[0] == "newest text" and contents.count("newest text") == 1
+    assert index.stats()["count"] == 201
+
+    # 行号墓碑随持久化一起恢复
+    index.close()
+    store.ids.append("x")
+    store.embeddings = np.vstack([store.embeddings, new_vec])
+    store.documents.append("newest text")
+    store.metadatas.append({})
+    loads = store.loads
+    reloaded = _make_index(store, temp_dir / "faiss")
+    reloaded.ensure_started(5)
+    _wait_ready(reloaded)
+    assert reloaded.ready and store.loads == loads
+    results = reloaded.search(old_vec[0], 3)
+    assert results is not None
+    assert all(doc.page_content not in ("old text", "new text") for doc, _ in results)
+    reloaded.close()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from src.agent.memory_prefetch import MemoryPrefetcher, normalize_draft
+from src.utils.async_loop_thread import AsyncLoopThread
+
+
+class _FakeRetriever:
+    def __init__(self, delay_s: float = 0.05) -> None:
+        self.delay_s = delay_s
+        self.queries: list[str] = []
+
+    async def retrieve_all_memories_async(
+        self, *, query, long_term_k, core_k, use_cache
+    ):  # noqa: ANN001
+        self.queries.append(query)
+        await asyncio.sleep(self.delay_s)
+        return {
+            "long_term": [f"lt{i}:{query}" for i in range(long_term_k)],
+            "core": [f"core{i}" for i in range(core_k)],
+        }
+
+
+@pytest.fixture()
+def loop_thread():
+    thread = AsyncLoopThread(thread_name="test-prefetch-loop")
+    yield thread
+    thread.close(timeout=1.0)
+
+
+def _make(loop_thread, retriever, versions=None, **kwargs) -> MemoryPrefetcher:
+    state = versions if versions is not None else {"v": (0, 0)}
+    kwargs.setdefault("debounce_s", 0.01)
+    return MemoryPrefetcher(
+        retriever, submit=loop_thread.submit, versions=lambda: state["v"], **kwargs
+    )
+
+
+def _wait_executed(prefetcher: MemoryPrefetcher, n: int = 1, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while prefetcher.stats()["executed"] < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_normalize_draft_ignores_spacing_case_and_trailing_punct() -> None:
+    assert normalize_draft("  你还记得  我昨天说的吗？？ ") == "你还记得 我昨天说的吗"
+    assert normalize_draft("Hello World!") == normalize_draft("hello   world")
+
+
+def test_prefetch_hit_reuses_result_and_records_saved_time(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.05)
+    prefetcher = _make(loop_thread, retriever)
+
+    assert prefetcher.schedule("你还记得我昨天说的电影吗", long_term_k=5, core_k=2)
+    # 与当前草稿等价：不重复调度
+    assert not prefetcher.schedule("你还记得我昨天说的电影吗 ", long_term_k=5, core_k=2)
+    _wait_executed(prefetcher)
+    time.sleep(0.08)
+
+    result = asyncio.run(prefetcher.take("你还记得我昨天说的电影吗？", long_term_k=3, core_k=2))
+    assert result is not None
+    assert len(result["long_term"]) == 3 and len(result["core"]) == 2
+    assert retriever.queries == ["你还记得我昨天说的电影吗"]
+
+    stats = prefetcher.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert stats["saved_ms"] >= 40.0
+    # 结果只能取走一次
+    assert asyncio.run(prefetcher.take("你还记得我昨天说的电影吗", long_term_k=3, core_k=2)) is None
+
+
+def test_prefetch_take_waits_for_in_flight_retrieval(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.2)
+    prefetcher = _make(loop_thread, retriever)
+    prefetcher.schedule("周末我们一起去看海吧", long_term_k=3, core_k=2)
+    _wait_executed(prefetcher)
+    time.sleep(0.1)
+
+    # 检索仍在进行：等待其完成而不是重新检索，已重叠的耗时计入节省
+    result = asyncio.run(prefetcher.take("周末我们一起去看海吧", long_term_k=3, core_k=2))
+    assert result is not None
+    assert len(retriever.queries) == 1
+    assert 80.0 <= prefetcher.stats()["saved_ms"] < 200.0
+
+
+def test_prefetch_debounce_only_runs_latest_draft(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.0)
+    prefetcher = _make(loop_thread, retriever, debounce_s=0.1)
+    for draft in ("今天天气", "今天天气怎么", "今天天气怎么样"):
+        prefetcher.schedule(draft, long_term_k=3, core_k=2)
+    _wait_executed(prefetcher)
+    time.sleep(0.05)
+    assert retriever.queries == ["今天天气怎么样"]
+    assert prefetcher.stats()["scheduled"] == 3
+    assert prefetcher.stats()["executed"] == 1
+
+
+def test_prefetch_miss_when_diverged_stale_or_too_small(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.0)
+    versions = {"v": (0, 0)}
+    prefetcher = _make(loop_thread, retriever, versions=versions)
+
+    prefetcher.schedule("帮我查一下明天的天气", long_term_k=3, core_k=2)
+    _wait_executed(prefetcher)
+    assert asyncio.run(prefetcher.take("讲个笑话给我听听", long_term_k=3, core_k=2)) is None
+
+    prefetcher.schedule("帮我查一下明天的天气", long_term_k=3, core_k=2)
+    _wait_executed(prefetcher, 2)
+    versions["v"] = (1, 0)  # 记忆写入后预取结果失效
+    assert asyncio.run(prefetcher.take("帮我查一下明天的天气", long_term_k=3, core_k=2)) is None
+
+    prefetcher.schedule("帮我查一下明天的天气", long_term_k=3, core_k=2)
+    _wait_executed(prefetcher, 3)
+    assert asyncio.run(prefetcher.take("帮我查一下明天的天气", long_term_k=8, core_k=2)) is None
+
+    stats = prefetcher.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 3
+    assert stats["miss_diverged"] == 1 and stats["miss_stale"] == 1 and stats["miss_k"] == 1
+
+
+def test_prefetch_take_expedites_matching_debounced_draft(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.0)
+    prefetcher = _make(loop_thread, retriever, debounce_s=5.0)
+    prefetcher.schedule("我们上次聊到哪里了", long_term_k=3, core_k=2)
+
+    # 防抖窗口内发送：跳过剩余防抖立即检索，而不是取消后记一次未命中
+    started = time.perf_counter()
+    result = asyncio.run(prefetcher.take("我们上次聊到哪里了？", long_term_k=3, core_k=2))
+    assert time.perf_counter() - started < 1.0
+    assert result is not None and len(result["long_term"]) == 3
+    assert retriever.queries == ["我们上次聊到哪里了"]
+    stats = prefetcher.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0
+
+
+def test_prefetch_miss_while_debouncing_cancels_diverged_draft(loop_thread) -> None:
+    retriever = _FakeRetriever(delay_s=0.0)
+    prefetcher = _make(loop_thread, retriever, debounce_s=0.05)
+    prefetcher.schedule("我们上次聊到哪里了", long_term_k=3, core_k=2)
+    assert asyncio.run(prefetcher.take("讲个笑话给我听听", long_term_k=3, core_k=2)) is None
+    time.sleep(0.15)
+    assert retriever.queries == []
+    assert prefetcher.stats()["miss_diverged"] == 1
+
+
+def test_agent_prepare_messages_uses_prefetched_memories(monkeypatch, loop_thread) -> None:
+    from src.agent import core as core_mod
+    from src.agent.core import MintChatAgent
+
+    class _Memory:
+        short_term_version = 0
+        long_term = None
+
+        def get_recent_messages(self):  # noqa: ANN201
+            return []
+
+    class _Retriever(_FakeRetriever):
+        def __init__(self) -> None:
+            super().__init__(delay_s=0.0)
+            self.direct_calls = 0
+
+    retriever = _Retriever()
+    agent = MintChatAgent.__new__(MintChatAgent)
+    agent.memory = _Memory()
+    agent.core_memory = object()
+    agent.memory_retriever = retriever
+    agent._context_cache_max = 0
+    agent._history_summary_keep = 50
+    agent._memory_prefetcher = MemoryPrefetcher(
+        retriever, submit=loop_thread.submit, versions=agent._memory_versions, debounce_s=0.0
+    )
+    captured = {}
+
+    def _build_memory_context(*, relevant_memories, core_memories):  # noqa: ANN001
+        captured["long_term"] = relevant_memories
+        return ""
+
+    agent._build_context_with_state = lambda *_a, **_k: ""
+    agent._build_memory_context = _build_memory_context
+    agent._should_compress_context = lambda *_a, **_k: False
+    monkeypatch.setattr(core_mod.settings.agent, "memory_fast_mode", False, raising=False)
+
+    assert agent.prefetch_context("记得我喜欢的颜色吗")
+    _wait_executed(agent._memory_prefetcher)
+    time.sleep(0.02)
+    messages = asyncio.run(agent._prepare_messages_async("记得我喜欢的颜色吗？"))
+
+    assert messages[-1] == {"role": "user", "content": "记得我喜欢的颜色吗？"}
+    assert retriever.queries == ["记得我喜欢的颜色吗"]
+    assert captured["long_term"][0].endswith("记得我喜欢的颜色吗")
+    assert agent._memory_prefetcher.stats()["hits"] == 1
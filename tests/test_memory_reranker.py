@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.agent.memory_reranker import compute_recency, rerank, to_float_column
+
+
+def test_compute_recency_matches_decay_curve() -> None:
+    now = 1_000_000_000.0
+    ts = np.array([now, now - 10 * 86400, now - 395 * 86400, now - 2000 * 86400, np.nan])
+    recency = compute_recency(ts, now)
+    assert recency.tolist() == pytest.approx([1.0, 1.0, 0.5, 0.5, 1.0])
+
+    mid = compute_recency(np.array([now - 212.5 * 86400]), now)
+    assert mid[0] == pytest.approx(0.5)
+    mid = compute_recency(np.array([now - 121.25 * 86400]), now)
+    assert mid[0] == pytest.approx(0.75)
+
+
+def test_rerank_filters_low_similarity_and_returns_topk_in_score_order() -> None:
+    now = 1_000_000_000.0
+    n = 300
+    rng = np.random.default_rng(7)
+    distances = rng.uniform(0.0, 3.0, size=n)
+    timestamps = now - rng.uniform(0.0, 800.0, size=n) * 86400
+    importance = rng.uniform(0.0, 1.0, size=n)
+    consistency = rng.uniform(0.0, 1.0, size=n)
+
+    result = rerank(
+        distances,
+        timestamps,
+        importance,
+        consistency,
+        k=10,
+        now_unix=now,
+        character_weight=0.1,
+    )
+
+    assert len(result) == 10
+    assert np.all(result.similarity >= 0.3)
+    assert np.all(np.diff(result.final_score) <= 0)
+
+    # 与逐条计算的参考实现一致
+    reference = []
+    for i in range(n):
+        similarity = 1.0 / (1.0 + distances[i])
+        if similarity < 0.3:
+            continue
+        age_days = max(0.0, (now - timestamps[i]) / 86400.0)
+        recency = max(0.5, 1.0 - (age_days - 30) / 365.0) if age_days > 30 else 1.0
+        numerator = similarity * 0.6 + recency * 0.2 + importance[i] * 0.2
+        numerator += consistency[i] * 0.1
+        reference.append((numerator / 1.1, i))
+    reference.sort(key=lambda item: item[0], reverse=True)
+    assert result.order.tolist() == [i for _, i in reference[:10]]
+
+
+def test_rerank_character_mask_and_ties_keep_input_order() -> None:
+    result = rerank(
+        np.zeros(3),
+        np.full(3, np.nan),
+        np.full(3, 0.5),
+        np.array([0.9, 0.1, 0.9]),
+        k=3,
+        now_unix=0.0,
+        character_weight=1.0,
+        character_mask=np.array([False, True, False]),
+    )
+    # 未参与角色加权的两条同分，保持原有顺序
+    assert result.order.tolist() == [0, 2, 1]
+
+
+def test_to_float_column_defaults_invalid_values() -> None:
+    column = to_float_column([0.2, "0.4", "bad", None, True], default=0.5)
+    assert column.tolist() == [0.2, 0.4, 0.5, 0.5, 0.5]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.agent.memory as memory_mod
+from src.agent.memory_scan import RecordBatch, plan_prune
+
+
+class _Collection:
+    def __init__(self, lock_probe=None) -> None:  # noqa: ANN001
+        self.items: list[tuple[str, str, dict]] = []
+        self.lock_probe = lock_probe
+        self.get_calls = 0
+
+    def count(self) -> int:
+        return len(self.items)
+
+    def get(self, *, include=None, limit=None, offset=None, where=None):  # noqa: ANN001
+        if where is not None:
+            raise RuntimeError("where not supported")
+        self.get_calls += 1
+        if self.lock_probe is not None:
+            self.lock_probe()
+        start = int(offset or 0)
+        subset = self.items[start:] if limit is None else self.items[start : start + int(limit)]
+        return {
+            "ids": [doc_id for doc_id, _, _ in subset],
+            "documents": [content for _, content, _ in subset],
+            "metadatas": [meta for _, _, meta in subset],
+        }
+
+    def delete(self, *, ids):  # noqa: ANN001
+        to_delete = {str(x) for x in ids or []}
+        self.items = [item for item in self.items if item[0] not in to_delete]
+
+
+class _VectorStore:
+    def __init__(self) -> None:
+        self._collection = _Collection()
+
+    def add_texts(self, *, texts, metadatas, ids=None):  # noqa: ANN001
+        ids = ids or [f"auto-{len(self._collection.items) + i}" for i in range(len(texts))]
+        for doc_id, content, meta in zip(ids, texts, metadatas):
+            self._collection.items.append((str(doc_id), str(content), dict(meta or {})))
+        return list(ids)
+
+
+@pytest.fixture()
+def ltm(monkeypatch, temp_dir: Path):  # noqa: ANN201
+    monkeypatch.setattr(memory_mod, "create_chroma_vectorstore", lambda **_k: _VectorStore())
+    monkeypatch.setattr(memory_mod, "get_collection_count", lambda vs: vs._collection.count())
+    return memory_mod.LongTermMemory(persist_directory=temp_dir / "lt", collection_name="scan")
+
+
+def test_record_batch_columns_match_legacy_defaults() -> None:
+    batch = RecordBatch.from_chunk(
+        {
+            "ids": ["a", "b", "c", "d"],
+            "metadatas": [
+                {"importance": 0.9, "timestamp_unix": 100.0},
+                {"importance": 0, "timestamp": "2000-01-01T00:00:00"},
+                {"importance": "0.3", "timestamp_unix": "42"},
+                None,
+            ],
+        },
+        lambda ts: 7.0 if ts.startswith("2000") else None,
+    )
+    assert len(batch) == 4
+    # importance 为 0/缺失时按 0.5（与历史的 `or 0.5` 一致）
+    assert batch.importance.tolist() == [0.9, 0.5, 0.3, 0.5]
+    assert batch.timestamp_unix[:3].tolist() == [100.0, 7.0, 42.0]
+    assert math.isnan(batch.timestamp_unix[3])
+
+
+def test_plan_prune_age_protection_and_max_items() -> None:
+    importance = np.array([0.2, 0.95, 0.8, 0.7, 0.1, 0.3])
+    ts = np.array([1.0, 1.0, 50.0, 60.0, 70.0, np.nan])
+
+    protected, delete = plan_prune(importance, ts, preserve_importance_above=0.9, cutoff_unix=10.0)
+    assert protected.tolist() == [False, True, False, False, False, False]
+    # 缺失时间戳的记录不按年龄删除
+    assert np.flatnonzero(delete).tolist() == [0]
+
+    _, delete = plan_prune(
+        importance, ts, preserve_importance_above=0.9, cutoff_unix=10.0, max_items=3
+    )
+    # 年龄删除 0；其余 4 个候选中保留 importance 最高的 2 个（2, 3）
+    assert np.flatnonzero(delete).tolist() == [0, 4, 5]
+
+    _, delete = plan_prune(importance, ts, preserve_importance_above=0.9, max_items=0)
+    assert not delete[1] and int(delete.sum()) == 5
+
+
+def test_iter_record_batches_releases_lock_between_pages(ltm) -> None:
+    for i in range(7):
+        ltm.add_memory(
+            f"m{i}", metadata={"importance": 0.5, "timestamp_unix": float(i)}, batch=False
+        )
+
+    collection = ltm.vectorstore._collection
+    states: list[tuple[int, bool]] = []
+    collection.lock_probe = lambda: states.append(
+        (ltm._vectorstore_lock.stats()["readers"], ltm._vectorstore_lock.stats()["writer"])
+    )
+
+    seen: list[str] = []
+    for batch in ltm.iter_record_batches(include=("metadatas",), batch_size=3):
+        # 处理批次时不持有任何锁，写入可以在页与页之间进行
+        stats = ltm._vectorstore_lock.stats()
+        assert stats["readers"] == 0 and stats["writer"] is False
+        seen.extend(batch.ids)
+        assert batch.timestamp_unix.dtype == np.float64
+
+    assert len(seen) == 7
+    assert collection.get_calls == 3
+    assert states == [(1, False)] * 3
+
+
+def test_export_jsonl_streams_records_and_matches_export_records(ltm, temp_dir: Path) -> None:
+    for i in range(5):
+        ltm.add_memory(f"记忆{i}", metadata={"importance": 0.5}, batch=False)
+
+    out = temp_dir / "export" / "memories.jsonl"
+    result = ltm.export_jsonl(out, batch_size=2)
+    assert result["count"] == 5 and result["scanned"] == 5
+    assert not out.with_name(out.name + ".tmp").exists()
+
+    lines = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [line["content"] for line in lines] == [f"记忆{i}" for i in range(5)]
+    assert all("content_hash" in line["metadata"] for line in lines)
+
+    exported = ltm.export_records(batch_size=2)
+    assert exported["count"] == 5
+    assert [item["id"] for item in exported["items"]] == [line["id"] for line in lines]
+    assert list(ltm.iter_export_items(batch_size=2)) == exported["items"]
+
+
+def test_time_range_fallback_scan_filters_with_column_mask(ltm) -> None:
+    ltm._time_index.mark_stale()  # 时间索引未就绪：走扫描路径
+    collection = ltm.vectorstore._collection
+    for i, ts in enumerate((10.0, 20.0, 30.0, 40.0)):
+        collection.items.append((f"id{i}", f"t{i}", {"timestamp_unix": ts}))
+    # 缺失时间戳的记录按“现在”处理，不会落入历史时间范围
+    collection.items.append(("id-none", "no-ts", {}))
+
+    results = ltm.get_memories_time_range(start_unix=15.0, end_unix=35.0, limit=10, batch_size=3)
+    assert sorted(r["content"] for r in results) == ["t1", "t2"]
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+import src.agent.memory as memory_mod
+from src.agent.memory_time_index import MemoryTimeIndex
+
+
+class _Collection:
+    def __init__(self) -> None:
+        self.items: list[tuple[str, str, dict]] = []
+        self.scans = 0
+
+    def count(self) -> int:
+        return len(self.items)
+
+    def get(self, *, ids=None, include=None, limit=None, offset=None, where=None):  # noqa: ANN001
+        if where is not None:
+            raise RuntimeError("where not supported")
+        if ids is not None:
+            wanted = set(ids)
+            subset = [item for item in self.items if item[0] in wanted]
+        else:
+            self.scans += 1
+            start = int(offset or 0)
+            subset = self.items[start:] if limit is None else self.items[start : start + limit]
+        return {
+            "ids": [doc_id for doc_id, _, _ in subset],
+            "documents": [content for _, content, _ in subset],
+            "metadatas": [meta for _, _, meta in subset],
+        }
+
+    def delete(self, *, ids):  # noqa: ANN001
+        to_delete = {str(x) for x in ids or []}
+        self.items = [item for item in self.items if item[0] not in to_delete]
+
+
+class _VectorStore:
+    def __init__(self, collection: _Collection) -> None:
+        self._collection = collection
+
+    def add_texts(self, *, texts, metadatas, ids=None):  # noqa: ANN001
+        ids = ids or [f"id-{len(self._collection.items) + i}" for i in range(len(texts))]
+        for doc_id, content, meta in zip(ids, texts, metadatas):
+            self._collection.items.append((str(doc_id), str(content), dict(meta or {})))
+        return list(ids)
+
+    def get(self, **kwargs):  # noqa: ANN003
+        return self._collection.get(**kwargs)
+
+    def delete_collection(self) -> None:
+        self._collection.items.clear()
+
+
+@pytest.fixture()
+def collection(monkeypatch) -> _Collection:
+    shared = _Collection()
+    monkeypatch.setattr(memory_mod, "create_chroma_vectorstore", lambda **_k: _VectorStore(shared))
+    monkeypatch.setattr(memory_mod, "get_collection_count", lambda vs: vs._collection.count())
+    return shared
+
+
+def _ltm(temp_dir: Path) -> memory_mod.LongTermMemory:
+    return memory_mod.LongTermMemory(persist_directory=temp_dir / "lt", collection_name="t")
+
+
+def _add(ltm: memory_mod.LongTermMemory, content: str, ts: float) -> None:
+    iso = memory_mod.datetime.fromtimestamp(ts).isoformat()
+    assert ltm.add_memory(content, metadata={"timestamp": iso, "importance": 0.2}, batch=False)
+
+
+def test_time_index_query_orders_newest_first_and_tracks_count(temp_dir: Path) -> None:
+    index = MemoryTimeIndex(temp_dir / "time.sqlite3")
+    assert index.sync_with(0)
+    index.upsert(["a", "b", "c", "d"], [10.0, 20.0, 30.0, 40.0])
+    index.upsert(["b"], [25.0])  # 覆盖导入：更新时间戳，不重复计数
+    index.remove(["d", "missing"])
+
+    assert index.count == 3
+    assert index.query(15.0, 100.0, 10) == [("c", 30.0), ("b", 25.0)]
+    assert index.query(0.0, 100.0, 1) == [("c", 30.0)]
+
+    index.close()
+    reopened = MemoryTimeIndex(temp_dir / "time.sqlite3")
+    assert reopened.ready and reopened.count == 3
+    # 向量库条数不一致（例如旧版本写入过）：标记失效，等待重建
+    assert not reopened.sync_with(5)
+    assert not MemoryTimeIndex(temp_dir / "time.sqlite3").ready
+
+
+def test_time_range_uses_index_and_stays_in_sync(collection, temp_dir: Path) -> None:
+    ltm = _ltm(temp_dir)
+    assert ltm.time_index_stats()["ready"]
+    for i, ts in enumerate((1_000.0, 2_000.0, 3_000.0, 4_000.0)):
+        _add(ltm, f"m{i}", ts)
+    ltm.add_memory("buffered", metadata={"timestamp_unix": 2_500.0, "timestamp": "x"}, batch=True)
+    ltm.flush_batch()
+
+    results = ltm.get_memories_time_range(start_unix=1_500.0, end_unix=3_500.0, limit=10)
+    assert [r["content"] for r in results] == ["m2", "buffered", "m1"]
+    assert collection.scans == 0  # 二分定位 + 按 id 回表，无全量扫描
+
+    assert ltm.prune(max_age_days=1, preserve_importance_above=0.9, dry_run=False)["deleted"] == 5
+    assert ltm.time_index_stats()["count"] == 0
+    assert ltm.get_memories_time_range(start_unix=0.0, end_unix=5_000.0) == []
+
+    _add(ltm, "after-prune", 4_200.0)
+    assert ltm.time_index_stats()["count"] == 1
+    ltm.clear()
+    stats = ltm.time_index_stats()
+    assert stats["ready"] and stats["count"] == 0
+
+
+def test_rebuild_enables_index_for_existing_store(collection, temp_dir: Path) -> None:
+    for i, ts in enumerate((100.0, 200.0, 300.0)):
+        collection.items.append((f"old-{i}", f"old{i}", {"timestamp_unix": ts}))
+
+    ltm = _ltm(temp_dir)
+    assert not ltm.time_index_stats()["ready"]
+    # 未就绪：回退扫描路径
+    results = ltm.get_memories_time_range(start_unix=150.0, end_unix=400.0)
+    assert [r["content"] for r in results] == ["old2", "old1"]
+
+    assert ltm.rebuild_time_index(batch_size=2) == 3
+    scans = collection.scans
+    results = ltm.get_memories_time_range(start_unix=150.0, end_unix=400.0, limit=1)
+    assert [r["content"] for r in results] == ["old2"]
+    assert collection.scans == scans
+
+
+def test_writes_during_rebuild_are_replayed(temp_dir: Path) -> None:
+    index = MemoryTimeIndex(temp_dir / "time.sqlite3")
+    scanning = threading.Event()
+    release = threading.Event()
+
+    def batches():  # noqa: ANN202
+        yield ["a", "b"], [1.0, 2.0]
+        scanning.set()
+        release.wait(2.0)
+        yield ["c"], [3.0]
+
+    worker = threading.Thread(target=index.rebuild, args=(batches(),))
+    worker.start()
+    assert scanning.wait(2.0)
+    # 重建进行中：写入排队而不是等待连接锁（调用方此时持有向量库写锁）
+    index.upsert(["d"], [4.0])
+    index.remove(["a"])
+    assert not index.ready
+    release.set()
+    worker.join(2.0)
+
+    assert index.ready and index.count == 3
+    assert [doc_id for doc_id, _ in index.query(0.0, 10.0, 10)] == ["d", "c", "b"]
+
+
+def test_long_term_writes_during_rebuild_reach_index(collection, temp_dir: Path) -> None:
+    for i, ts in enumerate((100.0, 200.0, 300.0)):
+        collection.items.append((f"old-{i}", f"old{i}", {"timestamp_unix": ts}))
+    ltm = _ltm(temp_dir)
+    assert not ltm.time_index_stats()["ready"]
+
+    scanning = threading.Event()
+    release = threading.Event()
+    iter_batches = ltm.iter_record_batches
+
+    def paused_batches(**kwargs):  # noqa: ANN003, ANN202
+        for batch in iter_batches(**kwargs):
+            yield batch
+            scanning.set()
+            release.wait(2.0)
+
+    ltm.iter_record_batches = paused_batches  # type: ignore[method-assign]
+    worker = threading.Thread(target=ltm.rebuild_time_index, kwargs={"batch_size": 2})
+    worker.start()
+    assert scanning.wait(2.0)
+    # 重建窗口内的写入/删除经 LongTermMemory 正常路径转发给索引排队
+    now = memory_mod.time.time()
+    _add(ltm, "fresh", now)
+    assert ltm.prune(max_age_days=1, preserve_importance_above=0.9, dry_run=False)["deleted"] == 3
+    release.set()
+    worker.join(2.0)
+
+    stats = ltm.time_index_stats()
+    assert stats["ready"] and stats["count"] == 1
+    results = ltm.get_memories_time_range(start_unix=0.0, end_unix=now + 60.0)
+    assert [r["content"] for r in results] == ["fresh"]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from src.utils.rw_lock import LockWaitHistogram, ReadWriteLock
+
+
+def test_readers_hold_lock_concurrently() -> None:
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=2.0)
+
+    def reader() -> None:
+        with lock.read():
+            inside.wait()  # 三个读者必须同时持锁才能通过屏障
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for t in threads:
+        t.start()
+    with lock.read():
+        inside.wait()
+    for t in threads:
+        t.join(timeout=2.0)
+    assert lock.stats()["read_wait"]["count"] == 3
+
+
+def test_writer_excludes_readers_and_is_preferred() -> None:
+    lock = ReadWriteLock()
+    order: list[str] = []
+    lock.acquire_read()
+
+    writer = threading.Thread(
+        target=lambda: (lock.acquire_write(), order.append("w"), lock.release_write())
+    )
+    writer.start()
+    deadline = time.monotonic() + 2.0
+    while lock.stats()["writers_waiting"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    # 写者排队时新读者必须等待（避免写入被持续检索饿死）
+    reader = threading.Thread(
+        target=lambda: (lock.acquire_read(), order.append("r"), lock.release_read())
+    )
+    reader.start()
+    time.sleep(0.05)
+    assert order == []
+
+    lock.release_read()
+    writer.join(timeout=2.0)
+    reader.join(timeout=2.0)
+    assert order == ["w", "r"]
+
+    stats = lock.stats()
+    assert stats["readers"] == 0 and stats["writer"] is False
+    assert stats["write_wait"]["max_ms"] >= 40.0
+
+
+def test_plain_with_is_exclusive_write() -> None:
+    lock = ReadWriteLock()
+    with lock:
+        assert lock.stats()["writer"] is True
+    assert lock.stats()["write_wait"]["count"] == 1
+
+
+def test_histogram_buckets_and_quantiles() -> None:
+    hist = LockWaitHistogram()
+    for wait_ms in (0.05, 0.05, 0.5, 3.0, 2000.0):
+        hist.record(wait_ms)
+    snap = hist.snapshot()
+    assert snap["count"] == 5
+    assert snap["buckets"]["<=0.1ms"] == 2
+    assert snap["buckets"]["<=1ms"] == 1
+    assert snap["buckets"]["<=5ms"] == 1
+    assert snap["buckets"][">1000ms"] == 1
+    assert snap["p50_ms"] == 1.0
+    assert snap["p99_ms"] == 2000.0
+    assert snap["max_ms"] == 2000.0
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+import src.agent.memory as memory_mod
+from src.utils.vector_cache import SemanticQueryCache
+
+
+def _unit(seed: int, dim: int = 32) -> np.ndarray:
+    vec = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def _near(vec: np.ndarray, eps: float, seed: int = 99) -> np.ndarray:
+    noise = np.random.default_rng(seed).normal(size=vec.shape).astype(np.float32)
+    return vec + eps * noise / np.linalg.norm(noise)
+
+
+def test_semantic_cache_hits_similar_vector_and_respects_scope() -> None:
+    cache = SemanticQueryCache(max_size=8, similarity_threshold=0.95)
+    base = _unit(1)
+    cache.put(base * 3.0, ["a"], scope=(5, ""), version=0)
+
+    assert cache.get(_near(base, 0.1), scope=(5, ""), version=0) == ["a"]
+    assert cache.get(_near(base, 0.1), scope=(3, ""), version=0) is None
+    assert cache.get(_unit(2), scope=(5, ""), version=0) is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["cache_size"] == 1
+    assert stats["hit_rate"] == round(1 / 3, 4)
+
+
+def test_semantic_cache_version_bump_invalidates_and_rejects_stale_put() -> None:
+    cache = SemanticQueryCache(max_size=8, similarity_threshold=0.95)
+    base = _unit(3)
+    cache.put(base, ["old"], scope=1, version=1)
+    assert cache.get(base, scope=1, version=2) is None
+    assert cache.get_stats()["invalidations"] == 1
+
+    # 检索开始于旧版本：结果不得回填
+    cache.put(base, ["stale"], scope=1, version=1)
+    assert cache.get(base, scope=1, version=2) is None
+    cache.put(base, ["fresh"], scope=1, version=2)
+    assert cache.get(base, scope=1, version=2) == ["fresh"]
+
+
+def test_semantic_cache_evicts_least_recently_used() -> None:
+    cache = SemanticQueryCache(max_size=2, similarity_threshold=0.99)
+    a, b, c = _unit(10), _unit(11), _unit(12)
+    cache.put(a, "a", scope=0, version=0)
+    cache.put(b, "b", scope=0, version=0)
+    assert cache.get(a, scope=0, version=0) == "a"
+    cache.put(c, "c", scope=0, version=0)
+
+    assert cache.get(b, scope=0, version=0) is None
+    assert cache.get(a, scope=0, version=0) == "a"
+    assert cache.get(c, scope=0, version=0) == "c"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_semantic_cache_expires_entries() -> None:
+    cache = SemanticQueryCache(max_size=4, similarity_threshold=0.99, ttl_seconds=0.0)
+    vec = _unit(20)
+    cache.put(vec, "x", scope=0, version=0)
+    assert cache.get(vec, scope=0, version=0) is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+class _Doc:
+    def __init__(self, page_content: str, metadata: dict) -> None:
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class _Collection:
+    def count(self) -> int:
+        return 1
+
+
+class _VectorStore:
+    """查询向量只取决于“语义槽”，模拟同义改写得到相近向量。"""
+
+    def __init__(self) -> None:
+        self._collection = _Collection()
+        self.embeds = 0
+        self.searches = 0
+
+    def embed_query(self, query: str) -> list[float]:
+        self.embeds += 1
+        base = _unit(7 if "喜欢" in query else 8)
+        return _near(base, 0.05, seed=len(query)).tolist()
+
+    def similarity_search_by_vector_with_score(
+        self, query_embedding, *, k, filter=None
+    ):  # noqa: ANN001
+        self.searches += 1
+        return [(_Doc("用户喜欢草莓蛋糕", {"importance": 0.8, "timestamp_unix": 1.0}), 0.1)]
+
+    def add_texts(self, *, texts, metadatas, ids=None):  # noqa: ANN001
+        return [f"id-{i}" for i in range(len(texts))]
+
+
+def test_long_term_search_reuses_results_for_paraphrased_query(monkeypatch, temp_dir: Path):
+    store = _VectorStore()
+    monkeypatch.setattr(memory_mod, "create_chroma_vectorstore", lambda **_k: store)
+    monkeypatch.setattr(memory_mod, "get_collection_count", lambda vs: 1)
+    monkeypatch.setattr(memory_mod.settings.agent, "long_term_faiss_enabled", False, raising=False)
+    monkeypatch.setattr(
+        memory_mod.settings.agent, "memory_character_consistency_weight", 0.0, raising=False
+    )
+
+    ltm = memory_mod.LongTermMemory(persist_directory=str(temp_dir / "ltm"), user_id=1)
+    first = ltm.search_memories("还记得我喜欢什么吗", k=3)
+    assert first and first[0]["content"] == "用户喜欢草莓蛋糕"
+    assert store.searches == 1
+
+    # 措辞不同但向量相近：直接复用，不再检索；返回副本互不影响
+    first[0]["metadata"]["importance"] = 0.0
+    second = ltm.search_memories("你记得我喜欢啥吗", k=3)
+    assert store.searches == 1
+    assert second[0]["metadata"]["importance"] == 0.8
+    assert store.embeds == 2
+
+    # 不相关查询与写入后的查询都要重新检索
+    ltm.search_memories("今天天气怎么样", k=3)
+    assert store.searches == 2
+    assert ltm.add_memory("新的记忆", metadata={"importance": 0.5})
+    ltm.search_memories("你记得我喜欢啥吗", k=3)
+    assert store.searches == 3
+
+    stats = ltm.query_cache_stats()
+    assert stats is not None and stats["hits"] == 1 and stats["invalidations"] >= 1
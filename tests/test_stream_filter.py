@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src.agent.stream_filter import RetractableStreamFilter, StreamTextFilter
+
+
+def _run(chunks: list[str], **kwargs) -> tuple[str, StreamTextFilter]:
+    stream_filter = StreamTextFilter(**kwargs)
+    out = [stream_filter.push(chunk) for chunk in chunks]
+    out.append(stream_filter.flush())
+    return "".join(out), stream_filter
+
+
+def _random_chunks(text: str, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    chunks: list[str] = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 9)
+        chunks.append(text[pos : pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [
+        (
+            '["general_chat"]}["emotion_analysis","affection_expression"]}当然是真的喵！\n再见',
+            "当然是真的喵！\n再见",
+        ),
+        (
+            '好的主人喵！\n["local_search","map_guide"]}\n我来帮您找附近的日式料理店喵！',
+            "好的主人喵！\n我来帮您找附近的日式料理店喵！",
+        ),
+        (
+            'ToolSelectionResponse\n{"tools":["calculator"]}当然是真的喵！',
+            "当然是真的喵！",
+        ),
+        (
+            "TOOL_RESULT: get_current_time\nlocal_time: 2025-12-26 22:44:00\n\n当然是真的喵！",
+            "当然是真的喵！",
+        ),
+        ('{"answer": 1} 后续解释\n["a_b","c_d"]\nok', '{"answer": 1} 后续解释\n["a_b","c_d"]\nok'),
+        ("普通文本\n[注意] 这是提示\ntools are fine", "普通文本\n[注意] 这是提示\ntools are fine"),
+    ],
+)
+def test_stream_filter_decisions_are_split_invariant(raw: str, expected: str) -> None:
+    whole, _ = _run([raw])
+    assert whole == expected
+    for seed in range(20):
+        out, _ = _run(_random_chunks(raw, seed))
+        assert out == expected
+
+
+def test_stream_filter_coalesces_until_min_chars_or_newline() -> None:
+    stream_filter = StreamTextFilter(min_chars=6)
+
+    assert stream_filter.push("你好") == ""
+    assert stream_filter.push("主人") == ""
+    assert stream_filter.push("喵~") == "你好主人喵~"
+    assert stream_filter.push("a\n") == "a\n"
+    assert stream_filter.push("b") == ""
+    assert stream_filter.flush() == "b"
+
+
+def test_stream_filter_push_snapshot_only_processes_new_suffix() -> None:
+    stream_filter = StreamTextFilter()
+
+    assert stream_filter.push_snapshot("你好") == "你好"
+    assert stream_filter.push_snapshot("你好主人") == "主人"
+    assert stream_filter.push_snapshot("你好主人") == ""
+    assert stream_filter.push_snapshot("你好呀") == "呀"
+
+
+def test_stream_filter_releases_prose_bracket_without_waiting_for_close() -> None:
+    stream_filter = StreamTextFilter()
+
+    assert stream_filter.push("[ 这是一段没有闭合括号的说明") == "[ 这是一段没有闭合括号的说明"
+
+
+def test_stream_filter_buffer_is_bounded_for_oversized_tool_payload() -> None:
+    payload = '{"tools": [' + ", ".join(f'"tool_{i}"' for i in range(2_000)) + "]}"
+    raw = payload + "\n正文"
+
+    out, stream_filter = _run(_random_chunks(raw, 7), max_buffer_chars=1_000)
+
+    assert out == "正文"
+    assert stream_filter.peak_buffered <= 1_000 + 9
+
+
+def test_stream_filter_prefix_only_passes_through_after_first_text() -> None:
+    out, _ = _run(['{"tools":["calculator"]}', "你好\n", '{"tools":["x"]}'], prefix_only=True)
+
+    assert out == '你好\n{"tools":["x"]}'
+
+
+def test_retractable_filter_reports_downstream_retraction_and_replay() -> None:
+    stream_filter = RetractableStreamFilter(min_chars=1)
+    shown = stream_filter.push("好的，") + stream_filter.push("让我查一下")
+    assert shown == "好的，让我查一下"
+
+    # 撤回末尾 5 个原始字符：下游丢弃同样多的已输出文本，无需补发
+    assert stream_filter.retract(len("让我查一下")) == (5, "")
+    assert stream_filter.push("答案是 2") == "答案是 2"
+    assert stream_filter.flush() == ""
+
+    # 原始文本中被过滤掉的部分不计入下游撤回
+    stream_filter = RetractableStreamFilter(min_chars=1)
+    raw = '{"tool_calls": [{"name": "calc"}]}\n好'
+    shown = "".join(stream_filter.push(ch) for ch in raw)
+    assert shown == "好"
+    assert stream_filter.retract(len(raw)) == (1, "")
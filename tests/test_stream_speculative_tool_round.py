@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+import pytest
+
+from src.agent.core import LLMTimeouts, MintChatAgent
+from src.config.settings import settings
+from src.llm_native.backend import ChatBackend, ChatRequest, ChatResponse
+from src.llm_native.events import DoneEvent, TextDeltaEvent, ToolCallDeltaEvent
+from src.llm_native.tool_runner import ToolRunner
+from src.utils.stream_processor import StreamRetraction, apply_stream_retraction
+
+
+class _Executor:
+    def execute_tool(self, name: str, timeout: float, **kwargs: Any) -> str:
+        return f"{name}=2"
+
+
+@dataclass(slots=True)
+class _ToolRoundBackend(ChatBackend):
+    calls: int = 0
+
+    def complete(self, request: ChatRequest) -> ChatResponse:  # pragma: no cover
+        raise NotImplementedError
+
+    def stream(self, request: ChatRequest) -> Iterator[Any]:
+        self.calls += 1
+        if self.calls == 1:
+            # 工具轮：先吐出前置说明，再出现 tool_call
+            yield TextDeltaEvent(delta="让我查一下")
+            yield ToolCallDeltaEvent(
+                index=0, tool_call_id="call_1", name="calculator", arguments_delta="{}"
+            )
+            yield DoneEvent(finish_reason="tool_calls")
+            return
+        yield TextDeltaEvent(delta="答案是 2 喵~")
+        yield DoneEvent(finish_reason="stop")
+
+
+class _Registry:
+    def get_tool_specs(self) -> list:
+        return []
+
+
+def _make_agent(backend: _ToolRoundBackend) -> MintChatAgent:
+    agent = MintChatAgent.__new__(MintChatAgent)
+    agent._stream_executor = ThreadPoolExecutor(max_workers=1)  # type: ignore[attr-defined]
+    agent._llm_timeouts = LLMTimeouts(  # type: ignore[attr-defined]
+        first_chunk=5.0, idle_chunk=5.0, total=10.0
+    )
+    agent._stream_min_chars = 1  # type: ignore[attr-defined]
+    agent.tool_registry = _Registry()  # type: ignore[attr-defined]
+    agent._get_native_backend = lambda: backend  # type: ignore[assignment]
+    agent._build_native_pipeline = lambda *_a: None  # type: ignore[assignment]
+    agent._native_tool_runner = ToolRunner(tool_executor=_Executor())  # type: ignore[attr-defined]
+    return agent
+
+
+@pytest.mark.parametrize("speculative", [False, True])
+def test_native_stream_retracts_tool_round_preamble(monkeypatch, speculative: bool) -> None:
+    monkeypatch.setattr(settings.agent, "native_speculative_streaming", speculative)
+    backend = _ToolRoundBackend()
+    agent = _make_agent(backend)
+
+    try:
+        chunks = list(agent._stream_llm_response_native([{"role": "user", "content": "1+1?"}]))
+    finally:
+        agent._stream_executor.shutdown(wait=True)
+
+    assert backend.calls == 2
+    retractions = [c for c in chunks if isinstance(c, StreamRetraction)]
+    if speculative:
+        # 前置说明先于 tool_call 输出，随后整段撤回
+        assert chunks[0] == "让我查一下"
+        assert [r.chars for r in retractions] == [len("让我查一下")]
+    else:
+        assert retractions == []
+
+    visible: list[str] = []
+    for chunk in chunks:
+        if isinstance(chunk, StreamRetraction):
+            apply_stream_retraction(visible, chunk.chars)
+        else:
+            visible.append(chunk)
+    assert "".join(visible) == "答案是 2 喵~"
+
+
+def test_chat_stream_saves_history_without_retracted_preamble() -> None:
+    from src.agent.core import AgentConversationBundle
+
+    agent = MintChatAgent.__new__(MintChatAgent)
+    bundle = AgentConversationBundle(
+        messages=[{"role": "user", "content": "1+1?"}],
+        save_message="1+1?",
+        original_message="1+1?",
+        processed_message="1+1?",
+    )
+
+    def stream_llm(_messages: list, *, tool_recorder=None, cancel_event=None) -> Iterator[str]:
+        yield "让我查一下"
+        yield StreamRetraction(len("让我查一下"))
+        yield "答案是 2 喵~"
+
+    saved: dict[str, str] = {}
+
+    def post_actions(
+        _save_message: str, reply: str, _save_to_long_term: bool, *, stream: bool
+    ) -> None:
+        saved["reply"] = reply
+
+    agent._build_agent_bundle = lambda *_a, **_k: bundle  # type: ignore[assignment]
+    agent._stream_llm_response_native = stream_llm  # type: ignore[assignment]
+    agent._post_reply_actions = post_actions  # type: ignore[assignment]
+
+    chunks = list(agent.chat_stream("1+1?"))
+
+    # 撤回标记继续交给 UI/TTS，历史只保存撤回后的文本
+    assert any(isinstance(c, StreamRetraction) for c in chunks)
+    assert saved["reply"] == "答案是 2 喵~"
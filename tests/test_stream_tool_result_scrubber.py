@@ -2,7 +2,10 @@ from __future__ import annotations
 
 from time import perf_counter
 
+import pytest
+
 from src.agent.core import MintChatAgent, StreamToolTraceScrubber
+from src.agent.stream_filter import StreamTextFilter
 from src.utils.tool_context import ToolTraceRecorder
 
 
@@ -74,3 +77,74 @@ def test_stream_tool_trace_scrubber_drops_partial_tool_result_prefix_on_flush()
     chunks = ["TOOL_RE"]
     output = "".join(scrubber.process(chunk) for chunk in chunks) + scrubber.flush()
     assert output == ""
+
+
+def _filter_new(chunks: list[str]) -> str:
+    stream_filter = StreamTextFilter(max_buffer_chars=32_768)
+    return "".join(stream_filter.push(chunk) for chunk in chunks) + stream_filter.flush()
+
+
+def test_stream_filter_scrubs_tool_result_after_kept_route_tag_list() -> None:
+    raw = '["general_chat"]\nTOOL_RESULT: get_time\nlocal_time: 1\n\n喵~'
+    assert _filter_new([raw]) == '["general_chat"]\n喵~'
+    assert _filter_new(list(raw)) == '["general_chat"]\n喵~'
+
+
+# (原始流, 可见输出)：与旧“前缀剥离 + 工具痕迹清理”链路整段输入的结果一致
+_GOLDEN_CASES = [
+    # 单个片段
+    ('["general_chat"]好的', '["general_chat"]好的'),
+    ('["a_b","c_d"]好的', '["a_b","c_d"]好的'),
+    ('["emotion_analysis"]\n{"x":1}\n好的', '{"x":1}\n好的'),
+    ('{"tools":["calculator"]}好的', "好的"),
+    ('[{"type":"function","function":{"name":"f","arguments":"{}"}}]\n好的', "好的"),
+    ("TOOL_RESULT: get_time\n好的", "好的"),
+    ("local_time: 1\n好的", "local_time: 1\n好的"),
+    ("results:\n好的", "results:\n好的"),
+    ("1. x\n好的", "1. x\n好的"),
+    ("}好的", "}好的"),
+    ("\n好的", "\n好的"),
+    ("  好的", "  好的"),
+    ("喵~好的", "喵~好的"),
+    ("hello\n好的", "hello\n好的"),
+    ("[注意] 文本\n好的", "[注意] 文本\n好的"),
+    ("tool 单独\n好的", "tool 单独\n好的"),
+    ("[1, 2]\n好的", "[1, 2]\n好的"),
+    ('{"a": 1}\n好的', '{"a": 1}\n好的'),
+    ("ToolSelectionResponse(tools=['calculator'])\n喵~好的", "喵~好的"),
+    # 分流标签列表：紧跟 `}` 时丢弃，单独成行时保留
+    ('["general_chat"]}hello\n好的', "hello\n好的"),
+    ('["general_chat"]\n喵~好的', '["general_chat"]\n喵~好的'),
+    ('tool 单独\n["general_chat"]}好的', "tool 单独\n好的"),
+    # 工具调用载荷之后的正文与工具痕迹
+    ('{"tools":["calculator"]}喵~好的', "喵~好的"),
+    ('  {"tools":["calculator"]}喵~好的', "喵~好的"),
+    ('{"tools":["calculator"]}\nTOOL_RESULT: get_time\nlocal_time: 1\n好的', "好的"),
+    ('[{"type":"function","function":{"name":"f","arguments":"{}"}}]\nhello\n好的', "hello\n好的"),
+    (
+        '[{"type":"function","function":{"name":"f","arguments":"{}"}}]\n["general_chat"]}好的',
+        "好的",
+    ),
+    ('hello\n{"tools":["calculator"]}好的', "hello\n好的"),
+    ('{"a": 1}\n{"tools":["calculator"]}好的', '{"a": 1}\n好的'),
+    # TOOL_RESULT 头及其续行
+    ("TOOL_RESULT: get_time\nresults:\n1. x\n喵~好的", "喵~好的"),
+    ('["general_chat"]TOOL_RESULT: get_time\nlocal_time: 1\n好的', '["general_chat"]好的'),
+    ('["a_b","c_d"]\nTOOL_RESULT: get_time\nlocal_time: 1\n好的', '["a_b","c_d"]\n好的'),
+    ('["emotion_analysis"]\n{"x":1}\nTOOL_RESULT: get_time\nlocal_time: 1\n好的', '{"x":1}\n好的'),
+    ("[1, 2]\nTOOL_RESULT: get_time\nlocal_time: 1\n好的", "[1, 2]\n好的"),
+    ("[注意] 文本\nTOOL_RESULT: get_time\nlocal_time: 1\n好的", "[注意] 文本\n好的"),
+    # 非行首的 TOOL_RESULT 属于正文
+    (
+        "喵~TOOL_RESULT: get_time\nlocal_time: 1\n好的",
+        "喵~TOOL_RESULT: get_time\nlocal_time: 1\n好的",
+    ),
+    ("}TOOL_RESULT: get_time\nlocal_time: 1\n好的", "}TOOL_RESULT: get_time\nlocal_time: 1\n好的"),
+]
+
+
+@pytest.mark.parametrize(("raw", "expected"), _GOLDEN_CASES)
+def test_stream_filter_golden_cases(raw: str, expected: str) -> None:
+    """任意切分（整段/按行/逐字）下输出都与期望一致。"""
+    for chunks in ([raw], raw.splitlines(keepends=True), list(raw)):
+        assert _filter_new(chunks) == expected, chunks
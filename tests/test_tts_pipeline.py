@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import re
+import threading
+import wave
+
+import pytest
+
+from src.multimodal.tts_pipeline import StreamingTTSPipeline, wav_duration_s
+from src.utils.async_loop_thread import AsyncLoopThread
+from src.utils.stream_processor import StreamRetraction
+
+
+def _wav(duration_s: float, rate: int = 8000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(rate * duration_s))
+    return buf.getvalue()
+
+
+class _FakeManager:
+    def __init__(self, delays: dict[str, float] | None = None, fail: set[str] | None = None):
+        self.delays = delays or {}
+        self.fail = fail or set()
+        self.active = 0
+        self.max_active = 0
+        self.texts: list[str] = []
+
+    async def synthesize_text(self, text: str, agent_profile=None):  # noqa: ANN001
+        self.texts.append(text)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(text, 0.01))
+        finally:
+            self.active -= 1
+        if text in self.fail:
+            return None
+        return text.encode("utf-8") + b"|" + _wav(0.02)
+
+
+class _Player:
+    def __init__(self) -> None:
+        self.played: list[str] = []
+        self.event = threading.Event()
+
+    def play_audio(self, audio: bytes) -> bool:
+        self.played.append(audio.split(b"|", 1)[0].decode("utf-8"))
+        self.event.set()
+        return True
+
+
+@pytest.fixture()
+def runtime():
+    loop_thread = AsyncLoopThread(thread_name="test-tts-pipeline")
+    yield loop_thread
+    loop_thread.close(timeout=2.0)
+
+
+def test_sentences_play_in_order_with_bounded_lookahead(runtime) -> None:
+    # 第一句合成最慢：后续句子先完成也必须等它交付
+    manager = _FakeManager(delays={"第一句话比较长哦。": 0.15})
+    player = _Player()
+    pipeline = StreamingTTSPipeline(manager, player, lookahead=2, runtime=runtime)
+
+    for ch in "第一句话比较长哦。第二句来了！第三句也到了。最后一句":
+        pipeline.feed(ch)
+    pipeline.finish()
+    assert pipeline.wait(3.0)
+
+    assert player.played == ["第一句话比较长哦。", "第二句来了！", "第三句也到了。", "最后一句"]
+    assert manager.max_active <= 2
+    stats = pipeline.stats()
+    assert stats["sentences"] == 4 and stats["delivered"] == 4 and stats["inflight"] == 0
+    assert len(stats["gaps_ms"]) == 3
+    assert stats["time_to_first_audio_ms"] >= stats["first_sentence_ms"]
+
+
+def test_first_audio_arrives_before_stream_ends(runtime) -> None:
+    manager = _FakeManager(fail={"这句会失败的。"})
+    player = _Player()
+    pipeline = StreamingTTSPipeline(
+        manager,
+        player,
+        runtime=runtime,
+        text_filter=lambda s: re.sub(r"（[^）]*）", "", s),
+    )
+
+    pipeline.feed("你好呀主人。")
+    assert player.event.wait(2.0)
+    stats = pipeline.stats()
+    assert not stats["finished"] and stats["time_to_first_audio_ms"] is not None
+
+    pipeline.feed("（蹭蹭主人的手）这句会失败的。然后继续说话。")
+    pipeline.finish()
+    assert pipeline.wait(2.0)
+    # 动作描写在送入 TTS 前被过滤；失败的句子被跳过，不阻塞后续句子
+    assert player.played == ["你好呀主人。", "然后继续说话。"]
+    assert pipeline.stats()["failed"] == 1
+
+
+def test_tee_passes_chunks_through_and_cancels_on_error(runtime) -> None:
+    manager = _FakeManager(delays={"第二句等很久。": 1.0})
+    player = _Player()
+    pipeline = StreamingTTSPipeline(manager, player, runtime=runtime)
+
+    def chunks():  # noqa: ANN202
+        yield "第一句说完了。"
+        yield "第二句等很久。"
+        raise RuntimeError("stream aborted")
+
+    seen: list[str] = []
+    with pytest.raises(RuntimeError):
+        for chunk in pipeline.tee(chunks()):
+            seen.append(chunk)
+
+    assert seen == ["第一句说完了。", "第二句等很久。"]
+    assert pipeline.wait(0.5) and pipeline.stats()["cancelled"]
+    pipeline.feed("之后的文本不再合成。")
+    assert "之后的文本不再合成。" not in manager.texts
+
+
+def test_retraction_drops_unplayed_tool_round_preamble(runtime) -> None:
+    # 前置说明合成较慢，尚未交付时该轮转为工具轮并被撤回
+    manager = _FakeManager(delays={"让我查一下天气。": 0.3})
+    player = _Player()
+    pipeline = StreamingTTSPipeline(manager, player, runtime=runtime)
+
+    preamble = "让我查一下天气。稍等"
+    chunks = [preamble, StreamRetraction(len(preamble)), "今天是晴天。", "保留这句。多余"]
+    chunks += [StreamRetraction(len("多余")), "结束。"]
+    seen = list(pipeline.tee(chunks))
+    assert pipeline.wait(2.0)
+
+    assert seen == chunks
+    assert player.played == ["今天是晴天。", "保留这句。", "结束。"]
+    assert pipeline.stats()["inflight"] == 0
+
+
+def test_wav_duration() -> None:
+    assert wav_duration_s(_wav(0.5)) == pytest.approx(0.5)
+    assert wav_duration_s(b"not a wav") == 0.0
+
+
+class _StreamWriter:
+    def __init__(self, log: list[str]) -> None:
+        self.log = log
+        self.data: list[bytes] = []
+        self.state = "open"
+
+    def write(self, chunk) -> None:  # noqa: ANN001
+        self.data.append(chunk.data)
+
+    def close(self) -> None:
+        self.state = "closed"
+        self.log.append(b"".join(self.data).decode("utf-8"))
+
+    def abort(self) -> None:
+        self.state = "aborted"
+
+
+class _StreamPlayer(_Player):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writers: list[_StreamWriter] = []
+
+    def open_stream(self, preroll_ms=None):  # noqa: ANN001
+        writer = _StreamWriter(self.played)
+        self.writers.append(writer)
+        return writer
+
+
+class _StreamingManager(_FakeManager):
+    config = type("Cfg", (), {"stream_audio_enabled": True, "stream_preroll_ms": 80})()
+
+    async def stream_text(self, text: str, agent_profile=None):  # noqa: ANN001
+        from src.multimodal.pcm_stream import PcmChunk
+
+        self.texts.append(text)
+        if text in self.fail:
+            return
+        for ch in text:
+            await asyncio.sleep(self.delays.get(text, 0.0))
+            yield PcmChunk(ch.encode("utf-8"), 8000)
+
+
+def test_stream_audio_opens_writers_in_sentence_order(runtime) -> None:
+    manager = _StreamingManager(delays={"慢一点的第一句。": 0.02}, fail={"失败句。"})
+    player = _StreamPlayer()
+    pipeline = StreamingTTSPipeline(manager, player, runtime=runtime)
+
+    pipeline.feed("慢一点的第一句。失败句。第三句。")
+    pipeline.finish()
+    assert pipeline.wait(3.0)
+
+    # 句柄按句序打开；失败的句子被放弃，其余写完后关闭
+    assert [w.state for w in player.writers] == ["closed", "aborted", "closed"]
+    assert sorted(player.played) == sorted(["慢一点的第一句。", "第三句。"])
+    stats = pipeline.stats()
+    assert stats["streamed"] == 2 and stats["failed"] == 1
+    assert stats["time_to_first_audio_ms"] is not None
+
+
+def test_gui_pipeline_and_warmer_share_agent_speech_profile(monkeypatch) -> None:
+    pytest.importorskip("PyQt6")
+    from types import SimpleNamespace
+
+    import src.multimodal.tts_warmer as tts_warmer
+    from src.agent.core import MintChatAgent
+    from src.gui.light_chat_window import LightChatWindow
+
+    warmed: list[dict] = []
+    monkeypatch.setattr(
+        tts_warmer, "start_tts_warmer", lambda _manager, **kwargs: warmed.append(kwargs)
+    )
+
+    class _Profile:
+        persona = ""
+        speaking_style = ""
+        mood_value = 0.0
+
+    manager = _FakeManager()
+    agent = MintChatAgent.__new__(MintChatAgent)
+    agent.user_id = 1
+    agent.character = SimpleNamespace(
+        name="小雪", get_greeting=lambda: "你好", get_farewell=lambda: "再见"
+    )
+    agent.mood_system = SimpleNamespace(enabled=True, mood_value=0.9, pad_state=None)
+    agent._tts_runtime = (manager, _Profile)
+
+    def text_filter(text: str) -> str:
+        return text
+
+    player = _Player()
+    window = SimpleNamespace(
+        agent=agent,
+        tts_enabled=True,
+        tts_manager=manager,
+        audio_player=player,
+        _tts_pipeline=None,
+        _tts_warmer=None,
+        _tts_warmer_agent=None,
+        _tts_text_filter=text_filter,
+    )
+    LightChatWindow._start_tts_pipeline(window)  # type: ignore[arg-type]
+    LightChatWindow._start_tts_warmer(window)  # type: ignore[arg-type]
+
+    pipeline = window._tts_pipeline
+    assert isinstance(pipeline, StreamingTTSPipeline)
+    profile = pipeline._profile
+    # GUI 语音不随情绪变化：流水线与预热器的语音参数一致，预热缓存可被流水线命中
+    assert profile.persona == "小雪" and profile.mood_value == 0.0
+    assert vars(warmed[0]["agent_profile"]) == vars(profile)
+    assert warmed[0]["text_filter"] is text_filter
+    pipeline.cancel()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+import wave
+
+import pytest
+
+from src.multimodal.tts_cache import PersistentTTSAudioCache, create_tts_disk_cache
+from src.multimodal.tts_segment_cache import SegmentedTTSAudioCache, codec_available
+from tests.fake_gpt_sovits import sine_pcm
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def time(self) -> float:
+        self.now += 0.001  # 保证 LRU 时间戳严格递增
+        return self.now
+
+
+def _wav(duration_s: float = 0.2, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(sine_pcm(duration_s, rate))
+    return buf.getvalue()
+
+
+def test_lru_order_survives_reopen(tmp_path) -> None:
+    clock = _FakeClock()
+    cache = SegmentedTTSAudioCache(tmp_path, max_entries=3, time_provider=clock.time)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.encode() * 100)
+    assert cache.get("a") == b"a" * 100  # a 变为最近使用
+    cache.close()
+
+    reopened = SegmentedTTSAudioCache(tmp_path, max_entries=3, time_provider=clock.time)
+    reopened.set("d", b"d" * 100)  # 淘汰最久未用的 b
+    assert reopened.get("b") is None
+    assert reopened.get("a") == b"a" * 100 and reopened.get("c") == b"c" * 100
+    stats = reopened.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1
+    assert stats["codec"] == "gzip" and stats["disk_usage"] == 300
+
+
+def test_ttl_and_byte_limit(tmp_path) -> None:
+    clock = _FakeClock()
+    cache = SegmentedTTSAudioCache(
+        tmp_path,
+        max_entries=10,
+        max_disk_usage_bytes=250,
+        compress=False,
+        ttl_seconds=5,
+        time_provider=clock.time,
+    )
+    cache.set("x", b"x" * 100)
+    cache.set("y", b"y" * 100)
+    cache.set("z", b"z" * 100)  # 超出 250 字节：淘汰 x
+    assert cache.get("x") is None and cache.get("y") == b"y" * 100
+
+    clock.now += 10
+    assert cache.get("y") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_overwrites_are_compacted_out_of_old_segments(tmp_path) -> None:
+    cache = SegmentedTTSAudioCache(
+        tmp_path, max_entries=4, compress=False, segment_max_bytes=64 * 1024
+    )
+    blobs = {f"k{i}": bytes([i]) * 20_000 for i in range(12)}
+    for key, blob in blobs.items():
+        cache.set(key, blob)
+
+    stats = cache.stats()
+    assert stats["entries"] == 4 and stats["compactions"] > 0
+    # 旧段中的空洞被回收：段文件总量不超过存活数据 + 一个活动段
+    assert stats["segment_bytes"] <= stats["disk_usage_bytes"] + 64 * 1024
+    for key in ("k8", "k9", "k10", "k11"):
+        assert cache.get(key) == blobs[key]
+    files = sorted(p.name for p in (tmp_path / "segments").iterdir())
+    assert len(files) == stats["segments"]
+
+
+def test_corrupted_payload_is_dropped(tmp_path) -> None:
+    cache = SegmentedTTSAudioCache(tmp_path, compress=False)
+    cache.set("k", b"HELLO WORLD")
+    segment = next((tmp_path / "segments").iterdir())
+    segment.write_bytes(b"JELLO WORLD")
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_legacy_json_cache_is_migrated(tmp_path) -> None:
+    legacy = PersistentTTSAudioCache(root_dir=tmp_path, max_entries=10)
+    legacy.set("old-1", b"first")
+    legacy.set("old-2", b"second")
+
+    cache = create_tts_disk_cache(tmp_path, backend="segment", max_entries=10)
+    assert isinstance(cache, SegmentedTTSAudioCache)
+    assert cache.get("old-1") == b"first" and cache.get("old-2") == b"second"
+    assert not (tmp_path / "cache_index.json").exists()
+    assert not (tmp_path / "audio").exists()
+
+
+@pytest.mark.parametrize("codec", ["flac", "opus"])
+def test_soundfile_codecs_shrink_audio(tmp_path, codec: str) -> None:
+    pytest.importorskip("soundfile")
+    if not codec_available(codec):
+        pytest.skip(f"libsndfile 不支持 {codec}")
+    np = pytest.importorskip("numpy")
+
+    audio = _wav(1.0)
+    cache = SegmentedTTSAudioCache(tmp_path, codec=codec)
+    cache.set("k", audio)
+    restored = cache.get("k")
+    assert restored is not None
+
+    stats = cache.stats()
+    assert stats["codec"] == codec and stats["disk_usage_bytes"] < len(audio) / 2
+    with wave.open(io.BytesIO(restored), "rb") as wav:
+        assert wav.getframerate() == 16000
+        frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    original = np.frombuffer(audio[44:], dtype="<i2")
+    if codec == "flac":
+        assert np.array_equal(frames, original)
+    else:
+        assert abs(frames.size - original.size) < 16000 * 0.1
+
+    # 非 WAV 数据无法用音频编码时回退 gzip
+    cache.set("blob", b"not audio" * 10)
+    assert cache.get("blob") == b"not audio" * 10
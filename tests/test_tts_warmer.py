@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+
+import pytest
+
+from src.multimodal.tts_cache import PersistentTTSAudioCache
+from src.multimodal.tts_manager import TTSConfig, TTSManager
+from src.multimodal.tts_segment_cache import SegmentedTTSAudioCache
+from src.multimodal.tts_warmer import TTSWarmer, mine_chat_history_phrases
+from src.utils.async_loop_thread import AsyncLoopThread
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def time(self) -> float:
+        self.now += 0.001  # 保证 LRU 时间戳严格递增
+        return self.now
+
+
+@pytest.mark.parametrize("backend", ["json", "segment"])
+def test_pinned_entries_survive_lru(tmp_path, backend: str) -> None:
+    clock = _FakeClock()
+    if backend == "json":
+        cache = PersistentTTSAudioCache(root_dir=tmp_path, max_entries=2, time_provider=clock.time)
+    else:
+        cache = SegmentedTTSAudioCache(tmp_path, max_entries=2, time_provider=clock.time)
+    cache.set("greeting", b"hello" * 10, pinned=True)
+    assert not cache.pin("missing")
+    for i in range(5):
+        cache.set(f"k{i}", bytes([i]) * 50)
+
+    assert cache.get("greeting") == b"hello" * 10
+    assert cache.get("k4") == bytes([4]) * 50
+    assert cache.get("k0") is None
+    assert cache.stats()["pinned"] == 1
+
+    # 覆盖写入保留常驻标记；取消后参与淘汰
+    cache.set("greeting", b"hi" * 10)
+    cache.set("k5", b"x")
+    assert cache.get("greeting") == b"hi" * 10
+    assert cache.pin("greeting", False)
+    for i in range(6, 10):
+        cache.set(f"k{i}", b"y")
+    assert cache.get("greeting") is None
+
+    # 只保留给定键的常驻标记
+    cache.set("hello", b"h", pinned=True)
+    cache.set("bye", b"b", pinned=True)
+    assert cache.unpin_except(["hello"]) == 1
+    assert cache.unpin_except(["hello"]) == 0
+    assert cache.stats()["pinned"] == 1
+
+
+def test_mine_chat_history_counts_spoken_sentences(tmp_path) -> None:
+    db_path = tmp_path / "user_data.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE chat_history "
+        "(id INTEGER PRIMARY KEY, user_id INTEGER, role TEXT, content TEXT)"
+    )
+    rows = [
+        ("assistant", "主人早上好喵！（摇尾巴）今天也要加油哦。"),
+        ("assistant", "主人早上好喵！要吃早饭吗？"),
+        ("assistant", "今天也要加油哦。"),
+        ("user", "主人早上好喵！"),
+        ("assistant", "这是一句只出现一次的很长很长的回复。"),
+    ]
+    conn.executemany("INSERT INTO chat_history (user_id, role, content) VALUES (1, ?, ?)", rows)
+    # 其他用户的对话不参与统计
+    conn.executemany(
+        "INSERT INTO chat_history (user_id, role, content) VALUES (2, 'assistant', ?)",
+        [("别人家的口头禅。",)] * 3,
+    )
+    conn.commit()
+    conn.close()
+
+    phrases = dict(mine_chat_history_phrases(db_path, 1, min_count=2))
+    assert phrases == {"主人早上好喵！": 2, "今天也要加油哦。": 2}
+    assert dict(mine_chat_history_phrases(db_path, 2)) == {"别人家的口头禅。": 3}
+    assert mine_chat_history_phrases(tmp_path / "missing.db", 1) == []
+
+
+def test_warmer_pins_phrases_and_waits_for_idle(tmp_path, fake_gpt_sovits) -> None:
+    manager = TTSManager(
+        TTSConfig(api_url=fake_gpt_sovits.url, disk_cache_dir=str(tmp_path / "cache"))
+    )
+    runtime = AsyncLoopThread(thread_name="tts-warmer-test")
+    try:
+        warmer = TTSWarmer(manager, idle_grace_s=0.0, poll_interval_s=0.02, runtime=runtime)
+        phrases = warmer.collect_phrases(["你好呀主人！（挥手）", "你好呀主人！", "再见啦。"])
+        assert phrases == ["你好呀主人！", "再见啦。"]
+
+        manager._active_requests = 1  # 模拟实时合成进行中
+        future = warmer.start(phrases)
+        time.sleep(0.2)
+        assert fake_gpt_sovits.requests == []
+        manager._active_requests = 0
+        stats = future.result(timeout=10)
+        assert stats["synthesized"] == 2 and stats["idle_wait_ms"] > 0
+        assert manager._disk_cache.stats()["pinned"] == 2
+
+        # 再次预热：只命中缓存，不再请求服务
+        again = TTSWarmer(manager, idle_grace_s=0.0, runtime=runtime).start(phrases)
+        assert again.result(timeout=10)["cached"] == 2
+        assert len(fake_gpt_sovits.requests) == 2
+
+        # 实际朗读命中预热结果
+        audio = runtime.submit(manager.synthesize_text("你好呀主人！")).result(timeout=10)
+        assert audio is not None and len(fake_gpt_sovits.requests) == 2
+        assert manager.is_idle(0.0)
+
+        # 计划变化：上一轮计划外的常驻句恢复参与淘汰，常驻条目不随预热次数累积
+        changed = TTSWarmer(manager, idle_grace_s=0.0, runtime=runtime).start(["晚安喵。"])
+        stats = changed.result(timeout=10)
+        assert stats["unpinned"] == 2 and stats["synthesized"] == 1
+        assert manager._disk_cache.stats()["pinned"] == 1
+    finally:
+        runtime.submit(manager.client.close()).result(timeout=5)
+        runtime.close()
+
+
+def test_agent_start_tts_warmer_pins_greeting_farewell_for_user(monkeypatch) -> None:
+    from types import SimpleNamespace
+
+    import src.multimodal.tts_warmer as tts_warmer
+    from src.agent.core import MintChatAgent
+
+    started: list[dict] = []
+
+    def fake_start(_manager, **kwargs):  # noqa: ANN001, ANN202
+        started.append(kwargs)
+        return object()
+
+    monkeypatch.setattr(tts_warmer, "start_tts_warmer", fake_start)
+
+    class _Profile:
+        persona = ""
+        speaking_style = ""
+
+    agent = MintChatAgent.__new__(MintChatAgent)
+    agent.user_id = 7
+    agent.character = SimpleNamespace(
+        name="小雪", get_greeting=lambda: "主人回来啦", get_farewell=lambda: "拜拜"
+    )
+    agent._tts_runtime = (object(), _Profile)
+
+    def text_filter(text: str) -> str:
+        return text
+
+    assert agent.start_tts_warmer(text_filter=text_filter, use_mood_context=False) is not None
+    assert started[0]["fixed"] == ["主人回来啦", "拜拜"]
+    assert started[0]["user_id"] == 7
+    assert started[0]["text_filter"] is text_filter
+    assert started[0]["agent_profile"].persona == "小雪"
+
+
+def test_gui_starts_warmer_once_agent_is_ready_after_tts() -> None:
+    pytest.importorskip("PyQt6")
+    from types import SimpleNamespace
+
+    from src.gui.light_chat_window import LightChatWindow
+
+    started: list[tuple[int, dict]] = []
+    stopped: list[object] = []
+
+    class _Warmer:
+        def stop(self) -> None:
+            stopped.append(self)
+
+    def _agent(user_id: int) -> SimpleNamespace:
+        def start_tts_warmer(**kwargs):  # noqa: ANN003, ANN202
+            started.append((user_id, kwargs))
+            return _Warmer()
+
+        return SimpleNamespace(user_id=user_id, start_tts_warmer=start_tts_warmer)
+
+    def text_filter(text: str) -> str:
+        return text
+
+    window = SimpleNamespace(
+        agent=None,
+        tts_manager=object(),
+        _tts_warmer=None,
+        _tts_warmer_agent=None,
+        _tts_text_filter=text_filter,
+    )
+
+    # TTS 先就绪：Agent 仍在初始化，不启动预热
+    LightChatWindow._start_tts_warmer(window)  # type: ignore[arg-type]
+    assert started == [] and window._tts_warmer is None
+
+    window.agent = _agent(7)
+    LightChatWindow._start_tts_warmer(window)  # type: ignore[arg-type]
+    LightChatWindow._start_tts_warmer(window)  # type: ignore[arg-type]
+    assert started == [(7, {"text_filter": text_filter, "use_mood_context": False})]
+
+    # 换了 Agent（重新登录）：旧预热器停止，按新用户重启
+    first = window._tts_warmer
+    window.agent = _agent(8)
+    LightChatWindow._start_tts_warmer(window)  # type: ignore[arg-type]
+    assert stopped == [first]
+    assert [user_id for user_id, _ in started] == [7, 8]
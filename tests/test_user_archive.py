@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import gzip
+import json
+import secrets
+from pathlib import Path
+
+from src.auth.user_data_manager import UserDataManager
+
+
+class _FakeMemory:
+    def __init__(self, items: list[dict] | None = None) -> None:
+        self.items = list(items or [])
+
+    def iter_export_items(self, *, batch_size: int = 500):
+        yield from self.items
+
+    def import_records(self, records, *, overwrite=False, batch_size=128):  # noqa: ANN001
+        self.items.extend(records)
+        return len(records)
+
+
+def _seed(manager: UserDataManager, user_id: int, count: int) -> None:
+    manager.add_contact(user_id, "Mint")
+    manager.add_contact(user_id, "Luna")
+    manager.save_user_settings(user_id, {"theme": "dark"})
+    manager.add_messages_batch(
+        [
+            {
+                "user_id": user_id,
+                "contact_name": ("Mint", "Luna")[i % 2],
+                "role": ("user", "assistant")[i % 2],
+                "content": f"m{i} {secrets.token_hex(32)}",
+            }
+            for i in range(count)
+        ]
+    )
+
+
+def test_archive_round_trip_streams_all_sections(temp_dir: Path) -> None:
+    source = UserDataManager(db_path=str(temp_dir / "a.db"))
+    _seed(source, 1, 250)
+    long_term = _FakeMemory(
+        [{"id": f"lt{i}", "content": f"记忆{i}", "metadata": {}} for i in range(3)]
+    )
+    core = _FakeMemory([{"id": "c0", "content": "住在杭州", "metadata": {"category": "home"}}])
+
+    progress: list[tuple[str, int, int]] = []
+    path = source.export_user_archive(
+        1,
+        str(temp_dir / "exports"),
+        long_term=long_term,
+        core_memory=core,
+        progress=lambda *args: progress.append(args),
+    )
+    assert path is not None and path.endswith(".jsonl.gz")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        kinds = [json.loads(line)["type"] for line in f]
+    assert kinds[0] == "header" and kinds[-1] == "footer"
+    assert kinds.count("message") == 250 and kinds.count("contact") == 2
+    assert ("messages", 250, 250) in progress
+
+    target = UserDataManager(db_path=str(temp_dir / "b.db"))
+    restored_lt, restored_core = _FakeMemory(), _FakeMemory()
+    stats = target.import_user_archive(2, path, long_term=restored_lt, core_memory=restored_core)
+    assert stats["complete"] and stats["messages"] == 250 and stats["contacts"] == 2
+    assert [r["content"] for r in restored_lt.items] == ["记忆0", "记忆1", "记忆2"]
+    assert restored_core.items[0]["metadata"] == {"category": "home"}
+    assert target.get_user_settings(2) == {"theme": "dark"}
+
+    original = source.get_chat_history_all(1, "Mint")
+    imported = target.get_chat_history_all(2, "Mint")
+    assert [(m["content"], m["timestamp"]) for m in imported] == [
+        (m["content"], m["timestamp"]) for m in original
+    ]
+
+    # 已完整导入的归档再次导入不会重复写入；import_user_data 自动识别归档格式
+    assert target.import_user_data(2, path)
+    assert target.get_user_message_count(2) == 250
+    source.close()
+    target.close()
+
+
+def test_interrupted_import_resumes_from_checkpoint(temp_dir: Path) -> None:
+    source = UserDataManager(db_path=str(temp_dir / "a.db"))
+    _seed(source, 1, 2000)
+    path = Path(source.export_user_archive(1, str(temp_dir / "exports")))
+    source.close()
+
+    # 模拟中断：只拷贝到一半的归档
+    partial = temp_dir / "partial.jsonl.gz"
+    data = path.read_bytes()
+    partial.write_bytes(data[: len(data) // 2])
+
+    target = UserDataManager(db_path=str(temp_dir / "b.db"))
+    first = target.import_user_archive(1, str(partial), batch_size=100)
+    assert not first["complete"] and 0 < first["messages"] < 2000
+
+    partial.write_bytes(data)  # 补全文件后继续
+    second = target.import_user_archive(1, str(partial), batch_size=100)
+    assert second["complete"] and second["resumed_from"] > 1
+    assert first["messages"] + second["messages"] == 2000
+    assert target.get_user_message_count(1) == 2000
+    contents = [m["content"] for m in target.get_chat_history_all(1, "Mint")]
+    assert len(contents) == len(set(contents)) == 1000
+    target.close()